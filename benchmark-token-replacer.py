@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This script compares the single pass TokenReplacer.filter with the
+    previous implementation, which searched for the first token and replaced
+    all of its occurrences until no token was left.
+"""
+
+import sys
+
+from timeit import Timer
+
+sys.path.append('src')
+
+from config_rpm_maker.token.tokenreplacer import MissingTokenException, TokenReplacer
+
+REPETITIONS = 5
+
+
+def legacy_filter(token_replacer, content):
+    while True:
+        match = TokenReplacer.TOKEN_PATTERN.search(content)
+        if not match:
+            return content
+        token_name = match.group(1)
+        if not token_name in token_replacer.token_values:
+            raise MissingTokenException(token_name)
+        replacement = token_replacer.replacer_function(token_name,
+                                                       token_replacer.token_values[token_name])
+
+        content = content.replace("@@@%s@@@" % token_name, replacement)
+        token_replacer.token_used.add(token_name)
+
+
+def create_content(token_count, lines):
+    line = u' '.join(u'key%d=@@@TOKEN_%d@@@' % (i, i) for i in range(token_count))
+    return u'\n'.join([line] * lines)
+
+
+def benchmark(token_count, lines):
+    token_values = dict(('TOKEN_%d' % i, 'value-%d' % i) for i in range(token_count))
+    token_replacer = TokenReplacer(token_values)
+    content = create_content(token_count, lines)
+
+    if legacy_filter(token_replacer, content) != token_replacer.filter(content):
+        raise Exception('Legacy and single pass filter do not produce the same result.')
+
+    number = max(1, 2000 / (token_count * lines))
+    legacy = min(Timer(lambda: legacy_filter(token_replacer, content)).repeat(REPETITIONS, number)) / number
+    single_pass = min(Timer(lambda: token_replacer.filter(content)).repeat(REPETITIONS, number)) / number
+
+    print '%5d tokens x %5d lines (%8d bytes): legacy %9.3fms  single pass %9.3fms  speedup %6.2fx' % (
+        token_count, lines, len(content), legacy * 1000, single_pass * 1000, legacy / single_pass)
+
+
+if __name__ == '__main__':
+    for token_count, lines in [(1, 1), (10, 10), (10, 1000), (100, 100), (500, 20)]:
+        benchmark(token_count, lines)
@@ -19,7 +19,7 @@ import traceback
 from logging import DEBUG, getLogger, getLevelName
 from sys import argv
 
-from config_rpm_maker.cli.argumentvalidation import ensure_valid_repository_url, ensure_valid_revision
+from config_rpm_maker.cli.argumentvalidation import ensure_valid_repository_url, ensure_valid_revision, split_revision_range
 from config_rpm_maker.cli.exitprogram import start_measuring_time, exit_program
 from config_rpm_maker.cli.returncodes import (RETURN_CODE_CONFIGURATION_ERROR,
                                               RETURN_CODE_UNKNOWN_EXCEPTION_OCCURRED,
@@ -32,7 +32,7 @@ from config_rpm_maker.cli.parsearguments import (ARGUMENT_REPOSITORY,
                                                  apply_arguments_to_config,
                                                  determine_console_log_level,
                                                  parse_arguments)
-from config_rpm_maker.configuration import get_svn_path_to_config, ConfigurationException, load_configuration_file
+from config_rpm_maker.configuration import get_svn_mirror_directory, get_svn_path_to_config, ConfigurationException, load_configuration_file
 from config_rpm_maker.configrpmmaker import ConfigRpmMaker
 from config_rpm_maker.cleaner import clean_up_deleted_hosts_data
 from config_rpm_maker.exceptions import BaseConfigRpmMakerException
@@ -40,6 +40,7 @@ from config_rpm_maker.utilities.logutils import (append_console_logger,
                                                  create_sys_log_handler,
                                                  log_additional_information,
                                                  log_exception_message)
+from config_rpm_maker.svnmirror import SvnMirror
 from config_rpm_maker.svnservice import SvnService
 
 from config_rpm_maker.version import __version__
@@ -122,10 +123,17 @@ def initialize_logging_to_syslog(arguments, revision):
 
 def building_configuration_rpms_and_clean_host_directories(repository, revision):
     """ This function will start the process of building configuration rpms
-        for the given configuration repository and the revision. """
+        for the given configuration repository and the revision. If the revision
+        is a revision range, the hosts affected by any revision of the range
+        are built once at the last revision of the range. """
 
+    first_revision, revision = split_revision_range(revision)
     path_to_config = get_svn_path_to_config()
+    svn_mirror_directory = get_svn_mirror_directory()
+    if svn_mirror_directory:
+        repository = SvnMirror(svn_mirror_directory, repository).synchronize(revision)
+
     svn_service = SvnService(base_url=repository, path_to_config=path_to_config)
-    svn_service.log_change_set_meta_information(revision)
-    ConfigRpmMaker(revision=revision, svn_service=svn_service).build()
-    clean_up_deleted_hosts_data(svn_service, revision)
+    svn_service.log_change_set_meta_information(revision, first_revision)
+    ConfigRpmMaker(revision=revision, svn_service=svn_service, first_revision=first_revision).build()
+    clean_up_deleted_hosts_data(svn_service, revision, first_revision)
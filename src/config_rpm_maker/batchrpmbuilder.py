@@ -0,0 +1,208 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the batch rpm builder. Instead of calling rpmbuild
+    once for every host, the hosts hand over the archive of their sources and
+    the archives are built in batches: rpmbuild builds all archives given on
+    its command line one after another within one process.
+
+    rpmbuild stops at the first archive which can not be built. In that case
+    the hosts which have not been built are built again: the first one, which
+    caused the failure, alone and the remaining hosts in a new batch. This way a failure is
+    reported for the host causing it only.
+"""
+
+from logging import getLogger
+from os import environ
+from os.path import abspath, basename
+from Queue import Queue
+from subprocess import PIPE, Popen
+from threading import Lock, Thread
+
+from config_rpm_maker.configuration.properties import is_no_clean_up_enabled
+from config_rpm_maker.utilities.profiler import measure_execution_time
+
+LOGGER = getLogger(__name__)
+
+WROTE_PREFIX = 'Wrote: '
+REPOS_PACKAGE_SUFFIX = '-repos'
+
+
+class RpmBuildJob(object):
+    """ The archive of the sources of a configuration rpm, which has been
+        assembled by one or more hosts (e.g. the hosts of a group rpm) """
+
+    def __init__(self, hostname, rpm_name, tar_path):
+        self.hostnames = [hostname]
+        self.rpm_name = rpm_name
+        self.tar_path = tar_path
+
+    def is_rpm_of_job(self, rpm_path):
+        return get_package_name(rpm_path) in (self.rpm_name, self.rpm_name + REPOS_PACKAGE_SUFFIX)
+
+
+def get_package_name(rpm_path):
+    """ returns: the package name of the given rpm file named <name>-<version>-<release>.<arch>.rpm """
+
+    name_version_release_arch = basename(rpm_path)[:-len('.rpm')]
+    name_version_release = name_version_release_arch.rsplit('.', 1)[0]
+    return name_version_release.rsplit('-', 2)[0]
+
+
+class BatchRpmBuilder(object):
+    """ Collects rpm build jobs and builds them in batches using rpmbuild """
+
+    def __init__(self, work_dir, rpm_build_dir, batch_size, notify_that_host_failed):
+        self.work_dir = work_dir
+        self.rpm_build_dir = rpm_build_dir
+        self.batch_size = batch_size
+        self.notify_that_host_failed = notify_that_host_failed
+        self.count_of_rpmbuild_invocations = 0
+        self._jobs = []
+        self._jobs_by_tar_path = {}
+        self.built_hostnames = []
+        self._rpms = []
+        self._lock = Lock()
+
+    def add(self, job):
+        """ Adds the given job. Jobs of several hosts sharing the same archive are built only once. """
+
+        with self._lock:
+            if job.tar_path in self._jobs_by_tar_path:
+                self._jobs_by_tar_path[job.tar_path].hostnames.extend(job.hostnames)
+                return
+
+            self._jobs_by_tar_path[job.tar_path] = job
+            self._jobs.append(job)
+
+    @measure_execution_time
+    def build(self, thread_count):
+        """ Builds all jobs using up to thread_count rpmbuild processes at the same time.
+
+            returns: the paths of the written rpms """
+
+        batches = [self._jobs[position:position + self.batch_size] for position in range(0, len(self._jobs), self.batch_size)]
+        if not batches:
+            return []
+
+        thread_count = max(1, min(thread_count, len(batches)))
+        batch_queue = Queue()
+        for batch in batches:
+            batch_queue.put(batch)
+        for _ in range(thread_count):
+            batch_queue.put(None)
+
+        LOGGER.info('Building %s rpm(s) in %s batch(es) using %s thread(s).', len(self._jobs), len(batches), thread_count)
+
+        threads = [Thread(target=self._build_batches_from_queue, args=(batch_queue,), name='RpmBuild-%d' % i) for i in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        LOGGER.debug('Built %s rpm(s) of %s host(s) using %s rpmbuild invocation(s).',
+                     len(self._rpms), sum(len(job.hostnames) for job in self._jobs), self.count_of_rpmbuild_invocations)
+        return list(self._rpms)
+
+    def _build_batches_from_queue(self, batch_queue):
+        while True:
+            batch = batch_queue.get()
+            if batch is None:
+                return
+
+            self._build_batch(batch)
+
+    def _build_batch(self, jobs):
+        while jobs:
+            if len(jobs) == 1:
+                self._build_job(jobs[0])
+                return
+
+            returncode, stdout, stderr = self._execute_rpmbuild([job.tar_path for job in jobs])
+            rpms_by_job = self._assign_written_rpms_to_jobs(jobs, stdout)
+
+            if not returncode:
+                self._add_built_jobs(jobs, rpms_by_job)
+                return
+
+            count_of_built_jobs = len([job for job in jobs if rpms_by_job[job]])
+            if count_of_built_jobs == len(jobs):
+                count_of_built_jobs -= 1
+            suspicious_job = jobs[count_of_built_jobs]
+            LOGGER.debug('Batch of %s rpm(s) failed, building "%s" separately.', len(jobs), suspicious_job.rpm_name)
+
+            self._add_built_jobs(jobs[:count_of_built_jobs], rpms_by_job)
+            self._build_job(suspicious_job)
+            jobs = jobs[count_of_built_jobs + 1:]
+
+    def _build_job(self, job):
+        returncode, stdout, stderr = self._execute_rpmbuild([job.tar_path])
+
+        if returncode:
+            for hostname in job.hostnames:
+                self.notify_that_host_failed(hostname, 'Could not build RPM for host "%s": stdout="%s", stderr="%s"' % (hostname, stdout.strip(), stderr.strip()))
+            return
+
+        self._add_built_jobs([job], self._assign_written_rpms_to_jobs([job], stdout))
+
+    def _add_built_jobs(self, jobs, rpms_by_job):
+        with self._lock:
+            for job in jobs:
+                self._rpms.extend(rpms_by_job[job])
+                self.built_hostnames.extend(job.hostnames)
+
+    def _assign_written_rpms_to_jobs(self, jobs, stdout):
+        """ rpmbuild builds the archives one after another, hence the written
+            rpms are assigned to the first job they belong to starting from
+            the job of the rpm written before. """
+
+        rpms_by_job = dict((job, []) for job in jobs)
+        position = 0
+        for line in stdout.splitlines():
+            if not line.startswith(WROTE_PREFIX):
+                continue
+
+            rpm_path = line[len(WROTE_PREFIX):].strip()
+            for index in range(position, len(jobs)):
+                if jobs[index].is_rpm_of_job(rpm_path):
+                    rpms_by_job[jobs[index]].append(rpm_path)
+                    position = index
+                    break
+
+        return rpms_by_job
+
+    def _execute_rpmbuild(self, tar_paths):
+        working_environment = environ.copy()
+        working_environment['HOME'] = abspath(self.work_dir)
+
+        clean_option = "--clean"
+        if is_no_clean_up_enabled():
+            clean_option = ""
+
+        rpmbuild_cmd = "rpmbuild %s --define '_topdir %s' -ta %s" % (clean_option, abspath(self.rpm_build_dir), ' '.join(tar_paths))
+        LOGGER.debug('Building %s rpm(s) by executing "%s"', len(tar_paths), rpmbuild_cmd)
+
+        with self._lock:
+            self.count_of_rpmbuild_invocations += 1
+
+        process = Popen(rpmbuild_cmd, shell=True, env=working_environment, stdout=PIPE, stderr=PIPE)
+        stdout, stderr = process.communicate()
+
+        if process.returncode:
+            LOGGER.debug('rpmbuild returned %s: %s', process.returncode, stderr.strip())
+
+        return process.returncode, stdout, stderr
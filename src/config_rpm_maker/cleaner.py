@@ -18,33 +18,42 @@
 
 from logging import getLogger
 from os import sep as PATH_SEPARATOR
-from os.path import exists
+from os.path import exists, islink
 from shutil import rmtree
 
 from config_rpm_maker.configuration import build_config_viewer_host_directory
+from config_rpm_maker.configviewerpublisher import delete_published_host_directory
 from config_rpm_maker.segment import Host
 from config_rpm_maker.utilities.logutils import verbose
 
 LOGGER = getLogger(__name__)
 
 
-def clean_up_deleted_hosts_data(svn_service, revision):
+def clean_up_deleted_hosts_data(svn_service, revision, first_revision=None):
     """ Deletes host directories within config viewer data
-        when the svn change set contains a delete of the host directory """
+        when the svn change set contains a delete of the host directory.
+        If first_revision is given, the change sets from first_revision up to
+        revision are considered, except for hosts which exist in revision. """
 
-    deleted_paths = svn_service.get_deleted_paths(revision)
+    deleted_paths = svn_service.get_deleted_paths(revision, first_revision)
 
     if deleted_paths:
         LOGGER.debug("Change set contains %d deleted path(s).", len(deleted_paths))
-        _delete_host_directories(deleted_paths)
+        existing_hosts = []
+        if first_revision is not None:
+            existing_hosts = svn_service.get_hosts(revision)
+        _delete_host_directories(deleted_paths, existing_hosts)
     else:
         verbose(LOGGER).debug("Change set did not contain any deleted paths.")
 
 
-def _delete_host_directories(deleted_paths):
+def _delete_host_directories(deleted_paths, existing_hosts=None):
     """ checks for each given path if it contains the svn_prefix for a host
         and if it does it will check if the rest of the path is a host name
-        if so it will delete the corresponding directory """
+        if so it will delete the corresponding directory unless the host
+        is one of the given existing hosts (since it has been added again) """
+
+    existing_hosts = existing_hosts or []
 
     svn_prefix = Host().get_svn_prefix()
     svn_prefix_length = len(svn_prefix)
@@ -52,7 +61,7 @@ def _delete_host_directories(deleted_paths):
     for deleted_path in deleted_paths:
         if deleted_path.startswith(svn_prefix):
             host_name = deleted_path[svn_prefix_length:]
-            if _is_a_host_name_and_not_a_path(host_name):
+            if _is_a_host_name_and_not_a_path(host_name) and host_name not in existing_hosts:
                 _delete_host_directory(host_name)
 
 
@@ -66,7 +75,10 @@ def _delete_host_directory(host_name):
     """ deletes the config viewer data for the given host name """
 
     host_directory = build_config_viewer_host_directory(host_name)
-    if exists(host_directory):
+    if islink(host_directory):
+        LOGGER.info('Deleting config viewer data for host "%s"', host_name)
+        delete_published_host_directory(host_directory)
+    elif exists(host_directory):
         LOGGER.info('Deleting config viewer data for host "%s"', host_name)
         rmtree(host_directory)
     else:
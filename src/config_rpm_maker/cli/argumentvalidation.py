@@ -25,13 +25,25 @@ LOGGER = getLogger(__name__)
 
 VALID_REPOSITORY_URL_SCHEMES = ['http', 'https', 'file', 'ssh', 'svn']
 
+REVISION_RANGE_SEPARATOR = ':'
+
 
 def ensure_valid_revision(revision):
     """ Ensures that the given argument is a valid revision (a string of digits)
-        and exits the program if not.
+        or a valid revision range (two revisions separated by a colon, the first
+        one not greater than the second one) and exits the program if not.
 
         returns: the given revision """
 
+    if REVISION_RANGE_SEPARATOR in revision:
+        first_revision, last_revision = revision.split(REVISION_RANGE_SEPARATOR, 1)
+        if not first_revision.isdigit() or not last_revision.isdigit() or int(first_revision) > int(last_revision):
+            return exit_program('Given revision range "%s" is invalid.' % revision,
+                                return_code=RETURN_CODE_REVISION_IS_NOT_AN_INTEGER)
+
+        LOGGER.debug('Accepting "%s" as a valid subversion revision range.', revision)
+        return revision
+
     if not revision.isdigit():
         exit_program('Given revision "%s" is not an integer.' % revision,
                      return_code=RETURN_CODE_REVISION_IS_NOT_AN_INTEGER)
@@ -40,6 +52,17 @@ def ensure_valid_revision(revision):
     return revision
 
 
+def split_revision_range(revision):
+    """ returns: a tuple (first_revision, revision) where first_revision
+                 is None if the given revision is not a revision range """
+
+    if REVISION_RANGE_SEPARATOR not in str(revision):
+        return None, revision
+
+    first_revision, last_revision = revision.split(REVISION_RANGE_SEPARATOR, 1)
+    return first_revision, last_revision
+
+
 def ensure_valid_repository_url(repository_url):
     """ Ensures that the given url is a valid repository url
 
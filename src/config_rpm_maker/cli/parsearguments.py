@@ -32,7 +32,9 @@ USAGE_INFORMATION = """Usage: %prog repo-url revision [options]
 Arguments:
   repo-url    URL to subversion repository or absolute path on localhost
   revision    subversion revision for which the configuration RPMs are going
-              to be built"""
+              to be built. Use first:last (e.g. 4711:4720) to build all hosts
+              affected by the revisions from first up to last only once at
+              revision last."""
 
 OPTION_CONFIG_VIEWER_ONLY = '--config-viewer-only'
 OPTION_CONFIG_VIEWER_ONLY_HELP = 'Only generate files for config viewer. Skip RPM build and upload.'
@@ -16,69 +16,116 @@
 
 import os
 import shutil
-import subprocess
+import sys
 import tempfile
 import traceback
 from logging import ERROR, FileHandler, Formatter, getLogger
-from os import makedirs, remove
+from collections import OrderedDict
+from multiprocessing import Pool, Queue as ProcessQueue, active_children, current_process
+from os import getpid, makedirs, remove
 from os.path import exists, join
-from Queue import Queue
-from shutil import rmtree, move
-from threading import Thread
+from Queue import Empty, Queue
+from shutil import rmtree
+from threading import Semaphore, Thread
 from tempfile import mkdtemp
 
 import configuration
-from config_rpm_maker.configuration.properties import (get_error_log_url,
+from config_rpm_maker.configuration.properties import (get_build_mode,
+                                                       get_canary_hosts,
+                                                       get_error_log_url,
                                                        get_error_log_directory,
+                                                       get_host_build_order,
                                                        get_max_failed_hosts,
+                                                       is_config_viewer_only_enabled,
+                                                       is_config_viewer_publish_while_building_enabled,
                                                        is_no_clean_up_enabled,
+                                                       get_rpm_manifest_directory,
                                                        get_rpm_upload_command,
                                                        get_rpm_upload_chunk_size,
+                                                       get_rpm_upload_process_count,
+                                                       get_rpm_upload_retries,
+                                                       get_rpm_upload_retry_delay,
+                                                       is_rpm_upload_while_building_enabled,
+                                                       get_rpmbuild_batch_size,
+                                                       get_svn_client_count,
                                                        get_thread_count,
                                                        get_temporary_directory,
+                                                       get_work_dir_min_free_inodes,
+                                                       get_work_dir_min_free_megabytes,
                                                        is_verbose_enabled)
-from config_rpm_maker.configuration import build_config_viewer_host_directory
+from config_rpm_maker.configuration import BUILD_MODE_PROCESSES, HOST_BUILD_ORDER_LARGEST_FIRST, build_config_viewer_host_directory
+from config_rpm_maker.batchrpmbuilder import BatchRpmBuilder
+from config_rpm_maker.configviewerpublisher import ConfigViewerPublisher, CouldNotPublishConfigViewerDataException
 from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.hostindex import HostIndex
 from config_rpm_maker.hostrpmbuilder import HostRpmBuilder
+from config_rpm_maker.hostscheduler import HostScheduler, order_hosts_by_name, order_largest_hosts_first
+from config_rpm_maker.rpmmanifest import publish_rpm_manifests
+from config_rpm_maker.rpmuploader import CouldNotUploadRpmsException, RpmUploader, UploadingRpmQueue
+from config_rpm_maker.segmentcache import SegmentCache
+from config_rpm_maker.svnservicepool import SvnServicePool
 from config_rpm_maker.utilities.logutils import log_elements_of_list
 from config_rpm_maker.utilities.profiler import measure_execution_time, log_directories_summary
+from config_rpm_maker.workdirbudget import BYTES_PER_MEGABYTE, WorkDirBudget
 from config_rpm_maker.segment import OVERLAY_ORDER
 
 LOGGER = getLogger(__name__)
 
+BUILD_PROCESS_POLL_INTERVAL_IN_SECONDS = 0.1
+
 
 class BuildHostThread(Thread):
 
-    def __init__(self, revision, host_queue, svn_service_queue, rpm_queue, notify_that_host_failed, work_dir, name=None, error_logging_handler=None):
+    def __init__(self, revision, host_scheduler, svn_service_queue, rpm_queue, notify_that_host_failed, work_dir, name=None, error_logging_handler=None, segment_cache=None,
+                 batch_rpm_builder=None, config_viewer_publisher=None):
         super(BuildHostThread, self).__init__(name=name)
         self.revision = revision
-        self.host_queue = host_queue
+        self.host_scheduler = host_scheduler
         self.svn_service_queue = svn_service_queue
         self.rpm_queue = rpm_queue
         self.work_dir = work_dir
         self.notify_that_host_failed = notify_that_host_failed
         self.error_logging_handler = error_logging_handler
+        self.segment_cache = segment_cache
+        self.batch_rpm_builder = batch_rpm_builder
+        self.config_viewer_publisher = config_viewer_publisher
 
     def run(self):
         rpms = []
-        while not self.host_queue.empty():
-            host = self.host_queue.get()
-            self.host_queue.task_done()
+        while True:
+            host = self.host_scheduler.next_host()
+            if host is None:
+                break
+
+            failed = True
             try:
-                rpms = HostRpmBuilder(thread_name=self.name,
-                                      hostname=host,
-                                      revision=self.revision,
-                                      work_dir=self.work_dir,
-                                      svn_service_queue=self.svn_service_queue,
-                                      error_logging_handler=self.error_logging_handler).build()
+                host_rpm_builder = HostRpmBuilder(thread_name=self.name,
+                                                  hostname=host,
+                                                  revision=self.revision,
+                                                  work_dir=self.work_dir,
+                                                  svn_service_queue=self.svn_service_queue,
+                                                  error_logging_handler=self.error_logging_handler,
+                                                  segment_cache=self.segment_cache)
+                rpms = host_rpm_builder.build()
                 for rpm in rpms:
                     self.rpm_queue.put(rpm)
 
+                if host_rpm_builder.rpm_build_job is not None:
+                    self.batch_rpm_builder.add(host_rpm_builder.rpm_build_job)
+
+                if host_rpm_builder.rpm_build_job is None and self.config_viewer_publisher is not None:
+                    self.config_viewer_publisher.publish(host)
+
+                failed = False
+
             except BaseConfigRpmMakerException as e:
-                self.notify_that_host_failed(host, str(e))
+                self.notify_that_host_failed(host, _format_error_message(e))
 
             except Exception:
-                self.notify_that_host_failed(host, traceback.format_exc())
+                self.notify_that_host_failed(host, _format_stack_trace())
+
+            finally:
+                self.host_scheduler.host_done(host, failed)
 
         count_of_rpms = len(rpms)
         if count_of_rpms > 0:
@@ -87,12 +134,147 @@ class BuildHostThread(Thread):
             LOGGER.debug('%s: finished without building any rpm!', self.name)
 
 
-class CouldNotBuildSomeRpmsException(BaseConfigRpmMakerException):
-    error_info = "Could not build all rpms\n"
+_build_process_context = {}
+
+
+def _initialize_build_process(revision, work_dir, svn_service, segment_cache, error_logging_handler, started_hosts):
+    """ Initializes a build process of the pool. Every build process uses its
+        own svn service since a pysvn client must not be shared between processes.
+        The build processes report each host they start building together with their
+        process id into the started_hosts queue. """
+
+    svn_service_queue = Queue()
+    svn_service_queue.put(svn_service.clone())
+
+    if segment_cache:
+        segment_cache.svn_service_queue = svn_service_queue
+
+    _build_process_context.update(revision=revision,
+                                  work_dir=work_dir,
+                                  svn_service_queue=svn_service_queue,
+                                  segment_cache=segment_cache,
+                                  error_logging_handler=error_logging_handler,
+                                  started_hosts=started_hosts)
+
+
+def _build_host_in_process(host):
+    """ Builds the rpms for the given host within a build process.
+
+        returns: a tuple (host, rpms, error, rpm_build_job) where error is None if the build succeeded
+                 and rpm_build_job is None unless the rpms will be built in a batch """
+
+    try:
+        _build_process_context['started_hosts'].put((host, getpid()))
+        host_rpm_builder = HostRpmBuilder(thread_name=current_process().name,
+                                          hostname=host,
+                                          revision=_build_process_context['revision'],
+                                          work_dir=_build_process_context['work_dir'],
+                                          svn_service_queue=_build_process_context['svn_service_queue'],
+                                          error_logging_handler=_build_process_context['error_logging_handler'],
+                                          segment_cache=_build_process_context['segment_cache'])
+        rpms = host_rpm_builder.build()
+        return host, rpms, None, host_rpm_builder.rpm_build_job
+
+    except BaseConfigRpmMakerException as e:
+        return host, [], _format_error_message(e), None
+
+    except Exception:
+        return host, [], _format_stack_trace(), None
+
+
+def _format_error_message(exception):
+    """ returns: the message of the given exception, even if it can not be converted to a plain string """
+
+    try:
+        return str(exception)
+    except Exception:
+        return repr(exception)
+
+
+def _format_stack_trace():
+    try:
+        return traceback.format_exc()
+    except Exception:
+        return 'Could not format stack trace of %s.' % repr(sys.exc_info()[1])
+
+
+def _dispatch_hosts_to_processes(pool, host_scheduler, free_processes, dispatched_hosts):
+    """ Hands the next host over to the process pool whenever a build process is free, so the
+        host scheduler decides when a host is started. Puts a tuple (host, async result) into the
+        dispatched_hosts queue for every host, None as soon as all hosts have been handed over or
+        an exception, if the hosts could not be handed over. """
+
+    try:
+        while True:
+            free_processes.acquire()
+            host = host_scheduler.next_host()
+            if host is None:
+                break
+
+            dispatched_hosts.put((host, pool.apply_async(_build_host_in_process, (host,))))
+
+        dispatched_hosts.put(None)
 
+    except Exception as e:
+        dispatched_hosts.put(e)
 
-class CouldNotUploadRpmsException(BaseConfigRpmMakerException):
-    error_info = "Could not upload rpms!\n"
+
+def _collect_results_of_build_processes(dispatched_hosts, started_hosts):
+    """ Yields a tuple (host, rpms, error, rpm_build_job) for every host handed over to the process
+        pool as soon as its build is done. A host whose build raised an exception within the pool or
+        whose build process died is yielded as a failed host, so its build process is not lost. """
+
+    async_results = OrderedDict()
+    process_ids = {}
+    all_hosts_dispatched = False
+
+    while not all_hosts_dispatched or async_results:
+        for dispatched_host in _get_queued_items(dispatched_hosts, BUILD_PROCESS_POLL_INTERVAL_IN_SECONDS):
+            if dispatched_host is None:
+                all_hosts_dispatched = True
+            elif isinstance(dispatched_host, Exception):
+                raise dispatched_host
+            else:
+                host, async_result = dispatched_host
+                async_results[host] = async_result
+
+        process_ids.update(_get_queued_items(started_hosts))
+        alive_process_ids = set(process.pid for process in active_children())
+
+        for host, async_result in async_results.items():
+            if async_result.ready():
+                del async_results[host]
+                yield _get_result_of_build_process(host, async_result)
+
+            elif host in process_ids and process_ids[host] not in alive_process_ids:
+                del async_results[host]
+                yield host, [], 'Build process %s died while building host "%s".' % (process_ids[host], host), None
+
+
+def _get_result_of_build_process(host, async_result):
+    try:
+        return async_result.get()
+    except Exception:
+        return host, [], _format_stack_trace(), None
+
+
+def _get_queued_items(queue, timeout=None):
+    """ returns: all items of the given queue, waiting up to timeout seconds for the first one """
+
+    items = []
+    try:
+        if timeout is not None:
+            items.append(queue.get(timeout=timeout))
+
+        while True:
+            items.append(queue.get_nowait())
+
+    except Empty:
+        return items
+
+
+class CouldNotBuildSomeRpmsException(BaseConfigRpmMakerException):
+    error_info = "Could not build all rpms\n"
 
 
 class ConfigurationException(BaseConfigRpmMakerException):
@@ -112,14 +294,19 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
 ------------------------------------------------------------------------
 """
 
-    def __init__(self, revision, svn_service):
+    def __init__(self, revision, svn_service, first_revision=None):
+        """ first_revision: if given, all hosts affected by the revisions from first_revision
+                            up to revision are built once at revision """
+
         self.revision = revision
+        self.first_revision = first_revision
         self.svn_service = svn_service
         self.temp_dir = get_temporary_directory()
         self._assure_temp_dir_if_set()
         self._create_logger()
         self.work_dir = None
-        self.host_queue = Queue()
+        self.host_scheduler = HostScheduler()
+        self.config_viewer_publisher = None
         self.failed_host_queue = Queue()
 
     def __build_error_msg_and_move_to_public_access(self, revision):
@@ -132,10 +319,13 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
         return error_msg
 
     def build(self):
-        LOGGER.info('Working on revision %s', self.revision)
+        if self.first_revision is None:
+            LOGGER.info('Working on revision %s', self.revision)
+        else:
+            LOGGER.info('Working on revisions %s to %s', self.first_revision, self.revision)
         self.logger.info("Starting with revision %s", self.revision)
         try:
-            changed_paths = self.svn_service.get_changed_paths(self.revision)
+            changed_paths = self.svn_service.get_changed_paths(self.revision, self.first_revision)
             if not changed_paths:
                 LOGGER.info("No rpm(s) built. No change in configuration directory.")
                 return
@@ -149,9 +339,7 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
             log_elements_of_list(LOGGER.debug, 'Detected %s affected host(s).', affected_hosts)
 
             self._prepare_work_dir()
-            rpms = self._build_hosts(affected_hosts)
-            self._upload_rpms(rpms)
-            self._move_configviewer_dirs_to_final_destination(affected_hosts)
+            rpms = self._build_upload_and_publish_hosts(affected_hosts)
 
         except BaseConfigRpmMakerException as exception:
             self.logger.error('Last error during build:\n%s' % str(exception))
@@ -192,33 +380,57 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
                 os.makedirs(error_log_dir)
             shutil.move(self.error_log_file, os.path.join(error_log_dir, self.revision + '.txt'))
 
-    def _read_integer_from_file(self, path):
-
-        with open(path) as file_which_contains_integer:
-            integer_from_file = int(file_which_contains_integer.read())
+    def _build_upload_and_publish_hosts(self, hosts):
+        config_viewer_publisher = self._create_config_viewer_publisher(hosts)
+        if is_config_viewer_publish_while_building_enabled():
+            LOGGER.info("Updating configviewer data while building.")
+            self.config_viewer_publisher = config_viewer_publisher
 
-        return integer_from_file
+        try:
+            if is_rpm_upload_while_building_enabled():
+                rpms = self._build_and_upload_hosts(hosts)
+            else:
+                rpms = self._build_hosts(hosts)
+                self._upload_rpms(rpms)
+            self._publish_rpm_manifests(hosts)
+        except Exception as exception:
+            try:
+                config_viewer_publisher.finish()
+            except CouldNotPublishConfigViewerDataException as publish_exception:
+                self.logger.error(str(publish_exception))
+            raise exception
 
-    def _move_configviewer_dirs_to_final_destination(self, hosts):
-        LOGGER.info("Updating configviewer data.")
+        if self.config_viewer_publisher is None:
+            LOGGER.info("Updating configviewer data.")
+            for host in hosts:
+                config_viewer_publisher.publish(host)
 
-        for host in hosts:
-            temp_path = build_config_viewer_host_directory(host, revision=self.revision)
-            dest_path = build_config_viewer_host_directory(host)
+        self._finish_config_viewer_publication(config_viewer_publisher)
+        return rpms
 
-            if exists(dest_path):
-                path_to_revision_file = join(dest_path, "%s.rev" % host)
-                revision_from_file = self._read_integer_from_file(path_to_revision_file)
+    def _create_config_viewer_publisher(self, hosts):
+        thread_count = int(get_thread_count())
+        if not thread_count or thread_count > len(hosts):
+            thread_count = len(hosts)
 
-                if revision_from_file > int(self.revision):
-                    LOGGER.debug('Will not update configviewer data for host "%s" since the current revision file contains revision %d which is higher than %s', host, revision_from_file, self.revision)
-                    rmtree(temp_path)
-                    continue
+        config_viewer_publisher = ConfigViewerPublisher(self.revision, thread_count)
+        config_viewer_publisher.start()
+        return config_viewer_publisher
 
-                rmtree(dest_path)
+    @measure_execution_time
+    def _finish_config_viewer_publication(self, config_viewer_publisher):
+        config_viewer_publisher.finish()
+        log_elements_of_list(LOGGER.debug, 'Published configviewer data of %s host(s).', config_viewer_publisher.published_hosts)
+        if config_viewer_publisher.skipped_hosts:
+            log_elements_of_list(LOGGER.info, 'Did not update configviewer data of %s host(s) since it contains a higher revision.', config_viewer_publisher.skipped_hosts)
+
+    def _publish_rpm_manifests(self, hosts):
+        rpm_manifest_directory = get_rpm_manifest_directory()
+        if not rpm_manifest_directory or is_config_viewer_only_enabled():
+            return
 
-            LOGGER.debug('Updating configviewer data for host "%s"', host)
-            move(temp_path, dest_path)
+        unchanged_hosts = publish_rpm_manifests(self.work_dir, rpm_manifest_directory, hosts)
+        log_elements_of_list(LOGGER.info, 'Did not build and upload rpm(s) of %s host(s) since their configuration did not change.', unchanged_hosts)
 
     def _notify_that_host_failed(self, host_name, stack_trace):
         failure_information = (host_name, stack_trace)
@@ -230,29 +442,66 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
         maximum_allowed_failed_hosts = get_max_failed_hosts()
         if approximately_count >= maximum_allowed_failed_hosts:
             LOGGER.error('Stopping to build more hosts since the maximum of %d failed hosts has been reached' % maximum_allowed_failed_hosts)
-            self.host_queue.queue.clear()
+            self.host_scheduler.cancel()
 
-    def _build_hosts(self, hosts):
+    def _build_hosts(self, hosts, rpm_queue=None):
         if not hosts:
             LOGGER.warn('Trying to build rpms for hosts, but no hosts given!')
             return
 
-        for host in hosts:
-            self.host_queue.put(host)
-
-        rpm_queue = Queue()
-        svn_service_queue = Queue()
-        svn_service_queue.put(self.svn_service)
+        self.host_scheduler = self._create_host_scheduler(hosts)
 
+        if rpm_queue is None:
+            rpm_queue = Queue()
         thread_count = self._get_thread_count(hosts)
+        build_in_processes = get_build_mode() == BUILD_MODE_PROCESSES
+        if build_in_processes:
+            svn_service_pool = SvnServicePool(self.svn_service, 1)
+        else:
+            svn_service_pool = SvnServicePool(self.svn_service, self._get_svn_client_count(thread_count))
+
+        segment_cache = self._create_segment_cache(hosts, svn_service_pool)
+        batch_rpm_builder = self._create_batch_rpm_builder()
+
+        if build_in_processes:
+            self._build_hosts_in_processes(thread_count, rpm_queue, segment_cache, batch_rpm_builder)
+        else:
+            self._build_hosts_in_threads(thread_count, rpm_queue, svn_service_pool, segment_cache, batch_rpm_builder)
+
+        self.host_scheduler.log_statistics(LOGGER.info)
+        svn_service_pool.log_statistics(LOGGER.debug)
+
+        if batch_rpm_builder is not None and self.failed_host_queue.empty():
+            for rpm in batch_rpm_builder.build(thread_count):
+                rpm_queue.put(rpm)
+
+            if self.config_viewer_publisher is not None:
+                for host in batch_rpm_builder.built_hostnames:
+                    self.config_viewer_publisher.publish(host)
+
+        failed_hosts = dict(self._consume_queue(self.failed_host_queue))
+        if failed_hosts:
+            failed_hosts_str = ['\n%s:\n\n%s\n\n' % (key, value) for (key, value) in failed_hosts.iteritems()]
+            raise CouldNotBuildSomeRpmsException("Could not build config rpm for some host(s): %s" % '\n'.join(failed_hosts_str))
+
+        LOGGER.info("Finished building configuration rpm(s).")
+        built_rpms = self._consume_queue(rpm_queue)
+        log_elements_of_list(LOGGER.debug, 'Built %s rpm(s).', built_rpms)
+
+        return built_rpms
+
+    def _build_hosts_in_threads(self, thread_count, rpm_queue, svn_service_queue, segment_cache, batch_rpm_builder=None):
         thread_pool = [BuildHostThread(name='Thread-%d' % i,
                                        revision=self.revision,
                                        svn_service_queue=svn_service_queue,
                                        rpm_queue=rpm_queue,
                                        notify_that_host_failed=self._notify_that_host_failed,
-                                       host_queue=self.host_queue,
+                                       host_scheduler=self.host_scheduler,
                                        work_dir=self.work_dir,
-                                       error_logging_handler=self.error_handler) for i in range(thread_count)]
+                                       error_logging_handler=self.error_handler,
+                                       segment_cache=segment_cache,
+                                       batch_rpm_builder=batch_rpm_builder,
+                                       config_viewer_publisher=self.config_viewer_publisher) for i in range(thread_count)]
 
         for thread in thread_pool:
             LOGGER.debug('%s: starting ...', thread.name)
@@ -261,16 +510,89 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
         for thread in thread_pool:
             thread.join()
 
-        failed_hosts = dict(self._consume_queue(self.failed_host_queue))
-        if failed_hosts:
-            failed_hosts_str = ['\n%s:\n\n%s\n\n' % (key, value) for (key, value) in failed_hosts.iteritems()]
-            raise CouldNotBuildSomeRpmsException("Could not build config rpm for some host(s): %s" % '\n'.join(failed_hosts_str))
+    def _build_hosts_in_processes(self, process_count, rpm_queue, segment_cache, batch_rpm_builder=None):
+        LOGGER.debug('Starting %s build process(es) ...', process_count)
+
+        segment_cache.export_all()
+        started_hosts = ProcessQueue()
+        pool = Pool(processes=process_count,
+                    initializer=_initialize_build_process,
+                    initargs=(self.revision, self.work_dir, self.svn_service, segment_cache, self.error_handler, started_hosts))
+        dispatched_hosts = Queue()
+        free_processes = Semaphore(process_count)
+        dispatcher = Thread(target=_dispatch_hosts_to_processes,
+                            args=(pool, self.host_scheduler, free_processes, dispatched_hosts),
+                            name='HostDispatcher')
+        dispatcher.start()
+        try:
+            for host, rpms, error, rpm_build_job in _collect_results_of_build_processes(dispatched_hosts, started_hosts):
+                self.host_scheduler.host_done(host, error is not None)
+                free_processes.release()
+                for rpm in rpms:
+                    rpm_queue.put(rpm)
+
+                if rpm_build_job is not None:
+                    batch_rpm_builder.add(rpm_build_job)
+
+                if error is None and rpm_build_job is None and self.config_viewer_publisher is not None:
+                    self.config_viewer_publisher.publish(host)
+
+                if error is not None:
+                    self._notify_that_host_failed(host, error)
+                    if self.failed_host_queue.qsize() >= get_max_failed_hosts():
+                        break
+        finally:
+            self.host_scheduler.cancel()
+            free_processes.release()
+            dispatcher.join()
+            pool.terminate()
+            pool.join()
+
+    def _create_host_scheduler(self, hosts):
+        if get_host_build_order() == HOST_BUILD_ORDER_LARGEST_FIRST:
+            ordered_hosts = order_largest_hosts_first(hosts, build_config_viewer_host_directory)
+        else:
+            ordered_hosts = order_hosts_by_name(hosts)
 
-        LOGGER.info("Finished building configuration rpm(s).")
-        built_rpms = self._consume_queue(rpm_queue)
-        log_elements_of_list(LOGGER.debug, 'Built %s rpm(s).', built_rpms)
+        canary_hosts = [host for host in get_canary_hosts() if host in hosts]
+        if canary_hosts:
+            log_elements_of_list(LOGGER.info, 'Building %s canary host(s) before all other hosts.', canary_hosts)
 
-        return built_rpms
+        return HostScheduler(ordered_hosts, canary_hosts, self._create_work_dir_budget())
+
+    def _create_work_dir_budget(self):
+        min_free_megabytes = get_work_dir_min_free_megabytes()
+        min_free_inodes = get_work_dir_min_free_inodes()
+        if min_free_megabytes <= 0 and min_free_inodes <= 0:
+            return None
+
+        LOGGER.debug('Starting hosts only while at least %s MB and %s inode(s) are free in working directory "%s".',
+                     min_free_megabytes, min_free_inodes, self.work_dir)
+        return WorkDirBudget(self.work_dir, min_free_megabytes * BYTES_PER_MEGABYTE, min_free_inodes)
+
+    def _create_batch_rpm_builder(self):
+        batch_size = get_rpmbuild_batch_size()
+        if batch_size <= 1:
+            return None
+
+        LOGGER.debug('Building rpms in batches of %s host(s).', batch_size)
+        return BatchRpmBuilder(self.work_dir, self.rpm_build_dir, batch_size, self._notify_that_host_failed)
+
+    def _create_segment_cache(self, hosts, svn_service_queue):
+        shared_svn_paths = self._get_shared_svn_paths(hosts)
+        log_elements_of_list(LOGGER.debug, 'Exporting %s svn path(s) only once since they are shared between hosts.', shared_svn_paths)
+
+        cache_directory = join(self.work_dir, 'segments')
+        return SegmentCache(cache_directory, self.revision, svn_service_queue, shared_svn_paths)
+
+    def _get_shared_svn_paths(self, hosts):
+        count_of_hosts_by_svn_path = {}
+        for host in hosts:
+            for segment in OVERLAY_ORDER:
+                for svn_path in segment.get_svn_paths(host):
+                    count_of_hosts_by_svn_path[svn_path] = count_of_hosts_by_svn_path.get(svn_path, 0) + 1
+
+        return [svn_path for svn_path, count_of_hosts in count_of_hosts_by_svn_path.iteritems() if count_of_hosts > 1]
 
     @measure_execution_time
     def _upload_rpms(self, rpms):
@@ -279,42 +601,47 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
 
         if rpm_upload_cmd:
             LOGGER.info("Uploading %s rpm(s).", len(rpms))
-            LOGGER.debug('Uploading rpm(s) using command "%s" and chunk_size "%s"', rpm_upload_cmd, chunk_size)
-
-            pos = 0
-            while pos < len(rpms):
-                rpm_chunk = rpms[pos:pos + chunk_size]
-                cmd = '%s %s' % (rpm_upload_cmd, ' '.join(rpm_chunk))
-                process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = process.communicate()
-                if process.returncode:
-                    error_message = 'Rpm upload failed with exit code %s. Executed command "%s"\n' % (process.returncode, cmd)
-                    if stdout:
-                        error_message += 'stdout: "%s"\n' % stdout.strip()
-                    if stderr:
-                        error_message += 'stderr: "%s"\n' % stderr.strip()
-                    raise CouldNotUploadRpmsException(error_message)
-                pos += chunk_size
+            rpm_uploader = self._create_rpm_uploader(rpm_upload_cmd, chunk_size)
+            for rpm in rpms:
+                rpm_uploader.add(rpm)
+            rpm_uploader.finish()
         else:
             LOGGER.info("Rpms will not be uploaded since no upload command has been configured.")
 
-    def _get_affected_hosts(self, changed_paths, available_host):
-        result = set()
-        for segment in OVERLAY_ORDER:
-            for changed_path in changed_paths:
-                result |= set(self._find_matching_hosts(segment, changed_path, available_host))
+    @measure_execution_time
+    def _build_and_upload_hosts(self, hosts):
+        rpm_upload_cmd = get_rpm_upload_command()
+        if not rpm_upload_cmd:
+            LOGGER.info("Rpms will not be uploaded since no upload command has been configured.")
+            return self._build_hosts(hosts)
+
+        LOGGER.info("Uploading rpm(s) while building.")
+        rpm_uploader = self._create_rpm_uploader(rpm_upload_cmd, self._get_chunk_size([]))
+        try:
+            rpms = self._build_hosts(hosts, UploadingRpmQueue(rpm_uploader))
+        except Exception as exception:
+            try:
+                rpm_uploader.finish(upload_pending_rpms=False)
+            except CouldNotUploadRpmsException as upload_exception:
+                self.logger.error(str(upload_exception))
+            raise exception
 
-        return result
+        rpm_uploader.finish()
+        return rpms
+
+    def _create_rpm_uploader(self, rpm_upload_cmd, chunk_size):
+        process_count = get_rpm_upload_process_count()
+        retries = get_rpm_upload_retries()
+        LOGGER.debug('Uploading rpm(s) using command "%s", chunk_size "%s", %s upload process(es) and %s retry(s)',
+                     rpm_upload_cmd, chunk_size, process_count, retries)
 
-    def _find_matching_hosts(self, segment, svn_path, available_hosts):
-        result = []
-        for host in available_hosts:
-            for path in segment.get_svn_paths(host):
-                if svn_path.startswith(path):
-                    result.append(host)
-                    break
+        rpm_uploader = RpmUploader(rpm_upload_cmd, chunk_size, process_count, retries, get_rpm_upload_retry_delay())
+        rpm_uploader.start()
+        return rpm_uploader
 
-        return result
+    @measure_execution_time
+    def _get_affected_hosts(self, changed_paths, available_host):
+        return HostIndex(available_host).get_affected_hosts(changed_paths)
 
     def _get_thread_count(self, affected_hosts):
         thread_count = int(get_thread_count())
@@ -330,6 +657,17 @@ Please fix the issues and trigger the RPM creation with a dummy commit.
             LOGGER.info("%s: using one thread for each affected host." % (reason))
         return thread_count
 
+    def _get_svn_client_count(self, thread_count):
+        svn_client_count = int(get_svn_client_count())
+        if svn_client_count < 0:
+            raise ConfigurationException('%s is %s, values <0 are not allowed)' % (get_svn_client_count, svn_client_count))
+
+        if not svn_client_count or svn_client_count > thread_count:
+            LOGGER.debug('Using one svn client for each of the %s build thread(s).', thread_count)
+            svn_client_count = thread_count
+
+        return svn_client_count
+
     def _consume_queue(self, queue):
         items = []
 
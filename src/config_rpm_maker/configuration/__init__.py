@@ -20,6 +20,7 @@ from os import environ, getcwd
 from os.path import abspath, exists, join
 from logging import DEBUG, ERROR, INFO, getLogger
 from re import compile
+from sys import maxint
 
 from config_rpm_maker.exceptions import BaseConfigRpmMakerException
 
@@ -38,6 +39,18 @@ DATE_FORMAT = "%d.%m.%Y %H:%M:%S"
 LOG_FILE_FORMAT = "%(asctime)s %(levelname)s: %(message)s"
 LOG_FILE_DATE_FORMAT = DATE_FORMAT
 
+BUILD_MODE_THREADS = 'threads'
+BUILD_MODE_PROCESSES = 'processes'
+BUILD_MODES = [BUILD_MODE_THREADS, BUILD_MODE_PROCESSES]
+
+RPM_WRITER_RPMBUILD = 'rpmbuild'
+RPM_WRITER_NATIVE = 'native'
+RPM_WRITERS = [RPM_WRITER_RPMBUILD, RPM_WRITER_NATIVE]
+
+HOST_BUILD_ORDER_NAME = 'name'
+HOST_BUILD_ORDER_LARGEST_FIRST = 'largest_first'
+HOST_BUILD_ORDERS = [HOST_BUILD_ORDER_NAME, HOST_BUILD_ORDER_LARGEST_FIRST]
+
 
 _properties = None
 _file_path_of_loaded_configuration = None
@@ -185,41 +198,77 @@ def _ensure_properties_are_valid(raw_properties):
         raw_properties = {}
 
     allow_unknown_hosts = raw_properties.get(unknown_hosts_are_allowed.key, unknown_hosts_are_allowed.default)
+    build_mode = raw_properties.get(get_build_mode.key, get_build_mode.default)
+    canary_hosts = raw_properties.get(get_canary_hosts.key, get_canary_hosts.default)
     config_rpm_prefix = raw_properties.get(get_config_rpm_prefix.key, get_config_rpm_prefix.default)
     config_viewer_hosts_dir = raw_properties.get(get_config_viewer_host_directory.key, get_config_viewer_host_directory.default)
+    config_viewer_publish_while_building = raw_properties.get(is_config_viewer_publish_while_building_enabled.key, is_config_viewer_publish_while_building_enabled.default)
     custom_dns_searchlist = raw_properties.get(get_custom_dns_search_list.key, get_custom_dns_search_list.default)
+    encoding_cache_size = raw_properties.get(get_encoding_cache_size.key, get_encoding_cache_size.default)
     error_log_directory = raw_properties.get(get_error_log_directory.key, get_error_log_directory.default)
     error_log_url = raw_properties.get(get_error_log_url.key, get_error_log_url.default)
+    host_build_order = raw_properties.get(get_host_build_order.key, get_host_build_order.default)
+    incremental_build_dir = raw_properties.get(get_incremental_build_directory.key, get_incremental_build_directory.default)
     log_level = raw_properties.get(get_log_level.key, get_log_level.default)
     max_file_size = raw_properties.get(get_max_file_size.key, get_max_file_size.default)
     max_failed_hosts = raw_properties.get(get_max_failed_hosts.key, get_max_failed_hosts.default)
     path_to_spec_file = raw_properties.get(get_path_to_spec_file.key, get_path_to_spec_file.default)
     repo_packages_regex = raw_properties.get(get_repo_packages_regex.key, get_repo_packages_regex.default)
+    rpm_manifest_dir = raw_properties.get(get_rpm_manifest_directory.key, get_rpm_manifest_directory.default)
     rpm_upload_chunk_size = raw_properties.get(get_rpm_upload_chunk_size.key, get_rpm_upload_chunk_size.default)
     rpm_upload_command = raw_properties.get(get_rpm_upload_command.key, get_rpm_upload_command.default)
+    rpm_upload_process_count = raw_properties.get(get_rpm_upload_process_count.key, get_rpm_upload_process_count.default)
+    rpm_upload_while_building = raw_properties.get(is_rpm_upload_while_building_enabled.key, is_rpm_upload_while_building_enabled.default)
+    rpm_upload_retries = raw_properties.get(get_rpm_upload_retries.key, get_rpm_upload_retries.default)
+    rpm_upload_retry_delay = raw_properties.get(get_rpm_upload_retry_delay.key, get_rpm_upload_retry_delay.default)
+    rpm_writer = raw_properties.get(get_rpm_writer.key, get_rpm_writer.default)
+    rpmbuild_batch_size = raw_properties.get(get_rpmbuild_batch_size.key, get_rpmbuild_batch_size.default)
+    svn_client_count = raw_properties.get(get_svn_client_count.key, get_svn_client_count.default)
+    svn_mirror_dir = raw_properties.get(get_svn_mirror_directory.key, get_svn_mirror_directory.default)
     svn_path_to_config = raw_properties.get(get_svn_path_to_config.key, get_svn_path_to_config.default)
+    tar_compression_level = raw_properties.get(get_tar_compression_level.key, get_tar_compression_level.default)
     temporary_directory = raw_properties.get(get_temporary_directory.key, get_temporary_directory.default)
+    work_dir_min_free_inodes = raw_properties.get(get_work_dir_min_free_inodes.key, get_work_dir_min_free_inodes.default)
+    work_dir_min_free_megabytes = raw_properties.get(get_work_dir_min_free_megabytes.key, get_work_dir_min_free_megabytes.default)
     thread_count = raw_properties.get(get_thread_count.key, get_thread_count.default)
 
     valid_properties = {
         get_log_level: _ensure_valid_log_level(log_level),
         unknown_hosts_are_allowed: _ensure_is_a_boolean_value(unknown_hosts_are_allowed, allow_unknown_hosts),
+        get_build_mode: _ensure_is_one_of(get_build_mode, build_mode, BUILD_MODES),
+        get_canary_hosts: _ensure_is_a_list_of_strings(get_canary_hosts, canary_hosts),
         get_config_rpm_prefix: _ensure_is_a_string(get_config_rpm_prefix, config_rpm_prefix),
         is_config_viewer_only_enabled: is_config_viewer_only_enabled.default,
         get_config_viewer_host_directory: _ensure_is_a_string(get_config_viewer_host_directory, config_viewer_hosts_dir),
+        is_config_viewer_publish_while_building_enabled: _ensure_is_a_boolean_value(is_config_viewer_publish_while_building_enabled, config_viewer_publish_while_building),
         get_custom_dns_search_list: _ensure_is_a_list_of_strings(get_custom_dns_search_list, custom_dns_searchlist),
+        get_encoding_cache_size: _ensure_is_an_integer_in_range(get_encoding_cache_size, encoding_cache_size, 0, maxint),
         get_error_log_directory: _ensure_is_a_string(get_error_log_directory, error_log_directory),
         get_error_log_url: _ensure_is_a_string(get_error_log_url, error_log_url),
+        get_host_build_order: _ensure_is_one_of(get_host_build_order, host_build_order, HOST_BUILD_ORDERS),
+        get_incremental_build_directory: _ensure_is_a_string(get_incremental_build_directory, incremental_build_dir),
         get_max_failed_hosts: _ensure_is_an_integer(get_max_failed_hosts, max_failed_hosts),
         get_max_file_size: _ensure_is_an_integer(get_max_file_size, max_file_size),
         is_no_clean_up_enabled: is_no_clean_up_enabled.default,
         get_path_to_spec_file: _ensure_is_a_string(get_path_to_spec_file, path_to_spec_file),
         get_repo_packages_regex: _ensure_repo_packages_regex_is_a_valid_regular_expression(repo_packages_regex),
+        get_rpm_manifest_directory: _ensure_is_a_string(get_rpm_manifest_directory, rpm_manifest_dir),
         get_rpm_upload_chunk_size: _ensure_is_an_integer(get_rpm_upload_chunk_size, rpm_upload_chunk_size),
         get_rpm_upload_command: _ensure_is_a_string_or_none(get_rpm_upload_command, rpm_upload_command),
+        get_rpm_upload_process_count: _ensure_is_an_integer(get_rpm_upload_process_count, rpm_upload_process_count),
+        is_rpm_upload_while_building_enabled: _ensure_is_a_boolean_value(is_rpm_upload_while_building_enabled, rpm_upload_while_building),
+        get_rpm_upload_retries: _ensure_is_an_integer_in_range(get_rpm_upload_retries, rpm_upload_retries, 0, maxint),
+        get_rpm_upload_retry_delay: _ensure_is_an_integer_in_range(get_rpm_upload_retry_delay, rpm_upload_retry_delay, 0, maxint),
+        get_rpm_writer: _ensure_is_one_of(get_rpm_writer, rpm_writer, RPM_WRITERS),
+        get_rpmbuild_batch_size: _ensure_is_an_integer(get_rpmbuild_batch_size, rpmbuild_batch_size),
+        get_svn_client_count: _ensure_is_an_integer(get_svn_client_count, svn_client_count),
+        get_svn_mirror_directory: _ensure_is_a_string(get_svn_mirror_directory, svn_mirror_dir),
         get_svn_path_to_config: _ensure_is_a_string(get_svn_path_to_config, svn_path_to_config),
+        get_tar_compression_level: _ensure_is_an_integer_in_range(get_tar_compression_level, tar_compression_level, 0, 9),
         get_thread_count: _ensure_is_an_integer(get_thread_count, thread_count),
         get_temporary_directory: _ensure_is_a_string(get_temporary_directory, temporary_directory),
+        get_work_dir_min_free_inodes: _ensure_is_an_integer(get_work_dir_min_free_inodes, work_dir_min_free_inodes),
+        get_work_dir_min_free_megabytes: _ensure_is_an_integer(get_work_dir_min_free_megabytes, work_dir_min_free_megabytes),
         is_verbose_enabled: is_verbose_enabled.default
     }
 
@@ -281,6 +330,27 @@ def _ensure_is_an_integer(key, value):
     return value
 
 
+def _ensure_is_an_integer_in_range(key, value, minimum, maximum):
+    """ Returns the given int or raises an exception if the given value is not an integer between minimum and maximum """
+
+    _ensure_is_an_integer(key, value)
+
+    if value < minimum or value > maximum:
+        raise ConfigurationException('Configuration parameter "%s": invalid value "%s"! Please use an integer between %s and %s.'
+                                     % (key, value, minimum, maximum))
+
+    return value
+
+
+def _ensure_is_one_of(key, value, allowed_values):
+    """ Returns the given value if it is one of the allowed values or raises an exception """
+
+    if value not in allowed_values:
+        raise ConfigurationException('Invalid value "%s" for "%s" has to be one of %s.' % (value, key, ', '.join(allowed_values)))
+
+    return value
+
+
 def _ensure_repo_packages_regex_is_a_valid_regular_expression(value):
     """ returns the given value if it is a valid regular expression or raises an exception if not """
 
@@ -20,24 +20,42 @@
     from the configuration file.
 """
 
-from config_rpm_maker.configuration import ConfigurationProperty
+from config_rpm_maker.configuration import BUILD_MODE_THREADS, HOST_BUILD_ORDER_NAME, RPM_WRITER_RPMBUILD, ConfigurationProperty
 
+get_build_mode = ConfigurationProperty(key='build_mode', default=BUILD_MODE_THREADS)
+get_canary_hosts = ConfigurationProperty(key='canary_hosts', default=[])
 get_config_viewer_host_directory = ConfigurationProperty(key='config_viewer_hosts_dir', default='/tmp')
+is_config_viewer_publish_while_building_enabled = ConfigurationProperty(key='config_viewer_publish_while_building', default=False)
 get_config_rpm_prefix = ConfigurationProperty(key='config_rpm_prefix', default='yadt-config-')
 get_custom_dns_search_list = ConfigurationProperty(key='custom_dns_searchlist', default=[])
+get_encoding_cache_size = ConfigurationProperty(key='encoding_cache_size', default=10000)
 get_error_log_directory = ConfigurationProperty(key='error_log_dir', default="")
 get_error_log_url = ConfigurationProperty(key='error_log_url', default='')
+get_host_build_order = ConfigurationProperty(key='host_build_order', default=HOST_BUILD_ORDER_NAME)
+get_incremental_build_directory = ConfigurationProperty(key='incremental_build_dir', default='')
 get_log_format = ConfigurationProperty(key="log_format", default="[%(levelname)5s] %(message)s")
 get_log_level = ConfigurationProperty(key="log_level", default='DEBUG')
 get_max_failed_hosts = ConfigurationProperty(key='max_failed_hosts', default=3)
 get_max_file_size = ConfigurationProperty(key='max_file_size', default=100 * 1024)
 get_path_to_spec_file = ConfigurationProperty(key='path_to_spec_file', default='default.spec')
 get_repo_packages_regex = ConfigurationProperty(key='repo_packages_regex', default='.*-repo.*')
+get_rpm_manifest_directory = ConfigurationProperty(key='rpm_manifest_dir', default='')
 get_rpm_upload_chunk_size = ConfigurationProperty(key='rpm_upload_chunk_size', default=10)
 get_rpm_upload_command = ConfigurationProperty(key='rpm_upload_cmd', default=None)
+get_rpm_upload_process_count = ConfigurationProperty(key='rpm_upload_process_count', default=1)
+is_rpm_upload_while_building_enabled = ConfigurationProperty(key='rpm_upload_while_building', default=False)
+get_rpm_upload_retries = ConfigurationProperty(key='rpm_upload_retries', default=0)
+get_rpm_upload_retry_delay = ConfigurationProperty(key='rpm_upload_retry_delay', default=2)
+get_rpm_writer = ConfigurationProperty(key='rpm_writer', default=RPM_WRITER_RPMBUILD)
+get_rpmbuild_batch_size = ConfigurationProperty(key='rpmbuild_batch_size', default=1)
+get_svn_client_count = ConfigurationProperty(key='svn_client_count', default=0)
+get_svn_mirror_directory = ConfigurationProperty(key='svn_mirror_dir', default='')
 get_svn_path_to_config = ConfigurationProperty(key='svn_path_to_config', default='/config')
+get_tar_compression_level = ConfigurationProperty(key='tar_compression_level', default=6)
 get_thread_count = ConfigurationProperty(key='thread_count', default=1)
 get_temporary_directory = ConfigurationProperty(key='temp_dir', default='/tmp')
+get_work_dir_min_free_inodes = ConfigurationProperty(key='work_dir_min_free_inodes', default=0)
+get_work_dir_min_free_megabytes = ConfigurationProperty(key='work_dir_min_free_megabytes', default=0)
 
 is_config_viewer_only_enabled = ConfigurationProperty(key='config_viewer_only', default=False)
 is_no_clean_up_enabled = ConfigurationProperty(key='no_clean_up', default=False)
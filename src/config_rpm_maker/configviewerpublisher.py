@@ -0,0 +1,172 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the config viewer publisher, which publishes the
+    config viewer data of the built hosts using a bounded number of threads.
+
+    The data of a host is kept in a directory named after the host and the
+    revision and the host directory itself is a symbolic link to it. Publishing
+    a host renames its new directory and swaps the symbolic link atomically,
+    so the web server never sees a missing or half-deleted host directory.
+    The replaced directories are deleted by a background thread.
+"""
+
+from logging import getLogger
+from os import readlink, remove, rename, symlink
+from os.path import basename, dirname, exists, islink, join
+from Queue import Queue
+from shutil import rmtree
+from threading import Lock, Thread
+from uuid import uuid4
+
+from config_rpm_maker.configuration import build_config_viewer_host_directory
+from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.utilities.profiler import measure_execution_time
+
+LOGGER = getLogger(__name__)
+
+
+class CouldNotPublishConfigViewerDataException(BaseConfigRpmMakerException):
+    error_info = "Could not publish config viewer data!\n"
+
+
+class ConfigViewerPublisher(object):
+    """ Publishes the config viewer data of the given revision using up to thread_count threads.
+
+        The data of a host is not published if the config viewer already contains
+        the data of a higher revision for this host. """
+
+    def __init__(self, revision, thread_count):
+        self.revision = revision
+        self.thread_count = max(1, thread_count)
+        self.published_hosts = []
+        self.skipped_hosts = []
+        self._host_queue = Queue()
+        self._garbage_queue = Queue()
+        self._errors = []
+        self._lock = Lock()
+        self._threads = []
+        self._garbage_collector = None
+
+    def start(self):
+        self._threads = [Thread(target=self._publish_hosts_from_queue, name='Publish-%d' % i) for i in range(self.thread_count)]
+        self._garbage_collector = Thread(target=self._delete_directories_from_queue, name='Publish-GC')
+        for thread in self._threads + [self._garbage_collector]:
+            thread.daemon = True
+            thread.start()
+
+    def publish(self, host):
+        self._host_queue.put(host)
+
+    def finish(self):
+        """ Waits until all hosts have been published and all replaced directories have been deleted.
+
+            raises: CouldNotPublishConfigViewerDataException if any host could not be published """
+
+        for _ in self._threads:
+            self._host_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self._garbage_collector is not None:
+            self._garbage_queue.put(None)
+            self._garbage_collector.join()
+            self._garbage_collector = None
+
+        if self._errors:
+            raise CouldNotPublishConfigViewerDataException(''.join(self._errors))
+
+    def _publish_hosts_from_queue(self):
+        while True:
+            host = self._host_queue.get()
+            if host is None:
+                return
+
+            try:
+                self._publish_host(host)
+            except Exception as e:
+                error_message = 'Could not publish config viewer data of host "%s": %s\n' % (host, str(e))
+                LOGGER.error(error_message.strip())
+                with self._lock:
+                    self._errors.append(error_message)
+
+    @measure_execution_time
+    def _publish_host(self, host):
+        new_path = build_config_viewer_host_directory(host, revision=self.revision)
+        host_path = build_config_viewer_host_directory(host)
+
+        if exists(host_path):
+            published_revision = read_published_revision(host_path, host)
+            if published_revision > int(self.revision):
+                LOGGER.debug('Will not update configviewer data for host "%s" since the current revision file contains revision %d which is higher than %s',
+                             host, published_revision, self.revision)
+                self._garbage_queue.put(new_path)
+                with self._lock:
+                    self.skipped_hosts.append(host)
+                return
+
+        LOGGER.debug('Updating configviewer data for host "%s"', host)
+        revision_path = '%s.revision-%s.%s' % (host_path, self.revision, uuid4().hex[:8])
+        rename(new_path, revision_path)
+        replaced_path = _swap_symbolic_link(host_path, revision_path)
+        if replaced_path:
+            self._garbage_queue.put(replaced_path)
+
+        with self._lock:
+            self.published_hosts.append(host)
+
+    def _delete_directories_from_queue(self):
+        while True:
+            path = self._garbage_queue.get()
+            if path is None:
+                return
+
+            rmtree(path, ignore_errors=True)
+
+
+def read_published_revision(host_path, host):
+    with open(join(host_path, '%s.rev' % host)) as revision_file:
+        return int(revision_file.read())
+
+
+def _swap_symbolic_link(host_path, revision_path):
+    """ Points the symbolic link host_path atomically to revision_path. A host directory
+        written by earlier versions of config-rpm-maker is moved aside first.
+
+        returns: the path of the replaced directory or None """
+
+    replaced_path = None
+    if islink(host_path):
+        replaced_path = join(dirname(host_path), readlink(host_path))
+    elif exists(host_path):
+        replaced_path = '%s.replaced-%s' % (host_path, uuid4().hex[:8])
+        rename(host_path, replaced_path)
+
+    temporary_link_path = '%s.link-%s' % (host_path, uuid4().hex[:8])
+    symlink(basename(revision_path), temporary_link_path)
+    rename(temporary_link_path, host_path)
+
+    return replaced_path
+
+
+def delete_published_host_directory(host_path):
+    """ Deletes the symbolic link host_path and the directory it points to """
+
+    target_path = join(dirname(host_path), readlink(host_path))
+    remove(host_path)
+    rmtree(target_path, ignore_errors=True)
@@ -0,0 +1,59 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the host index which answers the question which
+    hosts are affected by a changed svn path.
+"""
+
+from config_rpm_maker.segment import OVERLAY_ORDER
+
+
+class HostIndex(object):
+    """ Maps each svn path of the given segments to the hosts using it. A changed
+        path affects all hosts of the svn paths which are a prefix of it. """
+
+    def __init__(self, hosts, segments=OVERLAY_ORDER):
+        self._hosts_by_svn_path = {}
+        for host in hosts:
+            for segment in segments:
+                for svn_path in segment.get_svn_paths(host):
+                    self._hosts_by_svn_path.setdefault(svn_path, set()).add(host)
+
+        self._svn_path_lengths = sorted(set(len(svn_path) for svn_path in self._hosts_by_svn_path))
+
+    def get_hosts(self, changed_path):
+        """ Returns the set of hosts affected by the given changed path """
+
+        hosts = set()
+        for length in self._svn_path_lengths:
+            if length > len(changed_path):
+                break
+
+            hosts_of_svn_path = self._hosts_by_svn_path.get(changed_path[:length])
+            if hosts_of_svn_path:
+                hosts |= hosts_of_svn_path
+
+        return hosts
+
+    def get_affected_hosts(self, changed_paths):
+        """ Returns the set of hosts affected by any of the given changed paths """
+
+        hosts = set()
+        for changed_path in changed_paths:
+            hosts |= self.get_hosts(changed_path)
+
+        return hosts
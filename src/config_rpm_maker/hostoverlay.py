@@ -0,0 +1,95 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the host overlay, which keeps track of the svn path
+    providing each path of the configuration directory of a host while the
+    segments are overlaid.
+
+    Paths served from the segment cache are not copied right away. The host
+    overlay remembers the cache directory providing each of them and copies
+    only the paths which have not been overridden by a later svn path, once
+    all segments have been overlaid. Svn paths which are not served from the
+    segment cache are still exported directly into the configuration directory.
+"""
+
+from logging import getLogger
+from os.path import isdir, join, relpath
+
+from config_rpm_maker.segmentcache import copy_path
+from config_rpm_maker.utilities.profiler import measure_execution_time
+
+LOGGER = getLogger(__name__)
+
+
+class HostOverlay(object):
+
+    def __init__(self, target_directory):
+        self.target_directory = target_directory
+        self.count_of_overridden_paths = 0
+        self._source_directories = {}
+
+    def add_cached_paths(self, source_directory, paths):
+        """ Adds the given paths provided by source_directory, overriding the paths added before """
+
+        for path in paths:
+            if self._discard(path) and not isdir(join(source_directory, path)):
+                self._discard_paths_below_directory(path)
+            self._source_directories[path] = source_directory
+
+    def add_exported_paths(self, paths):
+        """ Adds the given paths, which have already been exported into the target directory """
+
+        for path in paths:
+            if self._discard(path) and not isdir(join(self.target_directory, path)):
+                self._discard_paths_below_directory(path)
+
+    def get_current_path(self, path):
+        """ Returns the path providing the content of the given path within the target directory right now """
+
+        relative_path = relpath(path, self.target_directory)
+        source_directory = self._source_directories.get(relative_path)
+        if source_directory is None:
+            return path
+
+        return join(source_directory, relative_path)
+
+    @measure_execution_time
+    def write(self):
+        """ Copies the paths which have not been overridden into the target directory """
+
+        for path in sorted(self._source_directories):
+            copy_path(join(self._source_directories[path], path), join(self.target_directory, path))
+
+        LOGGER.debug('Copied %s path(s) from the segment cache into "%s", %s path(s) have not been copied since they have been overridden.',
+                     len(self._source_directories), self.target_directory, self.count_of_overridden_paths)
+        self._source_directories = {}
+
+    def _discard(self, path):
+        """ returns: True if the discarded path has been a directory """
+
+        source_directory = self._source_directories.pop(path, None)
+        if source_directory is None:
+            return False
+
+        self.count_of_overridden_paths += 1
+        return isdir(join(source_directory, path))
+
+    def _discard_paths_below_directory(self, path):
+        prefix = path + '/'
+        for path_below in [path_below for path_below in self._source_directories if path_below.startswith(prefix)]:
+            del self._source_directories[path_below]
+            self.count_of_overridden_paths += 1
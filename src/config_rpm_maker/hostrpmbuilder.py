@@ -16,29 +16,45 @@
 
 import os
 import shutil
-import subprocess
+import tarfile
 
 from pysvn import ClientError
 from datetime import datetime
 from logging import ERROR, Formatter, FileHandler, getLogger
-from os import mkdir, remove, environ
+from os import mkdir, remove, rmdir, environ
 from os.path import exists, abspath
 from shutil import rmtree
 from subprocess import PIPE, Popen
 
 from config_rpm_maker import configuration
+from config_rpm_maker.batchrpmbuilder import RpmBuildJob
 from config_rpm_maker.configuration.properties import (is_no_clean_up_enabled,
                                                        get_log_level,
                                                        get_repo_packages_regex,
                                                        get_config_rpm_prefix,
+                                                       get_incremental_build_directory,
                                                        is_config_viewer_only_enabled,
-                                                       get_path_to_spec_file)
-from config_rpm_maker.configuration import build_config_viewer_host_directory
+                                                       get_path_to_spec_file,
+                                                       get_rpm_manifest_directory,
+                                                       get_rpm_writer,
+                                                       get_rpmbuild_batch_size,
+                                                       get_tar_compression_level)
+from config_rpm_maker.configuration import RPM_WRITER_NATIVE, build_config_viewer_host_directory
 from config_rpm_maker.dependency import Dependency
 from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.hostoverlay import HostOverlay
 from config_rpm_maker.hostresolver import HostResolver
+from config_rpm_maker.hoststate import (CouldNotApplyChangeSetException,
+                                        HostState,
+                                        apply_change_set,
+                                        build_overlay,
+                                        filter_directory,
+                                        get_exported_paths)
+from config_rpm_maker.rpmmanifest import calculate_rpm_digest, get_rpm_manifest_path, load_rpm_manifest, write_rpm_manifest
+from config_rpm_maker.rpmwriter import NotSupportedByRpmWriterException, RpmWriter
 from config_rpm_maker.utilities.logutils import verbose
 from config_rpm_maker.segment import OVERLAY_ORDER, ALL_SEGEMENTS
+from config_rpm_maker.svnservice import SvnServiceException
 from config_rpm_maker.token.tokenreplacer import TokenReplacer
 from config_rpm_maker.utilities.profiler import measure_execution_time
 
@@ -63,7 +79,7 @@ class CouldNotTarConfigurationDirectoryException(BaseConfigRpmMakerException):
 
 
 class HostRpmBuilder(object):
-    def __init__(self, thread_name, hostname, revision, work_dir, svn_service_queue, error_logging_handler=None):
+    def __init__(self, thread_name, hostname, revision, work_dir, svn_service_queue, error_logging_handler=None, segment_cache=None):
         self.thread_name = thread_name
         self.hostname = hostname
         self.revision = revision
@@ -73,6 +89,8 @@ class HostRpmBuilder(object):
         self.error_file_path = os.path.join(self.work_dir, self.hostname + '.error')
         self.logger = self._create_logger()
         self.svn_service_queue = svn_service_queue
+        self.segment_cache = segment_cache
+        self.host_overlay = None
         self.config_rpm_prefix = get_config_rpm_prefix()
         self.host_config_dir = os.path.join(self.work_dir, self.config_rpm_prefix + self.hostname)
         self.variables_dir = os.path.join(self.host_config_dir, 'VARIABLES')
@@ -81,6 +99,16 @@ class HostRpmBuilder(object):
         self.spec_file_path = os.path.join(self.host_config_dir, self.config_rpm_prefix + self.hostname + '.spec')
         self.config_viewer_host_dir = build_config_viewer_host_directory(hostname, revision=self.revision)
         self.rpm_build_dir = os.path.join(self.work_dir, 'rpmbuild')
+        self.host_state_directory = get_incremental_build_directory()
+        self.previous_host_state = None
+        self.host_state = None
+        self.svn_paths = []
+        self.token_replacer = None
+        self.config_viewer_token_replacer = None
+        self.rpm_build_job = None
+        self.rpm_manifest_directory = get_rpm_manifest_directory()
+        self.rpm_digest = None
+        self.unchanged_since_revision = None
 
     def build(self):
         LOGGER.info('%s: building configuration rpm(s) for host "%s"', self.thread_name, self.hostname)
@@ -94,17 +122,27 @@ class HostRpmBuilder(object):
         except Exception as exception:
             raise CouldNotCreateConfigDirException('Could not create host config directory "%s".' % self.host_config_dir, exception)
 
-        overall_requires = []
-        overall_provides = []
-        overall_svn_paths = []
-        overall_exported = {}
+        assembled_host_tree = self._apply_change_set_to_previous_host_tree()
+        if assembled_host_tree:
+            overall_svn_paths, overall_exported, overall_requires, overall_provides = assembled_host_tree
+        else:
+            overall_requires = []
+            overall_provides = []
+            overall_svn_paths = []
+            overall_exported = {}
+            self.host_overlay = HostOverlay(self.host_config_dir)
 
-        for segment in OVERLAY_ORDER:
-            svn_paths, exported_paths, requires, provides = self._overlay_segment(segment)
-            overall_exported[segment] = exported_paths
-            overall_svn_paths += svn_paths
-            overall_requires += requires
-            overall_provides += provides
+            for segment in OVERLAY_ORDER:
+                svn_paths, exported_paths, requires, provides = self._overlay_segment(segment)
+                overall_exported[segment] = exported_paths
+                overall_svn_paths += svn_paths
+                overall_requires += requires
+                overall_provides += provides
+
+            self.host_overlay.write()
+
+        self.svn_paths = overall_svn_paths
+        self._create_host_state(overall_exported, overall_requires, overall_provides)
 
         self.logger.debug("Overall_exported: %s", str(overall_exported))
         self.logger.info("Overall_requires: %s", str(overall_requires))
@@ -153,26 +191,33 @@ class HostRpmBuilder(object):
         self._save_network_variables()
 
         patch_info = self._generate_patch_info()
-
-        self._copy_files_for_config_viewer()
-
-        # write patch info into variable and config viewer
         self._write_file(os.path.join(self.variables_dir, 'VARIABLES'), patch_info)
-        self._write_file(os.path.join(self.config_viewer_host_dir, self.hostname + '.variables'), patch_info)
 
+        self._calculate_rpm_digest()
+
+        LOGGER.debug('%s: writing configviewer data for host "%s"', self.thread_name, self.hostname)
         self._filter_tokens_in_rpm_sources()
+        self._write_files_for_config_viewer()
 
         if not is_config_viewer_only_enabled():
-            self._build_rpm_using_rpmbuild()
+            if self._is_rpm_unchanged():
+                LOGGER.info('%s: not building rpm(s) for host "%s" since the configuration did not change since revision %s',
+                            self.thread_name, self.hostname, self.unchanged_since_revision)
+                self.logger.info("Configuration did not change since revision %s, not building rpm(s).", self.unchanged_since_revision)
+            else:
+                self._build_rpm()
+                self._write_rpm_manifest()
 
-        LOGGER.debug('%s: writing configviewer data for host "%s"', self.thread_name, self.hostname)
-        self._filter_tokens_in_config_viewer()
         self._write_revision_file_for_config_viewer()
         self._write_overlaying_for_config_viewer(overall_exported)
+        self._save_host_state()
 
         self._remove_logger_handlers()
         self._clean_up()
 
+        if self.rpm_build_job is not None or self.unchanged_since_revision is not None:
+            return []
+
         return self._find_rpms()
 
     def _clean_up(self):
@@ -183,21 +228,26 @@ class HostRpmBuilder(object):
         LOGGER.debug('Cleaning up temporary files for host "%s"', self.hostname)
 
         rmtree(self.variables_dir)
-        rmtree(self.host_config_dir)
+        if exists(self.host_config_dir):
+            rmtree(self.host_config_dir)
         remove(self.output_file_path)
         remove(self.error_file_path)
 
-    def _filter_tokens_in_config_viewer(self):
-
-        def configviewer_token_replacer(token, replacement):
-            filtered_replacement = replacement.rstrip()
-            return '<strong title="%s">%s</strong>' % (token, filtered_replacement)
+    @measure_execution_time
+    def _write_files_for_config_viewer(self):
+        """ Writes the html escaped and filtered variables and the unused variables to the config viewer.
+            The files of the configuration directory have already been written while filtering the rpm sources. """
+
+        token_replacer = self._get_config_viewer_token_replacer()
+        config_viewer_variables_dir = os.path.join(self.config_viewer_host_dir, 'VARIABLES')
+        mkdir(config_viewer_variables_dir)
+        for name in os.listdir(self.variables_dir):
+            path = os.path.join(self.variables_dir, name)
+            if name == 'VARIABLES':
+                token_replacer.filter_file(path, html_escape=True, target_filename=os.path.join(self.config_viewer_host_dir, self.hostname + '.variables'))
+            else:
+                token_replacer.filter_file(path, html_escape=True, target_filename=os.path.join(config_viewer_variables_dir, name))
 
-        token_replacer = TokenReplacer.filter_directory(self.config_viewer_host_dir,
-                                                        self.variables_dir,
-                                                        html_escape=True,
-                                                        replacer_function=configviewer_token_replacer,
-                                                        thread_name=self.thread_name)
         tokens_unused = set(token_replacer.token_values.keys()) - token_replacer.token_used
         path_to_unused_variables = os.path.join(self.config_viewer_host_dir, 'unused_variables.txt')
         self._write_file(path_to_unused_variables, '\n'.join(sorted(tokens_unused)))
@@ -220,9 +270,58 @@ class HostRpmBuilder(object):
         return result
 
     @measure_execution_time
-    def _build_rpm_using_rpmbuild(self):
+    def _calculate_rpm_digest(self):
+        if not self.rpm_manifest_directory:
+            return
+
+        self.rpm_digest = calculate_rpm_digest(self.host_config_dir, self._get_token_replacer().token_values)
+
+    def _is_rpm_unchanged(self):
+        if not self.rpm_digest:
+            return False
+
+        manifest = load_rpm_manifest(get_rpm_manifest_path(self.rpm_manifest_directory, self.hostname))
+        if not manifest or manifest['digest'] != self.rpm_digest or int(manifest['revision']) >= int(self.revision):
+            return False
+
+        self.unchanged_since_revision = manifest['revision']
+        return True
+
+    def _write_rpm_manifest(self):
+        if not self.rpm_digest:
+            return
+
+        write_rpm_manifest(get_rpm_manifest_path(self.work_dir, self.hostname), self.revision, self.rpm_digest)
+
+    def _build_rpm(self):
         tar_path = self._tar_sources()
 
+        if get_rpm_writer() == RPM_WRITER_NATIVE:
+            try:
+                self._write_rpm_natively(tar_path)
+                return
+            except NotSupportedByRpmWriterException as exception:
+                LOGGER.debug('%s: building rpms using rpmbuild since %s', self.thread_name, str(exception))
+                self.logger.info('Building rpms using rpmbuild: %s', str(exception))
+
+        if get_rpmbuild_batch_size() > 1:
+            LOGGER.debug('%s: rpms for host "%s" will be built in a batch', self.thread_name, self.hostname)
+            self.rpm_build_job = RpmBuildJob(self.hostname, self.config_rpm_prefix + self.rpm_name, tar_path)
+            return
+
+        self._build_rpm_using_rpmbuild(tar_path)
+
+    @measure_execution_time
+    def _write_rpm_natively(self, tar_path):
+        spec_file_path = os.path.join(self.host_config_dir, os.path.basename(self.spec_file_path))
+        rpm_writer = RpmWriter(spec_file_path, self.rpm_build_dir)
+
+        LOGGER.debug('%s: writing rpms for host "%s" without rpmbuild', self.thread_name, self.hostname)
+        for rpm_path in rpm_writer.write(self.host_config_dir, [tar_path]):
+            self.logger.info("Wrote: %s", rpm_path)
+
+    @measure_execution_time
+    def _build_rpm_using_rpmbuild(self, tar_path):
         working_environment = environ.copy()
         working_environment['HOME'] = abspath(self.work_dir)
         absolute_rpm_build_path = abspath(self.rpm_build_dir)
@@ -257,35 +356,143 @@ class HostRpmBuilder(object):
             group_config_dir = os.path.join(self.work_dir, self.config_rpm_prefix + self.rpm_name)
             shutil.move(self.host_config_dir, group_config_dir)
             self.host_config_dir = group_config_dir
-            output_file = group_config_dir + '.tar.gz'
-            tar_cmd = 'tar -cvzf "%s" -C %s %s' % (output_file, self.work_dir, self.config_rpm_prefix + self.rpm_name)
+            archive_name = self.config_rpm_prefix + self.rpm_name
         else:
-            output_file = self.host_config_dir + '.tar.gz'
-            tar_cmd = 'tar -cvzf "%s" -C %s %s' % (output_file, self.work_dir, self.config_rpm_prefix + self.hostname)
-
-        self.logger.debug("Executing %s ...", tar_cmd)
-        process = subprocess.Popen(tar_cmd,
-                                   shell=True,
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
-        if process.returncode:
-            stdout = stdout.strip()
-            stderr = stderr.strip()
-            raise CouldNotTarConfigurationDirectoryException('Creating tar of config dir failed:\n  stdout="%s",\n  stderr="%s"' % (stdout, stderr))
+            archive_name = self.config_rpm_prefix + self.hostname
+
+        output_file = self.host_config_dir + '.tar.gz'
+        compression_level = get_tar_compression_level()
+
+        self.logger.debug('Creating "%s" with compression level %s ...', output_file, compression_level)
+        try:
+            tar_file = tarfile.open(output_file, 'w:gz', compresslevel=compression_level)
+            try:
+                tar_file.add(self.host_config_dir, arcname=archive_name)
+            finally:
+                tar_file.close()
+        except (EnvironmentError, tarfile.TarError) as exception:
+            raise CouldNotTarConfigurationDirectoryException('Creating tar of config dir failed:\n  %s' % str(exception))
         return output_file
 
     @measure_execution_time
     def _filter_tokens_in_rpm_sources(self):
-        TokenReplacer.filter_directory(self.host_config_dir, self.variables_dir, thread_name=self.thread_name)
+        """ Filters the rpm sources in place and writes the html escaped and filtered config viewer
+            files in the same pass, so each file is read and decoded only once. """
 
-    @measure_execution_time
-    def _copy_files_for_config_viewer(self):
         if os.path.exists(self.config_viewer_host_dir):
             shutil.rmtree(self.config_viewer_host_dir)
 
-        shutil.copytree(self.host_config_dir, self.config_viewer_host_dir, symlinks=True)
-        shutil.copytree(self.variables_dir, os.path.join(self.config_viewer_host_dir, 'VARIABLES'))
+        LOGGER.debug('%s: filtering files in directory "%s" into "%s"', self.thread_name, self.host_config_dir, self.config_viewer_host_dir)
+        token_replacer = self._get_token_replacer()
+        config_viewer_token_replacer = self._get_config_viewer_token_replacer()
+
+        if not self.host_state:
+            token_replacer.filter_files_in_directory(self.host_config_dir, skip_directory=self.variables_dir,
+                                                     viewer_token_replacer=config_viewer_token_replacer, viewer_directory=self.config_viewer_host_dir)
+            return
+
+        self.host_state.token_values = token_replacer.token_values
+        self.host_state.files = filter_directory(self.host_config_dir, token_replacer, self.previous_host_state,
+                                                 config_viewer_token_replacer, self.config_viewer_host_dir)
+
+    def _get_token_replacer(self):
+        """ Resolves the token values of the host only once for the rpm sources and the config viewer.
+            Token values of svn paths shared with other hosts are taken from the segment cache. """
+
+        if not self.token_replacer:
+            resolved_tokens = None
+            if self.segment_cache:
+                resolved_tokens = self.segment_cache.get_resolved_tokens(self.svn_paths)
+
+            self.token_replacer = TokenReplacer.from_directory(os.path.abspath(self.variables_dir), resolved_tokens=resolved_tokens)
+
+        return self.token_replacer
+
+    def _get_config_viewer_token_replacer(self):
+        """ Returns the token replacer for the config viewer, which marks each replaced token and remembers the used tokens """
+
+        def configviewer_token_replacer(token, replacement):
+            filtered_replacement = replacement.rstrip()
+            return '<strong title="%s">%s</strong>' % (token, filtered_replacement)
+
+        if not self.config_viewer_token_replacer:
+            self.config_viewer_token_replacer = self._get_token_replacer().with_replacer_function(configviewer_token_replacer)
+
+        return self.config_viewer_token_replacer
+
+    @measure_execution_time
+    def _apply_change_set_to_previous_host_tree(self):
+        """ Assembles the configuration directory by applying the change set since the last
+            build to the host state of the last build.
+
+            returns: the svn paths, exported paths, requires and provides like overlaying
+            all segments does or None if the host has to be built from scratch """
+
+        if not self.host_state_directory:
+            return None
+
+        self.previous_host_state = HostState.load(os.path.join(self.host_state_directory, self.hostname))
+        if not self.previous_host_state:
+            LOGGER.debug('%s: no host state found for host "%s", building from scratch.', self.thread_name, self.hostname)
+            return None
+
+        previous_revision = int(self.previous_host_state.revision)
+        if previous_revision >= int(self.revision):
+            LOGGER.debug('%s: host state of host "%s" has revision %s, building from scratch.', self.thread_name, self.hostname, previous_revision)
+            return None
+
+        svn_paths = [svn_path for segment in OVERLAY_ORDER for svn_path in segment.get_svn_paths(self.hostname)]
+        staging_directory = os.path.join(self.work_dir, 'changes.' + self.hostname)
+        svn_service = self._get_next_svn_service_from_queue()
+        try:
+            changed_paths_with_action = svn_service.get_changed_paths_with_action(self.revision, first_revision=previous_revision + 1)
+            rmdir(self.host_config_dir)
+            shutil.copytree(self.previous_host_state.tree_directory, self.host_config_dir, symlinks=True)
+            overlay = apply_change_set(self.previous_host_state.overlay, changed_paths_with_action, self.host_config_dir,
+                                       svn_paths, svn_service, self.revision, staging_directory)
+
+        except (ClientError, CouldNotApplyChangeSetException, EnvironmentError, SvnServiceException) as e:
+            LOGGER.info('%s: building host "%s" from scratch since the change set could not be applied: %s', self.thread_name, self.hostname, str(e))
+            if exists(self.host_config_dir):
+                rmtree(self.host_config_dir)
+            mkdir(self.host_config_dir)
+            return None
+
+        finally:
+            self.svn_service_queue.put(svn_service)
+            self.svn_service_queue.task_done()
+            if exists(staging_directory):
+                rmtree(staging_directory)
+
+        LOGGER.info('%s: applied %s change(s) since revision %s to host "%s"', self.thread_name, len(changed_paths_with_action), previous_revision, self.hostname)
+
+        exported = {}
+        for segment in OVERLAY_ORDER:
+            exported[segment] = [exported_path for svn_path in segment.get_svn_paths(self.hostname) for exported_path in get_exported_paths(overlay, svn_path)]
+
+        return svn_paths, exported, list(self.previous_host_state.requires), list(self.previous_host_state.provides)
+
+    def _create_host_state(self, exported, requires, provides):
+        if not self.host_state_directory:
+            return
+
+        self.host_state = HostState(os.path.join(self.work_dir, 'host-state.' + self.hostname))
+        self.host_state.revision = self.revision
+        self.host_state.overlay = build_overlay([exported_path for segment in OVERLAY_ORDER for exported_path in exported[segment]])
+        self.host_state.requires = requires
+        self.host_state.provides = provides
+        shutil.copytree(self.host_config_dir, self.host_state.tree_directory, symlinks=True)
+
+    def _save_host_state(self):
+        if not self.host_state:
+            return
+
+        if is_no_clean_up_enabled():
+            shutil.copytree(self.host_config_dir, self.host_state.filtered_directory, symlinks=True)
+        else:
+            # the configuration directory is not needed anymore after building the rpm
+            shutil.move(self.host_config_dir, self.host_state.filtered_directory)
+        self.host_state.save(os.path.join(self.host_state_directory, self.hostname))
 
     def _generate_patch_info(self):
         variables = filter(lambda name: name != 'SVNLOG' and name != 'OVERLAYING', os.listdir(self.variables_dir))
@@ -395,22 +602,32 @@ Change set:
         svn_base_paths = []
         exported_paths = []
         for svn_path in segment.get_svn_paths(self.hostname):
-            svn_service = self._get_next_svn_service_from_queue()
             try:
-                new_exported_paths = svn_service.export(svn_path, self.host_config_dir, self.revision)
+                new_exported_paths = self._export_svn_path(svn_path)
                 exported_paths += new_exported_paths
 
             except ClientError:
                 pass
-            finally:
-                self.svn_service_queue.put(svn_service)
-                self.svn_service_queue.task_done()
             svn_base_paths.append(svn_path)
-            requires += self._parse_dependency_file(self.rpm_requires_path)
-            provides += self._parse_dependency_file(self.rpm_provides_path)
+            requires += self._parse_dependency_file(self.host_overlay.get_current_path(self.rpm_requires_path))
+            provides += self._parse_dependency_file(self.host_overlay.get_current_path(self.rpm_provides_path))
 
         return svn_base_paths, exported_paths, requires, provides
 
+    def _export_svn_path(self, svn_path):
+        if self.segment_cache and self.segment_cache.contains(svn_path):
+            return self.segment_cache.overlay(svn_path, self.host_overlay)
+
+        svn_service = self._get_next_svn_service_from_queue()
+        try:
+            exported_paths = svn_service.export(svn_path, self.host_config_dir, self.revision)
+        finally:
+            self.svn_service_queue.put(svn_service)
+            self.svn_service_queue.task_done()
+
+        self.host_overlay.add_exported_paths([path for _, path in exported_paths])
+        return exported_paths
+
     def _parse_dependency_file(self, path):
         if os.path.exists(path):
             f = open(path)
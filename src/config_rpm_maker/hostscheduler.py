@@ -0,0 +1,170 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the host scheduler which hands out the hosts to
+    build to the build threads (or the build process pool) one at a time.
+
+    Canary hosts are handed out first and the remaining hosts are held back
+    until all canary hosts have been built. If a canary host fails, all
+    remaining hosts are cancelled, so a broken template fails after the first
+    few builds instead of after building thousands of hosts.
+
+    If a work directory budget is given, no further host is started while the
+    file system of the working directory is running out of space or inodes
+    and other hosts are still being built, since these free their temporary
+    files when they are done.
+"""
+
+from collections import deque
+from logging import getLogger
+from os import walk
+from sys import maxint
+from threading import Condition
+
+LOGGER = getLogger(__name__)
+
+WORK_DIR_BUDGET_POLL_INTERVAL_IN_SECONDS = 1
+
+
+class HostScheduler(object):
+
+    def __init__(self, hosts=None, canary_hosts=None, work_dir_budget=None):
+        canary_hosts = set(canary_hosts or [])
+        hosts = hosts or []
+        self._canary_hosts = deque(host for host in hosts if host in canary_hosts)
+        self._pending_hosts = deque(host for host in hosts if host not in canary_hosts)
+        self._hosts_in_progress = set()
+        self._canary_hosts_in_progress = set()
+        self._condition = Condition()
+        self.work_dir_budget = work_dir_budget
+        self.count_of_started_hosts = 0
+        self.count_of_held_back_hosts = 0
+        self.count_of_finished_hosts = 0
+        self.count_of_cancelled_hosts = 0
+        self.canary_host_failed = False
+
+    def next_host(self):
+        """ Returns the next host to build or None if there are no more hosts to build.
+            Blocks while canary hosts are being built or the work directory budget is exhausted. """
+
+        held_back = False
+        with self._condition:
+            while True:
+                if not self._canary_hosts and not self._pending_hosts:
+                    return None
+
+                if self._canary_hosts_in_progress and not self._canary_hosts:
+                    self._condition.wait()
+                    continue
+
+                if not self._has_room_for_another_host():
+                    if not held_back:
+                        held_back = True
+                        self.count_of_held_back_hosts += 1
+                    self._condition.wait(WORK_DIR_BUDGET_POLL_INTERVAL_IN_SECONDS)
+                    continue
+
+                if self._canary_hosts:
+                    host = self._canary_hosts.popleft()
+                    self._canary_hosts_in_progress.add(host)
+                    return self._start(host)
+
+                return self._start(self._pending_hosts.popleft())
+
+    def host_done(self, host, failed=False):
+        """ Marks the given host as built. A failed canary host cancels all remaining hosts. """
+
+        with self._condition:
+            self._hosts_in_progress.discard(host)
+            self.count_of_finished_hosts += 1
+            if self.work_dir_budget is not None:
+                self.work_dir_budget.host_done(host)
+
+            if host in self._canary_hosts_in_progress:
+                self._canary_hosts_in_progress.remove(host)
+                if failed and not self.canary_host_failed:
+                    self.canary_host_failed = True
+                    LOGGER.error('Canary host "%s" failed, stopping to build more hosts.', host)
+                    self._cancel()
+
+            self._condition.notify_all()
+
+    def cancel(self):
+        """ Cancels all hosts which have not been started yet. Hosts being built are not interrupted. """
+
+        with self._condition:
+            self._cancel()
+            self._condition.notify_all()
+
+    def __iter__(self):
+        while True:
+            host = self.next_host()
+            if host is None:
+                return
+            yield host
+
+    def log_statistics(self, logging_function):
+        if self.work_dir_budget is not None:
+            self.work_dir_budget.log_statistics(logging_function)
+
+        if self.count_of_held_back_hosts:
+            logging_function('Held back %s host(s) until other hosts freed space in the work directory.', self.count_of_held_back_hosts)
+
+        if self.count_of_cancelled_hosts:
+            logging_function('Cancelled %s host(s), %s host(s) have been started.', self.count_of_cancelled_hosts, self.count_of_started_hosts)
+
+    def _has_room_for_another_host(self):
+        if self.work_dir_budget is None or not self._hosts_in_progress:
+            return True
+
+        return self.work_dir_budget.has_room_for_another_host()
+
+    def _start(self, host):
+        self._hosts_in_progress.add(host)
+        self.count_of_started_hosts += 1
+        if self.work_dir_budget is not None:
+            self.work_dir_budget.host_started(host)
+        return host
+
+    def _cancel(self):
+        self.count_of_cancelled_hosts += len(self._canary_hosts) + len(self._pending_hosts)
+        self._canary_hosts.clear()
+        self._pending_hosts.clear()
+
+
+def order_hosts_by_name(hosts):
+    return sorted(hosts)
+
+
+def order_largest_hosts_first(hosts, get_directory_of_previous_build):
+    """ Orders the hosts descending by the count of files in the directory of their previous build,
+        since building the largest hosts last would leave the other build threads idle.
+        Hosts without a previous build are built first. """
+
+    sizes = dict((host, _count_files(get_directory_of_previous_build(host))) for host in hosts)
+    return sorted(hosts, key=lambda host: (-sizes[host], host))
+
+
+def _count_files(directory):
+    count_of_files = 0
+    for _, _, files in walk(directory):
+        count_of_files += len(files)
+
+    if not count_of_files:
+        return maxint
+
+    return count_of_files
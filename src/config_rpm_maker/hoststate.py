@@ -0,0 +1,341 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the host state which is used by incremental builds.
+    The host state of a host contains the assembled (not yet filtered)
+    configuration directory, the overlay (which svn paths provide which
+    path), the token values and the filtered files of the last build.
+
+    For a new revision the change set between the revision of the host
+    state and the new revision is applied to the assembled configuration
+    directory and files are only filtered again when their content or the
+    values of the tokens they reference changed.
+"""
+
+import json
+
+from hashlib import sha1
+from logging import getLogger
+from os import listdir, makedirs, remove, rmdir, walk
+from os.path import dirname, exists, isdir, islink, join, lexists, relpath
+from shutil import copyfile, move, rmtree
+
+from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.segmentcache import copy_path
+from config_rpm_maker.svnservice import PYSVN_DELETE_ACTION
+from config_rpm_maker.token.tokenreplacer import TokenReplacer, create_viewer_directory
+from config_rpm_maker.utilities.logutils import verbose
+from config_rpm_maker.utilities.profiler import measure_execution_time
+
+LOGGER = getLogger(__name__)
+
+PYSVN_REPLACE_ACTION = 'R'
+
+# The dependencies are collected while overlaying the segments, therefore
+# changes to these files can not be applied incrementally.
+DEPENDENCY_FILES = ['VARIABLES/RPM_REQUIRES', 'VARIABLES/RPM_PROVIDES']
+
+STATE_FILE_NAME = 'state.json'
+TREE_DIRECTORY_NAME = 'tree'
+FILTERED_DIRECTORY_NAME = 'filtered'
+
+
+class CouldNotApplyChangeSetException(BaseConfigRpmMakerException):
+    error_info = "Could not apply change set to host state: "
+
+
+class HostState(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tree_directory = join(directory, TREE_DIRECTORY_NAME)
+        self.filtered_directory = join(directory, FILTERED_DIRECTORY_NAME)
+        self.revision = None
+        self.overlay = {}
+        self.requires = []
+        self.provides = []
+        self.token_values = {}
+        self.files = {}
+
+    @classmethod
+    def load(cls, directory):
+        """ Returns the host state stored in the given directory or None if
+            there is no complete host state. """
+
+        host_state = cls(directory)
+        state_file_path = join(directory, STATE_FILE_NAME)
+        if not exists(state_file_path):
+            return None
+
+        try:
+            with open(state_file_path) as state_file:
+                state = json.load(state_file)
+
+            host_state.revision = state['revision']
+            host_state.overlay = state['overlay']
+            host_state.requires = state['requires']
+            host_state.provides = state['provides']
+            host_state.token_values = state['token_values']
+            host_state.files = state['files']
+        except (ValueError, KeyError) as e:
+            LOGGER.warn('Ignoring host state in "%s" since it could not be read: %s', directory, str(e))
+            return None
+
+        if not isdir(host_state.tree_directory) or not isdir(host_state.filtered_directory):
+            return None
+
+        return host_state
+
+    def can_reuse_filtered_file(self, path, digest, tokens, token_values):
+        """ Returns True if the file with the given relative path has been filtered
+            in the last build, had the same content and all tokens it references
+            still have the same values. """
+
+        if path not in self.files:
+            return False
+
+        previous_digest, previous_tokens = self.files[path]
+        if previous_digest != digest or previous_tokens != tokens:
+            return False
+
+        if tokens is None:
+            tokens_unchanged = self.token_values == token_values
+        else:
+            tokens_unchanged = all(token in token_values and self.token_values.get(token) == token_values[token] for token in tokens)
+
+        return tokens_unchanged and exists(join(self.filtered_directory, path))
+
+    def save(self, directory):
+        """ Writes the state file and moves the host state into the given directory
+            unless the given directory already contains a host state of a newer revision. """
+
+        with open(join(self.directory, STATE_FILE_NAME), 'w') as state_file:
+            json.dump({'revision': self.revision,
+                       'overlay': self.overlay,
+                       'requires': self.requires,
+                       'provides': self.provides,
+                       'token_values': self.token_values,
+                       'files': self.files}, state_file)
+
+        current_host_state = HostState.load(directory)
+        if current_host_state and int(current_host_state.revision) > int(self.revision):
+            LOGGER.debug('Not saving host state of revision %s since "%s" contains revision %s.',
+                         self.revision, directory, current_host_state.revision)
+            rmtree(self.directory)
+            return
+
+        if exists(directory):
+            rmtree(directory)
+        elif not exists(dirname(directory)):
+            makedirs(dirname(directory))
+
+        move(self.directory, directory)
+        self.directory = directory
+        self.tree_directory = join(directory, TREE_DIRECTORY_NAME)
+        self.filtered_directory = join(directory, FILTERED_DIRECTORY_NAME)
+
+
+def build_overlay(exported_paths):
+    """ Returns a dictionary mapping each exported path to the list of svn paths
+        providing it. The last svn path of each list is the one which wins.
+
+        exported_paths: (svn_path, path) tuples in overlay order """
+
+    overlay = {}
+    for svn_path, path in exported_paths:
+        svn_paths_of_path = overlay.setdefault(path, [])
+        if svn_path not in svn_paths_of_path:
+            svn_paths_of_path.append(svn_path)
+
+    return overlay
+
+
+def get_exported_paths(overlay, svn_path):
+    """ Returns the (svn_path, path) tuples for the given svn path like SvnService.export does """
+
+    return [(svn_path, path) for path in sorted(overlay.keys()) if svn_path in overlay[path]]
+
+
+@measure_execution_time
+def apply_change_set(overlay, changed_paths_with_action, host_config_dir, svn_paths, svn_service, revision, staging_directory):
+    """ Applies the changed paths to the assembled configuration directory of a host.
+
+        overlay: the overlay of the assembled configuration directory, see build_overlay
+        changed_paths_with_action: (path, action) tuples in the order they have been committed
+        svn_paths: the svn paths of the host in overlay order
+
+        returns: the overlay of the configuration directory after applying the change set """
+
+    overlay = dict((path, list(svn_paths_of_path)) for path, svn_paths_of_path in overlay.iteritems())
+
+    for changed_path, action in changed_paths_with_action:
+        for svn_path in svn_paths:
+            path = _get_path_within_svn_path(changed_path, svn_path)
+            if path is None:
+                continue
+
+            if any(_is_same_or_below(dependency_file, path) for dependency_file in DEPENDENCY_FILES):
+                raise CouldNotApplyChangeSetException('dependency file "%s" changed' % changed_path)
+
+            if action == PYSVN_REPLACE_ACTION:
+                raise CouldNotApplyChangeSetException('path "%s" has been replaced' % changed_path)
+
+            verbose(LOGGER).debug('Applying change "%s" (%s) to "%s"', changed_path, action, host_config_dir)
+            if action == PYSVN_DELETE_ACTION:
+                _remove(overlay, svn_path, path, host_config_dir, svn_service, revision)
+            else:
+                _add(overlay, svn_path, path, host_config_dir, svn_paths, svn_service, revision, staging_directory)
+
+    return overlay
+
+
+@measure_execution_time
+def filter_directory(directory, token_replacer, previous_host_state, viewer_token_replacer=None, viewer_directory=None):
+    """ Filters all files in the given directory. Files which have been filtered
+        in the previous build are copied from there if they did not change.
+        If viewer_token_replacer is given, the files are also written html escaped
+        and filtered by it into viewer_directory (see TokenReplacer.filter_files_in_directory).
+
+        returns: a dictionary mapping each file path to its digest and referenced tokens """
+
+    files = {}
+    count_of_reused_files = 0
+
+    for root, directory_names, file_names in walk(directory):
+        viewer_root = None
+        if viewer_token_replacer is not None:
+            viewer_root = create_viewer_directory(directory, root, viewer_directory, directory_names + file_names)
+
+        for file_name in file_names:
+            file_path = join(root, file_name)
+            if islink(file_path):
+                token_replacer.filter_file(file_path)
+                continue
+
+            path = relpath(file_path, directory)
+            with open(file_path) as file_to_filter:
+                content = file_to_filter.read()
+
+            digest = sha1(content).hexdigest()
+            tokens = _get_referenced_tokens(content)
+            files[path] = (digest, tokens)
+
+            viewer_filename = None
+            if viewer_root is not None:
+                viewer_filename = join(viewer_root, file_name)
+
+            if previous_host_state and previous_host_state.can_reuse_filtered_file(path, digest, tokens, token_replacer.token_values):
+                if viewer_filename:
+                    viewer_token_replacer.filter_file(file_path, html_escape=True, target_filename=viewer_filename)
+                copyfile(join(previous_host_state.filtered_directory, path), file_path)
+                count_of_reused_files += 1
+            else:
+                token_replacer.filter_file(file_path, viewer_token_replacer=viewer_token_replacer, viewer_filename=viewer_filename)
+
+    LOGGER.debug('Reused %s of %s filtered file(s) in directory "%s".', count_of_reused_files, len(files), directory)
+    return files
+
+
+def _get_referenced_tokens(content):
+    """ Returns the sorted tokens referenced by the given content. Returns None
+        if the content might not be ascii compatible (e.g. utf-16) which means
+        the tokens can not be found reliably. """
+
+    if '\x00' in content:
+        return None
+
+    return sorted(set(TokenReplacer.TOKEN_PATTERN.findall(content)))
+
+
+def _get_path_within_svn_path(changed_path, svn_path):
+    """ Returns the path of the changed path relative to the svn path, an empty
+        string if the changed path contains the svn path or None if the changed
+        path does not affect the svn path. """
+
+    if changed_path == svn_path:
+        return ''
+
+    if changed_path.startswith(svn_path + '/'):
+        return changed_path[len(svn_path) + 1:]
+
+    if not changed_path or svn_path.startswith(changed_path + '/'):
+        return ''
+
+    return None
+
+
+def _is_same_or_below(path, parent_path):
+    return not parent_path or path == parent_path or path.startswith(parent_path + '/')
+
+
+def _remove(overlay, svn_path, removed_path, host_config_dir, svn_service, revision):
+    affected_paths = [path for path in overlay.keys() if _is_same_or_below(path, removed_path)]
+
+    for path in sorted(affected_paths, reverse=True):
+        svn_paths_of_path = overlay[path]
+        if svn_path not in svn_paths_of_path:
+            continue
+
+        was_winning = svn_paths_of_path[-1] == svn_path
+        svn_paths_of_path.remove(svn_path)
+        target_path = join(host_config_dir, path)
+
+        if not svn_paths_of_path:
+            del overlay[path]
+            _remove_path(target_path)
+
+        elif was_winning and not isdir(target_path):
+            svn_service.export(svn_paths_of_path[-1] + '/' + path, target_path, revision)
+
+
+def _add(overlay, svn_path, added_path, host_config_dir, svn_paths, svn_service, revision, staging_directory):
+    if added_path in overlay and svn_path in overlay[added_path] and overlay[added_path][-1] != svn_path \
+            and not isdir(join(host_config_dir, added_path)):
+        verbose(LOGGER).debug('Skipping "%s/%s" since it is overlaid by "%s"', svn_path, added_path, overlay[added_path][-1])
+        return
+
+    staging_path = join(staging_directory, svn_path, added_path)
+    _remove_path(staging_path, remove_directories=True)
+    if not exists(dirname(staging_path)):
+        makedirs(dirname(staging_path))
+
+    svn_path_to_export = svn_path + '/' + added_path if added_path else svn_path
+    exported_paths = [path for _, path in svn_service.export(svn_path_to_export, staging_path, revision)]
+
+    if added_path:
+        added_paths = [added_path] + [added_path + '/' + path for path in exported_paths]
+    else:
+        added_paths = exported_paths
+
+    for path in sorted(added_paths):
+        svn_paths_of_path = overlay.setdefault(path, [])
+        if svn_path not in svn_paths_of_path:
+            svn_paths_of_path.append(svn_path)
+            svn_paths_of_path.sort(key=svn_paths.index)
+
+        if svn_paths_of_path[-1] == svn_path:
+            copy_path(join(staging_directory, svn_path, path), join(host_config_dir, path))
+
+
+def _remove_path(path, remove_directories=False):
+    if isdir(path) and not islink(path):
+        if remove_directories:
+            rmtree(path)
+        elif not listdir(path):
+            rmdir(path)
+    elif lexists(path):
+        remove(path)
@@ -0,0 +1,128 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the rpm manifest which allows to skip building and
+    uploading the rpms of a host whose configuration did not change.
+
+    The digest of a host covers everything the filtered configuration
+    directory and the rendered spec file are made of: the assembled (not yet
+    filtered) configuration directory including the spec file and the values
+    of all tokens except the ones which change with every revision. The
+    manifest of a host stores the digest and the revision of the last rpms
+    which have been built and uploaded.
+"""
+
+import json
+
+from hashlib import sha1
+from logging import getLogger
+from os import lstat, makedirs, readlink, walk
+from os.path import exists, islink, join, relpath
+from shutil import move
+from stat import S_IMODE, S_ISLNK
+
+LOGGER = getLogger(__name__)
+
+# The values of these tokens contain the revision or the svn log,
+# hence they change with every build of a host.
+REVISION_TOKENS = ['REVISION', 'SVNLOG', 'VARIABLES']
+
+MANIFEST_FILE_SUFFIX = '.json'
+
+
+def calculate_rpm_digest(directory, token_values):
+    """ Returns a digest of the paths, modes and contents of all files below the
+        given directory and of the given token values without the revision tokens """
+
+    digest = sha1()
+    for root, directories, files in walk(directory):
+        directories.sort()
+        for name in sorted(files + [name for name in directories if islink(join(root, name))]):
+            path = join(root, name)
+            mode = lstat(path).st_mode
+            digest.update('%s\0%o\0' % (relpath(path, directory), S_IMODE(mode)))
+            if S_ISLNK(mode):
+                digest.update('->%s\0' % readlink(path))
+            else:
+                with open(path) as file_to_digest:
+                    digest.update(sha1(file_to_digest.read()).hexdigest())
+
+    for token in sorted(token_values):
+        if token not in REVISION_TOKENS:
+            digest.update('\0%s=%s' % (token, _to_bytes(token_values[token])))
+
+    return digest.hexdigest()
+
+
+def _to_bytes(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+
+    return value
+
+
+def load_rpm_manifest(path):
+    """ Returns the manifest stored in the given file as dictionary with the keys
+        "revision" and "digest" or None if there is no readable manifest """
+
+    if not exists(path):
+        return None
+
+    try:
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+        return {'revision': manifest['revision'], 'digest': manifest['digest']}
+    except (ValueError, KeyError, TypeError) as e:
+        LOGGER.warn('Ignoring rpm manifest "%s" since it could not be read: %s', path, str(e))
+        return None
+
+
+def write_rpm_manifest(path, revision, digest):
+    with open(path, 'w') as manifest_file:
+        json.dump({'revision': revision, 'digest': digest}, manifest_file)
+
+
+def publish_rpm_manifests(work_dir, manifest_directory, hostnames):
+    """ Moves the manifests written to the working directory into the manifest directory
+        unless it contains the manifest of a newer revision.
+
+        returns: the hosts without a new manifest, which have not been built """
+
+    if not exists(manifest_directory):
+        makedirs(manifest_directory)
+
+    unchanged_hosts = []
+    for hostname in hostnames:
+        new_manifest_path = get_rpm_manifest_path(work_dir, hostname)
+        if not exists(new_manifest_path):
+            unchanged_hosts.append(hostname)
+            continue
+
+        manifest_path = get_rpm_manifest_path(manifest_directory, hostname)
+        current_manifest = load_rpm_manifest(manifest_path)
+        new_manifest = load_rpm_manifest(new_manifest_path)
+        if current_manifest and new_manifest and int(current_manifest['revision']) > int(new_manifest['revision']):
+            LOGGER.debug('Not saving rpm manifest of host "%s" since "%s" contains revision %s.', hostname, manifest_path, current_manifest['revision'])
+            continue
+
+        move(new_manifest_path, manifest_path)
+
+    return unchanged_hosts
+
+
+def get_rpm_manifest_path(directory, hostname):
+    return join(directory, 'rpm-manifest.' + hostname + MANIFEST_FILE_SUFFIX)
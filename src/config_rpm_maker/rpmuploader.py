@@ -0,0 +1,198 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the rpm uploader. Rpms are collected into chunks and
+    every full chunk is handed over to a bounded number of upload threads,
+    each executing the configured upload command for one chunk at a time.
+    This way uploading can start while other hosts are still being built.
+
+    A chunk which could not be uploaded is retried with an exponentially
+    growing delay, since the repository server might only be unavailable
+    for a moment.
+"""
+
+from logging import getLogger
+from os.path import exists, getsize
+from Queue import Queue
+from subprocess import PIPE, Popen
+from threading import Lock, Thread
+from time import sleep, time
+
+from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.utilities.profiler import measure_execution_time, record_throughput
+
+LOGGER = getLogger(__name__)
+
+
+class CouldNotUploadRpmsException(BaseConfigRpmMakerException):
+    error_info = "Could not upload rpms!\n"
+
+
+class RpmUploader(object):
+    """ Uploads rpms in chunks using up to process_count upload commands at the same time.
+
+        A chunk size of 0 uploads all rpms in one chunk when finishing. The upload
+        of a chunk is retried up to retries times, waiting retry_delay seconds
+        before the first retry and twice as long before every further retry. """
+
+    def __init__(self, upload_command, chunk_size, process_count, retries=0, retry_delay=0):
+        self.upload_command = upload_command
+        self.chunk_size = chunk_size
+        self.process_count = max(1, process_count)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.uploaded_rpms = []
+        self.chunk_statistics = []
+        self._started_at = None
+        self._pending_rpms = []
+        self._chunk_queue = Queue()
+        self._errors = []
+        self._lock = Lock()
+        self._threads = []
+
+    def start(self):
+        self._started_at = time()
+        self._threads = [Thread(target=self._upload_chunks_from_queue, name='Upload-%d' % i) for i in range(self.process_count)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def add(self, rpm):
+        """ Adds the given rpm and dispatches a chunk as soon as it is full """
+
+        with self._lock:
+            self._pending_rpms.append(rpm)
+            if not self.chunk_size or len(self._pending_rpms) < self.chunk_size:
+                return
+
+            chunk = self._pending_rpms
+            self._pending_rpms = []
+
+        self._dispatch(chunk)
+
+    def finish(self, upload_pending_rpms=True):
+        """ Uploads the remaining rpms (unless upload_pending_rpms is False) and waits for all uploads.
+
+            raises: CouldNotUploadRpmsException if the upload of any chunk failed """
+
+        with self._lock:
+            chunk = self._pending_rpms
+            self._pending_rpms = []
+
+        if chunk and upload_pending_rpms:
+            self._dispatch(chunk)
+
+        for _ in self._threads:
+            self._chunk_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._record_throughput()
+
+        if self._errors:
+            raise CouldNotUploadRpmsException(''.join(self._errors))
+
+    def _dispatch(self, chunk):
+        if self._errors:
+            LOGGER.debug('Not uploading %s rpm(s) since a previous upload failed.', len(chunk))
+            return
+
+        self._chunk_queue.put(chunk)
+
+    def _upload_chunks_from_queue(self):
+        while True:
+            chunk = self._chunk_queue.get()
+            try:
+                if chunk is None:
+                    return
+
+                if not self._errors:
+                    self._upload_chunk(chunk)
+
+            except Exception as e:
+                LOGGER.error('Could not upload %s rpm(s): %s', len(chunk), e)
+                with self._lock:
+                    self._errors.append('Could not upload %s rpm(s): %s\n' % (len(chunk), e))
+
+            finally:
+                self._chunk_queue.task_done()
+
+    @measure_execution_time
+    def _upload_chunk(self, chunk):
+        cmd = '%s %s' % (self.upload_command, ' '.join(chunk))
+        LOGGER.debug('Uploading %s rpm(s).', len(chunk))
+        started_at = time()
+
+        attempt = 0
+        while True:
+            attempt += 1
+            error_message = self._execute_upload_command(cmd)
+            if not error_message:
+                break
+
+            if attempt > self.retries:
+                LOGGER.error(error_message.strip())
+                with self._lock:
+                    self._errors.append(error_message)
+                return
+
+            delay = self.retry_delay * 2 ** (attempt - 1)
+            LOGGER.warn('%sRetrying upload in %ss (retry %s of %s).', error_message, delay, attempt, self.retries)
+            sleep(delay)
+
+        size_in_bytes = sum(getsize(rpm) for rpm in chunk if exists(rpm))
+        elapsed_time = time() - started_at
+        record_throughput('RpmUploader._upload_chunk', len(chunk), size_in_bytes, elapsed_time)
+        with self._lock:
+            self.uploaded_rpms.extend(chunk)
+            self.chunk_statistics.append((len(chunk), size_in_bytes, attempt, elapsed_time))
+
+    def _record_throughput(self):
+        if not self.chunk_statistics:
+            return
+
+        count_of_rpms = sum(statistics[0] for statistics in self.chunk_statistics)
+        size_in_bytes = sum(statistics[1] for statistics in self.chunk_statistics)
+        record_throughput('RpmUploader', count_of_rpms, size_in_bytes, time() - self._started_at)
+
+    def _execute_upload_command(self, cmd):
+        """ returns: None if the upload command succeeded, otherwise an error message """
+
+        process = Popen(cmd, shell=True, stdout=PIPE, stderr=PIPE)
+        stdout, stderr = process.communicate()
+
+        if not process.returncode:
+            return None
+
+        error_message = 'Rpm upload failed with exit code %s. Executed command "%s"\n' % (process.returncode, cmd)
+        if stdout:
+            error_message += 'stdout: "%s"\n' % stdout.strip()
+        if stderr:
+            error_message += 'stderr: "%s"\n' % stderr.strip()
+        return error_message
+
+
+class UploadingRpmQueue(Queue):
+    """ A queue of built rpms, which hands every rpm over to the uploader as soon as it is put """
+
+    def __init__(self, rpm_uploader):
+        Queue.__init__(self)
+        self.rpm_uploader = rpm_uploader
+
+    def put(self, item, block=True, timeout=None):
+        Queue.put(self, item, block, timeout)
+        self.rpm_uploader.add(item)
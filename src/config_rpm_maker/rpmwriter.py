@@ -0,0 +1,829 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the native rpm writer. It writes the binary and the
+    source RPMs of a host without calling rpmbuild. Since a spec file may
+    contain arbitrary shell code, only spec files which follow the layout of
+    the default spec file are supported:
+
+    - the %install section copies the configuration directory to / and creates
+      the file lists "files.lst" (all files except /etc/yum.repos.d) and
+      "files-repos.lst" (the files in /etc/yum.repos.d) using the files ending
+      with .%attr, .%defattr, .%dir and .%symlink as directives
+    - there are no scriptlets, triggers, conditionals or changelog entries
+
+    For any other spec file NotSupportedByRpmWriterException is raised and the
+    RPMs have to be built using rpmbuild.
+"""
+
+import gzip
+import re
+
+from cStringIO import StringIO
+from hashlib import md5, sha1
+from logging import getLogger
+from os import lstat, makedirs, readlink, walk
+from os.path import basename, dirname, exists, isdir, islink, join, relpath
+from pwd import getpwuid
+from grp import getgrgid
+from socket import gethostname
+from stat import S_IFDIR, S_IFLNK, S_IFREG, S_IMODE, S_ISDIR, S_ISLNK, S_ISREG
+from struct import pack
+from time import time
+
+from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.utilities.profiler import measure_execution_time
+
+LOGGER = getLogger(__name__)
+
+RPM_VERSION = '4.8.0'
+
+MAIN_FILE_LIST = 'files.lst'
+REPOS_FILE_LIST = 'files-repos.lst'
+REPOS_DIRECTORY = 'etc/yum.repos.d'
+
+DEFAULT_ATTRIBUTES = ('0644', 'root', 'root', '0755')
+
+# digests of the %prep, %build, %install and %clean sections of the default spec file (see SpecFile.get_build_sections_digest)
+SUPPORTED_BUILD_SECTIONS_DIGESTS = ['20bc484355f459654c57fde7e2823eb6e0756876']
+
+SECTIONS = ['package', 'description', 'prep', 'build', 'install', 'check', 'clean', 'files', 'changelog',
+            'pre', 'post', 'preun', 'postun', 'pretrans', 'posttrans', 'verifyscript',
+            'triggerprein', 'triggerin', 'triggerun', 'triggerpostun',
+            'filetriggerin', 'filetriggerun', 'filetriggerpostun',
+            'transfiletriggerin', 'transfiletriggerun', 'transfiletriggerpostun']
+SUPPORTED_SECTIONS = ['package', 'description', 'prep', 'build', 'install', 'clean', 'files', 'changelog']
+BUILD_SECTIONS = ['prep', 'build', 'install', 'clean']
+CONDITIONALS = ['if', 'ifarch', 'ifnarch', 'ifos', 'ifnos', 'else', 'endif', 'include']
+SUPPORTED_MAIN_TAGS = ['name', 'version', 'release', 'summary', 'group', 'license', 'url', 'vendor', 'packager',
+                       'source', 'source0', 'buildroot', 'buildarch', 'requires', 'provides']
+SUPPORTED_SUBPACKAGE_TAGS = ['summary', 'group', 'requires', 'provides']
+
+SECTION_PATTERN = re.compile(r'^%([a-z]+)\b(.*)$')
+TAG_PATTERN = re.compile(r'^([A-Za-z][A-Za-z0-9]*)\s*:\s*(.*)$')
+MACRO_PATTERN = re.compile(r'%%|%\{([A-Za-z_][A-Za-z0-9_]*)\}|%([A-Za-z_][A-Za-z0-9_]*)')
+UNSUPPORTED_MACRO_PATTERN = re.compile(r'%[A-Za-z_{(\[?!]')
+DEFINE_PATTERN = re.compile(r'^%(define|global)\s+([A-Za-z_][A-Za-z0-9_]*)\s+(.*)$')
+
+RPMSENSE_LESS = 0x02
+RPMSENSE_GREATER = 0x04
+RPMSENSE_EQUAL = 0x08
+RPMSENSE_RPMLIB = 0x01000000
+DEPENDENCY_OPERATORS = {'<': RPMSENSE_LESS,
+                        '>': RPMSENSE_GREATER,
+                        '=': RPMSENSE_EQUAL,
+                        '==': RPMSENSE_EQUAL,
+                        '<=': RPMSENSE_LESS | RPMSENSE_EQUAL,
+                        '>=': RPMSENSE_GREATER | RPMSENSE_EQUAL}
+RPMLIB_REQUIRES = [('rpmlib(CompressedFileNames)', RPMSENSE_RPMLIB | RPMSENSE_LESS | RPMSENSE_EQUAL, '3.0.4-1'),
+                   ('rpmlib(PayloadFilesHavePrefix)', RPMSENSE_RPMLIB | RPMSENSE_LESS | RPMSENSE_EQUAL, '4.0-1')]
+
+RPM_INT16_TYPE = 3
+RPM_INT32_TYPE = 4
+RPM_STRING_TYPE = 6
+RPM_BIN_TYPE = 7
+RPM_STRING_ARRAY_TYPE = 8
+RPM_I18NSTRING_TYPE = 9
+
+RPMTAG_HEADERSIGNATURES = 62
+RPMTAG_HEADERIMMUTABLE = 63
+RPMTAG_HEADERI18NTABLE = 100
+RPMTAG_SHA1HEADER = 269
+RPMSIGTAG_SIZE = 1000
+RPMSIGTAG_MD5 = 1004
+RPMSIGTAG_PAYLOADSIZE = 1007
+RPMTAG_NAME = 1000
+RPMTAG_VERSION = 1001
+RPMTAG_RELEASE = 1002
+RPMTAG_SUMMARY = 1004
+RPMTAG_DESCRIPTION = 1005
+RPMTAG_BUILDTIME = 1006
+RPMTAG_BUILDHOST = 1007
+RPMTAG_SIZE = 1009
+RPMTAG_LICENSE = 1014
+RPMTAG_GROUP = 1016
+RPMTAG_SOURCE = 1018
+RPMTAG_OS = 1021
+RPMTAG_ARCH = 1022
+RPMTAG_FILESIZES = 1028
+RPMTAG_FILEMODES = 1030
+RPMTAG_FILERDEVS = 1033
+RPMTAG_FILEMTIMES = 1034
+RPMTAG_FILEDIGESTS = 1035
+RPMTAG_FILELINKTOS = 1036
+RPMTAG_FILEFLAGS = 1037
+RPMTAG_FILEUSERNAME = 1039
+RPMTAG_FILEGROUPNAME = 1040
+RPMTAG_SOURCERPM = 1044
+RPMTAG_FILEVERIFYFLAGS = 1045
+RPMTAG_PROVIDENAME = 1047
+RPMTAG_REQUIREFLAGS = 1048
+RPMTAG_REQUIRENAME = 1049
+RPMTAG_REQUIREVERSION = 1050
+RPMTAG_RPMVERSION = 1064
+RPMTAG_FILEDEVICES = 1095
+RPMTAG_FILEINODES = 1096
+RPMTAG_FILELANGS = 1097
+RPMTAG_SOURCEPACKAGE = 1106
+RPMTAG_PROVIDEFLAGS = 1112
+RPMTAG_PROVIDEVERSION = 1113
+RPMTAG_DIRINDEXES = 1116
+RPMTAG_BASENAMES = 1117
+RPMTAG_DIRNAMES = 1118
+RPMTAG_PAYLOADFORMAT = 1124
+RPMTAG_PAYLOADCOMPRESSOR = 1125
+RPMTAG_PAYLOADFLAGS = 1126
+
+HEADER_MAGIC = '\x8e\xad\xe8\x01\x00\x00\x00\x00'
+LEAD_MAGIC = '\xed\xab\xee\xdb'
+PAYLOAD_COMPRESSION_LEVEL = 9
+
+
+class NotSupportedByRpmWriterException(BaseConfigRpmMakerException):
+    error_info = "The native rpm writer does not support: "
+
+
+class Package(object):
+    """ A binary package declared in the spec file """
+
+    def __init__(self, name):
+        self.name = name
+        self.tags = {}
+        self.requires = []
+        self.provides = []
+        self.description = ''
+        self.file_list = None
+
+
+class SpecFile(object):
+    """ The parts of a spec file which end up in the header of the RPMs """
+
+    def __init__(self, content):
+        self.macros = {}
+        self.packages = []
+        self.build_sections = {}
+        self._parse(content)
+
+    @property
+    def main_package(self):
+        return self.packages[0]
+
+    def get_tag(self, package, tag):
+        if tag in package.tags:
+            return package.tags[tag]
+        return self.main_package.tags.get(tag, '')
+
+    def _parse(self, content):
+        package = None
+        section = None
+        description_lines = None
+
+        for line in content.splitlines():
+            define = DEFINE_PATTERN.match(line)
+            if define:
+                self.macros[define.group(2)] = define.group(3).strip()
+                continue
+
+            section_match = SECTION_PATTERN.match(line)
+            if section_match and section_match.group(1) in CONDITIONALS:
+                raise NotSupportedByRpmWriterException('conditionals and includes: "%s"' % line)
+
+            if section_match and section_match.group(1) in SECTIONS:
+                if description_lines is not None:
+                    package.description = self.expand_macros('\n'.join(description_lines).strip())
+                    description_lines = None
+
+                section = section_match.group(1)
+                arguments = section_match.group(2).split()
+                if section not in SUPPORTED_SECTIONS:
+                    raise NotSupportedByRpmWriterException('section "%%%s"' % section)
+
+                if section == 'package':
+                    package = Package(self._get_package_name(arguments))
+                    self.packages.append(package)
+                elif section == 'description':
+                    package = self._find_package(self._get_package_name(arguments))
+                    description_lines = []
+                elif section == 'files':
+                    self._find_package(self._get_package_name(arguments)).file_list = self._get_file_list(arguments)
+                elif section in BUILD_SECTIONS:
+                    self.build_sections[section] = []
+                continue
+
+            if description_lines is not None:
+                description_lines.append(line)
+            elif section is None or section == 'package':
+                if not self.packages:
+                    package = Package(None)
+                    self.packages.append(package)
+                self._parse_preamble_line(package, line, section is None)
+            elif section in BUILD_SECTIONS:
+                self.build_sections[section].append(line)
+            elif section == 'files' and line.strip() and not line.startswith('#'):
+                raise NotSupportedByRpmWriterException('explicit file lists: "%s"' % line)
+            elif section == 'changelog' and line.strip():
+                raise NotSupportedByRpmWriterException('changelog entries')
+
+        if description_lines is not None:
+            package.description = self.expand_macros('\n'.join(description_lines).strip())
+
+        self._ensure_spec_is_supported()
+
+    def _ensure_spec_is_supported(self):
+        if not self.packages or not self.main_package.name:
+            raise NotSupportedByRpmWriterException('spec files without a name')
+
+        for package in self.packages:
+            if package.file_list is None:
+                raise NotSupportedByRpmWriterException('packages without %%files section: "%s"' % package.name)
+
+        if self.main_package.tags.get('buildarch', 'noarch') != 'noarch':
+            raise NotSupportedByRpmWriterException('packages which are not noarch')
+
+        if self.get_build_sections_digest() not in SUPPORTED_BUILD_SECTIONS_DIGESTS:
+            raise NotSupportedByRpmWriterException('%prep, %build, %install or %clean sections differing from the default spec file')
+
+    def get_build_sections_digest(self):
+        """ Returns the digest of the build sections ignoring indentation and empty lines """
+
+        normalized_sections = []
+        for section in BUILD_SECTIONS:
+            normalized_sections.append('%' + section)
+            normalized_sections.extend(line.strip() for line in self.build_sections.get(section, []) if line.strip())
+        return sha1(_encode_string('\n'.join(normalized_sections))).hexdigest()
+
+    def _parse_preamble_line(self, package, line, is_main_package):
+        if not line.strip() or line.startswith('#'):
+            return
+
+        tag_match = TAG_PATTERN.match(line)
+        if not tag_match:
+            raise NotSupportedByRpmWriterException('preamble line "%s"' % line)
+
+        tag = tag_match.group(1).lower()
+        supported_tags = SUPPORTED_MAIN_TAGS if is_main_package else SUPPORTED_SUBPACKAGE_TAGS
+        if tag not in supported_tags:
+            raise NotSupportedByRpmWriterException('tag "%s"' % tag_match.group(1))
+
+        value = tag_match.group(2).strip()
+        if tag == 'buildroot':
+            return
+        if tag in ['requires', 'provides']:
+            getattr(package, tag).extend(parse_dependencies(self.expand_macros(value)))
+            return
+
+        package.tags[tag] = self.expand_macros(value)
+        if tag in ['name', 'version', 'release']:
+            self.macros[tag] = package.tags[tag]
+        if tag == 'name':
+            package.name = package.tags[tag]
+
+    def _get_package_name(self, arguments):
+        if '-f' in arguments:
+            index = arguments.index('-f')
+            arguments = arguments[:index] + arguments[index + 2:]
+
+        if not arguments:
+            return self.main_package.name
+        if arguments[0] == '-n' and len(arguments) > 1:
+            return self.expand_macros(arguments[1])
+        return '%s-%s' % (self.main_package.name, self.expand_macros(arguments[0]))
+
+    def _find_package(self, name):
+        for package in self.packages:
+            if package.name == name:
+                return package
+        raise NotSupportedByRpmWriterException('section for unknown package "%s"' % name)
+
+    def _get_file_list(self, arguments):
+        if '-f' not in arguments or arguments.index('-f') + 1 >= len(arguments):
+            raise NotSupportedByRpmWriterException('%files sections without "-f"')
+
+        file_list = arguments[arguments.index('-f') + 1]
+        if file_list not in [MAIN_FILE_LIST, REPOS_FILE_LIST]:
+            raise NotSupportedByRpmWriterException('file list "%s"' % file_list)
+        return file_list
+
+    def expand_macros(self, value):
+        """ Expands %{name}, %name and %% like rpm does. A percent sign which does not start
+            a macro is kept. Raises NotSupportedByRpmWriterException for unknown macros and
+            any other macro syntax (e.g. shell expansion or conditional macros). """
+
+        if UNSUPPORTED_MACRO_PATTERN.search(MACRO_PATTERN.sub('', value)):
+            raise NotSupportedByRpmWriterException('macros in "%s"' % value)
+
+        def expand_macro(match):
+            if match.group(0) == '%%':
+                return '%'
+            macro_name = match.group(1) or match.group(2)
+            if macro_name not in self.macros:
+                raise NotSupportedByRpmWriterException('macro "%s"' % match.group(0))
+            return self.expand_macros(self.macros[macro_name])
+
+        return MACRO_PATTERN.sub(expand_macro, value)
+
+
+class FileEntry(object):
+    """ A file, directory or symbolic link within a package """
+
+    def __init__(self, path, source_path, attributes, is_directory=False, link_target=None):
+        """ path: the absolute path of the file after installing the package
+            source_path: the path of the file within the configuration directory
+            attributes: a tuple of mode, user, group (and directory mode), '-' means
+                        that the value will be taken from the file system """
+
+        self.path = path
+        self.source_path = source_path
+        self.attributes = attributes
+        self.is_directory = is_directory
+        self.link_target = link_target
+
+
+def parse_dependencies(value):
+    """ Returns a list of (name, flags, version) tuples like rpm parses Requires and Provides """
+
+    dependencies = []
+    tokens = [token for token in re.split(r'[\s,]+', value) if token]
+    index = 0
+    while index < len(tokens):
+        name = tokens[index]
+        if name in DEPENDENCY_OPERATORS:
+            raise NotSupportedByRpmWriterException('dependency "%s"' % value)
+
+        if index + 1 < len(tokens) and tokens[index + 1] in DEPENDENCY_OPERATORS:
+            if index + 2 >= len(tokens):
+                raise NotSupportedByRpmWriterException('dependency "%s"' % value)
+            dependencies.append((name, DEPENDENCY_OPERATORS[tokens[index + 1]], tokens[index + 2]))
+            index += 3
+        else:
+            dependencies.append((name, 0, ''))
+            index += 1
+
+    return dependencies
+
+
+def collect_file_entries(directory, paths):
+    """ Returns the file entries for the given paths (relative to directory, starting with a slash)
+        the same way the filterPercentDirectives function of the default spec file does. """
+
+    directives = []
+    pending_entry = None
+    last_defattr_prefix = ''
+
+    def read_directive(path):
+        with open(join(directory, path.lstrip('/'))) as directive_file:
+            return directive_file.read()
+
+    def parse_attributes(path):
+        return tuple(re.sub(r'[^-a-zA-Z0-9,]', '', read_directive(path)).split(','))
+
+    for path in sorted(paths):
+        if path.endswith('.%verify'):
+            raise NotSupportedByRpmWriterException('%%verify directives: "%s"' % path)
+
+        if path.endswith('.%attr'):
+            if pending_entry is None:
+                raise NotSupportedByRpmWriterException('%%attr directive without file: "%s"' % path)
+            pending_entry.attributes = parse_attributes(path)
+            continue
+
+        if pending_entry is not None:
+            directives.append(pending_entry)
+            pending_entry = None
+
+        if path.endswith('.%defattr'):
+            directives.append(parse_attributes(path))
+            last_defattr_prefix = path[:-len('.%defattr')]
+        elif path.endswith('.%dir'):
+            directory_path = path[:-len('.%dir')]
+            if not isdir(join(directory, directory_path.lstrip('/'))):
+                raise NotSupportedByRpmWriterException('%%dir directive for missing directory "%s"' % directory_path)
+            pending_entry = FileEntry(directory_path, directory_path.lstrip('/'), None, is_directory=True)
+        elif path.endswith('.%symlink'):
+            link_path = path[:-len('.%symlink')]
+            if exists(join(directory, link_path.lstrip('/'))) or islink(join(directory, link_path.lstrip('/'))):
+                raise NotSupportedByRpmWriterException('%%symlink directive for existing file "%s"' % link_path)
+            pending_entry = FileEntry(link_path, path.lstrip('/'), None, link_target=read_directive(path).rstrip('\n'))
+        else:
+            if re.search(r'[%*?\[\]{}]', path):
+                raise NotSupportedByRpmWriterException('file names containing macro or glob characters: "%s"' % path)
+            pending_entry = FileEntry(path, path.lstrip('/'), None)
+            if last_defattr_prefix and not path.startswith(last_defattr_prefix):
+                directives.append(DEFAULT_ATTRIBUTES)
+                last_defattr_prefix = ''
+
+    if pending_entry is not None:
+        directives.append(pending_entry)
+
+    entries = []
+    default_attributes = DEFAULT_ATTRIBUTES
+    for directive in directives:
+        if isinstance(directive, tuple):
+            default_attributes = directive
+            continue
+
+        explicit_attributes = directive.attributes or ()
+        attributes = []
+        for index, default_value in enumerate(default_attributes[:3]):
+            value = explicit_attributes[index] if index < len(explicit_attributes) else '-'
+            attributes.append(default_value if value in ['', '-'] else value)
+        if directive.is_directory:
+            directory_mode = default_attributes[3] if len(default_attributes) > 3 else '-'
+            if not explicit_attributes or explicit_attributes[0] in ['', '-']:
+                attributes[0] = directory_mode
+        directive.attributes = tuple(attributes)
+        entries.append(directive)
+
+    return entries
+
+
+class RpmFile(object):
+    """ A file which will be written into the header and the payload of a RPM """
+
+    def __init__(self, path, mode, user, group, mtime, content):
+        self.path = path
+        self.mode = mode
+        self.user = user
+        self.group = group
+        self.mtime = mtime
+        self.content = content
+
+    @property
+    def size(self):
+        if S_ISDIR(self.mode):
+            return 4096
+        return len(self.content)
+
+    @property
+    def digest(self):
+        if S_ISREG(self.mode):
+            return md5(self.content).hexdigest()
+        return ''
+
+    @property
+    def link_target(self):
+        if S_ISLNK(self.mode):
+            return self.content
+        return ''
+
+
+def _to_rpm_file(directory, entry):
+    file_mode, user, group = entry.attributes
+
+    if entry.link_target is not None:
+        status = lstat(join(directory, entry.source_path))
+        return RpmFile(entry.path, S_IFLNK | 0777, _get_user(user, status), _get_group(group, status), int(status.st_mtime), entry.link_target)
+
+    source_path = join(directory, entry.source_path)
+    status = lstat(source_path)
+    if S_ISLNK(status.st_mode):
+        return RpmFile(entry.path, S_IFLNK | 0777, _get_user(user, status), _get_group(group, status), int(status.st_mtime), readlink(source_path))
+
+    if S_ISDIR(status.st_mode):
+        file_type = S_IFDIR
+        content = ''
+    else:
+        file_type = S_IFREG
+        with open(source_path, 'rb') as source_file:
+            content = source_file.read()
+
+    if file_mode == '-':
+        permissions = S_IMODE(status.st_mode)
+    else:
+        try:
+            permissions = int(file_mode, 8)
+        except ValueError:
+            raise NotSupportedByRpmWriterException('file mode "%s" of "%s"' % (file_mode, entry.path))
+
+    return RpmFile(entry.path, file_type | permissions, _get_user(user, status), _get_group(group, status), int(status.st_mtime), content)
+
+
+def _get_user(user, status):
+    if user != '-':
+        return user
+    try:
+        return getpwuid(status.st_uid).pw_name
+    except KeyError:
+        return 'root'
+
+
+def _get_group(group, status):
+    if group != '-':
+        return group
+    try:
+        return getgrgid(status.st_gid).gr_name
+    except KeyError:
+        return 'root'
+
+
+class _Header(object):
+    """ A rpm header, see http://rpm.org/devel_doc/file_format.html """
+
+    def __init__(self, region_tag):
+        self.region_tag = region_tag
+        self.entries = {}
+
+    def add(self, tag, tag_type, value):
+        self.entries[tag] = (tag_type, value)
+
+    def serialize(self):
+        index = []
+        store = StringIO()
+
+        for tag in sorted(self.entries.keys()):
+            tag_type, value = self.entries[tag]
+            data, count, alignment = _encode_value(tag_type, value)
+            padding = (alignment - store.tell() % alignment) % alignment
+            store.write('\0' * padding)
+            index.append(pack('>iiii', tag, tag_type, store.tell(), count))
+            store.write(data)
+
+        count_of_entries = len(index) + 1
+        region_offset = store.tell()
+        store.write(pack('>iiii', self.region_tag, RPM_BIN_TYPE, -count_of_entries * 16, 16))
+        index.insert(0, pack('>iiii', self.region_tag, RPM_BIN_TYPE, region_offset, 16))
+
+        data = store.getvalue()
+        return HEADER_MAGIC + pack('>ii', count_of_entries, len(data)) + ''.join(index) + data
+
+
+def _encode_value(tag_type, value):
+    if tag_type in [RPM_STRING_TYPE, RPM_I18NSTRING_TYPE]:
+        return _encode_string(value) + '\0', 1, 1
+    if tag_type == RPM_STRING_ARRAY_TYPE:
+        return ''.join(_encode_string(element) + '\0' for element in value), len(value), 1
+    if tag_type == RPM_BIN_TYPE:
+        return value, len(value), 1
+    if tag_type == RPM_INT16_TYPE:
+        return ''.join(pack('>H', element & 0xffff) for element in value), len(value), 2
+    if tag_type == RPM_INT32_TYPE:
+        return ''.join(pack('>I', element & 0xffffffff) for element in value), len(value), 4
+    raise ValueError('Unsupported rpm tag type %s' % tag_type)
+
+
+def _encode_string(value):
+    if isinstance(value, unicode):
+        return value.encode('UTF-8')
+    return value
+
+
+def _create_payload(files, with_prefix=True):
+    """ Returns the uncompressed size and the gzip compressed new ascii cpio archive of the given files """
+
+    archive = StringIO()
+    for inode, rpm_file in enumerate(files, 1):
+        name = '.' + rpm_file.path if with_prefix else rpm_file.path
+        content = '' if S_ISDIR(rpm_file.mode) else _encode_string(rpm_file.content)
+        _write_cpio_entry(archive, name, inode, rpm_file.mode, rpm_file.mtime, content)
+    _write_cpio_entry(archive, 'TRAILER!!!', 0, 0, 0, '')
+
+    payload = archive.getvalue()
+    compressed_payload = StringIO()
+    gzip_file = gzip.GzipFile(fileobj=compressed_payload, mode='wb', compresslevel=PAYLOAD_COMPRESSION_LEVEL)
+    try:
+        gzip_file.write(payload)
+    finally:
+        gzip_file.close()
+
+    return len(payload), compressed_payload.getvalue()
+
+
+def _write_cpio_entry(archive, name, inode, mode, mtime, content):
+    name = _encode_string(name)
+    archive.write('070701')
+    for field in [inode, mode, 0, 0, 1, mtime, len(content), 0, 0, 0, 0, len(name) + 1, 0]:
+        archive.write('%08x' % field)
+    archive.write(name + '\0')
+    archive.write('\0' * ((4 - archive.tell() % 4) % 4))
+    archive.write(content)
+    archive.write('\0' * ((4 - archive.tell() % 4) % 4))
+
+
+def _create_lead(name, is_source):
+    lead_name = _encode_string(name)[:65]
+    return (LEAD_MAGIC + pack('>BBhh', 3, 0, 1 if is_source else 0, 1) + lead_name + '\0' * (66 - len(lead_name)) +
+            pack('>hh', 1, 5) + '\0' * 16)
+
+
+def _create_signature(header, payload, payload_size):
+    signature = _Header(RPMTAG_HEADERSIGNATURES)
+    signature.add(RPMTAG_SHA1HEADER, RPM_STRING_TYPE, sha1(header).hexdigest())
+    signature.add(RPMSIGTAG_SIZE, RPM_INT32_TYPE, [len(header) + len(payload)])
+    signature.add(RPMSIGTAG_MD5, RPM_BIN_TYPE, md5(header + payload).digest())
+    signature.add(RPMSIGTAG_PAYLOADSIZE, RPM_INT32_TYPE, [payload_size])
+
+    serialized_signature = signature.serialize()
+    return serialized_signature + '\0' * ((8 - len(serialized_signature) % 8) % 8)
+
+
+def get_interpreter_requires(files):
+    """ Returns the interpreters of the executable scripts like the automatic dependency generator
+        of rpmbuild does. Raises NotSupportedByRpmWriterException for files rpmbuild would inspect
+        any further (binaries, perl and python scripts). """
+
+    interpreters = []
+    for rpm_file in files:
+        if not S_ISREG(rpm_file.mode):
+            continue
+
+        if rpm_file.content.startswith('\x7fELF'):
+            raise NotSupportedByRpmWriterException('binaries: "%s"' % rpm_file.path)
+
+        if rpm_file.path.endswith(('.pl', '.pm')):
+            raise NotSupportedByRpmWriterException('perl modules: "%s"' % rpm_file.path)
+
+        if not rpm_file.mode & 0111 or not rpm_file.content.startswith('#!'):
+            continue
+
+        shebang = rpm_file.content[2:].split('\n', 1)[0].split()
+        if not shebang:
+            continue
+
+        interpreter = shebang[0]
+        if basename(interpreter).startswith(('perl', 'python')) or (shebang[1:] and shebang[1].startswith(('perl', 'python'))):
+            raise NotSupportedByRpmWriterException('%s scripts: "%s"' % (basename(interpreter), rpm_file.path))
+
+        if interpreter not in interpreters:
+            interpreters.append(interpreter)
+
+    return [(path, 0, '') for path in sorted(interpreters)]
+
+
+def _add_dependencies(header, name_tag, flags_tag, version_tag, dependencies):
+    if dependencies:
+        header.add(name_tag, RPM_STRING_ARRAY_TYPE, [name for name, _, _ in dependencies])
+        header.add(flags_tag, RPM_INT32_TYPE, [flags for _, flags, _ in dependencies])
+        header.add(version_tag, RPM_STRING_ARRAY_TYPE, [version for _, _, version in dependencies])
+
+
+def _add_files(header, files):
+    if not files:
+        return
+
+    directory_names = []
+    directory_indexes = []
+    for rpm_file in files:
+        directory_name = dirname(rpm_file.path)
+        if directory_name:
+            directory_name = directory_name.rstrip('/') + '/'
+        if directory_name not in directory_names:
+            directory_names.append(directory_name)
+        directory_indexes.append(directory_names.index(directory_name))
+
+    header.add(RPMTAG_SIZE, RPM_INT32_TYPE, [sum(rpm_file.size for rpm_file in files if S_ISREG(rpm_file.mode))])
+    header.add(RPMTAG_FILESIZES, RPM_INT32_TYPE, [rpm_file.size for rpm_file in files])
+    header.add(RPMTAG_FILEMODES, RPM_INT16_TYPE, [rpm_file.mode for rpm_file in files])
+    header.add(RPMTAG_FILERDEVS, RPM_INT16_TYPE, [0 for _ in files])
+    header.add(RPMTAG_FILEMTIMES, RPM_INT32_TYPE, [rpm_file.mtime for rpm_file in files])
+    header.add(RPMTAG_FILEDIGESTS, RPM_STRING_ARRAY_TYPE, [rpm_file.digest for rpm_file in files])
+    header.add(RPMTAG_FILELINKTOS, RPM_STRING_ARRAY_TYPE, [rpm_file.link_target for rpm_file in files])
+    header.add(RPMTAG_FILEFLAGS, RPM_INT32_TYPE, [0 for _ in files])
+    header.add(RPMTAG_FILEUSERNAME, RPM_STRING_ARRAY_TYPE, [rpm_file.user for rpm_file in files])
+    header.add(RPMTAG_FILEGROUPNAME, RPM_STRING_ARRAY_TYPE, [rpm_file.group for rpm_file in files])
+    header.add(RPMTAG_FILEVERIFYFLAGS, RPM_INT32_TYPE, [-1 for _ in files])
+    header.add(RPMTAG_FILEDEVICES, RPM_INT32_TYPE, [1 for _ in files])
+    header.add(RPMTAG_FILEINODES, RPM_INT32_TYPE, range(1, len(files) + 1))
+    header.add(RPMTAG_FILELANGS, RPM_STRING_ARRAY_TYPE, ['' for _ in files])
+    header.add(RPMTAG_DIRINDEXES, RPM_INT32_TYPE, directory_indexes)
+    header.add(RPMTAG_BASENAMES, RPM_STRING_ARRAY_TYPE, [basename(rpm_file.path) for rpm_file in files])
+    header.add(RPMTAG_DIRNAMES, RPM_STRING_ARRAY_TYPE, directory_names)
+
+
+class RpmWriter(object):
+    """ Writes the binary RPMs and the source RPM of a configuration directory """
+
+    def __init__(self, spec_file_path, rpm_build_dir):
+        with open(spec_file_path) as spec_file:
+            content = spec_file.read()
+        try:
+            self.spec = SpecFile(content.decode('UTF-8'))
+        except UnicodeDecodeError:
+            raise NotSupportedByRpmWriterException('spec files which are not UTF-8 encoded')
+        self.spec_file_path = spec_file_path
+        self.rpm_build_dir = rpm_build_dir
+        self.build_time = int(time())
+        self.build_host = gethostname()
+
+        main_package = self.spec.main_package
+        self.version = self.spec.get_tag(main_package, 'version')
+        self.release = self.spec.get_tag(main_package, 'release')
+        self.source_rpm_name = '%s-%s-%s.src.rpm' % (main_package.name, self.version, self.release)
+
+    @measure_execution_time
+    def write(self, config_dir, source_paths):
+        """ Writes the RPMs for the given configuration directory and returns their paths.
+            source_paths: the paths of the sources which will be packaged into the source RPM """
+
+        files_by_file_list = self._collect_files(config_dir)
+        interpreter_requires_by_file_list = dict((file_list, get_interpreter_requires(files))
+                                                 for file_list, files in files_by_file_list.iteritems())
+
+        rpm_paths = []
+        for package in self.spec.packages:
+            rpm_path = join(self.rpm_build_dir, 'RPMS', 'noarch', '%s-%s-%s.noarch.rpm' % (package.name, self.version, self.release))
+            self._write_rpm(rpm_path, package, files_by_file_list[package.file_list], interpreter_requires_by_file_list[package.file_list])
+            rpm_paths.append(rpm_path)
+
+        source_rpm_path = join(self.rpm_build_dir, 'SRPMS', self.source_rpm_name)
+        self._write_source_rpm(source_rpm_path, [self.spec_file_path] + list(source_paths))
+        rpm_paths.append(source_rpm_path)
+
+        return rpm_paths
+
+    def _collect_files(self, config_dir):
+        spec_file_name = '/%s.spec' % self.spec.main_package.name
+        main_paths = []
+        repos_paths = []
+        for root, directories, file_names in walk(config_dir):
+            for name in file_names + [directory for directory in directories if islink(join(root, directory))]:
+                path = '/' + relpath(join(root, name), config_dir)
+                if path == spec_file_name:
+                    continue
+                if path.startswith('/%s/' % REPOS_DIRECTORY):
+                    repos_paths.append(path)
+                else:
+                    main_paths.append(path)
+
+        files_by_file_list = {}
+        for file_list, paths in [(MAIN_FILE_LIST, main_paths), (REPOS_FILE_LIST, repos_paths)]:
+            files = [_to_rpm_file(config_dir, entry) for entry in collect_file_entries(config_dir, paths)]
+            files_by_file_list[file_list] = sorted(files, key=lambda rpm_file: rpm_file.path)
+        return files_by_file_list
+
+    def _create_header(self, package):
+        header = _Header(RPMTAG_HEADERIMMUTABLE)
+        header.add(RPMTAG_HEADERI18NTABLE, RPM_STRING_ARRAY_TYPE, ['C'])
+        header.add(RPMTAG_NAME, RPM_STRING_TYPE, package.name)
+        header.add(RPMTAG_VERSION, RPM_STRING_TYPE, self.version)
+        header.add(RPMTAG_RELEASE, RPM_STRING_TYPE, self.release)
+        header.add(RPMTAG_SUMMARY, RPM_I18NSTRING_TYPE, self.spec.get_tag(package, 'summary'))
+        header.add(RPMTAG_DESCRIPTION, RPM_I18NSTRING_TYPE, package.description)
+        header.add(RPMTAG_BUILDTIME, RPM_INT32_TYPE, [self.build_time])
+        header.add(RPMTAG_BUILDHOST, RPM_STRING_TYPE, self.build_host)
+        header.add(RPMTAG_LICENSE, RPM_STRING_TYPE, self.spec.get_tag(package, 'license'))
+        header.add(RPMTAG_GROUP, RPM_I18NSTRING_TYPE, self.spec.get_tag(package, 'group') or 'Unspecified')
+        header.add(RPMTAG_OS, RPM_STRING_TYPE, 'linux')
+        header.add(RPMTAG_ARCH, RPM_STRING_TYPE, 'noarch')
+        header.add(RPMTAG_RPMVERSION, RPM_STRING_TYPE, RPM_VERSION)
+        header.add(RPMTAG_PAYLOADFORMAT, RPM_STRING_TYPE, 'cpio')
+        header.add(RPMTAG_PAYLOADCOMPRESSOR, RPM_STRING_TYPE, 'gzip')
+        header.add(RPMTAG_PAYLOADFLAGS, RPM_STRING_TYPE, str(PAYLOAD_COMPRESSION_LEVEL))
+        return header
+
+    def _write_rpm(self, rpm_path, package, files, interpreter_requires):
+        header = self._create_header(package)
+        header.add(RPMTAG_SOURCERPM, RPM_STRING_TYPE, self.source_rpm_name)
+
+        provides = package.provides + [(package.name, RPMSENSE_EQUAL, '%s-%s' % (self.version, self.release))]
+        _add_dependencies(header, RPMTAG_PROVIDENAME, RPMTAG_PROVIDEFLAGS, RPMTAG_PROVIDEVERSION, provides)
+        requires = package.requires + interpreter_requires + RPMLIB_REQUIRES
+        _add_dependencies(header, RPMTAG_REQUIRENAME, RPMTAG_REQUIREFLAGS, RPMTAG_REQUIREVERSION, requires)
+        _add_files(header, files)
+
+        payload_size, payload = _create_payload(files)
+        self._write_file(rpm_path, '%s-%s-%s' % (package.name, self.version, self.release), header, payload, payload_size, False)
+
+    def _write_source_rpm(self, rpm_path, source_paths):
+        files = []
+        for source_path in sorted(source_paths, key=basename):
+            status = lstat(source_path)
+            with open(source_path, 'rb') as source_file:
+                files.append(RpmFile(basename(source_path), S_IFREG | 0644, 'root', 'root', int(status.st_mtime), source_file.read()))
+
+        main_package = self.spec.main_package
+        header = self._create_header(main_package)
+        header.add(RPMTAG_SOURCE, RPM_STRING_ARRAY_TYPE, [basename(source_path) for source_path in source_paths[1:]])
+        header.add(RPMTAG_SOURCEPACKAGE, RPM_INT32_TYPE, [1])
+        _add_dependencies(header, RPMTAG_REQUIRENAME, RPMTAG_REQUIREFLAGS, RPMTAG_REQUIREVERSION, RPMLIB_REQUIRES[:1])
+        _add_files(header, files)
+
+        payload_size, payload = _create_payload(files, with_prefix=False)
+        self._write_file(rpm_path, '%s-%s-%s' % (main_package.name, self.version, self.release), header, payload, payload_size, True)
+
+    def _write_file(self, rpm_path, lead_name, header, payload, payload_size, is_source):
+        serialized_header = header.serialize()
+
+        if not exists(dirname(rpm_path)):
+            makedirs(dirname(rpm_path))
+
+        LOGGER.debug('Writing "%s"', rpm_path)
+        with open(rpm_path, 'wb') as rpm_file:
+            rpm_file.write(_create_lead(lead_name, is_source))
+            rpm_file.write(_create_signature(serialized_header, payload, payload_size))
+            rpm_file.write(serialized_header)
+            rpm_file.write(payload)
+
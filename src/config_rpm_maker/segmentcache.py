@@ -0,0 +1,156 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the segment cache. Svn paths which are part of the
+    overlay of more than one host (e.g. "all" or "typ/web") are exported only
+    once per revision into the cache and are copied from there into the
+    configuration directory of each host by its host overlay. The token values of these svn paths
+    are resolved only once for each combination of svn paths.
+"""
+
+from logging import getLogger
+from os import makedirs, readlink, remove, symlink
+from os.path import dirname, exists, isdir, islink, join, lexists
+from shutil import copyfile, copymode, rmtree
+from threading import Lock
+
+from pysvn import ClientError
+
+from config_rpm_maker.token.tokenreplacer import ResolvedTokens
+from config_rpm_maker.utilities.logutils import verbose
+from config_rpm_maker.utilities.profiler import measure_execution_time
+
+LOGGER = getLogger(__name__)
+
+
+class SegmentCache(object):
+
+    def __init__(self, cache_directory, revision, svn_service_queue, svn_paths):
+        """ cache_directory: directory where the svn paths will be exported to
+            svn_paths: the svn paths which should be served from the cache """
+
+        self.cache_directory = cache_directory
+        self.revision = revision
+        self.svn_service_queue = svn_service_queue
+        self.svn_paths = set(svn_paths)
+        self._lock = Lock()
+        self._path_locks = {}
+        self._exported_paths = {}
+        self._resolved_tokens_lock = Lock()
+        self._resolved_tokens = {}
+
+    def contains(self, svn_path):
+        """ Returns True if the given svn path is served from the cache """
+
+        return svn_path in self.svn_paths
+
+    @measure_execution_time
+    def export_all(self):
+        """ Exports all svn paths served from the cache. Has to be called before
+            the cache is handed over to other processes, since their exports
+            would not be visible to each other. """
+
+        for svn_path in sorted(self.svn_paths):
+            self._ensure_exported(svn_path)
+
+    @measure_execution_time
+    def overlay(self, svn_path, host_overlay):
+        """ Adds the files exported from the given svn path to the given host overlay
+            overriding the files added before. Exports the svn path if this did not happen yet.
+
+            returns: a list of (svn_path, path) tuples like SvnService.export does """
+
+        exported_paths = self._get_exported_paths(svn_path)
+        host_overlay.add_cached_paths(self._get_cache_path(svn_path), [path for _, path in exported_paths])
+
+        return list(exported_paths)
+
+    def get_resolved_tokens(self, svn_paths):
+        """ Returns the ResolvedTokens of the token values (VARIABLES) of the given
+            svn paths which are served from the cache, in the given order. """
+
+        cached_svn_paths = tuple(svn_path for svn_path in svn_paths if self.contains(svn_path))
+
+        with self._resolved_tokens_lock:
+            if cached_svn_paths not in self._resolved_tokens:
+                variables_directories = [join(self._get_cache_path(svn_path), 'VARIABLES') for svn_path in cached_svn_paths]
+                self._resolved_tokens[cached_svn_paths] = ResolvedTokens.from_directories(variables_directories)
+            return self._resolved_tokens[cached_svn_paths]
+
+    def _get_exported_paths(self, svn_path):
+        self._ensure_exported(svn_path)
+
+        exported_paths = self._exported_paths[svn_path]
+        if isinstance(exported_paths, ClientError):
+            raise exported_paths
+
+        return exported_paths
+
+    def _ensure_exported(self, svn_path):
+        with self._get_path_lock(svn_path):
+            if svn_path not in self._exported_paths:
+                self._exported_paths[svn_path] = self._export(svn_path)
+
+    def _export(self, svn_path):
+        cache_path = self._get_cache_path(svn_path)
+        parent_directory = dirname(cache_path)
+        if not exists(parent_directory):
+            makedirs(parent_directory)
+
+        LOGGER.debug('Exporting "%s" in revision %s into segment cache "%s"', svn_path, self.revision, cache_path)
+
+        svn_service = self.svn_service_queue.get()
+        try:
+            return svn_service.export(svn_path, cache_path, self.revision)
+        except ClientError as client_error:
+            verbose(LOGGER).debug('Could not export "%s" into segment cache: %s', svn_path, str(client_error))
+            return client_error
+        finally:
+            self.svn_service_queue.put(svn_service)
+            self.svn_service_queue.task_done()
+
+    def _get_path_lock(self, svn_path):
+        with self._lock:
+            if svn_path not in self._path_locks:
+                self._path_locks[svn_path] = Lock()
+            return self._path_locks[svn_path]
+
+    def _get_cache_path(self, svn_path):
+        return join(self.cache_directory, svn_path)
+
+
+def copy_path(source, target):
+    """ Copies a single file, symbolic link or directory (without its content)
+        from source to target the same way svn export --force would do it. """
+
+    if isdir(source) and not islink(source):
+        if not isdir(target):
+            makedirs(target)
+        return
+
+    if isdir(target) and not islink(target):
+        rmtree(target)
+    elif lexists(target):
+        remove(target)
+    elif not isdir(dirname(target)):
+        makedirs(dirname(target))
+
+    if islink(source):
+        symlink(readlink(source), target)
+    else:
+        copyfile(source, target)
+        copymode(source, target)
@@ -0,0 +1,121 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the svn mirror, a local copy of the configuration
+    repository on the build host which is kept up to date using svnsync.
+
+    Building from the mirror serves all exports, listings and logs from the
+    local disk. Before building a revision only the revisions the mirror
+    lacks are fetched from the configuration repository.
+"""
+
+import os
+
+from fcntl import LOCK_EX, LOCK_UN, flock
+from logging import getLogger
+from os.path import abspath, dirname, exists, isdir, join
+from shutil import rmtree
+from subprocess import PIPE, Popen
+from urllib import pathname2url
+
+from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.utilities.profiler import measure_execution_time
+
+LOGGER = getLogger(__name__)
+
+# svnsync copies revision properties, which a repository refuses by default.
+PRE_REVPROP_CHANGE_HOOK = """#!/bin/sh
+exit 0
+"""
+
+
+class SvnMirrorException(BaseConfigRpmMakerException):
+    error_info = "SVN Mirror error:\n"
+
+
+class SvnMirror(object):
+
+    def __init__(self, mirror_directory, source_url):
+        self.mirror_directory = abspath(mirror_directory)
+        self.source_url = source_url
+        self.url = 'file://' + pathname2url(self.mirror_directory)
+
+    @measure_execution_time
+    def synchronize(self, revision):
+        """ Makes sure the mirror contains the given revision. Concurrent runs
+            on the same build host wait until the mirror has been synchronized.
+
+            returns: the url of the mirror """
+
+        self._create_parent_directory()
+        with open(self.mirror_directory + '.lock', 'w') as lock_file:
+            flock(lock_file, LOCK_EX)
+            try:
+                if not exists(join(self.mirror_directory, 'format')):
+                    self._create()
+
+                youngest_revision = self.get_youngest_revision()
+                if youngest_revision < int(revision):
+                    LOGGER.info('Synchronizing svn mirror "%s" (revision %s) with "%s".', self.mirror_directory, youngest_revision, self.source_url)
+                    # no other svnsync can be running on the mirror while holding the lock,
+                    # hence a lock left behind by an interrupted svnsync can be stolen.
+                    self._execute('svnsync', 'synchronize', '--non-interactive', '--steal-lock', self.url, self.source_url)
+                else:
+                    LOGGER.debug('Svn mirror "%s" already contains revision %s.', self.mirror_directory, revision)
+            finally:
+                flock(lock_file, LOCK_UN)
+
+        return self.url
+
+    def get_youngest_revision(self):
+        return int(self._execute('svnlook', 'youngest', self.mirror_directory).strip())
+
+    def _create_parent_directory(self):
+        parent_directory = dirname(self.mirror_directory)
+        try:
+            os.makedirs(parent_directory)
+        except OSError:
+            # another run on the same build host might have created it in the meantime
+            if not isdir(parent_directory):
+                raise
+
+    def _create(self):
+        LOGGER.info('Creating svn mirror "%s" of "%s".', self.mirror_directory, self.source_url)
+        try:
+            self._execute('svnadmin', 'create', self.mirror_directory)
+
+            hook_path = join(self.mirror_directory, 'hooks', 'pre-revprop-change')
+            with open(hook_path, 'w') as hook_file:
+                hook_file.write(PRE_REVPROP_CHANGE_HOOK)
+            os.chmod(hook_path, 0755)
+
+            self._execute('svnsync', 'initialize', '--non-interactive', self.url, self.source_url)
+        except Exception:
+            if exists(self.mirror_directory):
+                rmtree(self.mirror_directory)
+            raise
+
+    def _execute(self, *arguments):
+        cmd = ' '.join(arguments)
+        LOGGER.debug('Executing "%s"', cmd)
+        process = Popen(list(arguments), stdout=PIPE, stderr=PIPE)
+        stdout, stderr = process.communicate()
+
+        if process.returncode:
+            raise SvnMirrorException('Executing "%s" failed with exit code %s: stdout="%s", stderr="%s"' % (cmd, process.returncode, stdout.strip(), stderr.strip()))
+
+        return stdout
@@ -18,11 +18,12 @@ import pysvn
 import os
 
 from logging import getLogger
+from threading import Lock
 
 from time import ctime
 from config_rpm_maker.utilities.logutils import log_elements_of_list
 from config_rpm_maker.exceptions import BaseConfigRpmMakerException
-from config_rpm_maker.utilities.profiler import measure_execution_time
+from config_rpm_maker.utilities.profiler import count_cache_access, measure_execution_time
 
 LOGGER = getLogger(__name__)
 
@@ -34,15 +35,77 @@ class SvnServiceException(BaseConfigRpmMakerException):
     error_info = "SVN Service error:\n"
 
 
+class SvnCache(object):
+    """ Keeps the results of svn queries for the lifetime of a build, so that e.g. the log of
+        a svn path which is part of the overlay of many hosts (like "all" or "typ/web") or the
+        change set of the revision is fetched only once. The first element of each key has to
+        be the revision. A svn service and all its clones share the same caches. """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = Lock()
+        self._key_locks = {}
+        self._results = {}
+
+    def get(self, key, fetch):
+        """ Returns the result for the given key calling fetch if it is not cached yet.
+            A ClientError raised by fetch is cached as well and raised again for the same key. """
+
+        with self._get_key_lock(key):
+            hit = key in self._results
+            if not hit:
+                try:
+                    self._results[key] = list(fetch())
+                except pysvn.ClientError as client_error:
+                    self._results[key] = client_error
+
+            result = self._results[key]
+
+        count_cache_access(self.name, hit)
+
+        if isinstance(result, pysvn.ClientError):
+            raise result
+
+        return result
+
+    def invalidate(self, revision=None):
+        """ Removes the cached results of the given revision or all cached results if no revision is given """
+
+        with self._lock:
+            for key in self._results.keys():
+                if revision is None or key[0] == int(revision):
+                    del self._results[key]
+
+            for key in self._key_locks.keys():
+                if revision is None or key[0] == int(revision):
+                    del self._key_locks[key]
+
+    def _get_key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = Lock()
+            return self._key_locks[key]
+
+
 class SvnService(object):
 
-    def __init__(self, base_url, username=None, password=None, path_to_config='/config'):
+    def __init__(self, base_url, username=None, password=None, path_to_config='/config', log_cache=None, metadata_cache=None):
         self.path_to_config = path_to_config
         self.base_url = base_url
+        self.username = username
+        self.password = password
         self.config_url = base_url + path_to_config
+        self.log_cache = log_cache if log_cache is not None else SvnCache('Svn log')
+        self.metadata_cache = metadata_cache if metadata_cache is not None else SvnCache('Svn metadata')
         LOGGER.info('Configuration repository is "%s".', self.config_url)
         self._initialize_pysvn_client(username, password)
 
+    def clone(self):
+        """ Returns a new svn service for the same repository using its own pysvn client.
+            A pysvn client must not be shared between processes. """
+
+        return SvnService(self.base_url, self.username, self.password, self.path_to_config, self.log_cache, self.metadata_cache)
+
     def _initialize_pysvn_client(self, username, password):
         self.client = pysvn.Client()
         self.client.set_auth_cache(True)
@@ -55,29 +118,40 @@ class SvnService(object):
             LOGGER.debug('Setting default password for subversion client.')
             self.client.set_default_password(password)
 
-    def log_change_set_meta_information(self, revision):
-        """ Logs the commit message, author and commit date. """
+    def log_change_set_meta_information(self, revision, first_revision=None):
+        """ Logs the commit message, author and commit date of the given revision
+            or of all revisions from first_revision up to the given revision. """
 
-        log_entries = self.get_logs_for_revision(revision)
+        log_entries = self.get_logs_for_revision(revision, first_revision)
         for info in log_entries:
             LOGGER.info('Commit message is "%s" (%s, %s)', info.message.strip(), info.author, ctime(info.date))
 
-    def get_logs_for_revision(self, revision):
-        """ Returns the logs for the given revision of the repository at the config_url """
+    def get_logs_for_revision(self, revision, first_revision=None):
+        """ Returns the logs for the given revision of the repository at the config_url.
+            If first_revision is given the logs of all revisions from first_revision
+            up to the given revision will be returned in ascending order.
+            The logs are fetched only once for each revision and first_revision. """
+
+        if first_revision is None:
+            first_revision = revision
+
+        def fetch_logs():
+            try:
+                return self.client.log(self.base_url, self._rev(first_revision), self._rev(revision),
+                                       discover_changed_paths=True)
+            except Exception as e:
+                LOGGER.error('Retrieving change set information for revision "%s" in repository "%s" failed.',
+                             revision, self.config_url)
+                raise SvnServiceException(str(e))
 
-        try:
-            logs = self.client.log(self.base_url, self._rev(revision), self._rev(revision),
-                                   discover_changed_paths=True)
-        except Exception as e:
-            LOGGER.error('Retrieving change set information for revision "%s" in repository "%s" failed.',
-                         revision, self.config_url)
-            raise SvnServiceException(str(e))
-        return logs
+        return self.metadata_cache.get((int(revision), 'log', int(first_revision)), fetch_logs)
 
-    def get_changed_paths_with_action(self, revision):
-        """ Returns a list of all (path, action) tuples from the change set """
+    def get_changed_paths_with_action(self, revision, first_revision=None):
+        """ Returns a list of all (path, action) tuples from the change set.
+            If first_revision is given the tuples of all change sets from
+            first_revision up to the given revision will be returned. """
 
-        log_entries = self.get_logs_for_revision(revision)
+        log_entries = self.get_logs_for_revision(revision, first_revision)
 
         path_to_config_slash = self.path_to_config + '/'
         start_pos = len(path_to_config_slash)
@@ -91,18 +165,20 @@ class SvnService(object):
 
         return action_and_path
 
-    def get_deleted_paths(self, revision):
-        """ Returns all paths which have been deleted in the given revision"""
+    def get_deleted_paths(self, revision, first_revision=None):
+        """ Returns all paths which have been deleted in the given revision
+            or in any revision from first_revision up to the given revision. """
 
-        paths_with_action = self.get_changed_paths_with_action(revision)
+        paths_with_action = self.get_changed_paths_with_action(revision, first_revision)
 
         return [element[0] for element in paths_with_action if element[1] == PYSVN_DELETE_ACTION]
 
     @measure_execution_time
-    def get_changed_paths(self, revision):
-        """ Returns the list of all changed paths from the change set with the given revision """
+    def get_changed_paths(self, revision, first_revision=None):
+        """ Returns the list of all changed paths from the change set with the given revision
+            or from all change sets from first_revision up to the given revision. """
 
-        path_with_action = self.get_changed_paths_with_action(revision)
+        path_with_action = self.get_changed_paths_with_action(revision, first_revision)
 
         changed_paths_and_action = []
         changed_paths = []
@@ -115,15 +191,20 @@ class SvnService(object):
 
     @measure_execution_time
     def get_hosts(self, revision):
-        url = self.config_url + '/host'
+        """ Returns the names of all hosts in the given revision. The hosts are listed only once for each revision. """
 
-        items = self.client.list(url, revision=self._rev(revision), depth=pysvn.depth.immediates)
+        def fetch_hosts():
+            url = self.config_url + '/host'
 
-        # remove first item
-        items = items[1:]
+            items = self.client.list(url, revision=self._rev(revision), depth=pysvn.depth.immediates)
 
-        repos_paths = [item[0].repos_path.encode(HOST_NAME_ENCODING) for item in items]
-        return [os.path.basename(repos_path) for repos_path in repos_paths]
+            # remove first item
+            items = items[1:]
+
+            repos_paths = [item[0].repos_path.encode(HOST_NAME_ENCODING) for item in items]
+            return [os.path.basename(repos_path) for repos_path in repos_paths]
+
+        return list(self.metadata_cache.get((int(revision), 'hosts'), fetch_hosts))
 
     @measure_execution_time
     def export(self, svn_path, target_dir, revision):
@@ -142,8 +223,20 @@ class SvnService(object):
 
     @measure_execution_time
     def log(self, svn_path, revision, limit=0):
+        """ Returns the log entries of the given svn path from head back to the given revision.
+            The log entries are fetched only once for each svn path, revision and limit. """
+
         url = self._get_url(svn_path)
-        return self.client.log(url, pysvn.Revision(pysvn.opt_revision_kind.head), self._rev(revision), discover_changed_paths=True, limit=limit)
+        return self.log_cache.get((int(revision), url, limit),
+                                  lambda: self.client.log(url, pysvn.Revision(pysvn.opt_revision_kind.head), self._rev(revision),
+                                                          discover_changed_paths=True, limit=limit))
+
+    def invalidate_caches(self, revision=None):
+        """ Forgets the cached results of all queries for the given revision
+            or of all revisions if no revision is given """
+
+        self.log_cache.invalidate(revision)
+        self.metadata_cache.invalidate(revision)
 
     def _rev(self, revision):
         return pysvn.Revision(pysvn.opt_revision_kind.number, int(revision))
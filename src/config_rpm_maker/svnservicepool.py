@@ -0,0 +1,103 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the svn service pool. The pool holds a bounded
+    number of independent svn services so that more than one build thread
+    can talk to the subversion server at the same time.
+"""
+
+from logging import getLogger
+from Queue import Queue
+from threading import Lock
+from time import time
+
+from config_rpm_maker.utilities.profiler import round_to_two_decimals_after_dot
+
+LOGGER = getLogger(__name__)
+
+
+class SvnServicePool(Queue):
+    """ A queue of svn services which keeps track of how long the threads
+        had to wait for a svn service and how busy the svn services were.
+        Use get() to borrow a svn service and put() to return it. """
+
+    def __init__(self, svn_service, size):
+        """ svn_service: the first svn service in the pool, the other ones will be clones of it
+            size: the number of svn services in the pool """
+
+        Queue.__init__(self)
+        self.size = size
+        Queue.put(self, svn_service)
+        for _ in range(size - 1):
+            Queue.put(self, svn_service.clone())
+
+        self._statistics_lock = Lock()
+        self._created_at = time()
+        self._borrowed_at = {}
+        self.count_of_borrows = 0
+        self.total_wait_time = 0
+        self.maximum_wait_time = 0
+        self.total_busy_time = 0
+        self.maximum_in_use = 0
+
+    def get(self, block=True, timeout=None):
+        start_time = time()
+        svn_service = Queue.get(self, block, timeout)
+        borrowed_at = time()
+
+        wait_time = borrowed_at - start_time
+        with self._statistics_lock:
+            self._borrowed_at[id(svn_service)] = borrowed_at
+            self.count_of_borrows += 1
+            self.total_wait_time += wait_time
+            self.maximum_wait_time = max(self.maximum_wait_time, wait_time)
+            self.maximum_in_use = max(self.maximum_in_use, len(self._borrowed_at))
+
+        return svn_service
+
+    def put(self, svn_service, block=True, timeout=None):
+        with self._statistics_lock:
+            borrowed_at = self._borrowed_at.pop(id(svn_service), None)
+            if borrowed_at is not None:
+                self.total_busy_time += time() - borrowed_at
+
+        Queue.put(self, svn_service, block, timeout)
+
+    def get_utilisation(self):
+        """ Returns the fraction of time the svn services have been in use since the pool was created """
+
+        elapsed_time = time() - self._created_at
+        if not elapsed_time:
+            return 0
+
+        return float(self.total_busy_time) / (elapsed_time * self.size)
+
+    def log_statistics(self, logging_function):
+        if self.count_of_borrows:
+            average_wait_time = float(self.total_wait_time) / self.count_of_borrows
+        else:
+            average_wait_time = 0
+
+        logging_function('Svn service pool of size %s: lent %s times, waited %ss in total (average %ss, maximum %ss), '
+                         'at most %s svn service(s) in use at the same time, utilisation %s%%.',
+                         self.size,
+                         self.count_of_borrows,
+                         round_to_two_decimals_after_dot(self.total_wait_time),
+                         round_to_two_decimals_after_dot(average_wait_time),
+                         round_to_two_decimals_after_dot(self.maximum_wait_time),
+                         self.maximum_in_use,
+                         int(round(self.get_utilisation() * 100)))
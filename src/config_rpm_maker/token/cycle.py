@@ -63,44 +63,56 @@ class TokenCycleChecking(object):
 
 
 def tarjan_scc(graph):
-    """ Tarjan's partitioning algorithm for finding strongly connected components in a graph. """
+    """ Tarjan's partitioning algorithm for finding strongly connected components in a graph.
+        Iterative, so that long chains do not hit the recursion limit. A component is
+        returned after all components which can be reached from it. """
 
-    index_counter = [0]
+    index_counter = 0
     stack = []
+    on_stack = set()
     lowlinks = {}
     index = {}
     result = []
 
-    def strongconnect(node):
-        index[node] = index_counter[0]
-        lowlinks[node] = index_counter[0]
-        index_counter[0] += 1
-        stack.append(node)
-
-        try:
-            successors = graph[node]
-        except:
-            successors = []
-        for successor in successors:
-            if successor not in lowlinks:
-                strongconnect(successor)
-                lowlinks[node] = min(lowlinks[node], lowlinks[successor])
-            elif successor in stack:
-                lowlinks[node] = min(lowlinks[node], index[successor])
-
-        if lowlinks[node] == index[node]:
-            connected_component = []
-
-            while True:
-                successor = stack.pop()
-                connected_component.append(successor)
-                if successor == node:
+    for root in graph:
+        if root in lowlinks:
+            continue
+
+        index[root] = lowlinks[root] = index_counter
+        index_counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        nodes_to_visit = [(root, iter(graph.get(root, [])))]
+
+        while nodes_to_visit:
+            node, successors = nodes_to_visit[-1]
+
+            for successor in successors:
+                if successor not in lowlinks:
+                    index[successor] = lowlinks[successor] = index_counter
+                    index_counter += 1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    nodes_to_visit.append((successor, iter(graph.get(successor, []))))
                     break
-            component = tuple(connected_component)
-            result.append(component)
-
-    for node in graph:
-        if node not in lowlinks:
-            strongconnect(node)
+                elif successor in on_stack:
+                    lowlinks[node] = min(lowlinks[node], index[successor])
+            else:
+                nodes_to_visit.pop()
+                if nodes_to_visit:
+                    parent = nodes_to_visit[-1][0]
+                    lowlinks[parent] = min(lowlinks[parent], lowlinks[node])
+
+                if lowlinks[node] == index[node]:
+                    connected_component = []
+
+                    while True:
+                        successor = stack.pop()
+                        on_stack.remove(successor)
+                        connected_component.append(successor)
+                        if successor == node:
+                            break
+                    component = tuple(connected_component)
+                    result.append(component)
 
     return result
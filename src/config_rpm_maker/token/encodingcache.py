@@ -0,0 +1,84 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the encoding cache. Detecting the encoding of a file
+    using libmagic is expensive, and most files (e.g. from "all" or "typ/web")
+    are filtered once for every host and again for the config viewer. The
+    cache remembers the detected encoding by the digest of the file content.
+"""
+
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+
+from config_rpm_maker.configuration.properties import get_encoding_cache_size
+from config_rpm_maker.utilities.profiler import count_cache_access
+
+ENCODING_CACHE_NAME = 'Encoding cache'
+
+_encoding_cache = None
+_encoding_cache_lock = Lock()
+
+
+class EncodingCache(object):
+    """ A thread-safe, size bounded cache which evicts the least recently
+        used encoding when it is full. """
+
+    def __init__(self, size):
+        """ size: maximum number of cached encodings, 0 disables the cache """
+
+        self.size = size
+        self._encodings = OrderedDict()
+        self._lock = Lock()
+
+    def get_encoding(self, content, detect_encoding):
+        """ Returns the encoding of the given content. Calls detect_encoding(content)
+            if the encoding of the content is not cached yet. """
+
+        if not self.size:
+            return detect_encoding(content)
+
+        digest = sha1(content).digest()
+
+        with self._lock:
+            encoding = self._encodings.pop(digest, None)
+            if encoding is not None:
+                self._encodings[digest] = encoding
+
+        count_cache_access(ENCODING_CACHE_NAME, encoding is not None)
+        if encoding is not None:
+            return encoding
+
+        encoding = detect_encoding(content)
+
+        with self._lock:
+            self._encodings[digest] = encoding
+            while len(self._encodings) > self.size:
+                self._encodings.popitem(last=False)
+
+        return encoding
+
+
+def get_encoding_cache():
+    """ Returns the encoding cache shared by all token replacers """
+
+    global _encoding_cache
+
+    with _encoding_cache_lock:
+        if _encoding_cache is None:
+            _encoding_cache = EncodingCache(get_encoding_cache_size())
+        return _encoding_cache
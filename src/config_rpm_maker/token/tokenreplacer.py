@@ -20,13 +20,16 @@ import os
 
 from logging import getLogger
 from os.path import getsize
+from shutil import copymode
 
 import config_rpm_maker.utilities.magic
 
 from config_rpm_maker.configuration.properties import get_max_file_size
 from config_rpm_maker.utilities.logutils import verbose
-from config_rpm_maker.token.cycle import TokenCycleChecking
+from config_rpm_maker.token.cycle import TokenCycleChecking, tarjan_scc
+from config_rpm_maker.token.encodingcache import get_encoding_cache
 from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.utilities.profiler import measure_execution_time
 
 
 LOGGER = getLogger(__name__)
@@ -100,35 +103,27 @@ class TokenReplacer(object):
         token_replacer = cls.from_directory(os.path.abspath(variables_definition_directory),
                                             replacer_function=replacer_function, html_escape_function=html_escape_function)
 
-        for root, _, filenames in os.walk(directory):
-            if variables_definition_directory in root and skip:
-                continue
-            for filename in filenames:
-                absolute_filename = os.path.join(root, filename)
-                token_replacer.filter_file(absolute_filename, html_escape=html_escape)
+        skip_directory = variables_definition_directory if skip else None
+        token_replacer.filter_files_in_directory(directory, html_escape=html_escape, skip_directory=skip_directory)
 
         return token_replacer
 
     @classmethod
-    def from_directory(cls, directory, replacer_function=None, html_escape_function=None):
-        LOGGER.debug("Initializing token replacer of class %s from directory %s", cls.__name__, directory)
+    def from_directory(cls, directory, replacer_function=None, html_escape_function=None, resolved_tokens=None):
+        """ resolved_tokens: optional ResolvedTokens which already contain most of the token values """
 
-        token_values = {}
-        absolute_path = os.path.abspath(directory)
+        LOGGER.debug("Initializing token replacer of class %s from directory %s", cls.__name__, directory)
 
-        for name in os.listdir(absolute_path):
-            candidate = os.path.join(absolute_path, name)
-            if os.path.isfile(candidate):
-                with open(candidate) as property_file:
-                    token_values[name] = property_file.read().strip()
+        token_values = _read_token_values(directory)
 
-        return cls(token_values=token_values, replacer_function=replacer_function, html_escape_function=html_escape_function)
+        return cls(token_values=token_values, replacer_function=replacer_function, html_escape_function=html_escape_function,
+                   resolved_tokens=resolved_tokens)
 
-    def __init__(self, token_values={}, replacer_function=None, html_escape_function=None):
+    def __init__(self, token_values={}, replacer_function=None, html_escape_function=None, resolved_tokens=None):
         self.token_values = {}
         self.token_used = set()
         for token in token_values:
-            self.token_values[token] = token_values[token].decode('UTF-8').strip()
+            self.token_values[token] = _decode_token_value(token_values[token])
 
         if not replacer_function:
             def replacer_function(token, replacement):
@@ -147,22 +142,57 @@ class TokenReplacer(object):
         self.replacer_function = replacer_function
         self.html_escape_function = html_escape_function
 
-        self.token_values = self._replace_tokens_in_token_values(self.token_values)
+        self.token_values = self._replace_tokens_in_token_values(self.token_values, resolved_tokens)
         self.magic_mime_encoding = None
 
+    def with_replacer_function(self, replacer_function=None, html_escape_function=None):
+        """ Returns a new token replacer using the already resolved token values of this one """
+
+        token_replacer = self.__class__(replacer_function=replacer_function, html_escape_function=html_escape_function)
+        token_replacer.token_values = self.token_values
+        return token_replacer
+
+    def filter_files_in_directory(self, directory, html_escape=False, skip_directory=None, viewer_token_replacer=None, viewer_directory=None):
+        """ Filters all files in the given directory, except the ones in directories containing skip_directory.
+            If viewer_token_replacer is given, each file is also written html escaped and filtered by it
+            into the corresponding path within viewer_directory. """
+
+        for root, directory_names, filenames in os.walk(directory):
+            if skip_directory and skip_directory in root:
+                continue
+
+            viewer_root = None
+            if viewer_token_replacer is not None:
+                viewer_root = create_viewer_directory(directory, root, viewer_directory, directory_names + filenames)
+
+            for filename in filenames:
+                absolute_filename = os.path.join(root, filename)
+                if viewer_root is None or os.path.islink(absolute_filename):
+                    self.filter_file(absolute_filename, html_escape=html_escape)
+                else:
+                    self.filter_file(absolute_filename, html_escape=html_escape,
+                                     viewer_token_replacer=viewer_token_replacer, viewer_filename=os.path.join(viewer_root, filename))
+
     def filter(self, content):
-        while True:
-            match = TokenReplacer.TOKEN_PATTERN.search(content)
-            if not match:
-                return content
-            token_name = match.group(1)
-            if not token_name in self.token_values:
-                raise MissingTokenException(token_name)
-            replacement = self.replacer_function(token_name,
-                                                 self.token_values[token_name])
-
-            content = content.replace("@@@%s@@@" % token_name, replacement)
-            self.token_used.add(token_name)
+        """ Replaces all tokens in the given content in a single pass.
+            The replacer_function is called once per distinct token. """
+
+        parts = TokenReplacer.TOKEN_PATTERN.split(content)
+        if len(parts) == 1:
+            return content
+
+        replacements = {}
+        token_names = parts[1::2]
+        for token_name in token_names:
+            if token_name not in replacements:
+                if token_name not in self.token_values:
+                    raise MissingTokenException(token_name)
+                replacements[token_name] = self.replacer_function(token_name,
+                                                                  self.token_values[token_name])
+                self.token_used.add(token_name)
+
+        parts[1::2] = [replacements[token_name] for token_name in token_names]
+        return ''.join(parts)
 
     def _read_content_from_file(self, filename):
 
@@ -171,20 +201,29 @@ class TokenReplacer(object):
 
         return file_content
 
-    def _perform_filtering_on_file(self, filename, file_content, file_encoding, html_escape):
+    def _write_content_to_file(self, filename, file_content):
+
+        with open(filename, "w") as output_file:
+            output_file.write(file_content)
+
+    def _perform_filtering_on_file(self, filename, file_content, file_encoding, html_escape, target_filename):
+        """ file_content: the already decoded content of the given file """
 
         verbose(LOGGER).debug('Filtering file "%s" using encoding "%s"', filename, file_encoding)
-        file_content = file_content.decode(file_encoding)
 
         if html_escape:
-            file_content = self.html_escape_function(os.path.basename(filename), file_content)
+            file_content = self.html_escape_function(os.path.basename(target_filename), file_content)
 
         file_content_filtered = self.filter(file_content)
 
-        with open(filename, "w") as output_file:
-            output_file.write(file_content_filtered.encode(file_encoding))
+        self._write_content_to_file(target_filename, file_content_filtered.encode(file_encoding))
+
+    def filter_file(self, filename, html_escape=False, target_filename=None, viewer_token_replacer=None, viewer_filename=None):
+        """ Filters the given file in place or, if target_filename is given, writes the filtered
+            content to target_filename. If viewer_token_replacer is given, the content is also written
+            html escaped and filtered by it to viewer_filename, so the file is read and decoded only once.
+            Files which can not be filtered are copied to target_filename and viewer_filename. """
 
-    def filter_file(self, filename, html_escape=False):
         try:
             self.file_size_limit = get_max_file_size()
 
@@ -194,59 +233,194 @@ class TokenReplacer(object):
             file_content = self._read_content_from_file(filename)
 
             file_encoding = self._get_file_encoding(file_content)
-            if file_encoding:
-                if file_encoding != 'binary' and file_encoding != 'unknown-8bit':
-                    self._perform_filtering_on_file(filename, file_content, file_encoding, html_escape)
-                else:
+            if file_encoding and file_encoding != 'binary' and file_encoding != 'unknown-8bit':
+                decoded_content = file_content.decode(file_encoding)
+                self._perform_filtering_on_file(filename, decoded_content, file_encoding, html_escape, target_filename or filename)
+                if viewer_token_replacer is not None:
+                    viewer_token_replacer._perform_filtering_on_file(filename, decoded_content, file_encoding, True, viewer_filename)
+            else:
+                if file_encoding:
                     verbose(LOGGER).warn('Not filtering file "%s" since it has encoding "%s".', filename, file_encoding)
 
+                for copy_filename in (target_filename, viewer_filename):
+                    if copy_filename:
+                        self._write_content_to_file(copy_filename, file_content)
+
+            for copy_filename in (target_filename, viewer_filename):
+                if copy_filename:
+                    copymode(filename, copy_filename)
+
         except MissingTokenException as exception:
             raise MissingTokenException(exception.token, filename)
 
         except Exception as e:
             raise CannotFilterFileException('Cannot filter file %s.\n%s' % (os.path.basename(filename), str(e)))
 
-    def _replace_tokens_in_token_values(self, token_values):
-        tokens_without_sub_tokens = dict((key, value) for (key, value) in token_values.iteritems() if not TokenReplacer.TOKEN_PATTERN.search(value))
-        tokens_with_sub_tokens = dict((key, value) for (key, value) in token_values.iteritems() if TokenReplacer.TOKEN_PATTERN.search(value))
-
-        while tokens_with_sub_tokens:
-            tokens_with_sub_tokens_after_replace = {}
-            replace_count = 0
-            for (key, value) in tokens_with_sub_tokens.iteritems():
-                token_names = TokenReplacer.TOKEN_PATTERN.findall(value)
-                for token_name in token_names:
-                    if token_name in tokens_without_sub_tokens:
-                        value = value.replace("@@@%s@@@" % token_name, tokens_without_sub_tokens[token_name])
-                        replace_count += 1
-
-                if TokenReplacer.TOKEN_PATTERN.search(value):
-                    tokens_with_sub_tokens_after_replace[key] = value
-                else:
-                    tokens_without_sub_tokens[key] = value
-
-            # there are still invalid tokens and we could not replace any of them in the last loop cycle, so let's throw an error
-            if tokens_with_sub_tokens_after_replace and not replace_count:
-                # maybe there is a cycle?
-                dependency_digraph = {}
-                for (variable, variable_contents) in tokens_with_sub_tokens_after_replace.iteritems():
-                    edge_source = variable
-                    edge_target = TokenReplacer.TOKEN_PATTERN.findall(variable_contents)
-                    dependency_digraph[edge_source] = edge_target
-                token_graph = TokenCycleChecking(dependency_digraph)
-                token_graph.assert_no_cycles_present()
-                # no cycle => variable undefined
-                unreplaced_variables = []
-                for(variable, variable_contents) in tokens_with_sub_tokens_after_replace.iteritems():
-                    unreplaced = TokenReplacer.TOKEN_PATTERN.findall(variable_contents)
-                    unreplaced_variables.append(unreplaced)
-                raise MissingOrRedundantTokenException("Unresolved variables :\n" + str(unreplaced_variables))
-
-            tokens_with_sub_tokens = tokens_with_sub_tokens_after_replace
+    @measure_execution_time
+    def _replace_tokens_in_token_values(self, token_values, resolved_tokens=None):
+        if resolved_tokens:
+            tokens_without_sub_tokens = resolved_tokens.get_reusable_token_values(token_values)
+        else:
+            tokens_without_sub_tokens = {}
+        tokens_to_resolve = dict((key, value) for (key, value) in token_values.iteritems() if key not in tokens_without_sub_tokens)
+
+        tokens_without_sub_tokens, tokens_with_sub_tokens_after_replace = _resolve_token_values(tokens_without_sub_tokens, tokens_to_resolve)
+
+        if tokens_with_sub_tokens_after_replace:
+            # maybe there is a cycle?
+            dependency_digraph = {}
+            for (variable, variable_contents) in tokens_with_sub_tokens_after_replace.iteritems():
+                edge_source = variable
+                edge_target = TokenReplacer.TOKEN_PATTERN.findall(variable_contents)
+                dependency_digraph[edge_source] = edge_target
+            token_graph = TokenCycleChecking(dependency_digraph)
+            token_graph.assert_no_cycles_present()
+            # no cycle => variable undefined
+            unreplaced_variables = []
+            for(variable, variable_contents) in tokens_with_sub_tokens_after_replace.iteritems():
+                unreplaced = TokenReplacer.TOKEN_PATTERN.findall(variable_contents)
+                unreplaced_variables.append(unreplaced)
+            raise MissingOrRedundantTokenException("Unresolved variables :\n" + str(unreplaced_variables))
 
         return tokens_without_sub_tokens
 
     def _get_file_encoding(self, content):
+        return get_encoding_cache().get_encoding(content, self._detect_file_encoding)
+
+    def _detect_file_encoding(self, content):
         if not self.magic_mime_encoding:
             self.magic_mime_encoding = config_rpm_maker.utilities.magic.Magic(mime_encoding=True)
         return self.magic_mime_encoding.from_buffer(content)
+
+
+class ResolvedTokens(object):
+    """ Token values of the svn paths shared by many hosts (e.g. "all" or "typ/web")
+        resolved as far as possible without the token values of a specific host.
+        A token replacer of a host only has to resolve the tokens again which differ
+        from these or which refer to tokens which differ from these. """
+
+    def __init__(self, token_values):
+        """ token_values: the decoded and stripped, but not yet resolved token values """
+
+        self.raw_token_values = dict(token_values)
+        self.token_values = self._resolve()
+        self.dependencies = _get_dependencies(self.raw_token_values)
+
+    @classmethod
+    def from_directories(cls, directories):
+        """ Reads the token values from the given directories, token values from
+            later directories override the ones from earlier directories. """
+
+        token_values = {}
+        for directory in directories:
+            if os.path.isdir(directory):
+                token_values.update(_read_token_values(directory))
+
+        return cls(dict((token, _decode_token_value(value)) for (token, value) in token_values.iteritems()))
+
+    @measure_execution_time
+    def _resolve(self):
+        tokens_without_sub_tokens, _ = _resolve_token_values({}, self.raw_token_values)
+        return tokens_without_sub_tokens
+
+    def get_reusable_token_values(self, token_values):
+        """ Returns the resolved token values which are still valid for the given raw token values """
+
+        changed_tokens = set(token for (token, value) in token_values.iteritems() if self.raw_token_values.get(token) != value)
+        changed_tokens.update(token for token in self.raw_token_values if token not in token_values)
+
+        return dict((token, value) for (token, value) in self.token_values.iteritems()
+                    if token not in changed_tokens and not self.dependencies[token] & changed_tokens)
+
+
+def create_viewer_directory(directory, root, viewer_directory, names):
+    """ Creates the directory within viewer_directory which corresponds to root within directory
+        and copies the symbolic links among the given names of root into it as they are.
+
+        returns: the created directory """
+
+    viewer_root = os.path.normpath(os.path.join(viewer_directory, os.path.relpath(root, directory)))
+    if not os.path.isdir(viewer_root):
+        os.makedirs(viewer_root)
+
+    for name in names:
+        path = os.path.join(root, name)
+        if os.path.islink(path):
+            os.symlink(os.readlink(path), os.path.join(viewer_root, name))
+
+    return viewer_root
+
+
+def _read_token_values(directory):
+    token_values = {}
+    absolute_path = os.path.abspath(directory)
+
+    for name in os.listdir(absolute_path):
+        candidate = os.path.join(absolute_path, name)
+        if os.path.isfile(candidate):
+            with open(candidate) as property_file:
+                token_values[name] = property_file.read().strip()
+
+    return token_values
+
+
+def _decode_token_value(value):
+    return value.decode('UTF-8').strip()
+
+
+def _resolve_token_values(tokens_without_sub_tokens, token_values):
+    """ Replaces the tokens within the given token values in a single pass over
+        the dependency graph of the token values. Tarjan's algorithm returns the
+        tokens a token value refers to before the token itself, tokens which are
+        part of a cycle form a component of their own.
+
+        returns: a tuple of the resolved token values and the ones which could not be resolved """
+
+    tokens_without_sub_tokens = dict(tokens_without_sub_tokens)
+    references = {}
+    for (key, value) in token_values.iteritems():
+        token_names = TokenReplacer.TOKEN_PATTERN.findall(value)
+        if token_names:
+            references[key] = sorted(set(token_names))
+        else:
+            tokens_without_sub_tokens[key] = value
+
+    tokens_with_sub_tokens = {}
+    for component in tarjan_scc(references):
+        if len(component) > 1 or component[0] not in references:
+            for token in component:
+                if token in references:
+                    tokens_with_sub_tokens[token] = token_values[token]
+            continue
+
+        token = component[0]
+        value = token_values[token]
+        for token_name in references[token]:
+            if token_name in tokens_without_sub_tokens:
+                value = value.replace("@@@%s@@@" % token_name, tokens_without_sub_tokens[token_name])
+
+        if TokenReplacer.TOKEN_PATTERN.search(value):
+            tokens_with_sub_tokens[token] = value
+        else:
+            tokens_without_sub_tokens[token] = value
+
+    return tokens_without_sub_tokens, tokens_with_sub_tokens
+
+
+def _get_dependencies(token_values):
+    """ Returns the names of all tokens each token refers to directly or indirectly """
+
+    references = dict((token, set(TokenReplacer.TOKEN_PATTERN.findall(value))) for (token, value) in token_values.iteritems())
+
+    dependencies = {}
+    for token in references:
+        visited = set()
+        tokens_to_visit = list(references[token])
+        while tokens_to_visit:
+            referenced_token = tokens_to_visit.pop()
+            if referenced_token not in visited:
+                visited.add(referenced_token)
+                tokens_to_visit.extend(references.get(referenced_token, ()))
+        dependencies[token] = visited
+
+    return dependencies
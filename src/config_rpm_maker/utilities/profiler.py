@@ -26,6 +26,7 @@ from math import ceil
 from time import time
 from os import walk
 from os.path import join, getsize
+from threading import Lock
 
 from config_rpm_maker.configuration import get_thread_count
 
@@ -33,7 +34,12 @@ LOGGER = getLogger(__name__)
 
 LOG_EACH_MEASUREMENT = False
 
+BYTES_PER_MEGABYTE = 1024.0 * 1024.0
+
 _execution_time_summary = {}
+_cache_summary = {}
+_cache_summary_lock = Lock()
+_throughput_summary = {}
 
 
 def round_to_two_decimals_after_dot(elapsed_time_in_seconds):
@@ -83,6 +89,32 @@ def measure_execution_time(original_function):
     return wrapped_function
 
 
+def count_cache_access(cache_name, hit):
+    """ Counts a hit or a miss of the cache with the given name """
+
+    with _cache_summary_lock:
+        if cache_name not in _cache_summary:
+            _cache_summary[cache_name] = [0, 0]
+
+        if hit:
+            _cache_summary[cache_name][0] += 1
+        else:
+            _cache_summary[cache_name][1] += 1
+
+
+def record_throughput(name, count_of_items, size_in_bytes, elapsed_time_in_seconds):
+    """ Records that count_of_items items of size_in_bytes bytes have been processed within the given time """
+
+    _throughput_summary.setdefault(name, []).append((count_of_items, size_in_bytes, elapsed_time_in_seconds))
+
+
+def per_second(amount, elapsed_time_in_seconds):
+    if not elapsed_time_in_seconds:
+        return 0
+
+    return round_to_two_decimals_after_dot(amount / elapsed_time_in_seconds)
+
+
 def log_execution_time_summaries(logging_function):
     logging_function('Execution times summary (keep in mind thread_count was set to %s):', get_thread_count())
 
@@ -94,6 +126,25 @@ def log_execution_time_summaries(logging_function):
         logging_function('    %5s times with average %5ss = sum %7ss : %s',
                          summary_of_function[1], average_time, rounded_elapsed_time, function_name)
 
+    if _cache_summary:
+        logging_function('Cache summary:')
+
+    for cache_name in sorted(_cache_summary.keys()):
+        hits, misses = _cache_summary[cache_name]
+        logging_function('    %7s hit(s), %7s miss(es) : %s', hits, misses, cache_name)
+
+    if _throughput_summary:
+        logging_function('Throughput summary:')
+
+    for name in sorted(_throughput_summary.keys()):
+        for count_of_items, size_in_bytes, elapsed_time in _throughput_summary[name]:
+            logging_function('    %7s item(s), %10s bytes in %7ss = %7s item(s)/s, %7s MB/s : %s',
+                             count_of_items, size_in_bytes,
+                             round_to_two_decimals_after_dot(elapsed_time),
+                             per_second(count_of_items, elapsed_time),
+                             per_second(size_in_bytes / BYTES_PER_MEGABYTE, elapsed_time),
+                             name)
+
 
 def log_directories_summary(logging_function, start_path):
 
@@ -0,0 +1,120 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    This module contains the work directory budget. It keeps track of the free
+    space and inodes of the file system of the working directory, which might
+    be a size limited tmpfs, while the hosts are being built.
+
+    While a host is being built its files (exported svn paths, rpm sources,
+    rpms, host states) take up space and inodes, most of which are freed when
+    it is done. So the budget samples the free space and inodes periodically
+    while hosts are in progress and keeps the lowest values seen during each
+    host. The difference to the free space at the start of the host is the
+    peak usage of the host. Since other hosts are built at the same time this
+    is an estimate on the safe side, the largest one is kept free for the next
+    host. The host scheduler asks the budget before starting another host and
+    holds the host back while starting it would leave less than the configured
+    minimum free.
+"""
+
+from os import statvfs
+from sys import maxint
+from threading import Lock, Thread
+from time import sleep
+
+BYTES_PER_MEGABYTE = 1024 * 1024
+SAMPLING_INTERVAL_IN_SECONDS = 0.1
+
+
+class WorkDirBudget(object):
+
+    def __init__(self, directory, min_free_bytes, min_free_inodes):
+        self.directory = directory
+        self.min_free_bytes = min_free_bytes
+        self.min_free_inodes = min_free_inodes
+        self.max_bytes_per_host = 0
+        self.max_inodes_per_host = 0
+        self.lowest_free_bytes = maxint
+        self.lowest_free_inodes = maxint
+        self._free_space_at_start_of_host = {}
+        self._lowest_free_space_of_host = {}
+        self._lock = Lock()
+        self._sampler = None
+        self._get_free_space()
+
+    def has_room_for_another_host(self):
+        """ returns: True if the file system has enough free space and inodes to start another host """
+
+        with self._lock:
+            free_bytes, free_inodes = self._get_free_space()
+            return (free_bytes - self.max_bytes_per_host >= self.min_free_bytes and
+                    free_inodes - self.max_inodes_per_host >= self.min_free_inodes)
+
+    def host_started(self, host):
+        with self._lock:
+            free_space = self._get_free_space()
+            self._free_space_at_start_of_host[host] = free_space
+            self._lowest_free_space_of_host[host] = free_space
+
+            if self._sampler is None:
+                self._sampler = Thread(target=self._sample_while_hosts_are_in_progress, name='WorkDirBudgetSampler')
+                self._sampler.daemon = True
+                self._sampler.start()
+
+    def host_done(self, host):
+        with self._lock:
+            self._get_free_space()
+            free_bytes_at_start, free_inodes_at_start = self._free_space_at_start_of_host.pop(host)
+            lowest_free_bytes, lowest_free_inodes = self._lowest_free_space_of_host.pop(host)
+            self.max_bytes_per_host = max(self.max_bytes_per_host, free_bytes_at_start - lowest_free_bytes)
+            self.max_inodes_per_host = max(self.max_inodes_per_host, free_inodes_at_start - lowest_free_inodes)
+
+    def sample(self):
+        """ Reads the free space and inodes, which are kept as the lowest values seen during the hosts in progress """
+
+        with self._lock:
+            self._get_free_space()
+
+    def _sample_while_hosts_are_in_progress(self):
+        while True:
+            sleep(SAMPLING_INTERVAL_IN_SECONDS)
+            with self._lock:
+                if not self._free_space_at_start_of_host:
+                    self._sampler = None
+                    return
+
+            self.sample()
+
+    def _get_free_space(self):
+        """ returns: a tuple (free bytes, free inodes) of the file system of the directory """
+
+        statistics = statvfs(self.directory)
+        free_bytes = statistics.f_bavail * statistics.f_frsize
+        free_inodes = statistics.f_favail
+        self.lowest_free_bytes = min(self.lowest_free_bytes, free_bytes)
+        self.lowest_free_inodes = min(self.lowest_free_inodes, free_inodes)
+
+        for host, (lowest_free_bytes, lowest_free_inodes) in self._lowest_free_space_of_host.items():
+            self._lowest_free_space_of_host[host] = (min(lowest_free_bytes, free_bytes), min(lowest_free_inodes, free_inodes))
+
+        return free_bytes, free_inodes
+
+    def log_statistics(self, logging_function):
+        logging_function('Work directory "%s": at least %s MB and %s inode(s) have been free, a host used up to %s MB and %s inode(s) at its peak.',
+                         self.directory,
+                         self.lowest_free_bytes // BYTES_PER_MEGABYTE, self.lowest_free_inodes,
+                         self.max_bytes_per_host // BYTES_PER_MEGABYTE, self.max_inodes_per_host)
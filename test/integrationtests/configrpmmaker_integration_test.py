@@ -29,9 +29,11 @@ from config_rpm_maker.configrpmmaker import (CouldNotBuildSomeRpmsException,
 from config_rpm_maker.configuration.properties import (is_no_clean_up_enabled,
                                                        get_config_rpm_prefix,
                                                        get_temporary_directory,
-                                                       get_rpm_upload_command)
-from config_rpm_maker.configuration import build_config_viewer_host_directory
-from config_rpm_maker.segment import All, Typ
+                                                       get_rpm_upload_command,
+                                                       get_rpm_upload_process_count,
+                                                       get_rpm_writer,
+                                                       is_rpm_upload_while_building_enabled)
+from config_rpm_maker.configuration import RPM_WRITER_NATIVE, RPM_WRITER_RPMBUILD, build_config_viewer_host_directory
 
 EXECUTION_ERROR_MESSAGE = """Execution of "{command_with_arguments}" failed. Error code was {error_code}
 stdout was: "{stdout}"
@@ -59,12 +61,6 @@ class ConfigRpmMakerIntegrationTestWithNonConfigCommitAndNoConfig(IntegrationTes
 
 class ConfigRpmMakerIntegrationTest(IntegrationTest):
 
-    def test_should_find_matching_hosts(self):
-        config_rpm_maker = ConfigRpmMaker(None, None)
-        self.assertEqual(['berweb01', 'devweb01'], config_rpm_maker._find_matching_hosts(All(), 'all/foo/bar', ['berweb01', 'devweb01']))
-        self.assertEqual([], config_rpm_maker._find_matching_hosts(All(), 'foo/bar', ['berweb01', 'devweb01']))
-        self.assertEqual(['berweb01', 'devweb01'], config_rpm_maker._find_matching_hosts(Typ(), 'typ/web', ['berweb01', 'devweb01']))
-
     def test_should_identify_affected_hosts(self):
         config_rpm_maker = ConfigRpmMaker(None, None)
         self.assertEqual(set(['berweb01', 'devweb01', 'tuvweb02']), config_rpm_maker._get_affected_hosts(['typ/web', 'foo/bar'], ['berweb01', 'devweb01', 'tuvweb02']))
@@ -106,7 +102,30 @@ class ConfigRpmMakerIntegrationTest(IntegrationTest):
         rpms = config_rpm_maker.build()
 
         self.assertEqual(12, len(rpms))
+        self.assert_rpms_for_hosts(rpms)
+
+    def test_should_build_hosts_affected_by_revision_range_once_at_last_revision(self):
+
+        config_rpm_maker = self._given_config_rpm_maker(revision='2', first_revision='1')
+        rpms = config_rpm_maker.build()
+
+        self.assertEqual(12, len(rpms))
+        self.assert_revision_file_contains_revision('berweb01', '2')
+
+    def test_should_write_rpms_for_hosts_without_rpmbuild(self):
+
+        configuration.set_property(is_no_clean_up_enabled, True)
+        configuration.set_property(get_rpm_writer, RPM_WRITER_NATIVE)
+        try:
+            config_rpm_maker = self._given_config_rpm_maker()
+            rpms = config_rpm_maker.build()
+        finally:
+            configuration.set_property(get_rpm_writer, RPM_WRITER_RPMBUILD)
+
+        self.assertEqual(12, len(rpms))
+        self.assert_rpms_for_hosts(rpms)
 
+    def assert_rpms_for_hosts(self, rpms):
         hosts_to_check = {
             'devweb01': {},
             'tuvweb01': {},
@@ -158,6 +177,43 @@ class ConfigRpmMakerIntegrationTest(IntegrationTest):
         with open(target_file) as f:
             self.assertEqual(f.read(), '10 a a a a a a a a a a\n10 a a a a a a a a a a\n5 a a a a a\n')
 
+    def _given_upload_command_writing_to(self, target_file):
+        if os.path.exists(target_file):
+            os.remove(target_file)
+        cmd_file = os.path.abspath(os.path.join(get_temporary_directory(), 'upload.sh'))
+        with open(cmd_file, 'w') as f:
+            f.write('#!/bin/bash\ndest=$1 ; shift ; echo "${#@} $@" >> "$dest"')
+
+        os.chmod(cmd_file, 0755)
+        return '%s %s' % (cmd_file, target_file)
+
+    def test_should_perform_chunked_uploads_concurrently(self):
+        target_file = os.path.abspath(os.path.join(get_temporary_directory(), 'upload.txt'))
+        configuration.set_property(get_rpm_upload_command, self._given_upload_command_writing_to(target_file))
+        configuration.set_property(get_rpm_upload_process_count, 3)
+        try:
+            ConfigRpmMaker(None, None)._upload_rpms(['a' for x in range(25)])
+        finally:
+            configuration.set_property(get_rpm_upload_command, None)
+            configuration.set_property(get_rpm_upload_process_count, 1)
+
+        with open(target_file) as f:
+            self.assertEqual(['10 a a a a a a a a a a', '10 a a a a a a a a a a', '5 a a a a a'], sorted(f.read().splitlines()))
+
+    def test_should_upload_rpms_while_building(self):
+        target_file = os.path.abspath(os.path.join(get_temporary_directory(), 'upload.txt'))
+        configuration.set_property(get_rpm_upload_command, self._given_upload_command_writing_to(target_file))
+        configuration.set_property(is_rpm_upload_while_building_enabled, True)
+        try:
+            rpms = self._given_config_rpm_maker().build()
+        finally:
+            configuration.set_property(get_rpm_upload_command, None)
+            configuration.set_property(is_rpm_upload_while_building_enabled, False)
+
+        with open(target_file) as f:
+            uploaded_rpms = [rpm for line in f.read().splitlines() for rpm in line.split()[1:]]
+        self.assertEqual(sorted(rpms), sorted(uploaded_rpms))
+
     def test_should_raise_CouldNotBuildSomeRpmsException(self):
         self.assertRaises(CouldNotBuildSomeRpmsException, ConfigRpmMaker(None, None)._build_hosts, ['devabc123'])
 
@@ -16,12 +16,16 @@
 #   You should have received a copy of the GNU General Public License
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import subprocess
+
 from os import makedirs
 from os.path import join, exists
 
-from integration_test_support import IntegrationTest
+from integration_test_support import IntegrationTest, IntegrationTestException
 
+from config_rpm_maker import configuration
 from config_rpm_maker.configuration import build_config_viewer_host_directory
+from config_rpm_maker.configuration.properties import get_incremental_build_directory
 from config_rpm_maker.hostrpmbuilder import (CouldNotTarConfigurationDirectoryException,
                                              CouldNotBuildRpmException,
                                              ConfigDirAlreadyExistsException,
@@ -66,10 +70,11 @@ class HostRpmBuilderIntegrationTest(IntegrationTest):
         svn_service_queue = self.create_svn_service_queue()
 
         host_rpm_builder = HostRpmBuilder(thread_name="Thread-0",
-                                          hostname="--help berweb",
+                                          hostname="berweb01",
                                           revision='1',
                                           work_dir=self.temporary_directory,
                                           svn_service_queue=svn_service_queue)
+        makedirs(join(self.temporary_directory, 'yadt-config-berweb01.tar.gz'))
 
         self.assertRaises(CouldNotTarConfigurationDirectoryException, host_rpm_builder.build)
 
@@ -136,3 +141,50 @@ class HostRpmBuilderIntegrationTest(IntegrationTest):
         host_rpm_builder.build()
 
         self.assert_path_does_not_exist(join(self.temporary_directory, 'berweb01.error'))
+
+
+class HostRpmBuilderIncrementalBuildIntegrationTest(IntegrationTest):
+
+    def setUp(self):
+        super(HostRpmBuilderIncrementalBuildIntegrationTest, self).setUp()
+        configuration.set_property(get_incremental_build_directory, join(self.temporary_directory, 'host-states'))
+
+    def tearDown(self):
+        configuration.set_property(get_incremental_build_directory, '')
+        super(HostRpmBuilderIncrementalBuildIntegrationTest, self).tearDown()
+
+    def test_should_apply_change_set_to_host_state_of_previous_build(self):
+
+        self.build_host('berweb01', revision='2')
+        self.svn('import -q -m add testdata/index.html %s/config/all/files/added_file' % self.repo_url)
+        self.svn('rm -q -m remove %s/config/loctyp/berweb/files/override' % self.repo_url)
+
+        self.build_host('berweb01', revision='4')
+
+        tree_directory = join(self.temporary_directory, 'host-states', 'berweb01', 'tree')
+        self.assert_path_exists(join(tree_directory, 'files', 'added_file'))
+        self.assert_path_exists(join(tree_directory, 'files', 'file_from_ber'))
+        self.assert_file_content(join(tree_directory, 'files', 'override'), 'pro')
+        self.assert_path_exists(join(build_config_viewer_host_directory('berweb01', revision='4'), 'files', 'added_file'))
+
+    def test_should_save_host_state_after_build(self):
+
+        self.build_host('berweb01', revision='2')
+
+        host_state_directory = join(self.temporary_directory, 'host-states', 'berweb01')
+        self.assert_path_exists(join(host_state_directory, 'state.json'))
+        self.assert_path_exists(join(host_state_directory, 'tree', 'files', 'file_from_ber'))
+        self.assert_path_exists(join(host_state_directory, 'filtered', 'files', 'file_from_ber'))
+
+    def build_host(self, hostname, revision):
+        svn_service_queue = self.create_svn_service_queue()
+        host_rpm_builder = HostRpmBuilder(thread_name="Thread-0",
+                                          hostname=hostname,
+                                          revision=revision,
+                                          work_dir=self.temporary_directory,
+                                          svn_service_queue=svn_service_queue)
+        return host_rpm_builder.build()
+
+    def svn(self, arguments):
+        if subprocess.call('svn %s' % arguments, shell=True):
+            raise IntegrationTestException('Could not execute "svn %s".' % arguments)
@@ -79,10 +79,10 @@ class IntegrationTest(unittest.TestCase):
 
         makedirs(self.repository_directory)
 
-    def _given_config_rpm_maker(self, revision='2'):
+    def _given_config_rpm_maker(self, revision='2', first_revision=None):
         svn_service = SvnService(base_url=self.repo_url, path_to_config=get_svn_path_to_config())
 
-        return ConfigRpmMaker(revision, svn_service)
+        return ConfigRpmMaker(revision, svn_service, first_revision)
 
     def write_revision_file_for_hostname(self, hostname, revision):
 
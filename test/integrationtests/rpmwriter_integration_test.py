@@ -0,0 +1,150 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import unittest
+
+from config_rpm_maker.rpmwriter import NotSupportedByRpmWriterException, RpmWriter
+
+TOKEN_VALUES = {'RPM_NAME': 'devweb01',
+                'REVISION': '42',
+                'RPM_PROVIDES': 'all-prov',
+                'RPM_REQUIRES_NON_REPOS': 'all-req >= 1.0',
+                'RPM_REQUIRES_REPOS': 'yadt-spam-repo',
+                'INSTALL_PROTECTION_DEPENDENCY': 'hostname-devweb01',
+                'VARIABLES': 'HOST=devweb01',
+                'OVERLAYING': 'all',
+                'SVNLOG': 'r42 | 100% done'}
+
+
+class RpmWriterIntegrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_directory = tempfile.mkdtemp(prefix=self.__class__.__name__ + "_")
+        self.config_dir = os.path.join(self.tmp_directory, 'yadt-config-devweb01')
+        self.rpm_build_dir = os.path.join(self.tmp_directory, 'rpmbuild')
+        self.spec_file_path = os.path.join(self.config_dir, 'yadt-config-devweb01.spec')
+
+        with open('testdata/svn_repo/config/default.spec') as spec_file:
+            spec = spec_file.read()
+        for token, value in TOKEN_VALUES.items():
+            spec = spec.replace('@@@%s@@@' % token, value)
+
+        self.create_file('yadt-config-devweb01.spec', spec)
+        self.create_file('etc/spam', 'eggs\n')
+        self.create_file('etc/yum.repos.d/spam.repo', '[spam]\n')
+        self.create_file('etc/sudoers.d.%defattr', '0440,root,root')
+        self.create_file('etc/sudoers.d/spam', 'spam ALL=(ALL) NOPASSWD: ALL\n')
+        self.create_file('usr/bin/spam', '#!/bin/bash\necho spam\n')
+        self.create_file('usr/bin/spam.%attr', '0755,root,root')
+        self.create_file('var/link.%symlink', '/etc/spam\n')
+
+        self.tar_path = self.config_dir + '.tar.gz'
+        tar_file = tarfile.open(self.tar_path, 'w:gz')
+        try:
+            tar_file.add(self.config_dir, arcname='yadt-config-devweb01')
+        finally:
+            tar_file.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_directory)
+
+    def create_file(self, path, content):
+        file_path = os.path.join(self.config_dir, path)
+        if not os.path.exists(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+        with open(file_path, 'w') as output_file:
+            output_file.write(content)
+
+    def query(self, rpm_path, *arguments):
+        process = subprocess.Popen(['rpm', '-qp'] + list(arguments) + [rpm_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        self.assertEqual(0, process.returncode, 'Querying "%s" failed: %s' % (rpm_path, stderr))
+        return stdout
+
+    def write_rpms(self):
+        return RpmWriter(self.spec_file_path, self.rpm_build_dir).write(self.config_dir, [self.tar_path])
+
+    def test_should_write_binary_and_source_rpms(self):
+
+        rpm_paths = self.write_rpms()
+
+        self.assertEqual([os.path.join(self.rpm_build_dir, 'RPMS', 'noarch', 'yadt-config-devweb01-21-42.noarch.rpm'),
+                          os.path.join(self.rpm_build_dir, 'RPMS', 'noarch', 'yadt-config-devweb01-repos-21-42.noarch.rpm'),
+                          os.path.join(self.rpm_build_dir, 'SRPMS', 'yadt-config-devweb01-21-42.src.rpm')], rpm_paths)
+
+    def test_should_write_rpm_which_can_be_queried_by_rpm(self):
+
+        rpm_path = self.write_rpms()[0]
+
+        information = self.query(rpm_path, '-i')
+        self.assertTrue('yadt-config-devweb01' in information, information)
+        self.assertTrue('YADT config RPM for devweb01' in information, information)
+        self.assertTrue('r42 | 100% done' in information, information)
+        self.assertEqual('yadt-config-devweb01 21 42 noarch yadt-config-devweb01-21-42.src.rpm',
+                         self.query(rpm_path, '--queryformat', '%{NAME} %{VERSION} %{RELEASE} %{ARCH} %{SOURCERPM}'))
+
+    def test_should_write_requires_and_provides(self):
+
+        rpm_path = self.write_rpms()[0]
+
+        requires = self.query(rpm_path, '--requires').splitlines()
+        self.assertEqual(['/bin/bash',
+                          'all-req >= 1.0',
+                          'hostname-devweb01',
+                          'rpmlib(CompressedFileNames) <= 3.0.4-1',
+                          'rpmlib(PayloadFilesHavePrefix) <= 4.0-1',
+                          'yadt-config-devweb01-repos = 21-42',
+                          'yadt-minion'], sorted(requirement.strip() for requirement in requires))
+        provides = self.query(rpm_path, '--provides').splitlines()
+        self.assertEqual(['all-prov', 'yadt-config-all', 'yadt-config-devweb01 = 21-42'], sorted(provide.strip() for provide in provides))
+
+    def test_should_write_files_with_attributes_of_percent_directives(self):
+
+        rpm_path = self.write_rpms()[0]
+
+        files = self.query(rpm_path, '--queryformat', '[%{FILEMODES:perms} %{FILEUSERNAME} %{FILENAMES} %{FILELINKTOS}\n]')
+        self.assertEqual(['-rw-r--r-- root /etc/spam ',
+                          '-r--r----- root /etc/sudoers.d/spam ',
+                          '-rwxr-xr-x root /usr/bin/spam ',
+                          'lrwxrwxrwx root /var/link /etc/spam'], files.splitlines())
+
+    def test_should_write_yum_repositories_into_repos_subpackage(self):
+
+        rpm_path = self.write_rpms()[1]
+
+        self.assertEqual('/etc/yum.repos.d/spam.repo\n', self.query(rpm_path, '--list'))
+        self.assertEqual(['rpmlib(CompressedFileNames) <= 3.0.4-1',
+                          'rpmlib(PayloadFilesHavePrefix) <= 4.0-1',
+                          'yadt-spam-repo',
+                          'yum'], sorted(requirement.strip() for requirement in self.query(rpm_path, '--requires').splitlines()))
+
+    def test_should_write_source_rpm_containing_spec_file_and_sources(self):
+
+        rpm_path = self.write_rpms()[2]
+
+        self.assertEqual('yadt-config-devweb01.spec\nyadt-config-devweb01.tar.gz\n', self.query(rpm_path, '--list'))
+
+    def test_should_raise_exception_when_spec_file_contains_scriptlets(self):
+
+        with open(self.spec_file_path, 'a') as spec_file:
+            spec_file.write('\n%post\necho spam\n')
+
+        self.assertRaises(NotSupportedByRpmWriterException, RpmWriter, self.spec_file_path, self.rpm_build_dir)
@@ -0,0 +1,47 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from os.path import join
+
+from integration_test_support import IntegrationTest
+
+from config_rpm_maker.configuration.properties import get_svn_path_to_config
+from config_rpm_maker.svnmirror import SvnMirror
+from config_rpm_maker.svnservice import SvnService
+
+
+class SvnMirrorIntegrationTest(IntegrationTest):
+
+    def setUp(self):
+        super(SvnMirrorIntegrationTest, self).setUp()
+        self.svn_mirror = SvnMirror(join(self.temporary_directory, 'svn_mirror'), self.repo_url)
+
+    def test_should_serve_hosts_from_synchronized_mirror(self):
+
+        mirror_url = self.svn_mirror.synchronize(2)
+        service = SvnService(mirror_url, None, None, path_to_config=get_svn_path_to_config())
+
+        self.assertEqual(['berweb01', 'devweb00', 'devweb01', 'tuvweb01'], service.get_hosts(2))
+        self.assertEqual(['typ/web/data/index.html'], service.get_changed_paths(2))
+
+    def test_should_synchronize_all_revisions_of_repository_once(self):
+
+        self.svn_mirror.synchronize(1)
+        self.assertEqual(2, self.svn_mirror.get_youngest_revision())
+
+        self.svn_mirror.synchronize(2)
+
+        self.assertEqual(2, self.svn_mirror.get_youngest_revision())
@@ -28,6 +28,15 @@ class SvnServiceIntegrationTest(IntegrationTest):
 
         self.assertEqual(['typ/web/data/index.html'], service.get_changed_paths(2))
 
+    def test_should_return_changed_paths_of_revision_range(self):
+
+        service = SvnService(self.repo_url, None, None, path_to_config=get_svn_path_to_config())
+
+        changed_paths = service.get_changed_paths(2, 1)
+
+        self.assertTrue('host/berweb01' in changed_paths)
+        self.assertTrue('typ/web/data/index.html' in changed_paths)
+
     def test_should_return_by_change_set_affected_hosts(self):
 
         service = SvnService(self.repo_url, None, None, path_to_config=get_svn_path_to_config())
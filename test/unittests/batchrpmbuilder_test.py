@@ -0,0 +1,180 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from mock import Mock, patch
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.batchrpmbuilder import BatchRpmBuilder, RpmBuildJob, get_package_name
+
+
+def wrote(*rpm_names):
+    return ''.join('Wrote: /rpmbuild/RPMS/noarch/%s-1-1.noarch.rpm\n' % rpm_name for rpm_name in rpm_names)
+
+
+class RpmBuildJobTests(UnitTests):
+
+    def test_should_match_rpms_of_job(self):
+
+        job = RpmBuildJob('devweb01', 'yadt-config-devweb01', '/work/devweb01.tar.gz')
+
+        self.assertTrue(job.is_rpm_of_job('/rpmbuild/RPMS/noarch/yadt-config-devweb01-1-1.noarch.rpm'))
+        self.assertTrue(job.is_rpm_of_job('/rpmbuild/RPMS/noarch/yadt-config-devweb01-repos-1-1.noarch.rpm'))
+        self.assertTrue(job.is_rpm_of_job('/rpmbuild/SRPMS/yadt-config-devweb01-1-1.src.rpm'))
+        self.assertFalse(job.is_rpm_of_job('/rpmbuild/RPMS/noarch/yadt-config-devweb012-1-1.noarch.rpm'))
+
+    def test_should_not_match_rpms_of_job_whose_name_starts_with_name_of_job(self):
+
+        job = RpmBuildJob('foo', 'yadt-config-foo', '/work/foo.tar.gz')
+
+        self.assertFalse(job.is_rpm_of_job('/rpmbuild/RPMS/noarch/yadt-config-foo-bar-1-1.noarch.rpm'))
+        self.assertFalse(job.is_rpm_of_job('/rpmbuild/RPMS/noarch/yadt-config-foo-bar-repos-1-1.noarch.rpm'))
+        self.assertFalse(job.is_rpm_of_job('/rpmbuild/SRPMS/yadt-config-foo-bar-1-1.src.rpm'))
+
+
+class GetPackageNameTests(UnitTests):
+
+    def test_should_return_package_name_of_rpm(self):
+
+        self.assertEqual('yadt-config-foo-bar', get_package_name('/rpmbuild/RPMS/noarch/yadt-config-foo-bar-21-1234.noarch.rpm'))
+
+    def test_should_return_package_name_of_source_rpm(self):
+
+        self.assertEqual('yadt-config-foo-bar', get_package_name('/rpmbuild/SRPMS/yadt-config-foo-bar-21-1234.src.rpm'))
+
+
+@patch('config_rpm_maker.batchrpmbuilder.is_no_clean_up_enabled')
+@patch('config_rpm_maker.batchrpmbuilder.Popen')
+class BatchRpmBuilderTests(UnitTests):
+
+    def setUp(self):
+        self.mock_notify_that_host_failed = Mock()
+        self.batch_rpm_builder = BatchRpmBuilder('/work', '/rpmbuild', 10, self.mock_notify_that_host_failed)
+
+    def add_jobs(self, *hostnames):
+        for hostname in hostnames:
+            self.batch_rpm_builder.add(RpmBuildJob(hostname, 'yadt-config-' + hostname, '/work/%s.tar.gz' % hostname))
+
+    def set_results(self, mock_popen, *results):
+        processes = []
+        for returncode, stdout in results:
+            mock_process = Mock()
+            mock_process.returncode = returncode
+            mock_process.communicate.return_value = (stdout, 'stderr')
+            processes.append(mock_process)
+        mock_popen.side_effect = processes
+
+    def test_should_build_all_archives_in_one_rpmbuild_invocation(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        mock_is_no_clean_up_enabled.return_value = False
+        self.add_jobs('devweb01', 'berweb01')
+        self.set_results(mock_popen, (0, wrote('yadt-config-devweb01', 'yadt-config-berweb01')))
+
+        rpms = self.batch_rpm_builder.build(4)
+
+        self.assertEqual(['/rpmbuild/RPMS/noarch/yadt-config-devweb01-1-1.noarch.rpm',
+                          '/rpmbuild/RPMS/noarch/yadt-config-berweb01-1-1.noarch.rpm'], rpms)
+        self.assertEqual("rpmbuild --clean --define '_topdir /rpmbuild' -ta /work/devweb01.tar.gz /work/berweb01.tar.gz",
+                         mock_popen.call_args[0][0])
+        self.assertEqual('/work', mock_popen.call_args[1]['env']['HOME'])
+        self.assertEqual(1, self.batch_rpm_builder.count_of_rpmbuild_invocations)
+
+    def test_should_split_jobs_into_batches_of_configured_size(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        self.batch_rpm_builder.batch_size = 2
+        self.add_jobs('devweb01', 'berweb01', 'tuvweb01')
+        self.set_results(mock_popen, (0, wrote('yadt-config-devweb01', 'yadt-config-berweb01')), (0, wrote('yadt-config-tuvweb01')))
+
+        rpms = self.batch_rpm_builder.build(1)
+
+        self.assertEqual(3, len(rpms))
+        self.assertEqual(2, self.batch_rpm_builder.count_of_rpmbuild_invocations)
+
+    def test_should_build_all_batches_using_several_threads(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        self.batch_rpm_builder.batch_size = 1
+        self.add_jobs('devweb01', 'berweb01', 'tuvweb01')
+
+        results_by_tar_path = {}
+        self.batch_rpm_builder._execute_rpmbuild = lambda tar_paths: results_by_tar_path.setdefault(tar_paths[0], (0, wrote('yadt-config-' + tar_paths[0][len('/work/'):-len('.tar.gz')]), ''))
+
+        rpms = self.batch_rpm_builder.build(3)
+
+        self.assertEqual(3, len(rpms))
+        self.assertEqual(['/work/berweb01.tar.gz', '/work/devweb01.tar.gz', '/work/tuvweb01.tar.gz'], sorted(results_by_tar_path.keys()))
+
+    def test_should_build_archive_shared_by_several_hosts_only_once(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        self.batch_rpm_builder.add(RpmBuildJob('devweb01', 'yadt-config-all', '/work/all.tar.gz'))
+        self.batch_rpm_builder.add(RpmBuildJob('devweb02', 'yadt-config-all', '/work/all.tar.gz'))
+        self.set_results(mock_popen, (0, wrote('yadt-config-all')))
+
+        rpms = self.batch_rpm_builder.build(1)
+
+        self.assertEqual(['/rpmbuild/RPMS/noarch/yadt-config-all-1-1.noarch.rpm'], rpms)
+        self.assertTrue(mock_popen.call_args[0][0].endswith(' -ta /work/all.tar.gz'))
+
+    def test_should_build_first_archive_without_rpms_alone_and_continue_with_remaining_archives(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        self.add_jobs('devweb01', 'berweb01', 'tuvweb01')
+        self.set_results(mock_popen,
+                         (1, wrote('yadt-config-devweb01')),
+                         (1, ''),
+                         (0, wrote('yadt-config-tuvweb01')))
+
+        rpms = self.batch_rpm_builder.build(1)
+
+        self.assertEqual(['/rpmbuild/RPMS/noarch/yadt-config-devweb01-1-1.noarch.rpm',
+                          '/rpmbuild/RPMS/noarch/yadt-config-tuvweb01-1-1.noarch.rpm'], rpms)
+        self.assertTrue(mock_popen.call_args_list[1][0][0].endswith(' -ta /work/berweb01.tar.gz'))
+        self.assertTrue(mock_popen.call_args_list[2][0][0].endswith(' -ta /work/tuvweb01.tar.gz'))
+        self.assertEqual(3, mock_popen.call_count)
+        self.mock_notify_that_host_failed.assert_called_with('berweb01', 'Could not build RPM for host "berweb01": stdout="", stderr="stderr"')
+        self.assertEqual(['devweb01', 'tuvweb01'], self.batch_rpm_builder.built_hostnames)
+
+    def test_should_isolate_failing_archive_when_name_of_previous_archive_is_prefix_of_its_name(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        self.add_jobs('foo', 'foo-bar', 'foo-baz')
+        self.set_results(mock_popen,
+                         (1, wrote('yadt-config-foo', 'yadt-config-foo-bar')),
+                         (1, ''))
+
+        rpms = self.batch_rpm_builder.build(1)
+
+        self.assertEqual(['/rpmbuild/RPMS/noarch/yadt-config-foo-1-1.noarch.rpm',
+                          '/rpmbuild/RPMS/noarch/yadt-config-foo-bar-1-1.noarch.rpm'], rpms)
+        self.assertTrue(mock_popen.call_args_list[1][0][0].endswith(' -ta /work/foo-baz.tar.gz'))
+        self.assertEqual(2, mock_popen.call_count)
+        self.mock_notify_that_host_failed.assert_called_with('foo-baz', 'Could not build RPM for host "foo-baz": stdout="", stderr="stderr"')
+
+    def test_should_notify_every_host_of_archive_which_could_not_be_built(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        self.batch_rpm_builder.add(RpmBuildJob('devweb01', 'yadt-config-all', '/work/all.tar.gz'))
+        self.batch_rpm_builder.add(RpmBuildJob('devweb02', 'yadt-config-all', '/work/all.tar.gz'))
+        self.add_jobs('berweb01')
+        self.set_results(mock_popen, (1, ''), (1, 'stdout'), (0, wrote('yadt-config-berweb01')))
+
+        rpms = self.batch_rpm_builder.build(1)
+
+        self.assertEqual(['/rpmbuild/RPMS/noarch/yadt-config-berweb01-1-1.noarch.rpm'], rpms)
+        self.mock_notify_that_host_failed.assert_any_call('devweb01', 'Could not build RPM for host "devweb01": stdout="stdout", stderr="stderr"')
+        self.mock_notify_that_host_failed.assert_any_call('devweb02', 'Could not build RPM for host "devweb02": stdout="stdout", stderr="stderr"')
+        self.assertEqual(2, self.mock_notify_that_host_failed.call_count)
+
+    def test_should_return_empty_list_when_no_jobs_have_been_added(self, mock_popen, mock_is_no_clean_up_enabled):
+
+        self.assertEqual([], self.batch_rpm_builder.build(4))
+        self.assert_mock_never_called(mock_popen)
@@ -35,7 +35,7 @@ class CleanerTests(UnitTests):
 
         clean_up_deleted_hosts_data(mock_svn_service, '42')
 
-        mock_svn_service.get_deleted_paths.assert_called_with('42')
+        mock_svn_service.get_deleted_paths.assert_called_with('42', None)
 
     @patch('config_rpm_maker.cleaner.exists')
     @patch('config_rpm_maker.cleaner.rmtree')
@@ -109,3 +109,30 @@ class CleanerTests(UnitTests):
 
         mock_exists.assert_any_call('target/tmp/configviewer/hosts/devweb01')
         mock_rmtree.assert_any_call('target/tmp/configviewer/hosts/devweb01')
+
+    @patch('config_rpm_maker.cleaner.exists')
+    @patch('config_rpm_maker.cleaner.rmtree')
+    def test_should_not_delete_config_viewer_host_directory_when_host_exists_at_end_of_revision_range(self, mock_rmtree, mock_exists):
+
+        mock_svn_service = Mock(SvnService)
+        mock_svn_service.get_deleted_paths.return_value = ['host/devweb01', 'host/berweb01']
+        mock_svn_service.get_hosts.return_value = ['devweb01']
+
+        clean_up_deleted_hosts_data(mock_svn_service, '42', '40')
+
+        mock_svn_service.get_deleted_paths.assert_called_with('42', '40')
+        mock_rmtree.assert_called_once_with('target/tmp/configviewer/hosts/berweb01')
+
+    @patch('config_rpm_maker.cleaner.delete_published_host_directory')
+    @patch('config_rpm_maker.cleaner.islink')
+    @patch('config_rpm_maker.cleaner.rmtree')
+    def test_should_delete_published_host_directory_when_host_directory_is_a_symbolic_link(self, mock_rmtree, mock_islink, mock_delete_published_host_directory):
+
+        mock_islink.return_value = True
+        mock_svn_service = Mock(SvnService)
+        mock_svn_service.get_deleted_paths.return_value = ['host/devweb01']
+
+        clean_up_deleted_hosts_data(mock_svn_service, '42')
+
+        mock_delete_published_host_directory.assert_called_with('target/tmp/configviewer/hosts/devweb01')
+        self.assert_mock_never_called(mock_rmtree)
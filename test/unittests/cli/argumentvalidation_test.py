@@ -17,7 +17,7 @@
 from unittest import TestCase
 from mock import patch
 
-from config_rpm_maker.cli.argumentvalidation import ensure_valid_revision, ensure_valid_repository_url
+from config_rpm_maker.cli.argumentvalidation import ensure_valid_revision, ensure_valid_repository_url, split_revision_range
 
 
 @patch('config_rpm_maker.cli.argumentvalidation.exit_program')
@@ -41,6 +41,36 @@ class EnsureValidRevisionTests(TestCase):
 
         self.assertEqual('123', actual_revision)
 
+    def test_should_return_revision_range_if_first_revision_is_not_greater_than_last_revision(self, mock_exit_program):
+
+        actual_revision = ensure_valid_revision('120:123')
+
+        self.assertEqual('120:123', actual_revision)
+        self.assertEqual(None, mock_exit_program.call_args)
+
+    def test_should_exit_if_first_revision_of_range_is_greater_than_last_revision(self, mock_exit_program):
+
+        ensure_valid_revision('123:120')
+
+        mock_exit_program.assert_called_with('Given revision range "123:120" is invalid.', return_code=2)
+
+    def test_should_exit_if_revision_range_contains_a_non_integer_string(self, mock_exit_program):
+
+        ensure_valid_revision('120:abc')
+
+        mock_exit_program.assert_called_with('Given revision range "120:abc" is invalid.', return_code=2)
+
+
+class SplitRevisionRangeTests(TestCase):
+
+    def test_should_return_first_and_last_revision_of_range(self):
+
+        self.assertEqual(('120', '123'), split_revision_range('120:123'))
+
+    def test_should_return_none_as_first_revision_if_no_range_is_given(self):
+
+        self.assertEqual((None, '123'), split_revision_range('123'))
+
 
 @patch('config_rpm_maker.cli.argumentvalidation.exit_program')
 class EnsureValidRepositoryUrlTests(TestCase):
@@ -170,7 +170,7 @@ class BuildingConfigurationRpmsAndCleanHostDirectoriesTests(TestCase):
 
         building_configuration_rpms_and_clean_host_directories('file:///path_to/testdata/repository', '1980')
 
-        mock_config_rpm_maker_class.assert_called_with(svn_service=mock_svn_service, revision='1980')
+        mock_config_rpm_maker_class.assert_called_with(svn_service=mock_svn_service, revision='1980', first_revision=None)
 
     @patch('config_rpm_maker.clean_up_deleted_hosts_data')
     @patch('config_rpm_maker.get_svn_path_to_config')
@@ -186,7 +186,38 @@ class BuildingConfigurationRpmsAndCleanHostDirectoriesTests(TestCase):
 
         building_configuration_rpms_and_clean_host_directories('file:///path_to/testdata/repository', '1980')
 
-        mock_clean_up_deleted_hosts_data.assert_called_with(mock_svn_service, '1980')
+        mock_clean_up_deleted_hosts_data.assert_called_with(mock_svn_service, '1980', None)
+
+    @patch('config_rpm_maker.clean_up_deleted_hosts_data')
+    @patch('config_rpm_maker.get_svn_path_to_config')
+    @patch('config_rpm_maker.SvnService')
+    @patch('config_rpm_maker.ConfigRpmMaker')
+    def test_should_build_last_revision_of_revision_range(self, mock_config_rpm_maker_class, mock_svn_service_constructor, mock_config, mock_clean_up_deleted_hosts_data):
+
+        mock_config.return_value = '/path-to-configuration'
+        mock_svn_service = mock_svn_service_constructor.return_value
+
+        building_configuration_rpms_and_clean_host_directories('file:///path_to/testdata/repository', '1975:1980')
+
+        mock_svn_service.log_change_set_meta_information.assert_called_with('1980', '1975')
+        mock_config_rpm_maker_class.assert_called_with(svn_service=mock_svn_service, revision='1980', first_revision='1975')
+        mock_clean_up_deleted_hosts_data.assert_called_with(mock_svn_service, '1980', '1975')
+
+    @patch('config_rpm_maker.clean_up_deleted_hosts_data')
+    @patch('config_rpm_maker.get_svn_mirror_directory')
+    @patch('config_rpm_maker.SvnMirror')
+    @patch('config_rpm_maker.SvnService')
+    @patch('config_rpm_maker.ConfigRpmMaker')
+    def test_should_build_from_synchronized_svn_mirror_when_configured(self, mock_config_rpm_maker_class, mock_svn_service_constructor, mock_svn_mirror_class, mock_config, mock_clean_up_deleted_hosts_data):
+
+        mock_config.return_value = 'target/tmp/mirror'
+        mock_svn_mirror_class.return_value.synchronize.return_value = 'file:///path_to/mirror'
+
+        building_configuration_rpms_and_clean_host_directories('svn://server/repository', '1980')
+
+        mock_svn_mirror_class.assert_called_with('target/tmp/mirror', 'svn://server/repository')
+        mock_svn_mirror_class.return_value.synchronize.assert_called_with('1980')
+        self.assertEqual('file:///path_to/mirror', mock_svn_service_constructor.call_args[1]['base_url'])
 
 
 class InitializeLoggingToConsoleTests(TestCase):
@@ -16,10 +16,15 @@
 
 from mock import Mock, call, patch
 
+from os import getpid
 from Queue import Queue
 
 from unittest_support import UnitTests
-from config_rpm_maker.configrpmmaker import ConfigRpmMaker
+from config_rpm_maker.batchrpmbuilder import BatchRpmBuilder
+from config_rpm_maker.configrpmmaker import ConfigRpmMaker, ConfigurationException, _build_host_in_process, _build_process_context
+from config_rpm_maker.configviewerpublisher import ConfigViewerPublisher
+from config_rpm_maker.exceptions import BaseConfigRpmMakerException
+from config_rpm_maker.hostscheduler import HostScheduler
 
 
 class ConstructorTests(UnitTests):
@@ -45,198 +50,67 @@ class ConstructorTests(UnitTests):
 
         self.assertEqual(None, self.config_rpm_maker.work_dir)
 
-    def test_should_initialize_host_queue(self):
+    def test_should_initialize_host_scheduler(self):
 
-        self.assert_is_instance_of(self.config_rpm_maker.host_queue, Queue)
+        self.assert_is_instance_of(self.config_rpm_maker.host_scheduler, HostScheduler)
+
+    def test_should_initialize_config_viewer_publisher(self):
+
+        self.assertEqual(None, self.config_rpm_maker.config_viewer_publisher)
 
     def test_should_initialize_failed_host_queue(self):
 
         self.assert_is_instance_of(self.config_rpm_maker.failed_host_queue, Queue)
 
 
-class MoveConfigviewerDirsToFinalDestinationTest(UnitTests):
+@patch('config_rpm_maker.configrpmmaker.is_rpm_upload_while_building_enabled')
+@patch('config_rpm_maker.configrpmmaker.is_config_viewer_publish_while_building_enabled')
+class BuildUploadAndPublishHostsTests(UnitTests):
 
     def setUp(self):
         mock_config_rpm_maker = Mock(ConfigRpmMaker)
-        mock_config_rpm_maker.revision = '54'
+        mock_config_rpm_maker.logger = Mock()
+        mock_config_rpm_maker.config_viewer_publisher = None
+        mock_config_rpm_maker._build_hosts.return_value = ['rpm1', 'rpm2']
+        self.mock_config_viewer_publisher = Mock(ConfigViewerPublisher)
+        self.mock_config_viewer_publisher.published_hosts = []
+        self.mock_config_viewer_publisher.skipped_hosts = []
+        mock_config_rpm_maker._create_config_viewer_publisher.return_value = self.mock_config_viewer_publisher
         self.mock_config_rpm_maker = mock_config_rpm_maker
 
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    def test_should_not_do_anything_if_no_hosts_are_given(self, mock_move, mock_rmtree):
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, [])
-
-        self.assert_mock_never_called(mock_move)
-        self.assert_mock_never_called(mock_rmtree)
-
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_move_directory_to_destination(self, mock_exists, mock_move, mock_rmtree):
-
-        mock_exists.return_value = False
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01'])
-
-        mock_move.assert_called_with('target/tmp/configviewer/hosts/devweb01.new-revision-54', 'target/tmp/configviewer/hosts/devweb01')
-
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_not_remove_directory_if_it_does_not_already_exist(self, mock_exists, mock_move, mock_rmtree):
-
-        mock_exists.return_value = False
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01'])
+    def test_should_publish_all_hosts_after_uploading_rpms(self, mock_publish_while_building, mock_upload_while_building):
 
-        self.assert_mock_never_called(mock_rmtree)
-
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    @patch('config_rpm_maker.configrpmmaker.build_config_viewer_host_directory')
-    def test_should_remove_directory_if_it_does_already_exist(self, mock_build_config_viewer_host_directory, mock_exists, mock_move, mock_rmtree):
-
-        mock_build_config_viewer_host_directory.return_value = 'target/tmp/configviewer/hosts/devweb01'
-        self.mock_config_rpm_maker._read_integer_from_file.return_value = 53
-
-        mock_exists.return_value = True
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01'])
-
-        mock_rmtree.assert_called_with('target/tmp/configviewer/hosts/devweb01')
+        mock_publish_while_building.return_value = False
+        mock_upload_while_building.return_value = False
 
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_not_remove_directory_if_the_revision_of_the_file_in_the_directory_is_higher(self, mock_exists, mock_move, mock_rmtree):
+        rpms = ConfigRpmMaker._build_upload_and_publish_hosts(self.mock_config_rpm_maker, ['devweb01', 'tuvweb01'])
 
-        self.mock_config_rpm_maker._read_integer_from_file.return_value = 99
+        self.assertEqual(['rpm1', 'rpm2'], rpms)
+        self.mock_config_rpm_maker._upload_rpms.assert_called_with(['rpm1', 'rpm2'])
+        self.assertEqual([call('devweb01'), call('tuvweb01')], self.mock_config_viewer_publisher.publish.call_args_list)
+        self.mock_config_rpm_maker._finish_config_viewer_publication.assert_called_with(self.mock_config_viewer_publisher)
 
-        mock_exists.return_value = True
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01'])
+    def test_should_hand_over_publisher_to_build_when_publishing_while_building(self, mock_publish_while_building, mock_upload_while_building):
 
-        self.assertTrue(call('target/tmp/configviewer/hosts/devweb01') not in mock_rmtree.call_args_list)
+        mock_publish_while_building.return_value = True
+        mock_upload_while_building.return_value = False
 
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_remove_temporary_directory_if_the_revision_of_the_file_in_the_directory_is_higher(self, mock_exists, mock_move, mock_rmtree):
+        ConfigRpmMaker._build_upload_and_publish_hosts(self.mock_config_rpm_maker, ['devweb01', 'tuvweb01'])
 
-        self.mock_config_rpm_maker._read_integer_from_file.return_value = 99
-
-        mock_exists.return_value = True
+        self.assertEqual(self.mock_config_viewer_publisher, self.mock_config_rpm_maker.config_viewer_publisher)
+        self.assert_mock_never_called(self.mock_config_viewer_publisher.publish)
+        self.mock_config_rpm_maker._finish_config_viewer_publication.assert_called_with(self.mock_config_viewer_publisher)
 
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01'])
+    def test_should_finish_publisher_and_raise_exception_when_build_failed(self, mock_publish_while_building, mock_upload_while_building):
 
-        mock_rmtree.assert_called_with('target/tmp/configviewer/hosts/devweb01.new-revision-54')
-
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_move_directories_of_hosts_to_destination(self, mock_exists, mock_move, mock_rmtree):
-
-        mock_exists.return_value = False
+        mock_publish_while_building.return_value = False
+        mock_upload_while_building.return_value = False
+        self.mock_config_rpm_maker._build_hosts.side_effect = BaseConfigRpmMakerException('build failed')
 
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01', 'tuvweb01'])
+        self.assertRaises(BaseConfigRpmMakerException, ConfigRpmMaker._build_upload_and_publish_hosts, self.mock_config_rpm_maker, ['devweb01'])
 
-        mock_move.assert_any_call('target/tmp/configviewer/hosts/devweb01.new-revision-54', 'target/tmp/configviewer/hosts/devweb01')
-        mock_move.assert_any_call('target/tmp/configviewer/hosts/tuvweb01.new-revision-54', 'target/tmp/configviewer/hosts/tuvweb01')
-
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_remove_directories_of_hosts_if_they_already_exist(self, mock_exists, mock_move, mock_rmtree):
-
-        mock_exists.return_value = True
-        self.mock_config_rpm_maker._read_integer_from_file.return_value = 42
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01', 'tuvweb01'])
-
-        mock_rmtree.assert_any_call('target/tmp/configviewer/hosts/devweb01')
-        mock_rmtree.assert_any_call('target/tmp/configviewer/hosts/tuvweb01')
-
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_remove_directories_of_hosts_if_they_already_exist_and_should_override_those_with_a_lower_revision(self, mock_exists, mock_move, mock_rmtree):
-
-        def read_integer_from_file_side_effect(path):
-            if path.endswith('devweb01.rev'):
-                return 42
-            elif path.endswith('tuvweb01.rev'):
-                raise Exception('This should not happen since the exists side effect returns False')
-            elif path.endswith('berweb01.rev'):
-                return 42
-            else:
-                raise Exception('Unknown path "%s"' % path)
-
-        self.mock_config_rpm_maker._read_integer_from_file.side_effect = read_integer_from_file_side_effect
-
-        def exists_side_effect(path):
-            if path.endswith('devweb01'):
-                return True
-            elif path.endswith('tuvweb01'):
-                return False
-            elif path.endswith('berweb01'):
-                return True
-            else:
-                raise Exception("Unknown path %s" % path)
-
-        mock_exists.side_effect = exists_side_effect
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01', 'tuvweb01', 'berweb01'])
-
-        mock_rmtree.assert_any_call('target/tmp/configviewer/hosts/devweb01')
-        mock_move.assert_any_call('target/tmp/configviewer/hosts/devweb01.new-revision-54', 'target/tmp/configviewer/hosts/devweb01')
-
-        self.assertTrue(call('target/tmp/configviewer/hosts/tuvweb01') not in mock_rmtree.call_args_list)
-        mock_move.assert_any_call('target/tmp/configviewer/hosts/tuvweb01.new-revision-54', 'target/tmp/configviewer/hosts/tuvweb01')
-
-        mock_rmtree.assert_any_call('target/tmp/configviewer/hosts/berweb01')
-        mock_move.assert_any_call('target/tmp/configviewer/hosts/berweb01.new-revision-54', 'target/tmp/configviewer/hosts/berweb01')
-
-    @patch('config_rpm_maker.configrpmmaker.rmtree')
-    @patch('config_rpm_maker.configrpmmaker.move')
-    @patch('config_rpm_maker.configrpmmaker.exists')
-    def test_should_remove_directories_of_hosts_if_they_already_exist_and_should_leave_them_if_they_have_a_higher_revision(self, mock_exists, mock_move, mock_rmtree):
-
-        def read_integer_from_file_side_effect(path):
-            if path.endswith('devweb01.rev'):
-                return 99
-            elif path.endswith('tuvweb01.rev'):
-                raise Exception('This should not happen since the exists side effect returns False')
-            elif path.endswith('berweb01.rev'):
-                return 42
-            else:
-                raise Exception("Unknown path %s" % path)
-
-        self.mock_config_rpm_maker._read_integer_from_file.side_effect = read_integer_from_file_side_effect
-
-        def exists_side_effect(path):
-            if path.endswith('devweb01'):
-                return True
-            elif path.endswith('tuvweb01'):
-                return False
-            elif path.endswith('berweb01'):
-                return True
-            else:
-                raise Exception("Unknown path %s" % path)
-
-        mock_exists.side_effect = exists_side_effect
-
-        ConfigRpmMaker._move_configviewer_dirs_to_final_destination(self.mock_config_rpm_maker, ['devweb01', 'tuvweb01', 'berweb01'])
-
-        mock_rmtree.assert_any_call('target/tmp/configviewer/hosts/devweb01.new-revision-54')
-        self.assertTrue(call('target/tmp/configviewer/hosts/devweb01.new-revision-54', 'target/tmp/configviewer/hosts/devweb01') not in mock_move.call_args_list)
-
-        self.assertTrue(call('target/tmp/configviewer/hosts/tuvweb01') not in mock_rmtree.call_args_list)
-        mock_move.assert_any_call('target/tmp/configviewer/hosts/tuvweb01.new-revision-54', 'target/tmp/configviewer/hosts/tuvweb01')
-
-        mock_rmtree.assert_any_call('target/tmp/configviewer/hosts/berweb01')
-        mock_move.assert_any_call('target/tmp/configviewer/hosts/berweb01.new-revision-54', 'target/tmp/configviewer/hosts/berweb01')
+        self.assert_mock_never_called(self.mock_config_viewer_publisher.publish)
+        self.mock_config_viewer_publisher.finish.assert_called_with()
 
 
 @patch('config_rpm_maker.configrpmmaker.exists')
@@ -441,21 +315,58 @@ class CleanUpWorkingDirectoryTests(UnitTests):
         mock_remove.assert_called_with('/path/to/error.log')
 
 
+@patch('config_rpm_maker.configrpmmaker.publish_rpm_manifests')
+@patch('config_rpm_maker.configrpmmaker.is_config_viewer_only_enabled')
+@patch('config_rpm_maker.configrpmmaker.get_rpm_manifest_directory')
+class PublishRpmManifestsTests(UnitTests):
+
+    def setUp(self):
+        self.mock_config_rpm_maker = Mock(ConfigRpmMaker)
+        self.mock_config_rpm_maker.work_dir = '/work'
+
+    def test_should_publish_rpm_manifests_of_hosts(self, mock_get_rpm_manifest_directory, mock_is_config_viewer_only_enabled, mock_publish_rpm_manifests):
+
+        mock_get_rpm_manifest_directory.return_value = '/manifests'
+        mock_is_config_viewer_only_enabled.return_value = False
+        mock_publish_rpm_manifests.return_value = ['berweb01']
+
+        ConfigRpmMaker._publish_rpm_manifests(self.mock_config_rpm_maker, ['devweb01', 'berweb01'])
+
+        mock_publish_rpm_manifests.assert_called_with('/work', '/manifests', ['devweb01', 'berweb01'])
+
+    def test_should_not_publish_rpm_manifests_when_no_directory_is_configured(self, mock_get_rpm_manifest_directory, mock_is_config_viewer_only_enabled, mock_publish_rpm_manifests):
+
+        mock_get_rpm_manifest_directory.return_value = ''
+        mock_is_config_viewer_only_enabled.return_value = False
+
+        ConfigRpmMaker._publish_rpm_manifests(self.mock_config_rpm_maker, ['devweb01'])
+
+        self.assert_mock_never_called(mock_publish_rpm_manifests)
+
+    def test_should_not_publish_rpm_manifests_when_only_building_config_viewer(self, mock_get_rpm_manifest_directory, mock_is_config_viewer_only_enabled, mock_publish_rpm_manifests):
+
+        mock_get_rpm_manifest_directory.return_value = '/manifests'
+        mock_is_config_viewer_only_enabled.return_value = True
+
+        ConfigRpmMaker._publish_rpm_manifests(self.mock_config_rpm_maker, ['devweb01'])
+
+        self.assert_mock_never_called(mock_publish_rpm_manifests)
+
+
 class NotifyThatHostBuildFailedTest(UnitTests):
 
     def test_should_add_fail_information_to_failed_host_queue(self):
 
         mock_config_rpm_maker = Mock(ConfigRpmMaker)
         mock_config_rpm_maker.failed_host_queue = Mock()
-        mock_host_queue = Mock()
-        mock_config_rpm_maker.host_queue = mock_host_queue
+        mock_config_rpm_maker.host_scheduler = Mock(HostScheduler)
 
         ConfigRpmMaker._notify_that_host_failed(mock_config_rpm_maker, 'devabc123', 'Stacktrace')
 
         mock_config_rpm_maker.failed_host_queue.put.assert_called_with(('devabc123', 'Stacktrace'))
 
     @patch('config_rpm_maker.configrpmmaker.get_max_failed_hosts')
-    def test_should_not_clear_hosts_queue_when_failed_hosts_under_maximum(self, mock_config):
+    def test_should_not_cancel_hosts_when_failed_hosts_under_maximum(self, mock_config):
 
         mock_config.return_value = 100
         mock_config_rpm_maker = Mock(ConfigRpmMaker)
@@ -464,15 +375,15 @@ class NotifyThatHostBuildFailedTest(UnitTests):
         fake_queue.put(('hostname2', 'stacktrace2'))
         fake_queue.put(('hostname3', 'stacktrace3'))
         mock_config_rpm_maker.failed_host_queue = fake_queue
-        mock_config_rpm_maker.host_queue = Mock()
+        mock_config_rpm_maker.host_scheduler = Mock(HostScheduler)
 
         ConfigRpmMaker._notify_that_host_failed(mock_config_rpm_maker, 'devabc123', 'Stacktrace')
 
-        self.assert_mock_never_called(mock_config_rpm_maker.host_queue.queue.clear)
+        self.assert_mock_never_called(mock_config_rpm_maker.host_scheduler.cancel)
         mock_config.assert_called_with()
 
     @patch('config_rpm_maker.configrpmmaker.get_max_failed_hosts')
-    def test_should_clear_hosts_queue_when_more_than_maximum_hosts_maximum_of_failed_hosts(self, mock_config):
+    def test_should_cancel_hosts_when_more_than_maximum_hosts_maximum_of_failed_hosts(self, mock_config):
 
         mock_config.return_value = 3
         mock_config_rpm_maker = Mock(ConfigRpmMaker)
@@ -481,15 +392,15 @@ class NotifyThatHostBuildFailedTest(UnitTests):
         fake_queue.put(('hostname2', 'stacktrace2'))
         fake_queue.put(('hostname3', 'stacktrace3'))
         mock_config_rpm_maker.failed_host_queue = fake_queue
-        mock_config_rpm_maker.host_queue = Mock()
+        mock_config_rpm_maker.host_scheduler = Mock(HostScheduler)
 
         ConfigRpmMaker._notify_that_host_failed(mock_config_rpm_maker, 'devabc123', 'Stacktrace')
 
-        mock_config_rpm_maker.host_queue.queue.clear.assert_called_with()
+        mock_config_rpm_maker.host_scheduler.cancel.assert_called_with()
         mock_config.assert_called_with()
 
     @patch('config_rpm_maker.configrpmmaker.get_max_failed_hosts')
-    def test_should_clear_hosts_queue_when_maximum_of_failed_hosts_reached(self, mock_config):
+    def test_should_cancel_hosts_when_maximum_of_failed_hosts_reached(self, mock_config):
 
         mock_config.return_value = 3
         mock_config_rpm_maker = Mock(ConfigRpmMaker)
@@ -497,9 +408,409 @@ class NotifyThatHostBuildFailedTest(UnitTests):
         fake_queue.put(('hostname1', 'stacktrace1'))
         fake_queue.put(('hostname2', 'stacktrace2'))
         mock_config_rpm_maker.failed_host_queue = fake_queue
-        mock_config_rpm_maker.host_queue = Mock()
+        mock_config_rpm_maker.host_scheduler = Mock(HostScheduler)
 
         ConfigRpmMaker._notify_that_host_failed(mock_config_rpm_maker, 'devabc123', 'Stacktrace')
 
-        mock_config_rpm_maker.host_queue.queue.clear.assert_called_with()
+        mock_config_rpm_maker.host_scheduler.cancel.assert_called_with()
         mock_config.assert_called_with()
+
+
+class GetSharedSvnPathsTests(UnitTests):
+
+    def test_should_return_svn_paths_which_are_used_by_more_than_one_host(self):
+
+        mock_config_rpm_maker = Mock(ConfigRpmMaker)
+
+        actual_svn_paths = ConfigRpmMaker._get_shared_svn_paths(mock_config_rpm_maker, ['berweb01', 'berweb02', 'devweb01'])
+
+        self.assertEqual(['all', 'loc/ber', 'loc/pro', 'loctyp/berweb', 'loctyp/proweb', 'typ/web'], sorted(actual_svn_paths))
+
+    def test_should_not_return_host_svn_paths(self):
+
+        mock_config_rpm_maker = Mock(ConfigRpmMaker)
+
+        actual_svn_paths = ConfigRpmMaker._get_shared_svn_paths(mock_config_rpm_maker, ['berweb01', 'devweb01'])
+
+        self.assertFalse('host/berweb01' in actual_svn_paths)
+        self.assertFalse('host/devweb01' in actual_svn_paths)
+
+
+def create_async_result(result):
+    mock_async_result = Mock()
+    mock_async_result.ready.return_value = True
+    mock_async_result.get.return_value = result
+    return mock_async_result
+
+
+@patch('config_rpm_maker.configrpmmaker.SvnServicePool')
+@patch('config_rpm_maker.configrpmmaker.get_build_mode')
+class BuildHostsTests(UnitTests):
+
+    def setUp(self):
+        self.mock_config_rpm_maker = Mock(ConfigRpmMaker)
+        self.mock_config_rpm_maker.svn_service = Mock()
+        self.mock_config_rpm_maker.failed_host_queue = Queue()
+        self.mock_config_rpm_maker._get_thread_count.return_value = 2
+        self.mock_config_rpm_maker._consume_queue.side_effect = lambda queue: list(queue.queue)
+        self.mock_batch_rpm_builder = Mock(BatchRpmBuilder)
+        self.mock_batch_rpm_builder.build.return_value = ['devweb01.rpm']
+        self.mock_batch_rpm_builder.built_hostnames = ['devweb01']
+        self.mock_config_rpm_maker._create_batch_rpm_builder.return_value = self.mock_batch_rpm_builder
+
+    def test_should_publish_config_viewer_data_of_hosts_built_in_a_batch_after_building_the_batch(self, mock_get_build_mode, mock_svn_service_pool_class):
+
+        mock_get_build_mode.return_value = 'threads'
+        mock_config_viewer_publisher = Mock(ConfigViewerPublisher)
+        self.mock_config_rpm_maker.config_viewer_publisher = mock_config_viewer_publisher
+
+        rpms = ConfigRpmMaker._build_hosts(self.mock_config_rpm_maker, ['devweb01', 'berweb01'])
+
+        self.assertEqual(['devweb01.rpm'], rpms)
+        mock_config_viewer_publisher.publish.assert_called_once_with('devweb01')
+
+    def test_should_not_build_batch_nor_publish_config_viewer_data_when_a_host_failed(self, mock_get_build_mode, mock_svn_service_pool_class):
+
+        mock_get_build_mode.return_value = 'threads'
+        mock_config_viewer_publisher = Mock(ConfigViewerPublisher)
+        self.mock_config_rpm_maker.config_viewer_publisher = mock_config_viewer_publisher
+        self.mock_config_rpm_maker.failed_host_queue.put(('berweb01', 'Stacktrace'))
+
+        self.assertRaises(BaseConfigRpmMakerException, ConfigRpmMaker._build_hosts, self.mock_config_rpm_maker, ['devweb01', 'berweb01'])
+
+        self.assert_mock_never_called(self.mock_batch_rpm_builder.build)
+        self.assert_mock_never_called(mock_config_viewer_publisher.publish)
+
+
+@patch('config_rpm_maker.configrpmmaker.Pool')
+@patch('config_rpm_maker.configrpmmaker.get_max_failed_hosts')
+class BuildHostsInProcessesTests(UnitTests):
+
+    def setUp(self):
+        self.mock_config_rpm_maker = Mock(ConfigRpmMaker)
+        self.mock_config_rpm_maker.revision = '123'
+        self.mock_config_rpm_maker.work_dir = '/work'
+        self.mock_config_rpm_maker.svn_service = Mock()
+        self.mock_config_rpm_maker.error_handler = Mock()
+        self.mock_config_rpm_maker.host_scheduler = HostScheduler(['devweb01', 'berweb01'])
+        self.mock_config_rpm_maker.config_viewer_publisher = None
+        self.mock_config_rpm_maker.failed_host_queue = Queue()
+        self.mock_segment_cache = Mock()
+        self.rpm_queue = Queue()
+
+    def given_build_results(self, mock_pool_class, *results):
+        results_by_host = dict((result[0], result) for result in results)
+
+        def apply_async(function, arguments):
+            return create_async_result(results_by_host[arguments[0]])
+
+        mock_pool_class.return_value.apply_async.side_effect = apply_async
+
+    def test_should_export_shared_svn_paths_before_starting_processes(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        self.given_build_results(mock_pool_class, ('devweb01', [], None, None), ('berweb01', [], None, None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        self.mock_segment_cache.export_all.assert_called_with()
+
+    def test_should_start_pool_with_configured_count_of_processes(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        self.given_build_results(mock_pool_class, ('devweb01', [], None, None), ('berweb01', [], None, None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        self.assertEqual(2, mock_pool_class.call_args[1]['processes'])
+
+    def test_should_put_built_rpms_into_rpm_queue(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        self.given_build_results(mock_pool_class, ('devweb01', ['devweb01.rpm'], None, None),
+                                 ('berweb01', ['berweb01.rpm'], None, None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        self.assertEqual(['devweb01.rpm', 'berweb01.rpm'], list(self.rpm_queue.queue))
+        self.assert_mock_never_called(self.mock_config_rpm_maker._notify_that_host_failed)
+
+    def test_should_add_rpm_build_jobs_to_batch_rpm_builder(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_batch_rpm_builder = Mock(BatchRpmBuilder)
+        mock_rpm_build_job = Mock()
+        self.given_build_results(mock_pool_class, ('devweb01', [], None, mock_rpm_build_job),
+                                 ('berweb01', ['berweb01.rpm'], None, None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache, mock_batch_rpm_builder)
+
+        mock_batch_rpm_builder.add.assert_called_once_with(mock_rpm_build_job)
+        self.assertEqual(['berweb01.rpm'], list(self.rpm_queue.queue))
+
+    def test_should_publish_config_viewer_data_of_successfully_built_hosts(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_get_max_failed_hosts.return_value = 3
+        mock_config_viewer_publisher = Mock(ConfigViewerPublisher)
+        self.mock_config_rpm_maker.config_viewer_publisher = mock_config_viewer_publisher
+        self.given_build_results(mock_pool_class, ('devweb01', ['devweb01.rpm'], None, None),
+                                 ('berweb01', [], 'Stacktrace', None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        mock_config_viewer_publisher.publish.assert_called_once_with('devweb01')
+
+    def test_should_not_publish_config_viewer_data_of_hosts_whose_rpms_will_be_built_in_a_batch(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_config_viewer_publisher = Mock(ConfigViewerPublisher)
+        self.mock_config_rpm_maker.config_viewer_publisher = mock_config_viewer_publisher
+        self.given_build_results(mock_pool_class, ('devweb01', [], None, Mock()),
+                                 ('berweb01', ['berweb01.rpm'], None, None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache, Mock(BatchRpmBuilder))
+
+        mock_config_viewer_publisher.publish.assert_called_once_with('berweb01')
+
+    def test_should_notify_that_host_failed(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_get_max_failed_hosts.return_value = 3
+        self.given_build_results(mock_pool_class, ('devweb01', [], 'Stacktrace', None),
+                                 ('berweb01', ['berweb01.rpm'], None, None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 1, self.rpm_queue, self.mock_segment_cache)
+
+        self.mock_config_rpm_maker._notify_that_host_failed.assert_called_with('devweb01', 'Stacktrace')
+
+    def test_should_tell_host_scheduler_which_hosts_are_done(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_get_max_failed_hosts.return_value = 3
+        self.given_build_results(mock_pool_class, ('devweb01', [], 'Stacktrace', None),
+                                 ('berweb01', ['berweb01.rpm'], None, None))
+
+        host_scheduler = self.mock_config_rpm_maker.host_scheduler
+
+        with patch.object(host_scheduler, 'host_done', wraps=host_scheduler.host_done) as mock_host_done:
+            ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        self.assertEqual([call('devweb01', True), call('berweb01', False)], mock_host_done.call_args_list)
+        self.assertEqual(2, host_scheduler.count_of_finished_hosts)
+
+    def test_should_not_hand_over_more_hosts_than_processes_are_free(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        host_scheduler = self.mock_config_rpm_maker.host_scheduler
+        finished_hosts_when_host_was_handed_over = []
+
+        def apply_async(function, arguments):
+            finished_hosts_when_host_was_handed_over.append(host_scheduler.count_of_finished_hosts)
+            return create_async_result((arguments[0], [], None, None))
+
+        mock_pool_class.return_value.apply_async.side_effect = apply_async
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 1, self.rpm_queue, self.mock_segment_cache)
+
+        self.assertEqual([0, 1], finished_hosts_when_host_was_handed_over)
+
+    def test_should_stop_building_when_maximum_of_failed_hosts_reached(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        def notify_that_host_failed(host_name, stack_trace):
+            self.mock_config_rpm_maker.failed_host_queue.put((host_name, stack_trace))
+
+        mock_get_max_failed_hosts.return_value = 1
+        self.mock_config_rpm_maker._notify_that_host_failed.side_effect = notify_that_host_failed
+        self.given_build_results(mock_pool_class, ('devweb01', [], 'Stacktrace', None),
+                                 ('berweb01', ['berweb01.rpm'], None, None))
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        self.assertTrue(self.rpm_queue.empty())
+        mock_pool_class.return_value.terminate.assert_called_with()
+
+    def test_should_treat_host_as_failed_when_its_result_could_not_be_received(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_get_max_failed_hosts.return_value = 3
+        mock_async_result = create_async_result(None)
+        mock_async_result.get.side_effect = Exception('Aaarrrgggghh...')
+        mock_pool_class.return_value.apply_async.side_effect = lambda function, arguments: mock_async_result
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        self.assertEqual(2, self.mock_config_rpm_maker._notify_that_host_failed.call_count)
+        self.assertTrue('Aaarrrgggghh...' in self.mock_config_rpm_maker._notify_that_host_failed.call_args[0][1])
+        self.assertEqual(2, self.mock_config_rpm_maker.host_scheduler.count_of_finished_hosts)
+
+    @patch('config_rpm_maker.configrpmmaker.active_children')
+    @patch('config_rpm_maker.configrpmmaker.ProcessQueue')
+    def test_should_treat_host_as_failed_when_its_build_process_died(self, mock_process_queue_class, mock_active_children,
+                                                                     mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_get_max_failed_hosts.return_value = 3
+        started_hosts = Queue()
+        started_hosts.put(('devweb01', 4711))
+        mock_process_queue_class.return_value = started_hosts
+        mock_active_children.return_value = []
+        mock_async_result = create_async_result(None)
+        mock_async_result.ready.return_value = False
+        self.mock_config_rpm_maker.host_scheduler = HostScheduler(['devweb01'])
+        mock_pool_class.return_value.apply_async.return_value = mock_async_result
+
+        ConfigRpmMaker._build_hosts_in_processes(self.mock_config_rpm_maker, 2, self.rpm_queue, self.mock_segment_cache)
+
+        self.mock_config_rpm_maker._notify_that_host_failed.assert_called_with('devweb01', 'Build process 4711 died while building host "devweb01".')
+        self.assertEqual(1, self.mock_config_rpm_maker.host_scheduler.count_of_finished_hosts)
+
+    def test_should_terminate_pool_when_building_failed_unexpectedly(self, mock_get_max_failed_hosts, mock_pool_class):
+
+        mock_pool_class.return_value.apply_async.side_effect = Exception('Aaarrrgggghh...')
+
+        self.assertRaises(Exception, ConfigRpmMaker._build_hosts_in_processes,
+                          self.mock_config_rpm_maker, 1, self.rpm_queue, self.mock_segment_cache)
+
+        mock_pool_class.return_value.terminate.assert_called_with()
+        mock_pool_class.return_value.join.assert_called_with()
+        self.assertEqual(1, self.mock_config_rpm_maker.host_scheduler.count_of_cancelled_hosts)
+
+
+@patch('config_rpm_maker.configrpmmaker.get_canary_hosts')
+@patch('config_rpm_maker.configrpmmaker.get_host_build_order')
+class CreateHostSchedulerTests(UnitTests):
+
+    def test_should_schedule_hosts_ordered_by_name(self, mock_get_host_build_order, mock_get_canary_hosts):
+
+        mock_get_host_build_order.return_value = 'name'
+        mock_get_canary_hosts.return_value = []
+
+        host_scheduler = ConfigRpmMaker._create_host_scheduler(Mock(ConfigRpmMaker), ['devweb01', 'berweb01'])
+
+        self.assertEqual(['berweb01', 'devweb01'], list(host_scheduler))
+
+    @patch('config_rpm_maker.configrpmmaker.order_largest_hosts_first')
+    def test_should_schedule_largest_hosts_first(self, mock_order_largest_hosts_first, mock_get_host_build_order, mock_get_canary_hosts):
+
+        mock_get_host_build_order.return_value = 'largest_first'
+        mock_get_canary_hosts.return_value = []
+        mock_order_largest_hosts_first.return_value = ['devweb01', 'berweb01']
+
+        host_scheduler = ConfigRpmMaker._create_host_scheduler(Mock(ConfigRpmMaker), ['devweb01', 'berweb01'])
+
+        self.assertEqual(['devweb01', 'berweb01'], list(host_scheduler))
+
+    def test_should_schedule_affected_canary_hosts_first(self, mock_get_host_build_order, mock_get_canary_hosts):
+
+        mock_get_host_build_order.return_value = 'name'
+        mock_get_canary_hosts.return_value = ['devweb01', 'tuvweb01']
+
+        host_scheduler = ConfigRpmMaker._create_host_scheduler(Mock(ConfigRpmMaker), ['devweb01', 'berweb01'])
+
+        self.assertEqual('devweb01', host_scheduler.next_host())
+        host_scheduler.host_done('devweb01')
+        self.assertEqual('berweb01', host_scheduler.next_host())
+
+
+@patch('config_rpm_maker.configrpmmaker.get_work_dir_min_free_inodes')
+@patch('config_rpm_maker.configrpmmaker.get_work_dir_min_free_megabytes')
+class CreateWorkDirBudgetTests(UnitTests):
+
+    def test_should_not_create_work_dir_budget_when_no_minimum_is_configured(self, mock_get_work_dir_min_free_megabytes, mock_get_work_dir_min_free_inodes):
+
+        mock_get_work_dir_min_free_megabytes.return_value = 0
+        mock_get_work_dir_min_free_inodes.return_value = 0
+
+        self.assertEqual(None, ConfigRpmMaker._create_work_dir_budget(Mock(ConfigRpmMaker)))
+
+    @patch('config_rpm_maker.configrpmmaker.WorkDirBudget')
+    def test_should_create_work_dir_budget_for_work_dir(self, mock_work_dir_budget_class, mock_get_work_dir_min_free_megabytes, mock_get_work_dir_min_free_inodes):
+
+        mock_get_work_dir_min_free_megabytes.return_value = 2
+        mock_get_work_dir_min_free_inodes.return_value = 1000
+        mock_config_rpm_maker = Mock(ConfigRpmMaker)
+        mock_config_rpm_maker.work_dir = '/tmp/work'
+
+        actual_work_dir_budget = ConfigRpmMaker._create_work_dir_budget(mock_config_rpm_maker)
+
+        mock_work_dir_budget_class.assert_called_with('/tmp/work', 2 * 1024 * 1024, 1000)
+        self.assertEqual(mock_work_dir_budget_class.return_value, actual_work_dir_budget)
+
+
+@patch('config_rpm_maker.configrpmmaker.get_svn_client_count')
+class GetSvnClientCountTests(UnitTests):
+
+    def test_should_return_configured_svn_client_count(self, mock_get_svn_client_count):
+
+        mock_get_svn_client_count.return_value = 2
+
+        actual_svn_client_count = ConfigRpmMaker._get_svn_client_count(Mock(ConfigRpmMaker), 4)
+
+        self.assertEqual(2, actual_svn_client_count)
+
+    def test_should_return_thread_count_when_svn_client_count_is_zero(self, mock_get_svn_client_count):
+
+        mock_get_svn_client_count.return_value = 0
+
+        actual_svn_client_count = ConfigRpmMaker._get_svn_client_count(Mock(ConfigRpmMaker), 4)
+
+        self.assertEqual(4, actual_svn_client_count)
+
+    def test_should_not_return_more_svn_clients_than_threads(self, mock_get_svn_client_count):
+
+        mock_get_svn_client_count.return_value = 8
+
+        actual_svn_client_count = ConfigRpmMaker._get_svn_client_count(Mock(ConfigRpmMaker), 4)
+
+        self.assertEqual(4, actual_svn_client_count)
+
+    def test_should_raise_exception_when_svn_client_count_is_negative(self, mock_get_svn_client_count):
+
+        mock_get_svn_client_count.return_value = -1
+
+        self.assertRaises(ConfigurationException, ConfigRpmMaker._get_svn_client_count, Mock(ConfigRpmMaker), 4)
+
+
+@patch('config_rpm_maker.configrpmmaker.HostRpmBuilder')
+class BuildHostInProcessTests(UnitTests):
+
+    def setUp(self):
+        _build_process_context.update(revision='123',
+                                      work_dir='/work',
+                                      svn_service_queue=Mock(),
+                                      segment_cache=Mock(),
+                                      error_logging_handler=Mock(),
+                                      started_hosts=Queue())
+
+    def test_should_return_built_rpms(self, mock_host_rpm_builder_class):
+
+        mock_host_rpm_builder_class.return_value.build.return_value = ['devweb01.rpm']
+
+        actual = _build_host_in_process('devweb01')
+
+        self.assertEqual(('devweb01', ['devweb01.rpm'], None, mock_host_rpm_builder_class.return_value.rpm_build_job), actual)
+
+    def test_should_return_error_message_when_build_failed(self, mock_host_rpm_builder_class):
+
+        mock_host_rpm_builder_class.return_value.build.side_effect = BaseConfigRpmMakerException('Aaarrrgggghh...')
+
+        actual_host, actual_rpms, actual_error, actual_rpm_build_job = _build_host_in_process('devweb01')
+
+        self.assertEqual('devweb01', actual_host)
+        self.assertEqual([], actual_rpms)
+        self.assertTrue('Aaarrrgggghh...' in actual_error)
+        self.assertEqual(None, actual_rpm_build_job)
+
+    def test_should_return_stack_trace_when_build_failed_unexpectedly(self, mock_host_rpm_builder_class):
+
+        mock_host_rpm_builder_class.return_value.build.side_effect = Exception('Aaarrrgggghh...')
+
+        actual_host, actual_rpms, actual_error, actual_rpm_build_job = _build_host_in_process('devweb01')
+
+        self.assertEqual([], actual_rpms)
+        self.assertTrue('Traceback' in actual_error)
+
+    def test_should_report_started_host_with_process_id(self, mock_host_rpm_builder_class):
+
+        _build_host_in_process('devweb01')
+
+        self.assertEqual(('devweb01', getpid()), _build_process_context['started_hosts'].get_nowait())
+
+    def test_should_return_error_message_which_can_not_be_converted_to_a_plain_string(self, mock_host_rpm_builder_class):
+
+        mock_host_rpm_builder_class.return_value.build.side_effect = BaseConfigRpmMakerException(u'Aaarrrgggghh \xe4')
+
+        actual_host, actual_rpms, actual_error, actual_rpm_build_job = _build_host_in_process('devweb01')
+
+        self.assertEqual([], actual_rpms)
+        self.assertTrue('Aaarrrgggghh' in actual_error)
@@ -18,30 +18,52 @@
 
 from logging import DEBUG, ERROR, INFO
 from mock import Mock, patch
+from sys import maxint
 from unittest import TestCase
 
 from unittest_support import UnitTests
 from config_rpm_maker import configuration
 from config_rpm_maker.configuration import (CONFIGURATION_FILE_PATH,
                                             ENVIRONMENT_VARIABLE_KEY_CONFIGURATION_FILE,
+                                            BUILD_MODES,
+                                            HOST_BUILD_ORDERS,
+                                            RPM_WRITERS,
                                             ConfigurationException,
                                             ConfigurationProperty,
                                             unknown_hosts_are_allowed,
+                                            get_build_mode,
+                                            get_canary_hosts,
                                             get_config_rpm_prefix,
                                             get_config_viewer_host_directory,
+                                            is_config_viewer_publish_while_building_enabled,
                                             get_custom_dns_search_list,
+                                            get_encoding_cache_size,
                                             get_error_log_directory,
                                             get_error_log_url,
+                                            get_host_build_order,
+                                            get_incremental_build_directory,
                                             get_log_level,
                                             get_max_failed_hosts,
                                             get_max_file_size,
                                             get_path_to_spec_file,
                                             get_svn_path_to_config,
+                                            get_tar_compression_level,
                                             get_repo_packages_regex,
+                                            get_rpm_manifest_directory,
                                             get_rpm_upload_chunk_size,
                                             get_rpm_upload_command,
+                                            get_rpm_upload_process_count,
+                                            is_rpm_upload_while_building_enabled,
+                                            get_rpm_upload_retries,
+                                            get_rpm_upload_retry_delay,
+                                            get_rpm_writer,
+                                            get_rpmbuild_batch_size,
+                                            get_svn_client_count,
+                                            get_svn_mirror_directory,
                                             get_thread_count,
                                             get_temporary_directory,
+                                            get_work_dir_min_free_inodes,
+                                            get_work_dir_min_free_megabytes,
                                             is_no_clean_up_enabled,
                                             is_config_viewer_only_enabled,
                                             is_verbose_enabled,
@@ -55,9 +77,11 @@ from config_rpm_maker.configuration import (CONFIGURATION_FILE_PATH,
                                             _ensure_valid_log_level,
                                             _ensure_is_a_boolean_value,
                                             _ensure_is_an_integer,
+                                            _ensure_is_an_integer_in_range,
                                             _ensure_is_a_string,
                                             _ensure_is_a_string_or_none,
                                             _ensure_is_a_list_of_strings,
+                                            _ensure_is_one_of,
                                             _ensure_repo_packages_regex_is_a_valid_regular_expression,
                                             _ensure_properties_are_valid,
                                             _load_configuration_properties_from_yaml_file,
@@ -225,7 +249,7 @@ class EnsurePropertiesAreValidTest(UnitTests):
         actual_properties = _ensure_properties_are_valid(properties)
 
         self.assertFalse(actual_properties[unknown_hosts_are_allowed])
-        mock_ensure_valid_allow_unknown_hosts.assert_called_with(unknown_hosts_are_allowed, False)
+        mock_ensure_valid_allow_unknown_hosts.assert_any_call(unknown_hosts_are_allowed, False)
 
     def test_should_return_default_property_for_allow_unkown_hosts(self):
 
@@ -243,6 +267,44 @@ class EnsurePropertiesAreValidTest(UnitTests):
 
         self.assertTrue(actual_properties[unknown_hosts_are_allowed])
 
+    @patch('config_rpm_maker.configuration._ensure_is_one_of')
+    def test_should_return_property_build_mode(self, mock_ensure_is_one_of):
+
+        mock_ensure_is_one_of.return_value = 'processes'
+        properties = {'build_mode': 'processes'}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('processes', actual_properties[get_build_mode])
+        mock_ensure_is_one_of.assert_any_call(get_build_mode, 'processes', BUILD_MODES)
+
+    def test_should_return_default_for_build_mode_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('threads', actual_properties[get_build_mode])
+
+    @patch('config_rpm_maker.configuration._ensure_is_a_list_of_strings')
+    def test_should_return_property_canary_hosts(self, mock_ensure_is_a_list_of_strings):
+
+        mock_ensure_is_a_list_of_strings.return_value = ['devweb01', 'tuvweb01']
+        properties = {'canary_hosts': ['devweb01', 'tuvweb01']}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(['devweb01', 'tuvweb01'], actual_properties[get_canary_hosts])
+        mock_ensure_is_a_list_of_strings.assert_any_call(get_canary_hosts, ['devweb01', 'tuvweb01'])
+
+    def test_should_return_default_for_canary_hosts_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual([], actual_properties[get_canary_hosts])
+
     @patch('config_rpm_maker.configuration._ensure_is_a_string')
     def test_should_return_property_config_rpm_prefix(self, mock_ensure_is_a_string):
 
@@ -281,6 +343,31 @@ class EnsurePropertiesAreValidTest(UnitTests):
 
         self.assertEqual([], actual_properties[get_custom_dns_search_list])
 
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer_in_range')
+    def test_should_return_encoding_cache_size(self, mock_ensure_is_an_integer_in_range):
+
+        mock_ensure_is_an_integer_in_range.return_value = 123
+        properties = {'encoding_cache_size': 123}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(123, actual_properties[get_encoding_cache_size])
+        mock_ensure_is_an_integer_in_range.assert_any_call(get_encoding_cache_size, 123, 0, maxint)
+
+    def test_should_raise_exception_when_encoding_cache_size_is_negative(self):
+
+        properties = {'encoding_cache_size': -1}
+
+        self.assertRaises(ConfigurationException, _ensure_properties_are_valid, properties)
+
+    def test_should_return_default_for_encoding_cache_size_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(10000, actual_properties[get_encoding_cache_size])
+
     @patch('config_rpm_maker.configuration._ensure_is_a_string')
     def test_should_return_property_error_log_dir(self, mock_ensure_is_a_string):
 
@@ -319,6 +406,44 @@ class EnsurePropertiesAreValidTest(UnitTests):
 
         self.assertEqual('', actual_properties[get_error_log_url])
 
+    @patch('config_rpm_maker.configuration._ensure_is_one_of')
+    def test_should_return_property_host_build_order(self, mock_ensure_is_one_of):
+
+        mock_ensure_is_one_of.return_value = 'largest_first'
+        properties = {'host_build_order': 'largest_first'}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('largest_first', actual_properties[get_host_build_order])
+        mock_ensure_is_one_of.assert_any_call(get_host_build_order, 'largest_first', HOST_BUILD_ORDERS)
+
+    def test_should_return_default_for_host_build_order_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('name', actual_properties[get_host_build_order])
+
+    @patch('config_rpm_maker.configuration._ensure_is_a_string')
+    def test_should_return_incremental_build_dir(self, mock_ensure_is_a_string):
+
+        mock_ensure_is_a_string.return_value = 'valid directory'
+        properties = {'incremental_build_dir': 'spam/eggs'}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('valid directory', actual_properties[get_incremental_build_directory])
+        mock_ensure_is_a_string.assert_any_call(get_incremental_build_directory, 'spam/eggs')
+
+    def test_should_return_default_for_incremental_build_dir_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('', actual_properties[get_incremental_build_directory])
+
     @patch('config_rpm_maker.configuration._ensure_is_a_string')
     def test_should_return_path_to_spec_file(self, mock_ensure_is_a_string):
 
@@ -395,6 +520,170 @@ class EnsurePropertiesAreValidTest(UnitTests):
 
         self.assertEqual(None, actual_properties[get_rpm_upload_command])
 
+    @patch('config_rpm_maker.configuration._ensure_is_a_string')
+    def test_should_return_rpm_manifest_dir(self, mock_ensure_is_a_string):
+
+        mock_ensure_is_a_string.return_value = 'valid directory'
+        properties = {'rpm_manifest_dir': 'spam/eggs'}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('valid directory', actual_properties[get_rpm_manifest_directory])
+        mock_ensure_is_a_string.assert_any_call(get_rpm_manifest_directory, 'spam/eggs')
+
+    def test_should_return_default_for_rpm_manifest_dir_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('', actual_properties[get_rpm_manifest_directory])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer')
+    def test_should_return_rpm_upload_process_count(self, mock_ensure_is_an_integer):
+
+        mock_ensure_is_an_integer.return_value = 4
+        properties = {'rpm_upload_process_count': 4}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(4, actual_properties[get_rpm_upload_process_count])
+        mock_ensure_is_an_integer.assert_any_call(get_rpm_upload_process_count, 4)
+
+    def test_should_return_default_for_rpm_upload_process_count_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(1, actual_properties[get_rpm_upload_process_count])
+
+    @patch('config_rpm_maker.configuration._ensure_is_a_boolean_value')
+    def test_should_return_config_viewer_publish_while_building(self, mock_ensure_is_a_boolean_value):
+
+        mock_ensure_is_a_boolean_value.return_value = True
+        properties = {'config_viewer_publish_while_building': True}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertTrue(actual_properties[is_config_viewer_publish_while_building_enabled])
+        mock_ensure_is_a_boolean_value.assert_any_call(is_config_viewer_publish_while_building_enabled, True)
+
+    def test_should_return_default_for_config_viewer_publish_while_building_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertFalse(actual_properties[is_config_viewer_publish_while_building_enabled])
+
+    @patch('config_rpm_maker.configuration._ensure_is_a_boolean_value')
+    def test_should_return_rpm_upload_while_building(self, mock_ensure_is_a_boolean_value):
+
+        mock_ensure_is_a_boolean_value.return_value = True
+        properties = {'rpm_upload_while_building': True}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertTrue(actual_properties[is_rpm_upload_while_building_enabled])
+        mock_ensure_is_a_boolean_value.assert_any_call(is_rpm_upload_while_building_enabled, True)
+
+    def test_should_return_default_for_rpm_upload_while_building_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertFalse(actual_properties[is_rpm_upload_while_building_enabled])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer_in_range')
+    def test_should_return_rpm_upload_retries(self, mock_ensure_is_an_integer_in_range):
+
+        mock_ensure_is_an_integer_in_range.return_value = 3
+        properties = {'rpm_upload_retries': 3}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(3, actual_properties[get_rpm_upload_retries])
+        mock_ensure_is_an_integer_in_range.assert_any_call(get_rpm_upload_retries, 3, 0, maxint)
+
+    def test_should_raise_exception_when_rpm_upload_retries_is_negative(self):
+
+        properties = {'rpm_upload_retries': -1}
+
+        self.assertRaises(ConfigurationException, _ensure_properties_are_valid, properties)
+
+    def test_should_return_default_for_rpm_upload_retries_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(0, actual_properties[get_rpm_upload_retries])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer_in_range')
+    def test_should_return_rpm_upload_retry_delay(self, mock_ensure_is_an_integer_in_range):
+
+        mock_ensure_is_an_integer_in_range.return_value = 5
+        properties = {'rpm_upload_retry_delay': 5}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(5, actual_properties[get_rpm_upload_retry_delay])
+        mock_ensure_is_an_integer_in_range.assert_any_call(get_rpm_upload_retry_delay, 5, 0, maxint)
+
+    def test_should_raise_exception_when_rpm_upload_retry_delay_is_negative(self):
+
+        properties = {'rpm_upload_retry_delay': -1}
+
+        self.assertRaises(ConfigurationException, _ensure_properties_are_valid, properties)
+
+    def test_should_return_default_for_rpm_upload_retry_delay_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(2, actual_properties[get_rpm_upload_retry_delay])
+
+    @patch('config_rpm_maker.configuration._ensure_is_one_of')
+    def test_should_return_property_rpm_writer(self, mock_ensure_is_one_of):
+
+        mock_ensure_is_one_of.return_value = 'native'
+        properties = {'rpm_writer': 'native'}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('native', actual_properties[get_rpm_writer])
+        mock_ensure_is_one_of.assert_any_call(get_rpm_writer, 'native', RPM_WRITERS)
+
+    def test_should_return_default_for_rpm_writer_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('rpmbuild', actual_properties[get_rpm_writer])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer')
+    def test_should_return_rpmbuild_batch_size(self, mock_ensure_is_an_integer):
+
+        mock_ensure_is_an_integer.return_value = 20
+        properties = {'rpmbuild_batch_size': 20}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(20, actual_properties[get_rpmbuild_batch_size])
+        mock_ensure_is_an_integer.assert_any_call(get_rpmbuild_batch_size, 20)
+
+    def test_should_return_default_for_rpmbuild_batch_size_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(1, actual_properties[get_rpmbuild_batch_size])
+
     @patch('config_rpm_maker.configuration._ensure_is_a_string')
     def test_should_return_svn_path_to_config(self, mock_ensure_is_a_string):
 
@@ -414,6 +703,101 @@ class EnsurePropertiesAreValidTest(UnitTests):
 
         self.assertEqual('/config', actual_properties[get_svn_path_to_config])
 
+    @patch('config_rpm_maker.configuration._ensure_is_a_string')
+    def test_should_return_svn_mirror_dir(self, mock_ensure_is_a_string):
+
+        mock_ensure_is_a_string.return_value = 'valid directory'
+        properties = {'svn_mirror_dir': '/var/cache/config-mirror'}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('valid directory', actual_properties[get_svn_mirror_directory])
+        mock_ensure_is_a_string.assert_any_call(get_svn_mirror_directory, '/var/cache/config-mirror')
+
+    def test_should_return_default_for_svn_mirror_dir_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual('', actual_properties[get_svn_mirror_directory])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer_in_range')
+    def test_should_return_tar_compression_level(self, mock_ensure_is_an_integer_in_range):
+
+        mock_ensure_is_an_integer_in_range.return_value = 1
+        properties = {'tar_compression_level': 0}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(1, actual_properties[get_tar_compression_level])
+        mock_ensure_is_an_integer_in_range.assert_called_with(get_tar_compression_level, 0, 0, 9)
+
+    def test_should_return_default_for_tar_compression_level_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(6, actual_properties[get_tar_compression_level])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer')
+    def test_should_return_work_dir_min_free_megabytes(self, mock_ensure_is_an_integer):
+
+        mock_ensure_is_an_integer.return_value = 512
+        properties = {'work_dir_min_free_megabytes': 512}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(512, actual_properties[get_work_dir_min_free_megabytes])
+        mock_ensure_is_an_integer.assert_any_call(get_work_dir_min_free_megabytes, 512)
+
+    def test_should_return_default_for_work_dir_min_free_megabytes_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(0, actual_properties[get_work_dir_min_free_megabytes])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer')
+    def test_should_return_work_dir_min_free_inodes(self, mock_ensure_is_an_integer):
+
+        mock_ensure_is_an_integer.return_value = 10000
+        properties = {'work_dir_min_free_inodes': 10000}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(10000, actual_properties[get_work_dir_min_free_inodes])
+        mock_ensure_is_an_integer.assert_any_call(get_work_dir_min_free_inodes, 10000)
+
+    def test_should_return_default_for_work_dir_min_free_inodes_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(0, actual_properties[get_work_dir_min_free_inodes])
+
+    @patch('config_rpm_maker.configuration._ensure_is_an_integer')
+    def test_should_return_svn_client_count(self, mock_ensure_is_an_integer):
+
+        mock_ensure_is_an_integer.return_value = 123
+        properties = {'svn_client_count': 4}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(123, actual_properties[get_svn_client_count])
+        mock_ensure_is_an_integer.assert_any_call(get_svn_client_count, 4)
+
+    def test_should_return_default_for_svn_client_count_if_not_defined(self):
+
+        properties = {}
+
+        actual_properties = _ensure_properties_are_valid(properties)
+
+        self.assertEqual(0, actual_properties[get_svn_client_count])
+
     @patch('config_rpm_maker.configuration._ensure_is_an_integer')
     def test_should_return_thread_count(self, mock_ensure_is_an_integer):
 
@@ -808,6 +1192,40 @@ class EnsureIsAInteger(TestCase):
         self.assertEqual(123, actual)
 
 
+class EnsureIsAnIntegerInRangeTests(TestCase):
+
+    def test_should_raise_exception_if_value_is_not_an_integer(self):
+
+        self.assertRaises(ConfigurationException, _ensure_is_an_integer_in_range, 'key', '1', 0, 9)
+
+    def test_should_raise_exception_if_value_is_too_small(self):
+
+        self.assertRaises(ConfigurationException, _ensure_is_an_integer_in_range, 'key', -1, 0, 9)
+
+    def test_should_raise_exception_if_value_is_too_big(self):
+
+        self.assertRaises(ConfigurationException, _ensure_is_an_integer_in_range, 'key', 10, 0, 9)
+
+    def test_should_return_given_value_if_in_range(self):
+
+        actual = _ensure_is_an_integer_in_range('key', 9, 0, 9)
+
+        self.assertEqual(9, actual)
+
+
+class EnsureIsOneOfTests(TestCase):
+
+    def test_should_raise_exception_if_value_is_not_allowed(self):
+
+        self.assertRaises(ConfigurationException, _ensure_is_one_of, 'key', 'spam', ['foo', 'bar'])
+
+    def test_should_return_given_value_if_allowed(self):
+
+        actual = _ensure_is_one_of('key', 'bar', ['foo', 'bar'])
+
+        self.assertEqual('bar', actual)
+
+
 class EnsureRepoPackageRegexIsAValidRegularExpressionTests(TestCase):
 
     def test_should_raise_an_exception_if_given_value_is_not_of_type_string(self):
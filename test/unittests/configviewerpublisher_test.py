@@ -0,0 +1,128 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from os import listdir, makedirs, readlink
+from os.path import exists, islink, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from mock import patch
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.configviewerpublisher import (ConfigViewerPublisher,
+                                                    CouldNotPublishConfigViewerDataException,
+                                                    delete_published_host_directory,
+                                                    read_published_revision)
+
+
+class ConfigViewerPublisherTests(UnitTests):
+
+    def setUp(self):
+        self.hosts_directory = mkdtemp(prefix=self.__class__.__name__ + '_')
+        patcher = patch('config_rpm_maker.configviewerpublisher.build_config_viewer_host_directory')
+        self.mock_build_config_viewer_host_directory = patcher.start()
+        self.mock_build_config_viewer_host_directory.side_effect = self.build_config_viewer_host_directory
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        rmtree(self.hosts_directory)
+
+    def build_config_viewer_host_directory(self, host, revision=False):
+        path = join(self.hosts_directory, host)
+        if revision:
+            path += '.new-revision-' + revision
+        return path
+
+    def write_new_host_directory(self, host, revision):
+        path = self.build_config_viewer_host_directory(host, revision)
+        makedirs(path)
+        with open(join(path, host + '.rev'), 'w') as revision_file:
+            revision_file.write(revision)
+
+    def publish(self, revision, hosts):
+        config_viewer_publisher = ConfigViewerPublisher(revision, 2)
+        config_viewer_publisher.start()
+        for host in hosts:
+            config_viewer_publisher.publish(host)
+        config_viewer_publisher.finish()
+        return config_viewer_publisher
+
+    def test_should_publish_host_directory_as_symbolic_link_to_revision_directory(self):
+
+        self.write_new_host_directory('devweb01', '54')
+
+        config_viewer_publisher = self.publish('54', ['devweb01'])
+
+        host_path = join(self.hosts_directory, 'devweb01')
+        self.assertTrue(islink(host_path))
+        self.assertTrue(readlink(host_path).startswith('devweb01.revision-54.'))
+        self.assertEqual(54, read_published_revision(host_path, 'devweb01'))
+        self.assertEqual(['devweb01'], config_viewer_publisher.published_hosts)
+        self.assertFalse(exists(self.build_config_viewer_host_directory('devweb01', '54')))
+
+    def test_should_replace_published_revision_and_delete_replaced_directory(self):
+
+        self.write_new_host_directory('devweb01', '54')
+        self.publish('54', ['devweb01'])
+        self.write_new_host_directory('devweb01', '55')
+
+        self.publish('55', ['devweb01'])
+
+        self.assertEqual(55, read_published_revision(join(self.hosts_directory, 'devweb01'), 'devweb01'))
+        self.assertEqual(2, len(listdir(self.hosts_directory)))
+
+    def test_should_replace_host_directory_written_without_symbolic_link(self):
+
+        makedirs(join(self.hosts_directory, 'devweb01'))
+        with open(join(self.hosts_directory, 'devweb01', 'devweb01.rev'), 'w') as revision_file:
+            revision_file.write('53')
+        self.write_new_host_directory('devweb01', '54')
+
+        self.publish('54', ['devweb01'])
+
+        self.assertTrue(islink(join(self.hosts_directory, 'devweb01')))
+        self.assertEqual(54, read_published_revision(join(self.hosts_directory, 'devweb01'), 'devweb01'))
+        self.assertEqual(2, len(listdir(self.hosts_directory)))
+
+    def test_should_not_publish_host_when_published_revision_is_higher(self):
+
+        self.write_new_host_directory('devweb01', '99')
+        self.publish('99', ['devweb01'])
+        self.write_new_host_directory('devweb01', '54')
+
+        config_viewer_publisher = self.publish('54', ['devweb01'])
+
+        self.assertEqual(99, read_published_revision(join(self.hosts_directory, 'devweb01'), 'devweb01'))
+        self.assertEqual(['devweb01'], config_viewer_publisher.skipped_hosts)
+        self.assertFalse(exists(self.build_config_viewer_host_directory('devweb01', '54')))
+
+    def test_should_publish_hosts_and_raise_exception_when_a_host_could_not_be_published(self):
+
+        self.write_new_host_directory('devweb01', '54')
+
+        self.assertRaises(CouldNotPublishConfigViewerDataException, self.publish, '54', ['devweb01', 'tuvweb01'])
+
+        self.assertEqual(54, read_published_revision(join(self.hosts_directory, 'devweb01'), 'devweb01'))
+
+    def test_should_delete_symbolic_link_and_published_directory(self):
+
+        self.write_new_host_directory('devweb01', '54')
+        self.publish('54', ['devweb01'])
+
+        delete_published_host_directory(join(self.hosts_directory, 'devweb01'))
+
+        self.assertEqual([], listdir(self.hosts_directory))
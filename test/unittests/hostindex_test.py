@@ -0,0 +1,86 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.hostindex import HostIndex
+from config_rpm_maker.segment import All, Host, Typ
+
+
+class HostIndexTests(UnitTests):
+
+    def setUp(self):
+        self.host_index = HostIndex(['berweb01', 'devweb01', 'tuvweb02', 'devdb01'])
+
+    def test_should_return_all_hosts_when_all_changed(self):
+
+        self.assertEqual(set(['berweb01', 'devweb01', 'tuvweb02', 'devdb01']), self.host_index.get_hosts('all/files/foo'))
+
+    def test_should_return_hosts_of_type(self):
+
+        self.assertEqual(set(['berweb01', 'devweb01', 'tuvweb02']), self.host_index.get_hosts('typ/web'))
+
+    def test_should_return_hosts_of_location(self):
+
+        self.assertEqual(set(['berweb01']), self.host_index.get_hosts('loc/ber/files/foo'))
+        self.assertEqual(set(['berweb01']), self.host_index.get_hosts('loc/pro'))
+
+    def test_should_return_host(self):
+
+        self.assertEqual(set(['devdb01']), self.host_index.get_hosts('host/devdb01/files'))
+
+    def test_should_return_no_hosts_when_changed_path_is_not_used_by_any_host(self):
+
+        self.assertEqual(set(), self.host_index.get_hosts('foo/bar'))
+        self.assertEqual(set(), self.host_index.get_hosts('typ'))
+
+    def test_should_match_svn_paths_which_are_a_prefix_of_the_changed_path(self):
+
+        self.assertEqual(set(['berweb01', 'devweb01', 'tuvweb02']), self.host_index.get_hosts('typ/webserver'))
+
+    def test_should_return_affected_hosts_of_all_changed_paths(self):
+
+        actual_hosts = self.host_index.get_affected_hosts(['foo/bar', 'loctyp/devweb', 'host/tuvweb02'])
+
+        self.assertEqual(set(['devweb01', 'tuvweb02']), actual_hosts)
+
+    def test_should_only_index_given_segments(self):
+
+        host_index = HostIndex(['berweb01', 'devdb01'], [Typ(), Host()])
+
+        self.assertEqual(set(), host_index.get_hosts('all'))
+        self.assertEqual(set(['berweb01']), host_index.get_hosts('typ/web'))
+        self.assertEqual(set(['devdb01']), host_index.get_hosts('host/devdb01'))
+
+    def test_should_return_hosts_of_single_segment(self):
+
+        self.assertEqual(set(['berweb01', 'devweb01']), HostIndex(['berweb01', 'devweb01'], [All()]).get_hosts('all/foo/bar'))
+        self.assertEqual(set(), HostIndex(['berweb01', 'devweb01'], [All()]).get_hosts('foo/bar'))
+        self.assertEqual(set(['berweb01', 'devweb01']), HostIndex(['berweb01', 'devweb01'], [Typ()]).get_hosts('typ/web'))
+
+    def test_should_return_the_same_hosts_as_checking_each_host(self):
+
+        hosts = ['berweb01', 'devweb01', 'tuvweb02', 'devdb01', 'hamweb07']
+        changed_paths = ['all', 'typ/web/foo', 'loc/ham', 'loc/dev', 'loctyp/proweb', 'host/hamweb07/x', 'typ', '']
+        host_index = HostIndex(hosts, [All(), Typ(), Host()])
+
+        for changed_path in changed_paths:
+            expected_hosts = set(host for host in hosts
+                                 for segment in [All(), Typ(), Host()]
+                                 for svn_path in segment.get_svn_paths(host)
+                                 if changed_path.startswith(svn_path))
+
+            self.assertEqual(expected_hosts, host_index.get_hosts(changed_path))
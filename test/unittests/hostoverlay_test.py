@@ -0,0 +1,116 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from os import makedirs
+from os.path import dirname, exists, isdir, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.hostoverlay import HostOverlay
+
+
+class HostOverlayTests(UnitTests):
+
+    def setUp(self):
+        self.temporary_directory = mkdtemp(prefix=self.__class__.__name__ + '_')
+        self.target_directory = join(self.temporary_directory, 'yadt-config-devweb01')
+        makedirs(self.target_directory)
+        self.host_overlay = HostOverlay(self.target_directory)
+
+    def tearDown(self):
+        rmtree(self.temporary_directory)
+
+    def write_file(self, directory, path, content):
+        path = join(directory, path)
+        if not isdir(dirname(path)):
+            makedirs(dirname(path))
+        with open(path, 'w') as file_to_write:
+            file_to_write.write(content)
+
+    def read_file(self, path):
+        with open(join(self.target_directory, path)) as file_to_read:
+            return file_to_read.read()
+
+    def create_cache_directory(self, svn_path, files):
+        cache_directory = join(self.temporary_directory, 'segments', svn_path)
+        for path, content in files.items():
+            self.write_file(cache_directory, path, content)
+        return cache_directory
+
+    def test_should_not_write_cached_paths_before_write_is_called(self):
+
+        self.host_overlay.add_cached_paths(self.create_cache_directory('all', {'files/a': 'all'}), ['files', 'files/a'])
+
+        self.assertFalse(exists(join(self.target_directory, 'files')))
+
+    def test_should_write_cached_path_of_last_svn_path(self):
+
+        self.host_overlay.add_cached_paths(self.create_cache_directory('all', {'files/a': 'all', 'files/b': 'all'}), ['files', 'files/a', 'files/b'])
+        self.host_overlay.add_cached_paths(self.create_cache_directory('typ/web', {'files/a': 'web'}), ['files', 'files/a'])
+
+        self.host_overlay.write()
+
+        self.assertEqual('web', self.read_file('files/a'))
+        self.assertEqual('all', self.read_file('files/b'))
+        self.assertEqual(2, self.host_overlay.count_of_overridden_paths)
+
+    def test_should_not_write_cached_path_overridden_by_exported_path(self):
+
+        self.host_overlay.add_cached_paths(self.create_cache_directory('all', {'files/a': 'all'}), ['files', 'files/a'])
+        self.write_file(self.target_directory, 'files/a', 'host')
+        self.host_overlay.add_exported_paths(['files', 'files/a'])
+
+        self.host_overlay.write()
+
+        self.assertEqual('host', self.read_file('files/a'))
+
+    def test_should_write_cached_path_overriding_exported_path(self):
+
+        self.write_file(self.target_directory, 'files/a', 'host')
+        self.host_overlay.add_exported_paths(['files', 'files/a'])
+        self.host_overlay.add_cached_paths(self.create_cache_directory('all', {'files/a': 'all'}), ['files', 'files/a'])
+
+        self.host_overlay.write()
+
+        self.assertEqual('all', self.read_file('files/a'))
+
+    def test_should_discard_cached_paths_below_directory_overridden_by_file(self):
+
+        self.host_overlay.add_cached_paths(self.create_cache_directory('all', {'files/a': 'all'}), ['files', 'files/a'])
+        self.host_overlay.add_cached_paths(self.create_cache_directory('typ/web', {'files': 'web'}), ['files'])
+
+        self.host_overlay.write()
+
+        self.assertEqual('web', self.read_file('files'))
+
+    def test_should_return_path_of_cached_file_as_current_path(self):
+
+        cache_directory = self.create_cache_directory('all', {'VARIABLES/RPM_REQUIRES': 'foo'})
+        self.host_overlay.add_cached_paths(cache_directory, ['VARIABLES', 'VARIABLES/RPM_REQUIRES'])
+
+        actual_path = self.host_overlay.get_current_path(join(self.target_directory, 'VARIABLES', 'RPM_REQUIRES'))
+
+        self.assertEqual(join(cache_directory, 'VARIABLES', 'RPM_REQUIRES'), actual_path)
+
+    def test_should_return_given_path_as_current_path_when_path_has_been_exported(self):
+
+        self.host_overlay.add_cached_paths(self.create_cache_directory('all', {'VARIABLES/RPM_REQUIRES': 'foo'}), ['VARIABLES', 'VARIABLES/RPM_REQUIRES'])
+        self.host_overlay.add_exported_paths(['VARIABLES/RPM_REQUIRES'])
+        path = join(self.target_directory, 'VARIABLES', 'RPM_REQUIRES')
+
+        self.assertEqual(path, self.host_overlay.get_current_path(path))
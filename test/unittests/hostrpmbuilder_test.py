@@ -16,15 +16,24 @@
 #   You should have received a copy of the GNU General Public License
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import tarfile
+
 from unittest import TestCase
-from mock import Mock, patch
+from mock import Mock, call, patch
 from subprocess import PIPE
 
 from unittest_support import UnitTests
 
 import config_rpm_maker
 
-from config_rpm_maker.hostrpmbuilder import CouldNotBuildRpmException, ConfigDirAlreadyExistsException, CouldNotCreateConfigDirException, HostRpmBuilder
+from config_rpm_maker.hostoverlay import HostOverlay
+from config_rpm_maker.hostrpmbuilder import (CouldNotBuildRpmException,
+                                             ConfigDirAlreadyExistsException,
+                                             CouldNotCreateConfigDirException,
+                                             CouldNotTarConfigurationDirectoryException,
+                                             HostRpmBuilder)
+from config_rpm_maker.hoststate import CouldNotApplyChangeSetException
+from config_rpm_maker.rpmwriter import NotSupportedByRpmWriterException
 
 
 class ConstructorTests(TestCase):
@@ -179,8 +188,12 @@ class BuildTests(TestCase):
         mock_host_rpm_builder.rpm_provides_path = 'rpm-provides-path'
         mock_host_rpm_builder.config_viewer_host_dir = 'config_viewer_host_dir'
         mock_host_rpm_builder.config_rpm_prefix = "any-config-prefix"
+        mock_host_rpm_builder.rpm_build_job = None
+        mock_host_rpm_builder.unchanged_since_revision = None
+        mock_host_rpm_builder._is_rpm_unchanged.return_value = False
 
         mock_host_rpm_builder._overlay_segment = self._create_mock_overlay_segment_method()
+        mock_host_rpm_builder._apply_change_set_to_previous_host_tree.return_value = None
 
         self.mock_host_rpm_builder = mock_host_rpm_builder
 
@@ -412,50 +425,65 @@ class BuildTests(TestCase):
 
     @patch('config_rpm_maker.hostrpmbuilder.mkdir')
     @patch('config_rpm_maker.hostrpmbuilder.exists')
-    def test_should_copy_files_for_config_viewer(self, mock_exists, mock_mkdir):
+    def test_should_write_patch_info_into_variables(self, mock_exists, mock_mkdir):
 
         mock_exists.return_value = False
+        self.mock_host_rpm_builder._generate_patch_info.return_value = "patchinfo1\npatchinfo2\npatchinfo3\n"
 
         HostRpmBuilder.build(self.mock_host_rpm_builder)
 
-        self.mock_host_rpm_builder._copy_files_for_config_viewer.assert_called_with()
+        self.mock_host_rpm_builder._write_file.assert_any_call('/path/to/variables-directory/VARIABLES', 'patchinfo1\npatchinfo2\npatchinfo3\n')
 
     @patch('config_rpm_maker.hostrpmbuilder.mkdir')
     @patch('config_rpm_maker.hostrpmbuilder.exists')
-    def test_should_write_patch_info_into_variables_and_configviewer(self, mock_exists, mock_mkdir):
+    def test_should_filter_tokens_in_rpm_sources(self, mock_exists, mock_mkdir):
 
         mock_exists.return_value = False
-        self.mock_host_rpm_builder._generate_patch_info.return_value = "patchinfo1\npatchinfo2\npatchinfo3\n"
 
         HostRpmBuilder.build(self.mock_host_rpm_builder)
 
-        self.mock_host_rpm_builder._write_file.assert_any_call('/path/to/variables-directory/VARIABLES', 'patchinfo1\npatchinfo2\npatchinfo3\n')
-        self.mock_host_rpm_builder._write_file.assert_any_call('config_viewer_host_dir/devweb01.variables', 'patchinfo1\npatchinfo2\npatchinfo3\n')
+        self.mock_host_rpm_builder._filter_tokens_in_rpm_sources.assert_called_with()
 
     @patch('config_rpm_maker.hostrpmbuilder.mkdir')
     @patch('config_rpm_maker.hostrpmbuilder.exists')
-    def test_should_filter_tokens_in_rpm_sources(self, mock_exists, mock_mkdir):
+    def test_should_build_rpm(self, mock_exists, mock_mkdir):
 
         mock_exists.return_value = False
 
         HostRpmBuilder.build(self.mock_host_rpm_builder)
 
-        self.mock_host_rpm_builder._filter_tokens_in_rpm_sources.assert_called_with()
+        self.mock_host_rpm_builder._build_rpm.assert_called_with()
 
     @patch('config_rpm_maker.hostrpmbuilder.mkdir')
     @patch('config_rpm_maker.hostrpmbuilder.exists')
-    def test_should_build_rpm_using_rpmbuild(self, mock_exists, mock_mkdir):
+    def test_should_write_rpm_manifest_after_building_rpm(self, mock_exists, mock_mkdir):
 
         mock_exists.return_value = False
 
         HostRpmBuilder.build(self.mock_host_rpm_builder)
 
-        self.mock_host_rpm_builder._build_rpm_using_rpmbuild.assert_called_with()
+        self.mock_host_rpm_builder._calculate_rpm_digest.assert_called_with()
+        self.mock_host_rpm_builder._write_rpm_manifest.assert_called_with()
+
+    @patch('config_rpm_maker.hostrpmbuilder.mkdir')
+    @patch('config_rpm_maker.hostrpmbuilder.exists')
+    def test_should_not_build_rpm_when_rpm_is_unchanged(self, mock_exists, mock_mkdir):
+
+        mock_exists.return_value = False
+        self.mock_host_rpm_builder._is_rpm_unchanged.return_value = True
+        self.mock_host_rpm_builder.unchanged_since_revision = '122'
+
+        actual_rpms = HostRpmBuilder.build(self.mock_host_rpm_builder)
+
+        self.assertEqual([], actual_rpms)
+        self.assertEqual(0, self.mock_host_rpm_builder._build_rpm.call_count)
+        self.assertEqual(0, self.mock_host_rpm_builder._write_rpm_manifest.call_count)
+        self.mock_host_rpm_builder._write_files_for_config_viewer.assert_called_with()
 
     @patch('config_rpm_maker.hostrpmbuilder.is_config_viewer_only_enabled')
     @patch('config_rpm_maker.hostrpmbuilder.mkdir')
     @patch('config_rpm_maker.hostrpmbuilder.exists')
-    def test_should_not_build_rpm_using_rpmbuild(self, mock_exists, mock_mkdir, mock_get):
+    def test_should_not_build_rpm(self, mock_exists, mock_mkdir, mock_get):
 
         mock_get.return_value = True
         mock_exists.return_value = False
@@ -463,17 +491,21 @@ class BuildTests(TestCase):
         HostRpmBuilder.build(self.mock_host_rpm_builder)
 
         mock_get.assert_any_call()
-        self.assertEqual(0, len(self.mock_host_rpm_builder._build_rpm_using_rpmbuild.call_args_list))
+        self.assertEqual(0, len(self.mock_host_rpm_builder._build_rpm.call_args_list))
 
     @patch('config_rpm_maker.hostrpmbuilder.mkdir')
     @patch('config_rpm_maker.hostrpmbuilder.exists')
-    def test_should_filter_tokens_in_config_viewer(self, mock_exists, mock_mkdir):
+    def test_should_write_files_for_config_viewer_after_filtering_tokens_in_rpm_sources(self, mock_exists, mock_mkdir):
 
         mock_exists.return_value = False
+        calls = []
+        self.mock_host_rpm_builder._calculate_rpm_digest.side_effect = lambda: calls.append('rpm digest')
+        self.mock_host_rpm_builder._filter_tokens_in_rpm_sources.side_effect = lambda: calls.append('rpm sources')
+        self.mock_host_rpm_builder._write_files_for_config_viewer.side_effect = lambda: calls.append('config viewer')
 
         HostRpmBuilder.build(self.mock_host_rpm_builder)
 
-        self.mock_host_rpm_builder._filter_tokens_in_config_viewer.assert_called_with()
+        self.assertEqual(['rpm digest', 'rpm sources', 'config viewer'], calls)
 
     @patch('config_rpm_maker.hostrpmbuilder.mkdir')
     @patch('config_rpm_maker.hostrpmbuilder.exists')
@@ -564,14 +596,26 @@ class CleanUpTests(UnitTests):
 
         mock_rmtree.assert_any_call('variables directory')
 
-    def test_should_remove_host_configuration_directory(self, mock_remove, mock_rmtree, mock_config):
+    @patch('config_rpm_maker.hostrpmbuilder.exists')
+    def test_should_remove_host_configuration_directory(self, mock_exists, mock_remove, mock_rmtree, mock_config):
 
         mock_config.return_value = False
+        mock_exists.return_value = True
 
         HostRpmBuilder._clean_up(self.mock_host_rpm_builder)
 
         mock_rmtree.assert_any_call('host configuration directory')
 
+    @patch('config_rpm_maker.hostrpmbuilder.exists')
+    def test_should_not_remove_host_configuration_directory_which_has_been_moved_into_host_state(self, mock_exists, mock_remove, mock_rmtree, mock_config):
+
+        mock_config.return_value = False
+        mock_exists.return_value = False
+
+        HostRpmBuilder._clean_up(self.mock_host_rpm_builder)
+
+        self.assertEqual([call('variables directory')], mock_rmtree.call_args_list)
+
     def test_should_remove_host_output_file(self, mock_remove, mock_rmtree, mock_config):
 
         mock_config.return_value = False
@@ -589,6 +633,38 @@ class CleanUpTests(UnitTests):
         mock_remove.assert_any_call('/path/to/error/file')
 
 
+@patch('config_rpm_maker.hostrpmbuilder.is_no_clean_up_enabled')
+@patch('config_rpm_maker.hostrpmbuilder.shutil')
+class SaveHostStateTests(UnitTests):
+
+    def setUp(self):
+        self.mock_host_rpm_builder = Mock(HostRpmBuilder)
+        self.mock_host_rpm_builder.host_config_dir = '/work/yadt-config-devweb01'
+        self.mock_host_rpm_builder.host_state_directory = '/host-states'
+        self.mock_host_rpm_builder.hostname = 'devweb01'
+        self.mock_host_rpm_builder.host_state = Mock()
+        self.mock_host_rpm_builder.host_state.filtered_directory = '/work/host-state.devweb01/filtered'
+
+    def test_should_move_filtered_configuration_directory_into_host_state(self, mock_shutil, mock_config):
+
+        mock_config.return_value = False
+
+        HostRpmBuilder._save_host_state(self.mock_host_rpm_builder)
+
+        mock_shutil.move.assert_called_with('/work/yadt-config-devweb01', '/work/host-state.devweb01/filtered')
+        self.assert_mock_never_called(mock_shutil.copytree)
+        self.mock_host_rpm_builder.host_state.save.assert_called_with('/host-states/devweb01')
+
+    def test_should_copy_filtered_configuration_directory_into_host_state_when_not_cleaning_up(self, mock_shutil, mock_config):
+
+        mock_config.return_value = True
+
+        HostRpmBuilder._save_host_state(self.mock_host_rpm_builder)
+
+        mock_shutil.copytree.assert_called_with('/work/yadt-config-devweb01', '/work/host-state.devweb01/filtered', symlinks=True)
+        self.assert_mock_never_called(mock_shutil.move)
+
+
 class WriteRevisionFileForConfigViewerTests(TestCase):
 
     def setUp(self):
@@ -605,6 +681,110 @@ class WriteRevisionFileForConfigViewerTests(TestCase):
         self.mock_host_rpm_builder._write_file.assert_called_with('config-viewer-host-dir/hostname.rev', '1234')
 
 
+@patch('config_rpm_maker.hostrpmbuilder.load_rpm_manifest')
+class IsRpmUnchangedTests(UnitTests):
+
+    def setUp(self):
+        self.mock_host_rpm_builder = Mock(HostRpmBuilder)
+        self.mock_host_rpm_builder.hostname = 'devweb01'
+        self.mock_host_rpm_builder.revision = '123'
+        self.mock_host_rpm_builder.rpm_manifest_directory = '/manifests'
+        self.mock_host_rpm_builder.rpm_digest = 'digest'
+        self.mock_host_rpm_builder.unchanged_since_revision = None
+
+    def test_should_return_true_when_digest_of_previous_revision_is_the_same(self, mock_load_rpm_manifest):
+
+        mock_load_rpm_manifest.return_value = {'revision': '120', 'digest': 'digest'}
+
+        self.assertTrue(HostRpmBuilder._is_rpm_unchanged(self.mock_host_rpm_builder))
+
+        mock_load_rpm_manifest.assert_called_with('/manifests/rpm-manifest.devweb01.json')
+        self.assertEqual('120', self.mock_host_rpm_builder.unchanged_since_revision)
+
+    def test_should_return_false_when_digest_differs(self, mock_load_rpm_manifest):
+
+        mock_load_rpm_manifest.return_value = {'revision': '120', 'digest': 'other digest'}
+
+        self.assertFalse(HostRpmBuilder._is_rpm_unchanged(self.mock_host_rpm_builder))
+
+    def test_should_return_false_when_manifest_is_of_same_revision(self, mock_load_rpm_manifest):
+
+        mock_load_rpm_manifest.return_value = {'revision': '123', 'digest': 'digest'}
+
+        self.assertFalse(HostRpmBuilder._is_rpm_unchanged(self.mock_host_rpm_builder))
+
+    def test_should_return_false_when_there_is_no_manifest(self, mock_load_rpm_manifest):
+
+        mock_load_rpm_manifest.return_value = None
+
+        self.assertFalse(HostRpmBuilder._is_rpm_unchanged(self.mock_host_rpm_builder))
+
+    def test_should_return_false_when_no_digest_has_been_calculated(self, mock_load_rpm_manifest):
+
+        self.mock_host_rpm_builder.rpm_digest = None
+
+        self.assertFalse(HostRpmBuilder._is_rpm_unchanged(self.mock_host_rpm_builder))
+        self.assert_mock_never_called(mock_load_rpm_manifest)
+
+
+@patch('config_rpm_maker.hostrpmbuilder.get_rpmbuild_batch_size')
+@patch('config_rpm_maker.hostrpmbuilder.get_rpm_writer')
+class BuildRpmTests(UnitTests):
+
+    def setUp(self):
+        self.mock_host_rpm_builder = Mock(HostRpmBuilder)
+        self.mock_host_rpm_builder.thread_name = 'thread-0'
+        self.mock_host_rpm_builder.logger = Mock()
+        self.mock_host_rpm_builder.hostname = 'devweb01'
+        self.mock_host_rpm_builder.config_rpm_prefix = 'yadt-config-'
+        self.mock_host_rpm_builder.rpm_name = 'devweb01'
+        self.mock_host_rpm_builder.rpm_build_job = None
+        self.mock_host_rpm_builder._tar_sources.return_value = '/path/to/tarred_sources.tar.gz'
+
+    def test_should_tar_sources_and_build_rpm_using_rpmbuild(self, mock_get_rpm_writer, mock_get_rpmbuild_batch_size):
+
+        mock_get_rpm_writer.return_value = 'rpmbuild'
+        mock_get_rpmbuild_batch_size.return_value = 1
+
+        HostRpmBuilder._build_rpm(self.mock_host_rpm_builder)
+
+        self.mock_host_rpm_builder._tar_sources.assert_called_with()
+        self.mock_host_rpm_builder._build_rpm_using_rpmbuild.assert_called_with('/path/to/tarred_sources.tar.gz')
+        self.assert_mock_never_called(self.mock_host_rpm_builder._write_rpm_natively)
+
+    def test_should_write_rpm_natively(self, mock_get_rpm_writer, mock_get_rpmbuild_batch_size):
+
+        mock_get_rpm_writer.return_value = 'native'
+
+        HostRpmBuilder._build_rpm(self.mock_host_rpm_builder)
+
+        self.mock_host_rpm_builder._write_rpm_natively.assert_called_with('/path/to/tarred_sources.tar.gz')
+        self.assert_mock_never_called(self.mock_host_rpm_builder._build_rpm_using_rpmbuild)
+
+    def test_should_fall_back_to_rpmbuild_when_rpm_writer_does_not_support_spec_file(self, mock_get_rpm_writer, mock_get_rpmbuild_batch_size):
+
+        mock_get_rpm_writer.return_value = 'native'
+        mock_get_rpmbuild_batch_size.return_value = 1
+        self.mock_host_rpm_builder._write_rpm_natively.side_effect = NotSupportedByRpmWriterException('section "%post"')
+
+        HostRpmBuilder._build_rpm(self.mock_host_rpm_builder)
+
+        self.mock_host_rpm_builder._build_rpm_using_rpmbuild.assert_called_with('/path/to/tarred_sources.tar.gz')
+
+    def test_should_defer_rpmbuild_to_batch_when_batch_size_is_greater_than_one(self, mock_get_rpm_writer, mock_get_rpmbuild_batch_size):
+
+        mock_get_rpm_writer.return_value = 'rpmbuild'
+        mock_get_rpmbuild_batch_size.return_value = 20
+
+        HostRpmBuilder._build_rpm(self.mock_host_rpm_builder)
+
+        rpm_build_job = self.mock_host_rpm_builder.rpm_build_job
+        self.assertEqual(['devweb01'], rpm_build_job.hostnames)
+        self.assertEqual('yadt-config-devweb01', rpm_build_job.rpm_name)
+        self.assertEqual('/path/to/tarred_sources.tar.gz', rpm_build_job.tar_path)
+        self.assert_mock_never_called(self.mock_host_rpm_builder._build_rpm_using_rpmbuild)
+
+
 @patch('config_rpm_maker.hostrpmbuilder.is_no_clean_up_enabled')
 @patch('config_rpm_maker.hostrpmbuilder.Popen')
 @patch('config_rpm_maker.hostrpmbuilder.abspath')
@@ -618,7 +798,6 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
         mock_host_rpm_builder.logger = Mock()
         mock_host_rpm_builder.work_dir = '/path/to/working/directory'
         mock_host_rpm_builder.rpm_build_dir = '/path/to/rpm/build/directory'
-        mock_host_rpm_builder._tar_sources.return_value = '/path/to/tarred_sources.tar.gz'
 
         mock_process = Mock()
         mock_process.communicate.return_value = ('stdout', 'stderr')
@@ -627,14 +806,6 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
         self.mock_host_rpm_builder = mock_host_rpm_builder
         self.mock_process = mock_process
 
-    def test_should_tar_sources_before_building_rpm(self, mock_environ, mock_abspath, mock_popen, mock_config):
-
-        mock_popen.return_value = self.mock_process
-
-        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder)
-
-        self.mock_host_rpm_builder._tar_sources.assert_called_with()
-
     def test_should_call_rpmbuild(self, mock_environ, mock_abspath, mock_popen, mock_config):
 
         mock_popen.return_value = self.mock_process
@@ -647,7 +818,7 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
 
         mock_abspath.side_effect = fake_abspath
 
-        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder)
+        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder, '/path/to/tarred_sources.tar.gz')
 
         mock_popen.assert_called_withPopen("rpmbuild --define --clean '_topdir /absolute/path/to/rpm/build/directory' -ta /path/to/tarred_sources.tar.gz", shell=True, env=mock_environment_copy, stderr=PIPE, stdout=PIPE)
 
@@ -664,7 +835,7 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
 
         mock_abspath.side_effect = fake_abspath
 
-        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder)
+        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder, '/path/to/tarred_sources.tar.gz')
 
         mock_popen.assert_called_with("rpmbuild  --define '_topdir /absolute/path/to/rpm/build/directory' -ta /path/to/tarred_sources.tar.gz", shell=True, env=mock_environment_copy, stderr=PIPE, stdout=PIPE)
 
@@ -683,7 +854,7 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
 
         mock_abspath.side_effect = fake_abspath
 
-        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder)
+        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder, '/path/to/tarred_sources.tar.gz')
 
         mock_logger.info.assert_called_with('stdout')
 
@@ -702,7 +873,7 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
 
         mock_abspath.side_effect = fake_abspath
 
-        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder)
+        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder, '/path/to/tarred_sources.tar.gz')
 
         mock_logger.error.assert_called_with('stderr')
 
@@ -713,7 +884,7 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
         self.mock_process.communicate.return_value = ('stdout', "")
         mock_popen.return_value = self.mock_process
 
-        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder)
+        HostRpmBuilder._build_rpm_using_rpmbuild(self.mock_host_rpm_builder, '/path/to/tarred_sources.tar.gz')
 
         self.assert_mock_never_called(mock_logger.error)
 
@@ -722,4 +893,235 @@ class BuildRpmUsingRpmbuildTests(UnitTests):
         self.mock_process.returncode = 123
         mock_popen.return_value = self.mock_process
 
-        self.assertRaises(CouldNotBuildRpmException, HostRpmBuilder._build_rpm_using_rpmbuild, self.mock_host_rpm_builder)
+        self.assertRaises(CouldNotBuildRpmException, HostRpmBuilder._build_rpm_using_rpmbuild, self.mock_host_rpm_builder, '/path/to/tarred_sources.tar.gz')
+
+
+@patch('config_rpm_maker.hostrpmbuilder.get_tar_compression_level')
+@patch('config_rpm_maker.hostrpmbuilder.shutil')
+@patch('config_rpm_maker.hostrpmbuilder.tarfile')
+class TarSourcesTests(UnitTests):
+
+    def setUp(self):
+        mock_host_rpm_builder = Mock(HostRpmBuilder)
+        mock_host_rpm_builder.hostname = 'devweb01'
+        mock_host_rpm_builder.work_dir = '/work'
+        mock_host_rpm_builder.config_rpm_prefix = 'yadt-config-'
+        mock_host_rpm_builder.host_config_dir = '/work/yadt-config-devweb01'
+        mock_host_rpm_builder.is_a_group_rpm = False
+        mock_host_rpm_builder.logger = Mock()
+
+        self.mock_host_rpm_builder = mock_host_rpm_builder
+
+    def test_should_add_host_config_dir_to_archive(self, mock_tarfile, mock_shutil, mock_get_tar_compression_level):
+
+        mock_get_tar_compression_level.return_value = 1
+
+        actual_output_file = HostRpmBuilder._tar_sources(self.mock_host_rpm_builder)
+
+        self.assertEqual('/work/yadt-config-devweb01.tar.gz', actual_output_file)
+        mock_tarfile.open.assert_called_with('/work/yadt-config-devweb01.tar.gz', 'w:gz', compresslevel=1)
+        mock_tar_file = mock_tarfile.open.return_value
+        mock_tar_file.add.assert_called_with('/work/yadt-config-devweb01', arcname='yadt-config-devweb01')
+        mock_tar_file.close.assert_called_with()
+
+    def test_should_move_host_config_dir_and_add_it_to_archive_when_building_group_rpm(self, mock_tarfile, mock_shutil, mock_get_tar_compression_level):
+
+        self.mock_host_rpm_builder.is_a_group_rpm = True
+        self.mock_host_rpm_builder.rpm_name = 'web'
+
+        actual_output_file = HostRpmBuilder._tar_sources(self.mock_host_rpm_builder)
+
+        self.assertEqual('/work/yadt-config-web.tar.gz', actual_output_file)
+        mock_shutil.move.assert_called_with('/work/yadt-config-devweb01', '/work/yadt-config-web')
+        mock_tarfile.open.return_value.add.assert_called_with('/work/yadt-config-web', arcname='yadt-config-web')
+
+    def test_should_raise_exception_when_archive_could_not_be_written(self, mock_tarfile, mock_shutil, mock_get_tar_compression_level):
+
+        mock_tarfile.TarError = tarfile.TarError
+        mock_tarfile.open.return_value.add.side_effect = IOError('No space left on device')
+
+        self.assertRaises(CouldNotTarConfigurationDirectoryException, HostRpmBuilder._tar_sources, self.mock_host_rpm_builder)
+        mock_tarfile.open.return_value.close.assert_called_with()
+
+
+class ExportSvnPathTests(UnitTests):
+
+    def setUp(self):
+        mock_host_rpm_builder = Mock(HostRpmBuilder)
+        mock_host_rpm_builder.host_config_dir = '/path/to/host/config/dir'
+        mock_host_rpm_builder.revision = '123'
+        mock_host_rpm_builder.svn_service_queue = Mock()
+        mock_host_rpm_builder.segment_cache = None
+        mock_host_rpm_builder.host_overlay = Mock(HostOverlay)
+
+        self.mock_svn_service = Mock()
+        self.mock_svn_service.export.return_value = [('host/devweb01', 'files')]
+        mock_host_rpm_builder._get_next_svn_service_from_queue.return_value = self.mock_svn_service
+
+        self.mock_host_rpm_builder = mock_host_rpm_builder
+
+    def test_should_export_svn_path_into_host_config_dir(self):
+
+        actual_exported_paths = HostRpmBuilder._export_svn_path(self.mock_host_rpm_builder, 'host/devweb01')
+
+        self.mock_svn_service.export.assert_called_with('host/devweb01', '/path/to/host/config/dir', '123')
+        self.assertEqual([('host/devweb01', 'files')], actual_exported_paths)
+
+    def test_should_return_svn_service_to_queue_after_export(self):
+
+        HostRpmBuilder._export_svn_path(self.mock_host_rpm_builder, 'host/devweb01')
+
+        self.mock_host_rpm_builder.svn_service_queue.put.assert_called_with(self.mock_svn_service)
+
+    def test_should_add_exported_paths_to_host_overlay(self):
+
+        HostRpmBuilder._export_svn_path(self.mock_host_rpm_builder, 'host/devweb01')
+
+        self.mock_host_rpm_builder.host_overlay.add_exported_paths.assert_called_with(['files'])
+
+    def test_should_export_svn_path_when_segment_cache_does_not_contain_svn_path(self):
+
+        self.mock_host_rpm_builder.segment_cache = Mock()
+        self.mock_host_rpm_builder.segment_cache.contains.return_value = False
+
+        HostRpmBuilder._export_svn_path(self.mock_host_rpm_builder, 'host/devweb01')
+
+        self.mock_svn_service.export.assert_called_with('host/devweb01', '/path/to/host/config/dir', '123')
+        self.assert_mock_never_called(self.mock_host_rpm_builder.segment_cache.overlay)
+
+    def test_should_overlay_svn_path_from_segment_cache_when_segment_cache_contains_svn_path(self):
+
+        self.mock_host_rpm_builder.segment_cache = Mock()
+        self.mock_host_rpm_builder.segment_cache.contains.return_value = True
+        self.mock_host_rpm_builder.segment_cache.overlay.return_value = [('all', 'files')]
+
+        actual_exported_paths = HostRpmBuilder._export_svn_path(self.mock_host_rpm_builder, 'all')
+
+        self.mock_host_rpm_builder.segment_cache.overlay.assert_called_with('all', self.mock_host_rpm_builder.host_overlay)
+        self.assertEqual([('all', 'files')], actual_exported_paths)
+        self.assert_mock_never_called(self.mock_svn_service.export)
+
+
+@patch('config_rpm_maker.hostrpmbuilder.TokenReplacer')
+class GetTokenReplacerTests(UnitTests):
+
+    def setUp(self):
+        mock_host_rpm_builder = Mock(HostRpmBuilder)
+        mock_host_rpm_builder.variables_dir = '/path/to/variables-directory'
+        mock_host_rpm_builder.svn_paths = ['all', 'typ/web', 'host/devweb01']
+        mock_host_rpm_builder.segment_cache = None
+        mock_host_rpm_builder.token_replacer = None
+
+        self.mock_host_rpm_builder = mock_host_rpm_builder
+
+    def test_should_create_token_replacer_from_variables_directory(self, mock_token_replacer_class):
+
+        actual_token_replacer = HostRpmBuilder._get_token_replacer(self.mock_host_rpm_builder)
+
+        self.assertEqual(mock_token_replacer_class.from_directory.return_value, actual_token_replacer)
+        mock_token_replacer_class.from_directory.assert_called_with('/path/to/variables-directory', resolved_tokens=None)
+
+    def test_should_create_token_replacer_using_resolved_tokens_from_segment_cache(self, mock_token_replacer_class):
+
+        self.mock_host_rpm_builder.segment_cache = Mock()
+
+        HostRpmBuilder._get_token_replacer(self.mock_host_rpm_builder)
+
+        self.mock_host_rpm_builder.segment_cache.get_resolved_tokens.assert_called_with(['all', 'typ/web', 'host/devweb01'])
+        mock_token_replacer_class.from_directory.assert_called_with('/path/to/variables-directory',
+                                                                    resolved_tokens=self.mock_host_rpm_builder.segment_cache.get_resolved_tokens.return_value)
+
+    def test_should_create_token_replacer_only_once(self, mock_token_replacer_class):
+
+        self.mock_host_rpm_builder.token_replacer = Mock()
+
+        actual_token_replacer = HostRpmBuilder._get_token_replacer(self.mock_host_rpm_builder)
+
+        self.assertEqual(self.mock_host_rpm_builder.token_replacer, actual_token_replacer)
+        self.assert_mock_never_called(mock_token_replacer_class.from_directory)
+
+
+@patch('config_rpm_maker.hostrpmbuilder.mkdir')
+@patch('config_rpm_maker.hostrpmbuilder.rmdir')
+@patch('config_rpm_maker.hostrpmbuilder.rmtree')
+@patch('config_rpm_maker.hostrpmbuilder.exists')
+@patch('config_rpm_maker.hostrpmbuilder.shutil')
+@patch('config_rpm_maker.hostrpmbuilder.apply_change_set')
+@patch('config_rpm_maker.hostrpmbuilder.HostState')
+class ApplyChangeSetToPreviousHostTreeTests(UnitTests):
+
+    def setUp(self):
+        mock_host_rpm_builder = Mock(HostRpmBuilder)
+        mock_host_rpm_builder.thread_name = 'Thread-0'
+        mock_host_rpm_builder.hostname = 'devweb01'
+        mock_host_rpm_builder.revision = '124'
+        mock_host_rpm_builder.work_dir = '/work'
+        mock_host_rpm_builder.host_config_dir = '/work/yadt-config-devweb01'
+        mock_host_rpm_builder.host_state_directory = '/host-states'
+        mock_host_rpm_builder.svn_service_queue = Mock()
+
+        self.mock_svn_service = Mock()
+        self.mock_svn_service.get_changed_paths_with_action.return_value = [('all/files/file_from_all', 'M')]
+        mock_host_rpm_builder._get_next_svn_service_from_queue.return_value = self.mock_svn_service
+
+        self.mock_previous_host_state = Mock()
+        self.mock_previous_host_state.revision = '123'
+        self.mock_previous_host_state.requires = ['all-req']
+        self.mock_previous_host_state.provides = ['all-prov']
+
+        self.mock_host_rpm_builder = mock_host_rpm_builder
+
+    def test_should_return_none_when_incremental_build_is_disabled(self, mock_host_state_class, mock_apply_change_set, mock_shutil, mock_exists, mock_rmtree, mock_rmdir, mock_mkdir):
+
+        self.mock_host_rpm_builder.host_state_directory = ''
+
+        actual = HostRpmBuilder._apply_change_set_to_previous_host_tree(self.mock_host_rpm_builder)
+
+        self.assertEqual(None, actual)
+        self.assert_mock_never_called(mock_host_state_class.load)
+
+    def test_should_return_none_when_there_is_no_previous_host_state(self, mock_host_state_class, mock_apply_change_set, mock_shutil, mock_exists, mock_rmtree, mock_rmdir, mock_mkdir):
+
+        mock_host_state_class.load.return_value = None
+
+        actual = HostRpmBuilder._apply_change_set_to_previous_host_tree(self.mock_host_rpm_builder)
+
+        self.assertEqual(None, actual)
+        mock_host_state_class.load.assert_called_with('/host-states/devweb01')
+
+    def test_should_return_none_when_previous_host_state_is_not_older(self, mock_host_state_class, mock_apply_change_set, mock_shutil, mock_exists, mock_rmtree, mock_rmdir, mock_mkdir):
+
+        self.mock_previous_host_state.revision = '124'
+        mock_host_state_class.load.return_value = self.mock_previous_host_state
+
+        actual = HostRpmBuilder._apply_change_set_to_previous_host_tree(self.mock_host_rpm_builder)
+
+        self.assertEqual(None, actual)
+        self.assert_mock_never_called(mock_apply_change_set)
+
+    def test_should_apply_change_sets_since_previous_revision(self, mock_host_state_class, mock_apply_change_set, mock_shutil, mock_exists, mock_rmtree, mock_rmdir, mock_mkdir):
+
+        mock_host_state_class.load.return_value = self.mock_previous_host_state
+        mock_apply_change_set.return_value = {'files': ['all'], 'files/file_from_all': ['all']}
+
+        actual_svn_paths, actual_exported, actual_requires, actual_provides = HostRpmBuilder._apply_change_set_to_previous_host_tree(self.mock_host_rpm_builder)
+
+        self.mock_svn_service.get_changed_paths_with_action.assert_called_with('124', first_revision=124)
+        mock_shutil.copytree.assert_called_with(self.mock_previous_host_state.tree_directory, '/work/yadt-config-devweb01', symlinks=True)
+        self.assertEqual(['all', 'typ/web', 'loc/dev', 'loctyp/devweb', 'host/devweb01'], actual_svn_paths)
+        self.assertEqual(['all-req'], actual_requires)
+        self.assertEqual(['all-prov'], actual_provides)
+        self.assertTrue([('all', 'files'), ('all', 'files/file_from_all')] in actual_exported.values())
+
+    def test_should_build_from_scratch_when_change_set_could_not_be_applied(self, mock_host_state_class, mock_apply_change_set, mock_shutil, mock_exists, mock_rmtree, mock_rmdir, mock_mkdir):
+
+        mock_host_state_class.load.return_value = self.mock_previous_host_state
+        mock_apply_change_set.side_effect = CouldNotApplyChangeSetException('dependency file changed')
+        mock_exists.return_value = True
+
+        actual = HostRpmBuilder._apply_change_set_to_previous_host_tree(self.mock_host_rpm_builder)
+
+        self.assertEqual(None, actual)
+        mock_rmtree.assert_any_call('/work/yadt-config-devweb01')
+        mock_mkdir.assert_called_with('/work/yadt-config-devweb01')
+        self.mock_host_rpm_builder.svn_service_queue.put.assert_called_with(self.mock_svn_service)
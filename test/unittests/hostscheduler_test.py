@@ -0,0 +1,201 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from os import makedirs
+from os.path import join
+from shutil import rmtree
+from sys import maxint
+from tempfile import mkdtemp
+from threading import Thread
+
+from mock import Mock
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.hostscheduler import HostScheduler, _count_files, order_hosts_by_name, order_largest_hosts_first
+from config_rpm_maker.workdirbudget import WorkDirBudget
+
+
+class HostSchedulerTests(UnitTests):
+
+    def test_should_return_hosts_in_given_order(self):
+
+        host_scheduler = HostScheduler(['devweb01', 'berweb01', 'tuvweb01'])
+
+        self.assertEqual(['devweb01', 'berweb01', 'tuvweb01'], list(host_scheduler))
+        self.assertEqual(3, host_scheduler.count_of_started_hosts)
+
+    def test_should_return_none_when_there_are_no_hosts(self):
+
+        self.assertEqual(None, HostScheduler().next_host())
+
+    def test_should_return_canary_hosts_first(self):
+
+        host_scheduler = HostScheduler(['berweb01', 'devweb01', 'tuvweb01'], canary_hosts=['tuvweb01'])
+
+        self.assertEqual('tuvweb01', host_scheduler.next_host())
+
+    def test_should_hold_back_hosts_until_canary_hosts_are_done(self):
+
+        host_scheduler = HostScheduler(['berweb01', 'devweb01'], canary_hosts=['devweb01'])
+        self.assertEqual('devweb01', host_scheduler.next_host())
+        hosts = []
+        thread = Thread(target=lambda: hosts.append(host_scheduler.next_host()))
+        thread.start()
+
+        thread.join(0.1)
+        self.assertEqual([], hosts)
+
+        host_scheduler.host_done('devweb01')
+        thread.join()
+        self.assertEqual(['berweb01'], hosts)
+
+    def test_should_hold_back_hosts_while_work_dir_budget_has_no_room_for_another_host(self):
+
+        mock_work_dir_budget = Mock(WorkDirBudget)
+        mock_work_dir_budget.has_room_for_another_host.return_value = False
+        host_scheduler = HostScheduler(['berweb01', 'devweb01'], work_dir_budget=mock_work_dir_budget)
+        self.assertEqual('berweb01', host_scheduler.next_host())
+        hosts = []
+        thread = Thread(target=lambda: hosts.append(host_scheduler.next_host()))
+        thread.start()
+
+        thread.join(0.1)
+        self.assertEqual([], hosts)
+
+        mock_work_dir_budget.has_room_for_another_host.return_value = True
+        host_scheduler.host_done('berweb01')
+        thread.join()
+        self.assertEqual(['devweb01'], hosts)
+        self.assertEqual(1, host_scheduler.count_of_held_back_hosts)
+        mock_work_dir_budget.host_done.assert_called_with('berweb01')
+
+    def test_should_start_host_regardless_of_work_dir_budget_when_no_other_host_is_in_progress(self):
+
+        mock_work_dir_budget = Mock(WorkDirBudget)
+        mock_work_dir_budget.has_room_for_another_host.return_value = False
+        host_scheduler = HostScheduler(['berweb01'], work_dir_budget=mock_work_dir_budget)
+
+        self.assertEqual('berweb01', host_scheduler.next_host())
+        mock_work_dir_budget.host_started.assert_called_with('berweb01')
+
+    def test_should_cancel_remaining_hosts_when_canary_host_failed(self):
+
+        host_scheduler = HostScheduler(['berweb01', 'devweb01', 'tuvweb01'], canary_hosts=['devweb01'])
+        host_scheduler.next_host()
+
+        host_scheduler.host_done('devweb01', failed=True)
+
+        self.assertEqual(None, host_scheduler.next_host())
+        self.assertTrue(host_scheduler.canary_host_failed)
+        self.assertEqual(2, host_scheduler.count_of_cancelled_hosts)
+
+    def test_should_not_cancel_remaining_hosts_when_other_host_failed(self):
+
+        host_scheduler = HostScheduler(['berweb01', 'devweb01'])
+        host_scheduler.next_host()
+
+        host_scheduler.host_done('berweb01', failed=True)
+
+        self.assertEqual('devweb01', host_scheduler.next_host())
+
+    def test_should_cancel_hosts_which_have_not_been_started(self):
+
+        host_scheduler = HostScheduler(['berweb01', 'devweb01', 'tuvweb01'])
+        host_scheduler.next_host()
+
+        host_scheduler.cancel()
+
+        self.assertEqual(None, host_scheduler.next_host())
+        self.assertEqual(2, host_scheduler.count_of_cancelled_hosts)
+
+    def test_should_count_finished_hosts(self):
+
+        host_scheduler = HostScheduler(['berweb01', 'devweb01'])
+        host_scheduler.next_host()
+        host_scheduler.cancel()
+        host_scheduler.host_done('berweb01')
+
+        self.assertEqual(1, host_scheduler.count_of_finished_hosts)
+
+    def test_should_log_count_of_cancelled_hosts(self):
+
+        mock_logging_function = Mock()
+        host_scheduler = HostScheduler(['berweb01', 'devweb01'])
+        host_scheduler.cancel()
+
+        host_scheduler.log_statistics(mock_logging_function)
+
+        mock_logging_function.assert_called_with('Cancelled %s host(s), %s host(s) have been started.', 2, 0)
+
+    def test_should_log_count_of_held_back_hosts(self):
+
+        mock_logging_function = Mock()
+        host_scheduler = HostScheduler(['berweb01'])
+        host_scheduler.count_of_held_back_hosts = 3
+
+        host_scheduler.log_statistics(mock_logging_function)
+
+        mock_logging_function.assert_called_with('Held back %s host(s) until other hosts freed space in the work directory.', 3)
+
+    def test_should_not_log_statistics_when_no_host_has_been_cancelled(self):
+
+        mock_logging_function = Mock()
+
+        HostScheduler(['berweb01']).log_statistics(mock_logging_function)
+
+        self.assert_mock_never_called(mock_logging_function)
+
+
+class OrderHostsTests(UnitTests):
+
+    def setUp(self):
+        self.directory = mkdtemp(prefix=self.__class__.__name__ + '_')
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def create_files(self, host, count_of_files):
+        host_directory = join(self.directory, host)
+        makedirs(join(host_directory, 'etc'))
+        for i in range(count_of_files):
+            open(join(host_directory, 'etc', 'file%d' % i), 'w').close()
+
+    def test_should_order_hosts_by_name(self):
+
+        self.assertEqual(['berweb01', 'devweb01', 'tuvweb01'], order_hosts_by_name(['devweb01', 'tuvweb01', 'berweb01']))
+
+    def test_should_order_largest_hosts_first(self):
+
+        self.create_files('berweb01', 1)
+        self.create_files('devweb01', 3)
+        self.create_files('tuvweb01', 2)
+
+        actual_hosts = order_largest_hosts_first(['berweb01', 'devweb01', 'tuvweb01'], lambda host: join(self.directory, host))
+
+        self.assertEqual(['devweb01', 'tuvweb01', 'berweb01'], actual_hosts)
+
+    def test_should_order_hosts_without_previous_build_first(self):
+
+        self.create_files('berweb01', 1)
+
+        actual_hosts = order_largest_hosts_first(['berweb01', 'devweb01'], lambda host: join(self.directory, host))
+
+        self.assertEqual(['devweb01', 'berweb01'], actual_hosts)
+
+    def test_should_count_files_of_missing_directory_as_maximum(self):
+
+        self.assertEqual(maxint, _count_files(join(self.directory, 'does-not-exist')))
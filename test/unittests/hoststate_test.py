@@ -0,0 +1,338 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from os import makedirs
+from os.path import dirname, exists, isdir, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from mock import Mock, patch
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.hoststate import (CouldNotApplyChangeSetException,
+                                        HostState,
+                                        apply_change_set,
+                                        build_overlay,
+                                        filter_directory,
+                                        get_exported_paths,
+                                        _get_path_within_svn_path,
+                                        _get_referenced_tokens)
+
+
+class BuildOverlayTests(UnitTests):
+
+    def test_should_return_svn_paths_providing_each_path_in_overlay_order(self):
+
+        actual_overlay = build_overlay([('all', 'files'), ('all', 'files/override'), ('typ/web', 'files'), ('typ/web', 'files/override')])
+
+        self.assertEqual({'files': ['all', 'typ/web'], 'files/override': ['all', 'typ/web']}, actual_overlay)
+
+    def test_should_return_each_svn_path_only_once(self):
+
+        actual_overlay = build_overlay([('all', 'files'), ('all', 'files')])
+
+        self.assertEqual({'files': ['all']}, actual_overlay)
+
+
+class GetExportedPathsTests(UnitTests):
+
+    def test_should_return_sorted_paths_provided_by_svn_path(self):
+
+        overlay = {'files/override': ['all', 'typ/web'], 'files': ['all'], 'files/file_from_web': ['typ/web']}
+
+        actual_exported_paths = get_exported_paths(overlay, 'typ/web')
+
+        self.assertEqual([('typ/web', 'files/file_from_web'), ('typ/web', 'files/override')], actual_exported_paths)
+
+
+class GetPathWithinSvnPathTests(UnitTests):
+
+    def test_should_return_path_relative_to_svn_path(self):
+
+        self.assertEqual('files/override', _get_path_within_svn_path('typ/web/files/override', 'typ/web'))
+
+    def test_should_return_empty_path_when_svn_path_changed(self):
+
+        self.assertEqual('', _get_path_within_svn_path('typ/web', 'typ/web'))
+
+    def test_should_return_empty_path_when_parent_of_svn_path_changed(self):
+
+        self.assertEqual('', _get_path_within_svn_path('typ', 'typ/web'))
+
+    def test_should_return_none_when_svn_path_is_not_affected(self):
+
+        self.assertEqual(None, _get_path_within_svn_path('typ/webserver/files', 'typ/web'))
+        self.assertEqual(None, _get_path_within_svn_path('all/files', 'typ/web'))
+
+
+class GetReferencedTokensTests(UnitTests):
+
+    def test_should_return_sorted_tokens(self):
+
+        self.assertEqual(['HOST', 'REVISION'], _get_referenced_tokens('@@@REVISION@@@ @@@HOST@@@ @@@HOST@@@'))
+
+    def test_should_return_none_when_content_is_not_ascii_compatible(self):
+
+        self.assertEqual(None, _get_referenced_tokens('@\x00@\x00@\x00'))
+
+
+@patch('config_rpm_maker.hoststate.exists')
+class CanReuseFilteredFileTests(UnitTests):
+
+    def setUp(self):
+        self.host_state = HostState('/host-states/devweb01')
+        self.host_state.token_values = {'HOST': 'devweb01', 'REVISION': '123'}
+        self.host_state.files = {'files/host': ('digest', ['HOST']), 'files/binary': ('digest', None)}
+
+    def test_should_reuse_file_when_content_and_token_values_did_not_change(self, mock_exists):
+
+        self.assertTrue(self.host_state.can_reuse_filtered_file('files/host', 'digest', ['HOST'], {'HOST': 'devweb01', 'REVISION': '124'}))
+
+        mock_exists.assert_called_with('/host-states/devweb01/filtered/files/host')
+
+    def test_should_not_reuse_file_when_content_changed(self, mock_exists):
+
+        self.assertFalse(self.host_state.can_reuse_filtered_file('files/host', 'other digest', ['HOST'], {'HOST': 'devweb01'}))
+
+    def test_should_not_reuse_file_when_token_value_changed(self, mock_exists):
+
+        self.assertFalse(self.host_state.can_reuse_filtered_file('files/host', 'digest', ['HOST'], {'HOST': 'devweb02'}))
+
+    def test_should_not_reuse_file_when_token_is_missing(self, mock_exists):
+
+        self.assertFalse(self.host_state.can_reuse_filtered_file('files/host', 'digest', ['HOST'], {}))
+
+    def test_should_not_reuse_unknown_file(self, mock_exists):
+
+        self.assertFalse(self.host_state.can_reuse_filtered_file('files/new', 'digest', [], {}))
+
+    def test_should_only_reuse_file_without_known_tokens_when_no_token_value_changed(self, mock_exists):
+
+        self.assertFalse(self.host_state.can_reuse_filtered_file('files/binary', 'digest', None, {'HOST': 'devweb01', 'REVISION': '124'}))
+        self.assertTrue(self.host_state.can_reuse_filtered_file('files/binary', 'digest', None, {'HOST': 'devweb01', 'REVISION': '123'}))
+
+
+class ApplyChangeSetTests(UnitTests):
+
+    def setUp(self):
+        self.temporary_directory = mkdtemp(prefix='yadt-config-rpm-maker.hoststate-test.')
+        self.host_config_dir = join(self.temporary_directory, 'host')
+        self.staging_directory = join(self.temporary_directory, 'staging')
+        self.svn_paths = ['all', 'typ/web', 'host/devweb01']
+        self.repository = {'all/files/override': 'all',
+                           'typ/web/files/override': 'web',
+                           'typ/web/files/file_from_web': 'web'}
+        self.svn_service = Mock()
+        self.svn_service.export.side_effect = self.export
+
+        self.write_file(join(self.host_config_dir, 'files', 'override'), 'web')
+        self.write_file(join(self.host_config_dir, 'files', 'file_from_web'), 'web')
+        self.overlay = {'files': ['all', 'typ/web'],
+                        'files/override': ['all', 'typ/web'],
+                        'files/file_from_web': ['typ/web']}
+
+    def tearDown(self):
+        rmtree(self.temporary_directory)
+
+    def export(self, svn_path, target, revision):
+        exported_paths = []
+        for path in sorted(self.repository.keys()):
+            if path == svn_path:
+                self.write_file(target, self.repository[path])
+            elif path.startswith(svn_path + '/'):
+                relative_path = path[len(svn_path) + 1:]
+                self.write_file(join(target, relative_path), self.repository[path])
+                exported_paths.append((svn_path, relative_path))
+        return exported_paths
+
+    def write_file(self, path, content):
+        if not exists(dirname(path)):
+            makedirs(dirname(path))
+        with open(path, 'w') as file_to_write:
+            file_to_write.write(content)
+
+    def read_file(self, path):
+        with open(join(self.host_config_dir, path)) as file_to_read:
+            return file_to_read.read()
+
+    def apply_change_set(self, changed_paths_with_action):
+        return apply_change_set(self.overlay, changed_paths_with_action, self.host_config_dir,
+                                self.svn_paths, self.svn_service, '124', self.staging_directory)
+
+    def test_should_copy_modified_file_of_winning_svn_path(self):
+
+        self.repository['typ/web/files/override'] = 'modified'
+
+        self.apply_change_set([('typ/web/files/override', 'M')])
+
+        self.assertEqual('modified', self.read_file('files/override'))
+
+    def test_should_not_export_modified_file_which_is_overlaid(self):
+
+        self.apply_change_set([('all/files/override', 'M')])
+
+        self.assert_mock_never_called(self.svn_service.export)
+        self.assertEqual('web', self.read_file('files/override'))
+
+    def test_should_add_file_and_return_overlay_containing_it(self):
+
+        self.repository['host/devweb01/files/override'] = 'devweb01'
+
+        actual_overlay = self.apply_change_set([('host/devweb01/files/override', 'A')])
+
+        self.assertEqual('devweb01', self.read_file('files/override'))
+        self.assertEqual(['all', 'typ/web', 'host/devweb01'], actual_overlay['files/override'])
+
+    def test_should_add_file_which_is_overlaid_without_copying_it(self):
+
+        self.repository['all/files/file_from_web'] = 'all'
+
+        actual_overlay = self.apply_change_set([('all/files/file_from_web', 'A')])
+
+        self.assertEqual('web', self.read_file('files/file_from_web'))
+        self.assertEqual(['all', 'typ/web'], actual_overlay['files/file_from_web'])
+
+    def test_should_add_all_files_of_added_directory(self):
+
+        self.repository['host/devweb01/files/override'] = 'devweb01'
+        self.repository['host/devweb01/files/file_from_host'] = 'devweb01'
+
+        self.apply_change_set([('host/devweb01/files', 'A')])
+
+        self.assertEqual('devweb01', self.read_file('files/override'))
+        self.assertEqual('devweb01', self.read_file('files/file_from_host'))
+
+    def test_should_remove_deleted_file(self):
+
+        del self.repository['typ/web/files/file_from_web']
+
+        actual_overlay = self.apply_change_set([('typ/web/files/file_from_web', 'D')])
+
+        self.assertFalse(exists(join(self.host_config_dir, 'files', 'file_from_web')))
+        self.assertFalse('files/file_from_web' in actual_overlay)
+
+    def test_should_export_overlaid_file_when_winning_file_has_been_deleted(self):
+
+        del self.repository['typ/web/files/override']
+
+        actual_overlay = self.apply_change_set([('typ/web/files/override', 'D')])
+
+        self.assertEqual('all', self.read_file('files/override'))
+        self.assertEqual(['all'], actual_overlay['files/override'])
+
+    def test_should_remove_all_files_of_deleted_directory(self):
+
+        actual_overlay = self.apply_change_set([('typ/web/files', 'D')])
+
+        self.assertEqual('all', self.read_file('files/override'))
+        self.assertFalse(exists(join(self.host_config_dir, 'files', 'file_from_web')))
+        self.assertEqual({'files': ['all'], 'files/override': ['all']}, actual_overlay)
+
+    def test_should_ignore_changes_of_other_svn_paths(self):
+
+        actual_overlay = self.apply_change_set([('typ/db/files/override', 'M'), ('host/berweb01', 'D')])
+
+        self.assert_mock_never_called(self.svn_service.export)
+        self.assertEqual(self.overlay, actual_overlay)
+
+    def test_should_not_modify_given_overlay(self):
+
+        self.apply_change_set([('typ/web/files', 'D')])
+
+        self.assertEqual(['all', 'typ/web'], self.overlay['files/override'])
+
+    def test_should_raise_exception_when_dependency_file_changed(self):
+
+        self.assertRaises(CouldNotApplyChangeSetException, self.apply_change_set, [('all/VARIABLES/RPM_REQUIRES', 'M')])
+
+    def test_should_raise_exception_when_svn_path_has_been_deleted(self):
+
+        self.assertRaises(CouldNotApplyChangeSetException, self.apply_change_set, [('all', 'D')])
+
+    def test_should_raise_exception_when_variables_directory_has_been_deleted(self):
+
+        self.assertRaises(CouldNotApplyChangeSetException, self.apply_change_set, [('all/VARIABLES', 'D')])
+
+    def test_should_raise_exception_when_path_has_been_replaced(self):
+
+        self.assertRaises(CouldNotApplyChangeSetException, self.apply_change_set, [('typ/web/files/override', 'R')])
+
+
+class FilterDirectoryTests(UnitTests):
+
+    def setUp(self):
+        self.temporary_directory = mkdtemp(prefix='yadt-config-rpm-maker.hoststate-test.')
+        self.directory = join(self.temporary_directory, 'host')
+        self.file_path = join(self.directory, 'files', 'host')
+        makedirs(dirname(self.file_path))
+        with open(self.file_path, 'w') as file_to_write:
+            file_to_write.write('@@@HOST@@@')
+
+        self.token_replacer = Mock()
+        self.token_replacer.token_values = {'HOST': 'devweb01'}
+
+    def tearDown(self):
+        rmtree(self.temporary_directory)
+
+    def test_should_filter_files_when_there_is_no_previous_host_state(self):
+
+        actual_files = filter_directory(self.directory, self.token_replacer, None)
+
+        self.token_replacer.filter_file.assert_called_with(self.file_path, viewer_token_replacer=None, viewer_filename=None)
+        self.assertEqual(['files/host'], actual_files.keys())
+        self.assertEqual(['HOST'], actual_files['files/host'][1])
+
+    def test_should_copy_filtered_file_of_previous_host_state(self):
+
+        previous_host_state = Mock(HostState)
+        previous_host_state.filtered_directory = join(self.temporary_directory, 'filtered')
+        previous_host_state.can_reuse_filtered_file.return_value = True
+        makedirs(join(previous_host_state.filtered_directory, 'files'))
+        with open(join(previous_host_state.filtered_directory, 'files', 'host'), 'w') as file_to_write:
+            file_to_write.write('devweb01')
+
+        filter_directory(self.directory, self.token_replacer, previous_host_state)
+
+        self.assert_mock_never_called(self.token_replacer.filter_file)
+        with open(self.file_path) as filtered_file:
+            self.assertEqual('devweb01', filtered_file.read())
+
+    def test_should_write_config_viewer_file_when_filtering_file(self):
+
+        mock_viewer_token_replacer = Mock()
+        viewer_directory = join(self.temporary_directory, 'viewer')
+
+        filter_directory(self.directory, self.token_replacer, None, mock_viewer_token_replacer, viewer_directory)
+
+        self.token_replacer.filter_file.assert_called_with(self.file_path, viewer_token_replacer=mock_viewer_token_replacer,
+                                                           viewer_filename=join(viewer_directory, 'files', 'host'))
+        self.assertTrue(isdir(join(viewer_directory, 'files')))
+
+    def test_should_write_config_viewer_file_from_not_yet_filtered_file_when_reusing_filtered_file(self):
+
+        previous_host_state = Mock(HostState)
+        previous_host_state.filtered_directory = join(self.temporary_directory, 'filtered')
+        previous_host_state.can_reuse_filtered_file.return_value = True
+        makedirs(join(previous_host_state.filtered_directory, 'files'))
+        with open(join(previous_host_state.filtered_directory, 'files', 'host'), 'w') as file_to_write:
+            file_to_write.write('devweb01')
+        mock_viewer_token_replacer = Mock()
+        viewer_directory = join(self.temporary_directory, 'viewer')
+
+        filter_directory(self.directory, self.token_replacer, previous_host_state, mock_viewer_token_replacer, viewer_directory)
+
+        mock_viewer_token_replacer.filter_file.assert_called_with(self.file_path, html_escape=True, target_filename=join(viewer_directory, 'files', 'host'))
@@ -0,0 +1,126 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from os import chmod, makedirs, symlink
+from os.path import exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.rpmmanifest import (calculate_rpm_digest,
+                                          get_rpm_manifest_path,
+                                          load_rpm_manifest,
+                                          publish_rpm_manifests,
+                                          write_rpm_manifest)
+
+TOKEN_VALUES = {'HOST': 'devweb01', 'REVISION': '123', 'SVNLOG': 'r123 | changed', 'VARIABLES': 'REVISION : 123'}
+
+
+class CalculateRpmDigestTests(UnitTests):
+
+    def setUp(self):
+        self.directory = mkdtemp(prefix=self.__class__.__name__ + '_')
+        makedirs(join(self.directory, 'etc'))
+        self.write_file('etc/spam', 'spam @@@HOST@@@')
+        self.write_file('yadt-config-devweb01.spec', 'Release: @@@REVISION@@@')
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def write_file(self, path, content):
+        with open(join(self.directory, path), 'w') as file_to_write:
+            file_to_write.write(content)
+
+    def test_should_return_same_digest_when_only_revision_tokens_changed(self):
+
+        digest = calculate_rpm_digest(self.directory, TOKEN_VALUES)
+
+        token_values = dict(TOKEN_VALUES, REVISION='124', SVNLOG='r124 | changed again', VARIABLES='REVISION : 124')
+        self.assertEqual(digest, calculate_rpm_digest(self.directory, token_values))
+
+    def test_should_return_other_digest_when_token_value_changed(self):
+
+        digest = calculate_rpm_digest(self.directory, TOKEN_VALUES)
+
+        self.assertNotEqual(digest, calculate_rpm_digest(self.directory, dict(TOKEN_VALUES, HOST='devweb02')))
+
+    def test_should_return_other_digest_when_content_changed(self):
+
+        digest = calculate_rpm_digest(self.directory, TOKEN_VALUES)
+        self.write_file('etc/spam', 'eggs @@@HOST@@@')
+
+        self.assertNotEqual(digest, calculate_rpm_digest(self.directory, TOKEN_VALUES))
+
+    def test_should_return_other_digest_when_mode_changed(self):
+
+        digest = calculate_rpm_digest(self.directory, TOKEN_VALUES)
+        chmod(join(self.directory, 'etc', 'spam'), 0755)
+
+        self.assertNotEqual(digest, calculate_rpm_digest(self.directory, TOKEN_VALUES))
+
+    def test_should_return_other_digest_when_symbolic_link_added(self):
+
+        digest = calculate_rpm_digest(self.directory, TOKEN_VALUES)
+        symlink('etc', join(self.directory, 'link'))
+
+        self.assertNotEqual(digest, calculate_rpm_digest(self.directory, TOKEN_VALUES))
+
+
+class RpmManifestTests(UnitTests):
+
+    def setUp(self):
+        self.work_dir = mkdtemp(prefix=self.__class__.__name__ + '_')
+        self.manifest_directory = join(self.work_dir, 'manifests')
+
+    def tearDown(self):
+        rmtree(self.work_dir)
+
+    def test_should_load_written_manifest(self):
+
+        path = get_rpm_manifest_path(self.work_dir, 'devweb01')
+        write_rpm_manifest(path, '123', 'digest')
+
+        self.assertEqual({'revision': '123', 'digest': 'digest'}, load_rpm_manifest(path))
+
+    def test_should_return_none_when_manifest_can_not_be_read(self):
+
+        path = get_rpm_manifest_path(self.work_dir, 'devweb01')
+        with open(path, 'w') as manifest_file:
+            manifest_file.write('{"revision": "123"}')
+
+        self.assertEqual(None, load_rpm_manifest(path))
+        self.assertEqual(None, load_rpm_manifest(join(self.work_dir, 'does-not-exist')))
+
+    def test_should_publish_manifests_and_return_unchanged_hosts(self):
+
+        write_rpm_manifest(get_rpm_manifest_path(self.work_dir, 'devweb01'), '123', 'digest')
+
+        unchanged_hosts = publish_rpm_manifests(self.work_dir, self.manifest_directory, ['devweb01', 'berweb01'])
+
+        self.assertEqual(['berweb01'], unchanged_hosts)
+        self.assertEqual({'revision': '123', 'digest': 'digest'}, load_rpm_manifest(get_rpm_manifest_path(self.manifest_directory, 'devweb01')))
+        self.assertFalse(exists(get_rpm_manifest_path(self.work_dir, 'devweb01')))
+
+    def test_should_not_replace_manifest_of_newer_revision(self):
+
+        makedirs(self.manifest_directory)
+        write_rpm_manifest(get_rpm_manifest_path(self.manifest_directory, 'devweb01'), '124', 'newer digest')
+        write_rpm_manifest(get_rpm_manifest_path(self.work_dir, 'devweb01'), '123', 'digest')
+
+        publish_rpm_manifests(self.work_dir, self.manifest_directory, ['devweb01'])
+
+        self.assertEqual({'revision': '124', 'digest': 'newer digest'}, load_rpm_manifest(get_rpm_manifest_path(self.manifest_directory, 'devweb01')))
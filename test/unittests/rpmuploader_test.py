@@ -0,0 +1,162 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from mock import Mock, patch
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.rpmuploader import CouldNotUploadRpmsException, RpmUploader, UploadingRpmQueue
+
+
+def create_process(returncode):
+    mock_process = Mock()
+    mock_process.returncode = returncode
+    mock_process.communicate.return_value = ('stdout', 'stderr')
+    return mock_process
+
+
+@patch('config_rpm_maker.rpmuploader.Popen')
+class RpmUploaderTests(UnitTests):
+
+    def upload(self, rpm_uploader, rpms):
+        rpm_uploader.start()
+        for rpm in rpms:
+            rpm_uploader.add(rpm)
+        rpm_uploader.finish()
+
+    def test_should_upload_rpms_in_chunks(self, mock_popen):
+
+        mock_popen.return_value = create_process(0)
+        rpm_uploader = RpmUploader('upload', 2, 1)
+
+        self.upload(rpm_uploader, ['a.rpm', 'b.rpm', 'c.rpm'])
+
+        self.assertEqual(['upload a.rpm b.rpm', 'upload c.rpm'], [call_args[0][0] for call_args in mock_popen.call_args_list])
+        self.assertEqual(['a.rpm', 'b.rpm', 'c.rpm'], rpm_uploader.uploaded_rpms)
+
+    def test_should_upload_all_rpms_in_one_chunk_when_chunk_size_is_zero(self, mock_popen):
+
+        mock_popen.return_value = create_process(0)
+
+        self.upload(RpmUploader('upload', 0, 2), ['a.rpm', 'b.rpm', 'c.rpm'])
+
+        mock_popen.assert_called_once_with('upload a.rpm b.rpm c.rpm', shell=True, stdout=-1, stderr=-1)
+
+    def test_should_upload_full_chunk_before_finishing(self, mock_popen):
+
+        mock_popen.return_value = create_process(0)
+        rpm_uploader = RpmUploader('upload', 2, 1)
+        rpm_uploader.start()
+
+        rpm_uploader.add('a.rpm')
+        rpm_uploader.add('b.rpm')
+        rpm_uploader.add('c.rpm')
+        rpm_uploader._chunk_queue.join()
+
+        mock_popen.assert_called_once_with('upload a.rpm b.rpm', shell=True, stdout=-1, stderr=-1)
+        rpm_uploader.finish()
+
+    def test_should_not_upload_pending_rpms_when_told_so(self, mock_popen):
+
+        rpm_uploader = RpmUploader('upload', 2, 1)
+        rpm_uploader.start()
+        rpm_uploader.add('a.rpm')
+
+        rpm_uploader.finish(upload_pending_rpms=False)
+
+        self.assert_mock_never_called(mock_popen)
+
+    def test_should_raise_exception_and_stop_uploading_when_upload_failed(self, mock_popen):
+
+        mock_popen.return_value = create_process(1)
+        rpm_uploader = RpmUploader('upload', 1, 1)
+
+        self.assertRaises(CouldNotUploadRpmsException, self.upload, rpm_uploader, ['a.rpm', 'b.rpm', 'c.rpm'])
+
+        mock_popen.assert_called_once_with('upload a.rpm', shell=True, stdout=-1, stderr=-1)
+        self.assertEqual([], rpm_uploader.uploaded_rpms)
+
+    def test_should_raise_exception_when_upload_command_could_not_be_executed(self, mock_popen):
+
+        mock_popen.side_effect = OSError('No such file or directory')
+        rpm_uploader = RpmUploader('upload', 1, 1)
+
+        self.assertRaises(CouldNotUploadRpmsException, self.upload, rpm_uploader, ['a.rpm'])
+
+        self.assertEqual([], rpm_uploader.uploaded_rpms)
+
+    @patch('config_rpm_maker.rpmuploader.sleep')
+    def test_should_retry_failed_upload_with_exponential_back_off(self, mock_sleep, mock_popen):
+
+        mock_popen.side_effect = [create_process(1), create_process(1), create_process(0)]
+        rpm_uploader = RpmUploader('upload', 2, 1, retries=3, retry_delay=5)
+
+        self.upload(rpm_uploader, ['a.rpm', 'b.rpm'])
+
+        self.assertEqual([((5,), {}), ((10,), {})], mock_sleep.call_args_list)
+        self.assertEqual(['a.rpm', 'b.rpm'], rpm_uploader.uploaded_rpms)
+        self.assertEqual(3, rpm_uploader.chunk_statistics[0][2])
+
+    @patch('config_rpm_maker.rpmuploader.sleep')
+    def test_should_raise_exception_when_all_retries_failed(self, mock_sleep, mock_popen):
+
+        mock_popen.return_value = create_process(1)
+        rpm_uploader = RpmUploader('upload', 2, 1, retries=2, retry_delay=1)
+
+        self.assertRaises(CouldNotUploadRpmsException, self.upload, rpm_uploader, ['a.rpm'])
+
+        self.assertEqual(3, mock_popen.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+
+    @patch('config_rpm_maker.rpmuploader.record_throughput')
+    @patch('config_rpm_maker.rpmuploader.getsize')
+    @patch('config_rpm_maker.rpmuploader.exists')
+    def test_should_record_throughput_of_uploaded_chunks(self, mock_exists, mock_getsize, mock_record_throughput, mock_popen):
+
+        mock_popen.return_value = create_process(0)
+        mock_exists.return_value = True
+        mock_getsize.return_value = 1024
+        rpm_uploader = RpmUploader('upload', 2, 1)
+
+        self.upload(rpm_uploader, ['a.rpm', 'b.rpm', 'c.rpm'])
+
+        self.assertEqual(3, mock_record_throughput.call_count)
+        recorded_arguments = [call_arguments[0][:3] for call_arguments in mock_record_throughput.call_args_list]
+        self.assertEqual([('RpmUploader._upload_chunk', 2, 2048),
+                          ('RpmUploader._upload_chunk', 1, 1024),
+                          ('RpmUploader', 3, 3072)], recorded_arguments)
+
+    @patch('config_rpm_maker.rpmuploader.record_throughput')
+    def test_should_not_record_throughput_when_nothing_has_been_uploaded(self, mock_record_throughput, mock_popen):
+
+        rpm_uploader = RpmUploader('upload', 2, 1)
+
+        self.upload(rpm_uploader, [])
+
+        self.assert_mock_never_called(mock_record_throughput)
+
+
+class UploadingRpmQueueTests(UnitTests):
+
+    def test_should_hand_over_rpm_to_uploader(self):
+
+        mock_rpm_uploader = Mock(RpmUploader)
+        rpm_queue = UploadingRpmQueue(mock_rpm_uploader)
+
+        rpm_queue.put('a.rpm')
+
+        self.assertEqual(['a.rpm'], list(rpm_queue.queue))
+        mock_rpm_uploader.add.assert_called_with('a.rpm')
@@ -0,0 +1,276 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+
+from cStringIO import StringIO
+from hashlib import sha1
+from mock import patch
+from stat import S_IFDIR, S_IFREG
+from struct import unpack
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.rpmwriter import (RPMSENSE_EQUAL,
+                                        RPMSENSE_GREATER,
+                                        RPMSENSE_LESS,
+                                        RPM_INT32_TYPE,
+                                        RPM_STRING_ARRAY_TYPE,
+                                        RPM_STRING_TYPE,
+                                        NotSupportedByRpmWriterException,
+                                        RpmFile,
+                                        SpecFile,
+                                        _Header,
+                                        _create_lead,
+                                        _create_payload,
+                                        get_interpreter_requires,
+                                        parse_dependencies)
+
+EMPTY_BUILD_SECTIONS_DIGEST = sha1('%prep\n%build\n%install\n%clean').hexdigest()
+
+SPEC_FILE = """
+%define repos_suffix repos
+
+Name:    yadt-config-devweb01
+Version: 21
+Release: 42
+Summary: YADT config RPM for devweb01
+Group:   YADT
+License: GPL
+BuildRoot: %(mktemp -ud %{_tmppath}/%{name}-%{version}-%{release}-XXXXXX)
+BuildArch: noarch
+Provides: yadt-config-all, spam
+Requires: yadt-minion, %{name}-%{repos_suffix} = %{version}-%{release}
+
+%description
+Generated for %name: 100% done
+
+%files -f files.lst
+
+%package -n %{name}-repos
+Requires: yum
+Summary: YADT config RPM - YUM Repo definitions
+
+%description -n %{name}-repos
+The repos of devweb01.
+
+%files -n %{name}-repos -f files-repos.lst
+"""
+
+
+def read_header(data):
+    """ Returns the entries of the rpm header at the beginning of data as dictionary tag -> (type, offset, count)
+        and the data store of the header """
+
+    magic, count_of_entries, size_of_data = unpack('>8sii', data[:16])
+    entries = {}
+    for index in range(count_of_entries):
+        tag, tag_type, offset, count = unpack('>iiii', data[16 + index * 16:32 + index * 16])
+        entries[tag] = (tag_type, offset, count)
+    store_start = 16 + count_of_entries * 16
+    return magic, entries, data[store_start:store_start + size_of_data]
+
+
+def read_cpio_names(payload):
+    archive = gzip.GzipFile(fileobj=StringIO(payload)).read()
+    names = []
+    position = 0
+    while True:
+        header = archive[position:position + 110]
+        name_size = int(header[94:102], 16)
+        file_size = int(header[54:62], 16)
+        name = archive[position + 110:position + 110 + name_size - 1]
+        if name == 'TRAILER!!!':
+            return names
+        names.append(name)
+        position += 110 + name_size
+        position += (4 - position % 4) % 4 + file_size
+        position += (4 - position % 4) % 4
+
+
+class ParseDependenciesTests(UnitTests):
+
+    def test_should_parse_names_separated_by_commas_and_white_spaces(self):
+
+        self.assertEqual([('spam', 0, ''), ('eggs', 0, ''), ('ham', 0, '')], parse_dependencies('spam, eggs ham,'))
+
+    def test_should_parse_versioned_dependencies(self):
+
+        self.assertEqual([('spam', RPMSENSE_GREATER | RPMSENSE_EQUAL, '1.0'), ('eggs', RPMSENSE_LESS, '2'), ('ham', RPMSENSE_EQUAL, '1-1')],
+                         parse_dependencies('spam >= 1.0, eggs < 2, ham = 1-1'))
+
+    def test_should_raise_exception_when_version_is_missing(self):
+
+        self.assertRaises(NotSupportedByRpmWriterException, parse_dependencies, 'spam >=')
+
+
+@patch('config_rpm_maker.rpmwriter.SUPPORTED_BUILD_SECTIONS_DIGESTS', [EMPTY_BUILD_SECTIONS_DIGEST])
+class SpecFileTests(UnitTests):
+
+    def test_should_parse_main_package(self):
+
+        spec_file = SpecFile(SPEC_FILE)
+
+        main_package = spec_file.main_package
+        self.assertEqual('yadt-config-devweb01', main_package.name)
+        self.assertEqual('21', spec_file.get_tag(main_package, 'version'))
+        self.assertEqual('42', spec_file.get_tag(main_package, 'release'))
+        self.assertEqual('files.lst', main_package.file_list)
+        self.assertEqual([('yadt-config-all', 0, ''), ('spam', 0, '')], main_package.provides)
+        self.assertEqual([('yadt-minion', 0, ''), ('yadt-config-devweb01-repos', RPMSENSE_EQUAL, '21-42')], main_package.requires)
+
+    def test_should_expand_macros_in_description_and_keep_percent_signs(self):
+
+        self.assertEqual('Generated for yadt-config-devweb01: 100% done', SpecFile(SPEC_FILE).main_package.description)
+
+    def test_should_parse_subpackage_and_inherit_tags_of_main_package(self):
+
+        spec_file = SpecFile(SPEC_FILE)
+
+        subpackage = spec_file.packages[1]
+        self.assertEqual('yadt-config-devweb01-repos', subpackage.name)
+        self.assertEqual('files-repos.lst', subpackage.file_list)
+        self.assertEqual('The repos of devweb01.', subpackage.description)
+        self.assertEqual([('yum', 0, '')], subpackage.requires)
+        self.assertEqual('YADT config RPM - YUM Repo definitions', spec_file.get_tag(subpackage, 'summary'))
+        self.assertEqual('GPL', spec_file.get_tag(subpackage, 'license'))
+
+    def test_should_raise_exception_when_spec_file_contains_scriptlet(self):
+
+        self.assertRaises(NotSupportedByRpmWriterException, SpecFile, SPEC_FILE + '\n%post\necho spam\n')
+
+    def test_should_raise_exception_when_spec_file_contains_conditional(self):
+
+        self.assertRaises(NotSupportedByRpmWriterException, SpecFile, SPEC_FILE.replace('Group:', '%if 0\n%endif\nGroup:'))
+
+    def test_should_raise_exception_when_spec_file_contains_unknown_macro(self):
+
+        self.assertRaises(NotSupportedByRpmWriterException, SpecFile, SPEC_FILE.replace('Summary: YADT', 'Summary: %{_sysconfdir}'))
+
+    def test_should_raise_exception_when_spec_file_contains_changelog_entries(self):
+
+        self.assertRaises(NotSupportedByRpmWriterException, SpecFile, SPEC_FILE + '\n%changelog\n* Mon Jan 01 2013 spam\n')
+
+    def test_should_raise_exception_when_package_is_not_noarch(self):
+
+        self.assertRaises(NotSupportedByRpmWriterException, SpecFile, SPEC_FILE.replace('BuildArch: noarch', 'BuildArch: x86_64'))
+
+    def test_should_raise_exception_when_build_sections_differ_from_default_spec_file(self):
+
+        self.assertRaises(NotSupportedByRpmWriterException, SpecFile, SPEC_FILE + '\n%install\nrm -rf /\n')
+
+
+class GetInterpreterRequiresTests(UnitTests):
+
+    def test_should_return_interpreters_of_executable_scripts(self):
+
+        files = [RpmFile('/bin/spam', S_IFREG | 0755, 'root', 'root', 0, '#!/bin/bash\necho spam\n'),
+                 RpmFile('/bin/eggs', S_IFREG | 0755, 'root', 'root', 0, '#!/bin/sh -e\necho eggs\n'),
+                 RpmFile('/etc/ham', S_IFREG | 0644, 'root', 'root', 0, '#!/bin/zsh\n'),
+                 RpmFile('/etc', S_IFDIR | 0755, 'root', 'root', 0, '')]
+
+        self.assertEqual([('/bin/bash', 0, ''), ('/bin/sh', 0, '')], get_interpreter_requires(files))
+
+    def test_should_raise_exception_when_executable_is_a_perl_script(self):
+
+        files = [RpmFile('/bin/spam', S_IFREG | 0755, 'root', 'root', 0, '#!/usr/bin/env perl\n')]
+
+        self.assertRaises(NotSupportedByRpmWriterException, get_interpreter_requires, files)
+
+    def test_should_raise_exception_when_file_is_a_binary(self):
+
+        files = [RpmFile('/lib/spam.so', S_IFREG | 0644, 'root', 'root', 0, '\x7fELF\x02\x01')]
+
+        self.assertRaises(NotSupportedByRpmWriterException, get_interpreter_requires, files)
+
+
+class HeaderTests(UnitTests):
+
+    def test_should_serialize_region_and_entries_sorted_by_tag(self):
+
+        header = _Header(63)
+        header.add(1001, RPM_STRING_TYPE, '21')
+        header.add(1000, RPM_STRING_TYPE, 'spam')
+        header.add(1009, RPM_INT32_TYPE, [42])
+
+        magic, entries, store = read_header(header.serialize())
+
+        self.assertEqual('\x8e\xad\xe8\x01\x00\x00\x00\x00', magic)
+        self.assertEqual([63, 1000, 1001, 1009], sorted(entries.keys()))
+        self.assertEqual('spam\0', store[entries[1000][1]:entries[1000][1] + 5])
+        self.assertEqual('21\0', store[entries[1001][1]:entries[1001][1] + 3])
+
+    def test_should_align_integers(self):
+
+        header = _Header(63)
+        header.add(1000, RPM_STRING_TYPE, 'spam')
+        header.add(1009, RPM_INT32_TYPE, [42])
+
+        _, entries, store = read_header(header.serialize())
+
+        offset = entries[1009][1]
+        self.assertEqual(0, offset % 4)
+        self.assertEqual((42,), unpack('>i', store[offset:offset + 4]))
+
+    def test_should_write_region_trailer_at_the_end_of_the_store(self):
+
+        header = _Header(63)
+        header.add(1000, RPM_STRING_ARRAY_TYPE, ['spam', 'eggs'])
+
+        _, entries, store = read_header(header.serialize())
+
+        region_type, region_offset, region_count = entries[63]
+        self.assertEqual(len(store) - 16, region_offset)
+        self.assertEqual((63, region_type, -2 * 16, region_count), unpack('>iiii', store[region_offset:]))
+
+
+class LeadTests(UnitTests):
+
+    def test_should_create_lead_of_binary_rpm(self):
+
+        lead = _create_lead('yadt-config-devweb01-21-42', is_source=False)
+
+        self.assertEqual(96, len(lead))
+        self.assertEqual((0xedabeedb, 3, 0, 0, 1), unpack('>IBBhh', lead[:10]))
+        self.assertEqual('yadt-config-devweb01-21-42', lead[10:76].rstrip('\0'))
+        self.assertEqual((1, 5), unpack('>hh', lead[76:80]))
+
+    def test_should_create_lead_of_source_rpm(self):
+
+        lead = _create_lead('yadt-config-devweb01-21-42', is_source=True)
+
+        self.assertEqual(1, unpack('>h', lead[6:8])[0])
+
+
+class PayloadTests(UnitTests):
+
+    def test_should_create_compressed_cpio_archive_with_prefixed_paths(self):
+
+        files = [RpmFile('/etc', S_IFDIR | 0755, 'root', 'root', 0, ''),
+                 RpmFile('/etc/spam', S_IFREG | 0644, 'root', 'root', 0, 'eggs')]
+
+        payload_size, payload = _create_payload(files)
+
+        self.assertEqual(['./etc', './etc/spam'], read_cpio_names(payload))
+        self.assertEqual(payload_size, len(gzip.GzipFile(fileobj=StringIO(payload)).read()))
+
+    def test_should_create_cpio_archive_without_prefix(self):
+
+        files = [RpmFile('spam.spec', S_IFREG | 0644, 'root', 'root', 0, 'Name: spam')]
+
+        _, payload = _create_payload(files, with_prefix=False)
+
+        self.assertEqual(['spam.spec'], read_cpio_names(payload))
@@ -0,0 +1,128 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from mock import Mock, call, patch
+from pysvn import ClientError
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.hostoverlay import HostOverlay
+from config_rpm_maker.segmentcache import SegmentCache
+
+
+@patch('config_rpm_maker.segmentcache.makedirs')
+@patch('config_rpm_maker.segmentcache.exists')
+class SegmentCacheTests(UnitTests):
+
+    def setUp(self):
+        self.mock_svn_service = Mock()
+        self.mock_svn_service.export.return_value = [('all', 'files'), ('all', 'files/file_from_all')]
+        self.mock_svn_service_queue = Mock()
+        self.mock_svn_service_queue.get.return_value = self.mock_svn_service
+
+        self.mock_host_overlay = Mock(HostOverlay)
+
+        self.segment_cache = SegmentCache('/work/segments', '123', self.mock_svn_service_queue, ['all', 'typ/web'])
+
+    def test_should_contain_given_svn_paths(self, mock_exists, mock_makedirs):
+
+        self.assertTrue(self.segment_cache.contains('all'))
+        self.assertTrue(self.segment_cache.contains('typ/web'))
+        self.assertFalse(self.segment_cache.contains('host/devweb01'))
+
+    def test_should_export_svn_path_into_cache_directory(self, mock_exists, mock_makedirs):
+
+        self.segment_cache.overlay('typ/web', self.mock_host_overlay)
+
+        self.mock_svn_service.export.assert_called_with('typ/web', '/work/segments/typ/web', '123')
+
+    def test_should_create_parent_of_cache_directory(self, mock_exists, mock_makedirs):
+
+        mock_exists.return_value = False
+
+        self.segment_cache.overlay('typ/web', self.mock_host_overlay)
+
+        mock_makedirs.assert_called_with('/work/segments/typ')
+
+    def test_should_return_svn_service_to_queue_after_export(self, mock_exists, mock_makedirs):
+
+        self.segment_cache.overlay('all', self.mock_host_overlay)
+
+        self.mock_svn_service_queue.put.assert_called_with(self.mock_svn_service)
+
+    def test_should_export_svn_path_only_once(self, mock_exists, mock_makedirs):
+
+        self.segment_cache.overlay('all', self.mock_host_overlay)
+        self.segment_cache.overlay('all', self.mock_host_overlay)
+
+        self.assertEqual(1, self.mock_svn_service.export.call_count)
+
+    def test_should_add_exported_paths_to_host_overlay(self, mock_exists, mock_makedirs):
+
+        self.segment_cache.overlay('all', self.mock_host_overlay)
+
+        self.mock_host_overlay.add_cached_paths.assert_called_with('/work/segments/all', ['files', 'files/file_from_all'])
+
+    def test_should_return_exported_paths_of_svn_path(self, mock_exists, mock_makedirs):
+
+        actual_exported_paths = self.segment_cache.overlay('all', self.mock_host_overlay)
+
+        self.assertEqual([('all', 'files'), ('all', 'files/file_from_all')], actual_exported_paths)
+
+    def test_should_raise_client_error_each_time_when_export_failed(self, mock_exists, mock_makedirs):
+
+        self.mock_svn_service.export.side_effect = ClientError('path does not exist')
+
+        self.assertRaises(ClientError, self.segment_cache.overlay, 'all', self.mock_host_overlay)
+        self.assertRaises(ClientError, self.segment_cache.overlay, 'all', self.mock_host_overlay)
+
+        self.assertEqual(1, self.mock_svn_service.export.call_count)
+        self.assert_mock_never_called(self.mock_host_overlay.add_cached_paths)
+
+    def test_should_export_all_svn_paths(self, mock_exists, mock_makedirs):
+
+        self.segment_cache.export_all()
+
+        self.assertEqual([call('all', '/work/segments/all', '123'),
+                          call('typ/web', '/work/segments/typ/web', '123')],
+                         self.mock_svn_service.export.call_args_list)
+        self.assert_mock_never_called(self.mock_host_overlay.add_cached_paths)
+
+    def test_should_not_export_again_after_all_svn_paths_have_been_exported(self, mock_exists, mock_makedirs):
+
+        self.segment_cache.export_all()
+        self.segment_cache.overlay('all', self.mock_host_overlay)
+
+        self.assertEqual(2, self.mock_svn_service.export.call_count)
+
+    @patch('config_rpm_maker.segmentcache.ResolvedTokens')
+    def test_should_resolve_tokens_of_cached_svn_paths(self, mock_resolved_tokens, mock_exists, mock_makedirs):
+
+        actual_resolved_tokens = self.segment_cache.get_resolved_tokens(['all', 'loc/de', 'typ/web', 'host/devweb01'])
+
+        self.assertEqual(mock_resolved_tokens.from_directories.return_value, actual_resolved_tokens)
+        mock_resolved_tokens.from_directories.assert_called_with(['/work/segments/all/VARIABLES', '/work/segments/typ/web/VARIABLES'])
+
+    @patch('config_rpm_maker.segmentcache.ResolvedTokens')
+    def test_should_resolve_tokens_of_same_cached_svn_paths_only_once(self, mock_resolved_tokens, mock_exists, mock_makedirs):
+
+        self.segment_cache.get_resolved_tokens(['all', 'typ/web', 'host/devweb01'])
+        self.segment_cache.get_resolved_tokens(['all', 'typ/web', 'host/berweb01'])
+        self.segment_cache.get_resolved_tokens(['all', 'host/tuvdb01'])
+
+        self.assertEqual([call(['/work/segments/all/VARIABLES', '/work/segments/typ/web/VARIABLES']),
+                          call(['/work/segments/all/VARIABLES'])],
+                         mock_resolved_tokens.from_directories.call_args_list)
@@ -0,0 +1,114 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from os import makedirs
+from os.path import exists, join
+from shutil import rmtree
+from subprocess import PIPE
+from tempfile import mkdtemp
+
+from mock import Mock, call, patch
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.svnmirror import SvnMirror, SvnMirrorException
+
+
+@patch('config_rpm_maker.svnmirror.SvnMirror._execute')
+class SynchronizeTests(UnitTests):
+
+    def setUp(self):
+        self.directory = mkdtemp(prefix=self.__class__.__name__ + '_')
+        self.mirror_directory = join(self.directory, 'mirror')
+        self.svn_mirror = SvnMirror(self.mirror_directory, 'svn://server/repository')
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def create_mirror(self, *arguments):
+        if arguments[:2] == ('svnadmin', 'create'):
+            makedirs(join(self.mirror_directory, 'hooks'))
+            open(join(self.mirror_directory, 'format'), 'w').close()
+        if arguments[:2] == ('svnlook', 'youngest'):
+            return '0\n'
+        return ''
+
+    def test_should_create_and_initialize_mirror(self, mock_execute):
+
+        mock_execute.side_effect = self.create_mirror
+
+        actual_url = self.svn_mirror.synchronize('2')
+
+        self.assertEqual('file://' + self.mirror_directory, actual_url)
+        self.assertEqual([call('svnadmin', 'create', self.mirror_directory),
+                          call('svnsync', 'initialize', '--non-interactive', 'file://' + self.mirror_directory, 'svn://server/repository'),
+                          call('svnlook', 'youngest', self.mirror_directory),
+                          call('svnsync', 'synchronize', '--non-interactive', '--steal-lock', 'file://' + self.mirror_directory, 'svn://server/repository')],
+                         mock_execute.call_args_list)
+        self.assertTrue(exists(join(self.mirror_directory, 'hooks', 'pre-revprop-change')))
+
+    def test_should_create_parent_directory_of_mirror(self, mock_execute):
+
+        mock_execute.side_effect = self.create_mirror
+        self.mirror_directory = join(self.directory, 'svn', 'mirrors', 'config')
+        svn_mirror = SvnMirror(self.mirror_directory, 'svn://server/repository')
+
+        svn_mirror.synchronize('2')
+
+        self.assertTrue(exists(self.mirror_directory + '.lock'))
+        self.assertTrue(exists(join(self.mirror_directory, 'format')))
+
+    def test_should_remove_mirror_when_initializing_failed(self, mock_execute):
+
+        def execute(*arguments):
+            if arguments[:2] == ('svnsync', 'initialize'):
+                raise SvnMirrorException('Aaarrrgggghh...')
+            return self.create_mirror(*arguments)
+
+        mock_execute.side_effect = execute
+
+        self.assertRaises(SvnMirrorException, self.svn_mirror.synchronize, '2')
+
+        self.assertFalse(exists(self.mirror_directory))
+
+    def test_should_not_synchronize_when_mirror_contains_revision(self, mock_execute):
+
+        makedirs(self.mirror_directory)
+        open(join(self.mirror_directory, 'format'), 'w').close()
+        mock_execute.return_value = '2\n'
+
+        self.svn_mirror.synchronize('2')
+
+        mock_execute.assert_called_once_with('svnlook', 'youngest', self.mirror_directory)
+
+
+@patch('config_rpm_maker.svnmirror.Popen')
+class ExecuteTests(UnitTests):
+
+    def test_should_return_stdout(self, mock_popen):
+
+        mock_popen.return_value.communicate.return_value = ('42\n', '')
+        mock_popen.return_value.returncode = 0
+
+        self.assertEqual('42\n', SvnMirror._execute(Mock(SvnMirror), 'svnlook', 'youngest', '/mirror with space'))
+        mock_popen.assert_called_with(['svnlook', 'youngest', '/mirror with space'], stdout=PIPE, stderr=PIPE)
+
+    def test_should_raise_exception_when_command_failed(self, mock_popen):
+
+        mock_popen.return_value.communicate.return_value = ('', 'svnsync: E000000: Aaarrrgggghh...')
+        mock_popen.return_value.returncode = 1
+
+        self.assertRaises(SvnMirrorException, SvnMirror._execute, Mock(SvnMirror), 'svnsync', 'synchronize')
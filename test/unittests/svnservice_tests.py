@@ -17,9 +17,11 @@
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from unittest import TestCase
-from mock import Mock
+from mock import Mock, call, patch
 
-from config_rpm_maker.svnservice import SvnServiceException, SvnService
+from pysvn import ClientError
+
+from config_rpm_maker.svnservice import SvnCache, SvnServiceException, SvnService
 
 
 class SvnServiceTests(TestCase):
@@ -28,6 +30,7 @@ class SvnServiceTests(TestCase):
 
         mock_svn_service = Mock(SvnService)
         mock_svn_service.config_url = '/path to repository/config'
+        mock_svn_service.metadata_cache = SvnCache('Svn metadata')
         mock_svn_service.client = Mock()
         item0 = Mock()
         item0.repos_path = "get_hosts removes the first element - so this will never show up"
@@ -54,6 +57,7 @@ class GetLogsForRevision(TestCase):
         mock_svn_service.config_url = 'svn://url/for/configuration/repository/config'
         mock_svn_service.base_url = 'svn://url/for/configuration/repository'
         mock_svn_service.path_to_config = '/config'
+        mock_svn_service.metadata_cache = SvnCache('Svn metadata')
         mock_svn_service.client = Mock()
         mock_svn_service.client.log.side_effect = Exception("Aaarrrgggghh...")
 
@@ -63,14 +67,27 @@ class GetLogsForRevision(TestCase):
         mock_svn_service = Mock(SvnService)
         mock_svn_service.base_url = 'svn://url/for/configuration/repository'
         mock_svn_service.path_to_config = '/config'
+        mock_svn_service.metadata_cache = SvnCache('Svn metadata')
         mock_svn_service.client = Mock()
-        mock_logs = Mock()
+        mock_logs = [Mock()]
         mock_svn_service.client.log.return_value = mock_logs
 
         actual = SvnService.get_logs_for_revision(mock_svn_service, '1980')
 
         self.assertEqual(mock_logs, actual)
 
+    def test_should_fetch_logs_for_revision_only_once(self):
+        mock_svn_service = Mock(SvnService)
+        mock_svn_service.base_url = 'svn://url/for/configuration/repository'
+        mock_svn_service.metadata_cache = SvnCache('Svn metadata')
+        mock_svn_service.client = Mock()
+        mock_svn_service.client.log.return_value = [Mock()]
+
+        SvnService.get_logs_for_revision(mock_svn_service, '1980')
+        SvnService.get_logs_for_revision(mock_svn_service, 1980)
+
+        self.assertEqual(1, mock_svn_service.client.log.call_count)
+
 
 class GetChangedPathsWithActionTests(TestCase):
 
@@ -230,3 +247,140 @@ class GetDeletedPathsTests(TestCase):
         actual = SvnService.get_deleted_paths(mock_svn_service, '1980')
 
         self.assertEqual(['example', 'spam.egg'], actual)
+
+
+@patch('config_rpm_maker.svnservice.pysvn')
+class CloneTests(TestCase):
+
+    def test_should_return_svn_service_for_same_repository(self, mock_pysvn):
+
+        svn_service = SvnService('svn://url/for/configuration/repository', 'username', 'password', '/config')
+
+        actual_svn_service = svn_service.clone()
+
+        self.assertEqual('svn://url/for/configuration/repository', actual_svn_service.base_url)
+        self.assertEqual('/config', actual_svn_service.path_to_config)
+        self.assertEqual('username', actual_svn_service.username)
+        self.assertEqual('password', actual_svn_service.password)
+
+    def test_should_create_new_pysvn_client_for_clone(self, mock_pysvn):
+
+        svn_service = SvnService('svn://url/for/configuration/repository', 'username', 'password', '/config')
+
+        svn_service.clone()
+
+        self.assertEqual(2, mock_pysvn.Client.call_count)
+        mock_pysvn.Client.return_value.set_default_username.assert_called_with('username')
+        mock_pysvn.Client.return_value.set_default_password.assert_called_with('password')
+
+    def test_should_share_log_cache_with_clone(self, mock_pysvn):
+
+        svn_service = SvnService('svn://url/for/configuration/repository', 'username', 'password', '/config')
+
+        actual_svn_service = svn_service.clone()
+
+        self.assertTrue(actual_svn_service.log_cache is svn_service.log_cache)
+
+
+class SvnCacheTests(TestCase):
+
+    def test_should_fetch_logs_only_once_for_same_key(self):
+
+        svn_cache = SvnCache('Svn log')
+        mock_fetch = Mock(return_value=iter([{'revision': 2}]))
+
+        svn_cache.get((2, 'svn://url/config/all', 5), mock_fetch)
+        actual_logs = svn_cache.get((2, 'svn://url/config/all', 5), mock_fetch)
+
+        self.assertEqual([{'revision': 2}], actual_logs)
+        self.assertEqual(1, mock_fetch.call_count)
+
+    def test_should_fetch_logs_for_other_key(self):
+
+        svn_cache = SvnCache('Svn log')
+        mock_fetch = Mock(return_value=[])
+
+        svn_cache.get((2, 'svn://url/config/all', 5), mock_fetch)
+        svn_cache.get((2, 'svn://url/config/typ/web', 5), mock_fetch)
+
+        self.assertEqual(2, mock_fetch.call_count)
+
+    def test_should_raise_cached_client_error_again(self):
+
+        svn_cache = SvnCache('Svn log')
+        mock_fetch = Mock(side_effect=ClientError('path not found'))
+
+        self.assertRaises(ClientError, svn_cache.get, (2, 'svn://url/config/loc/xyz', 5), mock_fetch)
+        self.assertRaises(ClientError, svn_cache.get, (2, 'svn://url/config/loc/xyz', 5), mock_fetch)
+
+        self.assertEqual(1, mock_fetch.call_count)
+
+    def test_should_not_cache_other_exceptions(self):
+
+        svn_cache = SvnCache('Svn log')
+        mock_fetch = Mock(side_effect=[Exception('Aaarrrgggghh...'), []])
+
+        self.assertRaises(Exception, svn_cache.get, (2, 'svn://url/config/all', 5), mock_fetch)
+
+        self.assertEqual([], svn_cache.get((2, 'svn://url/config/all', 5), mock_fetch))
+
+    def test_should_fetch_again_after_revision_has_been_invalidated(self):
+
+        svn_cache = SvnCache('Svn metadata')
+        mock_fetch = Mock(return_value=[])
+        svn_cache.get((2, 'hosts'), mock_fetch)
+        svn_cache.get((3, 'hosts'), mock_fetch)
+
+        svn_cache.invalidate('2')
+        svn_cache.get((2, 'hosts'), mock_fetch)
+        svn_cache.get((3, 'hosts'), mock_fetch)
+
+        self.assertEqual(3, mock_fetch.call_count)
+
+    def test_should_remove_key_locks_of_invalidated_revision(self):
+
+        svn_cache = SvnCache('Svn metadata')
+        svn_cache.get((2, 'hosts'), Mock(return_value=[]))
+        svn_cache.get((3, 'hosts'), Mock(return_value=[]))
+
+        svn_cache.invalidate('2')
+
+        self.assertEqual([(3, 'hosts')], svn_cache._key_locks.keys())
+
+    def test_should_fetch_again_after_all_revisions_have_been_invalidated(self):
+
+        svn_cache = SvnCache('Svn metadata')
+        mock_fetch = Mock(return_value=[])
+        svn_cache.get((2, 'hosts'), mock_fetch)
+
+        svn_cache.invalidate()
+        svn_cache.get((2, 'hosts'), mock_fetch)
+
+        self.assertEqual(2, mock_fetch.call_count)
+
+    @patch('config_rpm_maker.svnservice.count_cache_access')
+    def test_should_count_hits_and_misses_in_profiler(self, mock_count_cache_access):
+
+        svn_cache = SvnCache('Svn metadata')
+
+        svn_cache.get((2, 'hosts'), Mock(return_value=[]))
+        svn_cache.get((2, 'hosts'), Mock(return_value=[]))
+
+        self.assertEqual([call('Svn metadata', False), call('Svn metadata', True)], mock_count_cache_access.call_args_list)
+
+
+class LogTests(TestCase):
+
+    def test_should_fetch_log_of_svn_path_only_once(self):
+
+        mock_svn_service = Mock(SvnService)
+        mock_svn_service.log_cache = SvnCache('Svn log')
+        mock_svn_service._get_url.return_value = 'svn://url/for/configuration/repository/config/all'
+        mock_svn_service.client = Mock()
+        mock_svn_service.client.log.return_value = [{'revision': 2}]
+
+        SvnService.log(mock_svn_service, 'all', '2', 5)
+        actual_logs = SvnService.log(mock_svn_service, 'all', 2, 5)
+
+        self.assertEqual([{'revision': 2}], actual_logs)
+        self.assertEqual(1, mock_svn_service.client.log.call_count)
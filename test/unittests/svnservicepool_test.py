@@ -0,0 +1,97 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from mock import Mock, patch
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.svnservicepool import SvnServicePool
+
+
+class SvnServicePoolTests(UnitTests):
+
+    def setUp(self):
+        self.mock_svn_service = Mock()
+        self.mock_clone = Mock()
+        self.mock_svn_service.clone.return_value = self.mock_clone
+
+    def test_should_contain_given_svn_service_only_when_size_is_one(self):
+
+        svn_service_pool = SvnServicePool(self.mock_svn_service, 1)
+
+        self.assertEqual(1, svn_service_pool.qsize())
+        self.assertEqual(self.mock_svn_service, svn_service_pool.get())
+        self.assert_mock_never_called(self.mock_svn_service.clone)
+
+    def test_should_contain_clones_of_given_svn_service(self):
+
+        svn_service_pool = SvnServicePool(self.mock_svn_service, 3)
+
+        self.assertEqual(3, svn_service_pool.qsize())
+        self.assertEqual(2, self.mock_svn_service.clone.call_count)
+
+    def test_should_count_borrowed_svn_services(self):
+
+        svn_service_pool = SvnServicePool(self.mock_svn_service, 2)
+
+        svn_service_pool.put(svn_service_pool.get())
+        svn_service_pool.put(svn_service_pool.get())
+
+        self.assertEqual(2, svn_service_pool.count_of_borrows)
+
+    def test_should_remember_maximum_of_svn_services_in_use_at_the_same_time(self):
+
+        svn_service_pool = SvnServicePool(self.mock_svn_service, 2)
+
+        first_svn_service = svn_service_pool.get()
+        second_svn_service = svn_service_pool.get()
+        svn_service_pool.put(first_svn_service)
+        svn_service_pool.put(second_svn_service)
+        svn_service_pool.put(svn_service_pool.get())
+
+        self.assertEqual(2, svn_service_pool.maximum_in_use)
+
+    @patch('config_rpm_maker.svnservicepool.time')
+    def test_should_sum_up_wait_time_and_busy_time(self, mock_time):
+
+        mock_time.side_effect = [0, 1, 3, 10]
+        svn_service_pool = SvnServicePool(self.mock_svn_service, 1)
+
+        svn_service_pool.put(svn_service_pool.get())
+
+        self.assertEqual(2, svn_service_pool.total_wait_time)
+        self.assertEqual(2, svn_service_pool.maximum_wait_time)
+        self.assertEqual(7, svn_service_pool.total_busy_time)
+
+    @patch('config_rpm_maker.svnservicepool.time')
+    def test_should_return_utilisation_of_svn_services(self, mock_time):
+
+        mock_time.side_effect = [0, 0, 0, 5, 10]
+        svn_service_pool = SvnServicePool(self.mock_svn_service, 2)
+
+        svn_service_pool.put(svn_service_pool.get())
+
+        self.assertEqual(0.25, svn_service_pool.get_utilisation())
+
+    def test_should_log_statistics(self):
+
+        svn_service_pool = SvnServicePool(self.mock_svn_service, 1)
+        svn_service_pool.put(svn_service_pool.get())
+        mock_logging_function = Mock()
+
+        svn_service_pool.log_statistics(mock_logging_function)
+
+        self.assertEqual(1, mock_logging_function.call_count)
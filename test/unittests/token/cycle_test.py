@@ -19,7 +19,7 @@
 import unittest
 
 from config_rpm_maker.token.cycle import ContainsCyclesException
-from config_rpm_maker.token.cycle import TokenCycleChecking
+from config_rpm_maker.token.cycle import TokenCycleChecking, tarjan_scc
 
 
 class CycleTest(unittest.TestCase):
@@ -60,3 +60,42 @@ class CycleTest(unittest.TestCase):
         actual_graph = TokenCycleChecking(graph_with_cycle)
 
         self.assertRaises(ContainsCyclesException, actual_graph.assert_no_cycles_present)
+
+    def test_should_not_raise_exception_for_deep_chain_without_cycles(self):
+        deep_chain = dict(('token%d' % i, ['token%d' % (i + 1)]) for i in range(10000))
+
+        actual_graph = TokenCycleChecking(deep_chain)
+
+        actual_graph.assert_no_cycles_present()
+
+    def test_should_recognize_cycle_at_end_of_deep_chain(self):
+        deep_chain = dict(('token%d' % i, ['token%d' % (i + 1)]) for i in range(10000))
+        deep_chain['token10000'] = ['token9999']
+
+        actual_graph = TokenCycleChecking(deep_chain)
+
+        self.assertRaises(ContainsCyclesException, actual_graph.assert_no_cycles_present)
+
+
+class TarjanSccTest(unittest.TestCase):
+
+    def test_should_return_components_after_the_components_they_refer_to(self):
+        graph = {'foo': ['bar', 'baz'],
+                 'bar': ['baz'],
+                 'baz': ['qux']}
+
+        self.assertEqual([('qux',), ('baz',), ('bar',), ('foo',)], tarjan_scc(graph))
+
+    def test_should_return_cycle_as_one_component(self):
+        graph = {'foo': ['bar'],
+                 'bar': ['baz'],
+                 'baz': ['foo', 'qux']}
+
+        components = tarjan_scc(graph)
+
+        self.assertEqual(('qux',), components[0])
+        self.assertEqual(set(['foo', 'bar', 'baz']), set(components[1]))
+        self.assertEqual(2, len(components))
+
+    def test_should_return_self_reference_as_component_of_its_own(self):
+        self.assertEqual([('foo',)], tarjan_scc({'foo': ['foo']}))
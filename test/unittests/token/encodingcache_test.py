@@ -0,0 +1,83 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from mock import Mock, call, patch
+
+from config_rpm_maker.token.encodingcache import EncodingCache
+
+
+class EncodingCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_detect_encoding = Mock(return_value='us-ascii')
+
+    def test_should_return_detected_encoding(self):
+
+        encoding_cache = EncodingCache(10)
+
+        self.assertEqual('us-ascii', encoding_cache.get_encoding('spam', self.mock_detect_encoding))
+        self.mock_detect_encoding.assert_called_with('spam')
+
+    def test_should_detect_encoding_of_same_content_only_once(self):
+
+        encoding_cache = EncodingCache(10)
+
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+
+        self.assertEqual(1, self.mock_detect_encoding.call_count)
+
+    def test_should_detect_encoding_of_different_contents(self):
+
+        encoding_cache = EncodingCache(10)
+
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+        encoding_cache.get_encoding('eggs', self.mock_detect_encoding)
+
+        self.assertEqual([call('spam'), call('eggs')], self.mock_detect_encoding.call_args_list)
+
+    def test_should_evict_least_recently_used_encoding_when_cache_is_full(self):
+
+        encoding_cache = EncodingCache(2)
+
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+        encoding_cache.get_encoding('eggs', self.mock_detect_encoding)
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+        encoding_cache.get_encoding('ham', self.mock_detect_encoding)
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+        encoding_cache.get_encoding('eggs', self.mock_detect_encoding)
+
+        self.assertEqual([call('spam'), call('eggs'), call('ham'), call('eggs')], self.mock_detect_encoding.call_args_list)
+
+    def test_should_always_detect_encoding_when_size_is_zero(self):
+
+        encoding_cache = EncodingCache(0)
+
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+
+        self.assertEqual(2, self.mock_detect_encoding.call_count)
+
+    @patch('config_rpm_maker.token.encodingcache.count_cache_access')
+    def test_should_count_hits_and_misses_in_profiler(self, mock_count_cache_access):
+
+        encoding_cache = EncodingCache(10)
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+        encoding_cache.get_encoding('spam', self.mock_detect_encoding)
+
+        self.assertEqual([call('Encoding cache', False), call('Encoding cache', True)], mock_count_cache_access.call_args_list)
@@ -18,10 +18,19 @@
 
 import unittest
 
+from os import makedirs, readlink, symlink
+from os.path import islink, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
 from mock import Mock, patch
 
 from config_rpm_maker.token.cycle import ContainsCyclesException
-from config_rpm_maker.token.tokenreplacer import CannotFilterFileException, MissingTokenException, TokenReplacer
+from config_rpm_maker.token.tokenreplacer import (CannotFilterFileException,
+                                                  MissingOrRedundantTokenException,
+                                                  MissingTokenException,
+                                                  ResolvedTokens,
+                                                  TokenReplacer)
 
 
 class TokenReplacerTest(unittest.TestCase):
@@ -60,6 +69,34 @@ class TokenReplacerTest(unittest.TestCase):
                           TokenReplacer({"spam": "eggs"},
                                         custom_replacer_function).filter("@@@spam@@@"))
 
+    def test_should_call_custom_replacer_function_once_per_token(self):
+        calls = []
+
+        def custom_replacer_function(token, value):
+            calls.append((token, value))
+            return value
+
+        TokenReplacer({"spam": "eggs"}, custom_replacer_function).filter("@@@spam@@@ and @@@spam@@@")
+
+        self.assertEqual([("spam", "eggs")], calls)
+
+    def test_should_not_filter_replaced_values_again(self):
+        self.assertEquals("@@@EGGS@@@", TokenReplacer({"AT": "@@@", "EGGS": "eggs"}).filter("@@@AT@@@EGGS@@@"))
+
+    def test_should_remember_used_tokens(self):
+        token_replacer = TokenReplacer({"SPAM": "spam", "EGGS": "eggs", "HAM": "ham"})
+
+        token_replacer.filter("@@@SPAM@@@ and @@@EGGS@@@")
+
+        self.assertEqual(set(["SPAM", "EGGS"]), token_replacer.token_used)
+
+    def test_should_remember_tokens_used_before_missing_token(self):
+        token_replacer = TokenReplacer({"SPAM": "spam"})
+
+        self.assertRaises(MissingTokenException, token_replacer.filter, "@@@SPAM@@@ @@@NOT_FOUND@@@ @@@SPAM@@@")
+
+        self.assertEqual(set(["SPAM"]), token_replacer.token_used)
+
     def test_should_replace_token_in_token(self):
         self.assertEquals("foo", TokenReplacer({"FOO": "foo", "BAR": "@@@FOO@@@"}).filter("@@@BAR@@@"))
 
@@ -70,6 +107,56 @@ class TokenReplacerTest(unittest.TestCase):
         self.assertRaises(ContainsCyclesException, TokenReplacer, {"FOO": "@@@BAR@@@", "BAR": "@@@FOO@@@"})
         self.assertRaises(ContainsCyclesException, TokenReplacer, {"FOO": "@@@BAR@@@", "BAR": "@@@BLO@@@", "BLO": "@@@FOO@@@"})
 
+    def test_should_use_resolved_token_values_of_other_token_replacer(self):
+        def custom_replacer_function(token, value):
+            return "<%s:%s>" % (token, value)
+
+        token_replacer = TokenReplacer({"FOO": "foo", "BAR": "@@@FOO@@@"}).with_replacer_function(custom_replacer_function)
+
+        self.assertEquals("<BAR:foo>", token_replacer.filter("@@@BAR@@@"))
+        self.assertEqual(set(["BAR"]), token_replacer.token_used)
+
+    def test_should_reuse_resolved_token_values_which_did_not_change(self):
+        resolved_tokens = ResolvedTokens({"FOO": u"foo", "BAR": u"@@@FOO@@@"})
+        resolved_tokens.token_values["BAR"] = u"reused"
+
+        token_replacer = TokenReplacer({"FOO": "foo", "BAR": "@@@FOO@@@"}, resolved_tokens=resolved_tokens)
+
+        self.assertEquals("reused", token_replacer.filter("@@@BAR@@@"))
+
+    def test_should_resolve_token_values_again_which_refer_to_changed_token_values(self):
+        resolved_tokens = ResolvedTokens({"FOO": u"foo", "BAR": u"@@@FOO@@@", "BAZ": u"@@@BAR@@@"})
+
+        token_replacer = TokenReplacer({"FOO": "bar", "BAR": "@@@FOO@@@", "BAZ": "@@@BAR@@@"}, resolved_tokens=resolved_tokens)
+
+        self.assertEqual({"FOO": "bar", "BAR": "bar", "BAZ": "bar"}, token_replacer.token_values)
+
+    def test_should_resolve_token_values_referring_to_tokens_of_host(self):
+        resolved_tokens = ResolvedTokens({"FQDN": u"@@@HOST@@@.example.com"})
+
+        token_replacer = TokenReplacer({"HOST": "devweb01", "FQDN": "@@@HOST@@@.example.com"}, resolved_tokens=resolved_tokens)
+
+        self.assertEqual({"HOST": "devweb01", "FQDN": "devweb01.example.com"}, token_replacer.token_values)
+
+    def test_should_raise_exception_when_token_is_missing_although_resolved_tokens_are_given(self):
+        resolved_tokens = ResolvedTokens({"FOO": u"foo", "BAR": u"@@@FOO@@@"})
+
+        self.assertRaises(MissingOrRedundantTokenException, TokenReplacer, {"BAR": "@@@FOO@@@"}, resolved_tokens=resolved_tokens)
+
+    def test_should_raise_exception_when_token_refers_to_itself(self):
+        self.assertRaises(MissingOrRedundantTokenException, TokenReplacer, {"FOO": "foo@@@FOO@@@"})
+
+    def test_should_raise_exception_when_token_refers_to_cycle(self):
+        self.assertRaises(ContainsCyclesException, TokenReplacer, {"FOO": "@@@BAR@@@", "BAR": "@@@FOO@@@", "BAZ": "@@@FOO@@@"})
+
+    def test_should_replace_tokens_in_deep_chain_of_tokens(self):
+        token_values = dict(("TOKEN%d" % i, "@@@TOKEN%d@@@" % (i + 1)) for i in range(5000))
+        token_values["TOKEN5000"] = "spam"
+
+        token_replacer = TokenReplacer(token_values)
+
+        self.assertEquals("spam", token_replacer.filter("@@@TOKEN0@@@"))
+
     @patch('config_rpm_maker.token.tokenreplacer.get_max_file_size')
     @patch('config_rpm_maker.token.tokenreplacer.getsize')
     def test_should_not_filter_file_with_encoding_unknown_8bit(self, mock_get_size, mock_config):
@@ -95,3 +182,88 @@ class TokenReplacerTest(unittest.TestCase):
         mock_token_replacer = Mock(TokenReplacer)
 
         self.assertRaises(CannotFilterFileException, TokenReplacer.filter_file, mock_token_replacer, "binary.file")
+
+
+class FilterFilesInDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp(prefix=self.__class__.__name__ + '_')
+        self.source_directory = join(self.directory, 'source')
+        self.viewer_directory = join(self.directory, 'viewer')
+        makedirs(join(self.source_directory, 'etc'))
+        with open(join(self.source_directory, 'etc', 'spam'), 'w') as source_file:
+            source_file.write('<@@@SPAM@@@>')
+        symlink('etc', join(self.source_directory, 'link'))
+
+        self.token_replacer = TokenReplacer({"SPAM": "eggs"})
+        self.viewer_token_replacer = self.token_replacer.with_replacer_function(lambda token, value: '[%s]' % value)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def read_file(self, *path):
+        with open(join(*path)) as file_to_read:
+            return file_to_read.read()
+
+    def filter_files(self):
+        self.token_replacer.filter_files_in_directory(self.source_directory,
+                                                      viewer_token_replacer=self.viewer_token_replacer,
+                                                      viewer_directory=self.viewer_directory)
+
+    def test_should_filter_files_in_place(self):
+
+        self.filter_files()
+
+        self.assertEqual('<eggs>', self.read_file(self.source_directory, 'etc', 'spam'))
+
+    def test_should_write_html_escaped_files_filtered_by_viewer_token_replacer_into_viewer_directory(self):
+
+        self.filter_files()
+
+        self.assertEqual('<!DOCTYPE html><html><head><title>spam</title></head><body><pre>&lt;[eggs]&gt;</pre></body></html>',
+                         self.read_file(self.viewer_directory, 'etc', 'spam'))
+        self.assertEqual(set(["SPAM"]), self.viewer_token_replacer.token_used)
+
+    def test_should_copy_symbolic_links_into_viewer_directory(self):
+
+        self.filter_files()
+
+        self.assertTrue(islink(join(self.viewer_directory, 'link')))
+        self.assertEqual('etc', readlink(join(self.viewer_directory, 'link')))
+
+
+class ResolvedTokensTest(unittest.TestCase):
+
+    def test_should_resolve_token_values(self):
+        resolved_tokens = ResolvedTokens({"FOO": "foo", "BAR": "@@@FOO@@@"})
+
+        self.assertEqual({"FOO": "foo", "BAR": "foo"}, resolved_tokens.token_values)
+
+    def test_should_not_contain_token_values_referring_to_unknown_tokens(self):
+        resolved_tokens = ResolvedTokens({"FOO": "@@@HOST@@@", "BAR": "@@@FOO@@@", "BAZ": "baz"})
+
+        self.assertEqual({"BAZ": "baz"}, resolved_tokens.token_values)
+
+    def test_should_not_contain_token_values_with_cycles(self):
+        resolved_tokens = ResolvedTokens({"FOO": "@@@BAR@@@", "BAR": "@@@FOO@@@"})
+
+        self.assertEqual({}, resolved_tokens.token_values)
+
+    def test_should_determine_direct_and_indirect_dependencies(self):
+        resolved_tokens = ResolvedTokens({"FOO": "foo", "BAR": "@@@FOO@@@", "BAZ": "@@@BAR@@@ @@@HOST@@@"})
+
+        self.assertEqual({"FOO": set(), "BAR": set(["FOO"]), "BAZ": set(["BAR", "FOO", "HOST"])}, resolved_tokens.dependencies)
+
+    def test_should_return_reusable_token_values(self):
+        resolved_tokens = ResolvedTokens({"FOO": "foo", "BAR": "@@@FOO@@@", "SPAM": "spam", "EGGS": "@@@SPAM@@@"})
+
+        actual_token_values = resolved_tokens.get_reusable_token_values({"FOO": "foo", "BAR": "@@@FOO@@@", "SPAM": "ham", "EGGS": "@@@SPAM@@@"})
+
+        self.assertEqual({"FOO": "foo", "BAR": "foo"}, actual_token_values)
+
+    def test_should_not_return_token_values_referring_to_removed_tokens(self):
+        resolved_tokens = ResolvedTokens({"FOO": "foo", "BAR": "@@@FOO@@@"})
+
+        actual_token_values = resolved_tokens.get_reusable_token_values({"BAR": "@@@FOO@@@"})
+
+        self.assertEqual({}, actual_token_values)
@@ -17,9 +17,11 @@
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from unittest import TestCase
-from mock import patch
+from mock import Mock, patch
 
-from config_rpm_maker.utilities.profiler import measure_execution_time
+from config_rpm_maker.utilities import profiler
+from config_rpm_maker.utilities.profiler import (count_cache_access, log_execution_time_summaries, measure_execution_time,
+                                                 record_throughput)
 
 
 class ProfilerTests(TestCase):
@@ -36,3 +38,30 @@ class ProfilerTests(TestCase):
         actual_function()
 
         self.assertTrue(self.dummy_function_has_been_executed)
+
+    @patch.dict(profiler._throughput_summary, clear=True)
+    @patch.dict(profiler._cache_summary, clear=True)
+    @patch.dict(profiler._execution_time_summary, clear=True)
+    def test_should_log_hits_and_misses_of_caches(self):
+
+        count_cache_access('Svn metadata', True)
+        count_cache_access('Svn metadata', True)
+        count_cache_access('Svn metadata', False)
+        mock_logging_function = Mock()
+
+        log_execution_time_summaries(mock_logging_function)
+
+        mock_logging_function.assert_called_with('    %7s hit(s), %7s miss(es) : %s', 2, 1, 'Svn metadata')
+
+    @patch.dict(profiler._throughput_summary, clear=True)
+    @patch.dict(profiler._cache_summary, clear=True)
+    @patch.dict(profiler._execution_time_summary, clear=True)
+    def test_should_log_recorded_throughput(self):
+
+        record_throughput('RpmUploader', 4, 2 * 1024 * 1024, 2.0)
+        mock_logging_function = Mock()
+
+        log_execution_time_summaries(mock_logging_function)
+
+        mock_logging_function.assert_called_with('    %7s item(s), %10s bytes in %7ss = %7s item(s)/s, %7s MB/s : %s',
+                                                 4, 2 * 1024 * 1024, 2.0, 2.0, 1.0, 'RpmUploader')
@@ -0,0 +1,136 @@
+#   yadt-config-rpm-maker
+#   Copyright (C) 2011-2013 Immobilien Scout GmbH
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from mock import Mock, patch
+
+from unittest_support import UnitTests
+
+from config_rpm_maker.workdirbudget import WorkDirBudget
+
+
+def create_statvfs_result(free_blocks, free_inodes):
+    statvfs_result = Mock()
+    statvfs_result.f_bavail = free_blocks
+    statvfs_result.f_frsize = 1024
+    statvfs_result.f_favail = free_inodes
+    return statvfs_result
+
+
+@patch('config_rpm_maker.workdirbudget.Thread')
+@patch('config_rpm_maker.workdirbudget.statvfs')
+class WorkDirBudgetTests(UnitTests):
+
+    def test_should_read_free_space_of_work_directory(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+
+        WorkDirBudget('/tmp/work', 0, 0)
+
+        mock_statvfs.assert_called_with('/tmp/work')
+
+    def test_should_have_room_for_another_host_when_enough_space_and_inodes_are_free(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+
+        self.assertTrue(WorkDirBudget('/tmp/work', 100 * 1024, 1000).has_room_for_another_host())
+
+    def test_should_not_have_room_for_another_host_when_not_enough_space_is_free(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(99, 1000)
+
+        self.assertFalse(WorkDirBudget('/tmp/work', 100 * 1024, 0).has_room_for_another_host())
+
+    def test_should_not_have_room_for_another_host_when_not_enough_inodes_are_free(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 999)
+
+        self.assertFalse(WorkDirBudget('/tmp/work', 0, 1000).has_room_for_another_host())
+
+    def test_should_measure_space_and_inodes_a_host_still_uses_when_it_is_done(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+        work_dir_budget = WorkDirBudget('/tmp/work', 0, 0)
+        work_dir_budget.host_started('devweb01')
+        mock_statvfs.return_value = create_statvfs_result(90, 980)
+
+        work_dir_budget.host_done('devweb01')
+
+        self.assertEqual(10 * 1024, work_dir_budget.max_bytes_per_host)
+        self.assertEqual(20, work_dir_budget.max_inodes_per_host)
+        self.assertEqual(90 * 1024, work_dir_budget.lowest_free_bytes)
+        self.assertEqual(980, work_dir_budget.lowest_free_inodes)
+
+    def test_should_keep_room_for_space_and_inodes_the_largest_host_left_behind(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+        work_dir_budget = WorkDirBudget('/tmp/work', 81 * 1024, 0)
+        work_dir_budget.host_started('devweb01')
+        mock_statvfs.return_value = create_statvfs_result(90, 1000)
+        work_dir_budget.host_done('devweb01')
+
+        self.assertFalse(work_dir_budget.has_room_for_another_host())
+
+    def test_should_measure_peak_usage_of_space_and_inodes_while_host_is_in_progress(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+        work_dir_budget = WorkDirBudget('/tmp/work', 0, 0)
+        work_dir_budget.host_started('devweb01')
+        mock_statvfs.return_value = create_statvfs_result(70, 950)
+        work_dir_budget.sample()
+        mock_statvfs.return_value = create_statvfs_result(95, 990)
+
+        work_dir_budget.host_done('devweb01')
+
+        self.assertEqual(30 * 1024, work_dir_budget.max_bytes_per_host)
+        self.assertEqual(50, work_dir_budget.max_inodes_per_host)
+
+    def test_should_only_measure_peak_usage_while_host_is_in_progress(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+        work_dir_budget = WorkDirBudget('/tmp/work', 0, 0)
+        mock_statvfs.return_value = create_statvfs_result(50, 500)
+        work_dir_budget.sample()
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+        work_dir_budget.host_started('devweb01')
+        mock_statvfs.return_value = create_statvfs_result(90, 990)
+
+        work_dir_budget.host_done('devweb01')
+
+        self.assertEqual(10 * 1024, work_dir_budget.max_bytes_per_host)
+        self.assertEqual(10, work_dir_budget.max_inodes_per_host)
+
+    def test_should_start_sampling_when_first_host_is_started(self, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+        work_dir_budget = WorkDirBudget('/tmp/work', 0, 0)
+
+        work_dir_budget.host_started('devweb01')
+        work_dir_budget.host_started('berweb01')
+
+        mock_thread_class.assert_called_once_with(target=work_dir_budget._sample_while_hosts_are_in_progress, name='WorkDirBudgetSampler')
+        mock_thread_class.return_value.start.assert_called_once_with()
+
+    @patch('config_rpm_maker.workdirbudget.sleep')
+    def test_should_stop_sampling_when_no_host_is_in_progress(self, mock_sleep, mock_statvfs, mock_thread_class):
+
+        mock_statvfs.return_value = create_statvfs_result(100, 1000)
+        work_dir_budget = WorkDirBudget('/tmp/work', 0, 0)
+        work_dir_budget.host_started('devweb01')
+        work_dir_budget.host_done('devweb01')
+
+        work_dir_budget._sample_while_hosts_are_in_progress()
+
+        self.assertEqual(None, work_dir_budget._sampler)